@@ -18,6 +18,7 @@ You should have received a copy of the GNU General Public License
 along with dmf_control_board.  If not, see <http://www.gnu.org/licenses/>.
 """
 from collections import OrderedDict
+from contextlib import contextmanager
 import copy
 from datetime import datetime
 import decorator
@@ -25,12 +26,12 @@ import logging
 import math
 import os
 import re
+import sys
 import time
 import types
 import warnings
 
 from arduino_helpers.context import auto_context, Board, Uploader
-from base_node import BaseNode
 from dmf_control_board_base import INPUT, OUTPUT, HIGH, LOW  # Firmware consts
 from microdrop_utility import Version, FutureVersionError
 from path_helpers import path
@@ -43,6 +44,17 @@ import serial_device as sd
 from .calibrate.feedback import compute_from_transfer_function
 from .dmf_control_board_base import DMFControlBoard as Base
 from .dmf_control_board_base import uint8_tVector
+from .actuation import ActuationProgram, split_results_buffer
+from .autorange import (DEFAULT_HEADROOM, HV_ATTENUATOR_RESISTANCE,
+                        SaturationMetrics, predict_series_resistor_indexes)
+from .batch import CommandBatch
+from .calibration_cache import CALIBRATION_KEYS, CalibrationCache
+from .config import ConfigTransaction
+from .gain_cache import AmplifierGainCache
+from .i2c import I2cDeviceInventory
+from .metrics import CommandMetrics, MetricsDumper
+from .stream import ImpedanceStream
+from .tracing import span, traced
 
 logger = logging.getLogger()
 
@@ -144,6 +156,30 @@ class FirmwareError(Exception):
                                            self.command_code)))
 
 
+class BatchError(FirmwareError):
+    '''
+    Used to indicate that one or more commands in a batch (see
+    :meth:`DMFControlBoard.batch`) failed.
+
+    The command code and return code refer to the first command that failed.
+    The results of all commands in the batch (including commands that were
+    not run) are available in the :attr:`results` attribute.
+    '''
+    def __init__(self, results):
+        self.results = results
+        failed = results.loc[results.return_code !=
+                             RETURN_CODES_BY_NAME.OK].iloc[0]
+        super(BatchError, self).__init__(int(failed.command_code),
+                                         int(failed.return_code))
+        self.index = failed.name
+
+    def __str__(self):
+        n_not_run = self.results.return_code.isnull().sum()
+        return (r'%s [batch command %d of %d, %d command(s) not run]' %
+                (super(BatchError, self).__str__(), self.index + 1,
+                 self.results.shape[0], n_not_run))
+
+
 def feedback_results_to_measurements_frame(feedback_result):
     '''
     Extract measured data from `FeedbackResults` instance into
@@ -284,12 +320,23 @@ class FeedbackResults():
      - Actuation frequency.
      - Target actuation voltage.
      - Active channels.
+
+    Each measurement may either be a single sampling window or a *summary* of
+    a group of sampling windows (see
+    :meth:`DMFControlBoard.measure_impedance_summary`).  In the latter case,
+    ``V_hv`` and ``V_fb`` hold the mean of each group and the attributes
+    listed in :data:`SUMMARY_ATTRS` hold the remaining aggregates.
     '''
-    class_version = str(Version(0, 6))
+    class_version = str(Version(0, 7))
+
+    # Attributes only set for summaries of groups of sampling windows.
+    SUMMARY_ATTRS = ['n_windows', 'hv_saturated', 'fb_saturated', 'V_hv_min',
+                     'V_hv_max', 'V_hv_last', 'V_fb_min', 'V_fb_max',
+                     'V_fb_last']
 
     def __init__(self, voltage, frequency, dt_ms, V_hv, hv_resistor, V_fb,
                  fb_resistor, calibration, area=0, amplifier_gain=None,
-                 vgnd_hv=None, vgnd_fb=None):
+                 vgnd_hv=None, vgnd_fb=None, summary=None):
         # ## One value per set of measurements ##
         #
         # Actually, only changes if device is recalibrated.
@@ -312,6 +359,18 @@ class FeedbackResults():
         self.V_fb = V_fb  # Measured device load voltage
         self.hv_resistor = hv_resistor  # Index of high voltage resistor
         self.fb_resistor = fb_resistor  # Index of device load resistor
+        # ### Window group summary values ###
+        #
+        # Number of windows, number of saturated windows, and min, max, and
+        # last voltage of each group.
+        if summary is None:
+            summary = {}
+        for name in self.SUMMARY_ATTRS:
+            setattr(self, name, summary.get(name))
+        if self.n_windows is not None:
+            # Time of the first window of each group.
+            self.time = np.concatenate([[0], np.cumsum(self.n_windows)
+                                        [:-1]]) * dt_ms
 
         self._sanitize_data()
 
@@ -320,6 +379,17 @@ class FeedbackResults():
     def _sanitize_data(self):
         self.V_hv[self.hv_resistor < 0] = np.nan
         self.V_fb[self.fb_resistor < 0] = np.nan
+        if self.is_summary:
+            for suffix in ('min', 'max', 'last'):
+                getattr(self, 'V_hv_' + suffix)[self.hv_resistor < 0] = np.nan
+                getattr(self, 'V_fb_' + suffix)[self.fb_resistor < 0] = np.nan
+
+    @property
+    def is_summary(self):
+        '''
+        ``True`` if each measurement summarizes a group of sampling windows.
+        '''
+        return getattr(self, 'n_windows', None) is not None
 
     def _upgrade(self):
         """
@@ -366,6 +436,12 @@ class FeedbackResults():
                 self.version = str(Version(0, 6))
                 logging.info('[FeedbackResults] upgrade to version %s' %
                              self.version)
+            if version < Version(0, 7):
+                for name in self.SUMMARY_ATTRS:
+                    setattr(self, name, None)
+                self.version = str(Version(0, 7))
+                logging.info('[FeedbackResults] upgrade to version %s' %
+                             self.version)
         else:
             # Else the versions are equal and don't need to be upgraded.
             pass
@@ -402,15 +478,18 @@ class FeedbackResults():
         V1.fill(np.nan)
         V1[ind] = compute_from_transfer_function(self.calibration.hw_version
                                                  .major, 'V1',
-                                                 V2=self.V_hv[ind], R1=10e6,
+                                                 V2=self.V_hv[ind],
+                                                 R1=HV_ATTENUATOR_RESISTANCE,
                                                  R2=self.calibration.R_hv
                                                  [self.hv_resistor[ind]],
                                                  C2=self.calibration.C_hv
                                                  [self.hv_resistor[ind]],
                                                  f=self.frequency)
         # convert to masked array
-        V1 = np.ma.masked_invalid(pd.Series(V1, pd.to_datetime(self.time, unit='s')
-            ).interpolate(method='time').values)
+        with span('interpolate', 'analysis'):
+            V1 = np.ma.masked_invalid(pd.Series(V1, pd.to_datetime(self.time,
+                                                                   unit='s')
+                ).interpolate(method='time').values)
         V1.fill_value = np.nan
         V1.data[V1.mask] = V1.fill_value
         return V1
@@ -478,8 +557,10 @@ class FeedbackResults():
                                                  V2=self.V_fb[ind], R2=R2,
                                                  C2=C2, f=self.frequency)
 
-        Z1 = np.ma.masked_invalid(pd.Series(Z1, pd.to_datetime(self.time, unit='s')
-            ).interpolate(method='time').values)
+        with span('interpolate', 'analysis'):
+            Z1 = np.ma.masked_invalid(pd.Series(Z1, pd.to_datetime(self.time,
+                                                                   unit='s')
+                ).interpolate(method='time').values)
         Z1.fill_value = np.nan
         Z1.data[Z1.mask] = Z1.fill_value
 
@@ -496,21 +577,15 @@ class FeedbackResults():
             # if the window size is less than half the sample length
             if window_size and window_size < len(Z1) / 2:
                 # suppress polyfit warnings
-                with warnings.catch_warnings():
+                with warnings.catch_warnings(), span('savgol_filter',
+                                                     'analysis'):
                     warnings.simplefilter("ignore")
                     Z1 = savgol_filter(Z1, window_size, filter_order)
             else: # fit a line
                 result = self.mean_velocity(tol=tol)
                 if result['dt'] and \
                     result['dt'] > 0.1 * self.time[-1] and result['p'][0] > 0:
-                    if self.calibration._c_drop:
-                        c_drop = self.calibration.c_drop(self.frequency)
-                    else:
-                        c_drop = self.capacitance()[-1] / self.area
-                    if self.calibration._c_filler:
-                        c_filler = self.calibration.c_filler(self.frequency)
-                    else:
-                        c_filler = 0
+                    c_drop, c_filler = self._unit_capacitances()
                     x = result['p'][0]*self.time + result['p'][1]
                     C = self.area * (x * (c_drop - c_filler) / \
                                      np.sqrt(self.area) + c_filler)
@@ -521,6 +596,28 @@ class FeedbackResults():
                     Z1 = np.mean(Z1)*np.ones(Z1.shape)
         return Z1
 
+    def _unit_capacitances(self):
+        '''
+        Returns
+        -------
+        tuple
+            Capacitance per unit area (F/mm^2) of an electrode covered in
+            liquid (``c_drop``) and in filler media (``c_filler``) at the
+            actuation frequency.
+
+            If not calibrated, ``c_drop`` is estimated from the final measured
+            capacitance, and ``c_filler`` is assumed to be 0.
+        '''
+        if self.calibration._c_drop:
+            c_drop = self.calibration.c_drop(self.frequency)
+        else:
+            c_drop = self.capacitance()[-1] / self.area
+        if self.calibration._c_filler:
+            c_filler = self.calibration.c_filler(self.frequency)
+        else:
+            c_filler = 0
+        return c_drop, c_filler
+
     def force(self, Ly=None):
         '''
         Estimate the applied force (in Newtons) on a drop according to the
@@ -538,14 +635,7 @@ class FeedbackResults():
            a two-plate droplet microfluidic device," Lab on a Chip, no. 9
            (2009): 1219-1229.
         '''
-        if self.calibration._c_drop:
-            c_drop = self.calibration.c_drop(self.frequency)
-        else:
-            c_drop = self.capacitance()[-1] / self.area
-        if self.calibration._c_filler:
-            c_filler = self.calibration.c_filler(self.frequency)
-        else:
-            c_filler = 0
+        c_drop, c_filler = self._unit_capacitances()
         if Ly is None:
             Ly = np.sqrt(self.area)
         return 1e3 * Ly * 0.5 * (c_drop - c_filler) * self.V_actuation()**2
@@ -593,14 +683,7 @@ class FeedbackResults():
         for Lx, the electrode is assumed to be square, i.e.,
             Lx=Ly=sqrt(area)
         '''
-        if self.calibration._c_drop:
-            c_drop = self.calibration.c_drop(self.frequency)
-        else:
-            c_drop = self.capacitance()[-1] / self.area
-        if self.calibration._c_filler:
-            c_filler = self.calibration.c_filler(self.frequency)
-        else:
-            c_filler = 0
+        c_drop, c_filler = self._unit_capacitances()
         if Lx is None:
             Lx = np.sqrt(self.area)
         return (self.capacitance(filter_order=filter_order,
@@ -696,7 +779,8 @@ class FeedbackResults():
             # if the window size is less than half the sample length
             if window_size < len(x) / 2:
                 # suppress polyfit warnings
-                with warnings.catch_warnings():
+                with warnings.catch_warnings(), span('savgol_filter',
+                                                     'analysis'):
                     warnings.simplefilter("ignore")
                     dx = savgol_filter(x, window_size, filter_order, 1)
             else: # use the average velocity
@@ -707,6 +791,79 @@ class FeedbackResults():
                 dx[:mlab.find(t==result['t_end'])[0]+1] = mean_dxdt * dt
         return t, np.ma.masked_invalid(dx / dt)
 
+    def _with_voltages(self, V_hv, V_fb):
+        '''
+        Return a copy of these results with the measured voltages replaced.
+        '''
+        results = FeedbackResults(self.voltage, self.frequency, 0,
+                                  np.array(V_hv, dtype=float),
+                                  self.hv_resistor,
+                                  np.array(V_fb, dtype=float),
+                                  self.fb_resistor, self.calibration,
+                                  area=self.area,
+                                  amplifier_gain=self.amplifier_gain,
+                                  vgnd_hv=self.vgnd_hv, vgnd_fb=self.vgnd_fb)
+        results.time = self.time
+        return results
+
+    def summary_frame(self):
+        '''
+        Convert window group summaries to a `pandas.DataFrame`.
+
+        The transfer functions are applied to each aggregate using the series
+        resistors of the corresponding group.  Note that the control board
+        closes a group whenever a series resistor changes, so all unsaturated
+        windows in a group share the same series resistors.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Indexed by time of the first window of each group (in seconds),
+            with the columns:
+
+             - ``n_windows``: number of sampling windows in group.
+             - ``hv_saturated``, ``fb_saturated``: number of saturated
+               windows.
+             - ``V_actuation``, ``V_actuation_min``, ``V_actuation_max``,
+               ``V_actuation_last``: mean, min, max, and last actuation
+               voltage.
+             - ``capacitance``, ``capacitance_min``, ``capacitance_max``,
+               ``capacitance_last``: capacitance computed from the mean,
+               min, max, and last feedback voltage.
+
+            The ``min``/``max`` capacitance columns are computed against the
+            *mean* actuation voltage of each group, while the ``last`` columns
+            use the high-voltage and feedback values of the same (last)
+            window.
+
+        Raises
+        ------
+        ValueError
+            If the results do not contain window group summaries.
+        '''
+        if not self.is_summary:
+            raise ValueError('Results do not contain window group summaries.')
+
+        columns = OrderedDict()
+        columns['n_windows'] = self.n_windows
+        columns['hv_saturated'] = self.hv_saturated
+        columns['fb_saturated'] = self.fb_saturated
+        columns['V_actuation'] = self.V_actuation().filled(np.NaN)
+        for suffix in ('min', 'max', 'last'):
+            V_hv = getattr(self, 'V_hv_' + suffix)
+            columns['V_actuation_' + suffix] = (self._with_voltages(V_hv,
+                                                                    self.V_fb)
+                                                .V_actuation().filled(np.NaN))
+        columns['capacitance'] = self.capacitance().filled(np.NaN)
+        for suffix in ('min', 'max', 'last'):
+            V_hv = self.V_hv_last if suffix == 'last' else self.V_hv
+            V_fb = getattr(self, 'V_fb_' + suffix)
+            columns['capacitance_' + suffix] = (self._with_voltages(V_hv, V_fb)
+                                                .capacitance().filled(np.NaN))
+        return pd.DataFrame(columns, index=pd.Index(self.time * 1e-3,
+                                                    name='seconds'))
+
+    @traced('analysis')
     def to_frame(self, filter_order=3):
         """
         Convert data to a `pandas.DataFrame`.
@@ -904,6 +1061,70 @@ class FeedbackResultsSeries():
         return np.ma.masked_invalid(result)
 
 
+class FrequencyTable(object):
+    '''
+    Piecewise-linear lookup table of a calibrated quantity (e.g., capacitance
+    per unit area) versus frequency.
+
+    Breakpoints are sorted by frequency (values at duplicate frequencies are
+    averaged) when the table is built, so lookups are vectorised over arrays
+    of frequencies.  Frequencies outside of the table range take the value of
+    the nearest breakpoint (as with :func:`numpy.interp`).
+
+    Parameters
+    ----------
+    frequency : array-like
+        Frequency of each breakpoint.
+    values : array-like
+        Value at each breakpoint.
+    '''
+    def __init__(self, frequency, values):
+        frequency = np.asarray(frequency, dtype=float).ravel()
+        values = np.asarray(values, dtype=float).ravel()
+        if not len(frequency) or frequency.shape != values.shape:
+            raise ValueError('Expected the same (non-zero) number of '
+                             'frequencies and values.')
+        self.frequency, inverse = np.unique(frequency, return_inverse=True)
+        self.values = (np.bincount(inverse, weights=values) /
+                       np.bincount(inverse))
+
+    @classmethod
+    def from_calibration(cls, value, key='capacitance'):
+        '''
+        Parameters
+        ----------
+        value : dict
+            Calibration data with ``frequency`` and ``key`` arrays.
+        key : str, optional
+            Name of values in :data:`value`.
+
+        Returns
+        -------
+        FrequencyTable
+            Lookup table, or ``None`` if :data:`value` is not a table (e.g.,
+            a scalar).
+        '''
+        try:
+            frequency, values = value['frequency'], value[key]
+        except (TypeError, KeyError, IndexError, ValueError):
+            return None
+        return cls(frequency, values)
+
+    def __call__(self, frequency):
+        '''
+        Parameters
+        ----------
+        frequency : float or array-like
+            Frequency (or frequencies) to look up.
+
+        Returns
+        -------
+        float or numpy.ndarray
+            Interpolated value at each frequency.
+        '''
+        return np.interp(frequency, self.frequency, self.values)
+
+
 class FeedbackCalibration():
     class_version = str(Version(0, 3))
 
@@ -957,37 +1178,108 @@ class FeedbackCalibration():
         logger.warning('C_filler is depreciated. Use c_filler instead.')
         return self.c_filler(frequency)
 
+    def _frequency_table(self, name):
+        '''
+        Returns
+        -------
+        FrequencyTable
+            Lookup table compiled from a frequency-dependent calibration
+            attribute (e.g., ``_c_drop``), or ``None`` if the attribute is not
+            a table.  The table is compiled once, and again only if the
+            attribute is replaced (or after :meth:`invalidate_tables`).
+        '''
+        source = getattr(self, name)
+        tables = self.__dict__.setdefault('_frequency_tables', {})
+        if name not in tables or tables[name][0] is not source:
+            tables[name] = (source, FrequencyTable.from_calibration(source))
+        return tables[name][1]
+
+    def invalidate_tables(self):
+        '''
+        Discard the lookup tables compiled from the frequency-dependent
+        calibration attributes (i.e., ``_c_drop`` and ``_c_filler``).
+
+        Must be called after modifying an attribute in place (e.g., appending
+        a frequency); replacing an attribute is detected automatically.
+        '''
+        self.__dict__.pop('_frequency_tables', None)
+
     def c_drop(self, frequency):
         '''
         Capacitance of an electrode covered in liquid, normalized per unit
         area (i.e., units are F/mm^2).
+
+        The :data:`frequency` may be an array of frequencies.
         '''
-        try:
-            return np.interp(frequency,
-                             self._c_drop['frequency'],
-                             self._c_drop['capacitance']
-            )
-        except:
-            pass
-        return self._c_drop
+        table = self._frequency_table('_c_drop')
+        if table is None:
+            return self._c_drop
+        return table(frequency)
 
     def c_filler(self, frequency):
         '''
         Capacitance of an electrode covered in filler media (e.g., air or oil),
         normalized per unit area (i.e., units are F/mm^2).
+
+        The :data:`frequency` may be an array of frequencies.
         '''
-        try:
-            return np.interp(frequency,
-                             self._c_filler['frequency'],
-                             self._c_filler['capacitance']
-            )
-        except:
-            pass
-        return self._c_filler
+        table = self._frequency_table('_c_filler')
+        if table is None:
+            return self._c_filler
+        return table(frequency)
+
+    def force_to_voltage(self, force, frequency):
+        '''
+        Convert a force in uN/mm to voltage.
+
+        Parameters
+        ----------
+        force : float or array-like
+            Force in **uN/mm**.
+        frequency : float or array-like
+            Actuation frequency (broadcast against :data:`force`, e.g., the
+            columns of a table of protocol steps).
+
+        Returns
+        -------
+        float or array-like
+            Actuation voltage to apply :data:`force` at an actuation frequency
+            of :data:`frequency`.
+        '''
+        c_drop = self.c_drop(frequency)
+        # if c_filler hasn't been set, assume c_filler = 0
+        c_filler = self.c_filler(frequency) if self._c_filler else 0
+        return np.sqrt(np.multiply(force, 1e-9) / (0.5 * (c_drop - c_filler)))
+
+    def force_to_voltage_surface(self, frequencies, forces):
+        '''
+        Parameters
+        ----------
+        frequencies : array-like
+            Actuation frequencies.
+        forces : array-like
+            Forces in **uN/mm**.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Actuation voltage for each combination of frequency (index) and
+            force (columns), e.g., to look up voltages for many protocol steps
+            without recomputing the calibration.
+        '''
+        frequencies = np.asarray(frequencies, dtype=float).ravel()
+        forces = np.asarray(forces, dtype=float).ravel()
+        forces_, frequencies_ = np.broadcast_arrays(forces[np.newaxis, :],
+                                                    frequencies[:, np.newaxis])
+        return pd.DataFrame(self.force_to_voltage(forces_, frequencies_),
+                            index=pd.Index(frequencies, name='frequency'),
+                            columns=pd.Index(forces, name='force'))
 
     def __getstate__(self):
         """Convert numpy arrays to lists for serialization"""
         out = copy.deepcopy(self.__dict__)
+        # Lookup tables are compiled again as needed.
+        out.pop('_frequency_tables', None)
         for k, v in out.items():
             if isinstance(v, np.ndarray):
                 out[k] = v.tolist()
@@ -1108,6 +1400,45 @@ def remote_command(function, self, *args, **kwargs):
     Catch `RuntimeError` exceptions raised by remote control board firmware
     commands and re-raise as more specific `FirmwareError` exception type,
     which includes command code and return code.
+
+    Each call is recorded in the metrics registry of the control board (see
+    :attr:`DMFControlBoard.metrics`), unless the registry is disabled.
+    '''
+    with span(function.__name__, 'command'):
+        metrics = getattr(self, 'metrics', None)
+        if metrics is None or not metrics.enabled:
+            return _remote_call(function, self, *args, **kwargs)
+
+        bytes_sent = self.total_bytes_sent()
+        bytes_received = self.total_bytes_received()
+        return_code = None
+        timeout = False
+        start = time.time()
+        try:
+            return _remote_call(function, self, *args, **kwargs)
+        except FirmwareError, exception:
+            return_code = NAMES_BY_RETURN_CODE.get(exception.return_code,
+                                                   exception.return_code)
+            raise
+        except RuntimeError, exception:
+            if 'timeout' in str(exception):
+                timeout = True
+                return_code = 'TIMEOUT'
+            raise
+        finally:
+            # Byte counters are 32-bit and may wrap around.
+            metrics.record(function.__name__, time.time() - start,
+                           bytes_sent=(self.total_bytes_sent() - bytes_sent)
+                           % 2 ** 32,
+                           bytes_received=(self.total_bytes_received() -
+                                           bytes_received) % 2 ** 32,
+                           return_code=return_code, timeout=timeout)
+
+
+def _remote_call(function, self, *args, **kwargs):
+    '''
+    Call remote command function, translating firmware errors (see
+    :func:`remote_command`).
     '''
     try:
         return function(self, *args, **kwargs)
@@ -1133,40 +1464,192 @@ def remote_command(function, self, *args, **kwargs):
 
 
 class DMFControlBoard(Base):
-    def __init__(self):
+    # Columns of frame returned by `sweep_channels`.
+    SWEEP_CHANNELS_COLUMNS = ['frequency', 'voltage', 'channel_i',
+                              'V_actuation', 'capacitance', 'impedance']
+
+    def __init__(self, calibration_cache=True):
+        '''
+        Parameters
+        ----------
+        calibration_cache : CalibrationCache or bool, optional
+            History of the calibration of each control board, used to skip
+            reading the calibration values while connecting (see
+            :meth:`_read_calibration_data`).  If ``True`` (default), the
+            default on-disk cache is used.  If ``None`` or ``False``, the
+            calibration values are always read from the control board.
+        '''
         Base.__init__(self)
         self.__aref__ = None
         self._channel_mask_cache = None
+        # Active configuration transaction (see :meth:`config_transaction`).
+        self._config_transaction = None
         self._i2c_devices = {}
         self._number_of_channels = None
         self.calibration = None
+        # On-disk history of the calibration of each control board (see
+        # :meth:`_read_calibration_data`).
+        if calibration_cache is True:
+            calibration_cache = CalibrationCache()
+        self.calibration_cache = calibration_cache or None
+        # `True` while packets are captured (see :meth:`capture`).
+        self._capturing = False
+        # Serial number of the connected control board (if supported by the
+        # firmware).
+        self._serial_number = None
+        # Converged amplifier gain per waveform frequency and voltage (see
+        # :meth:`settle_amplifier_gain`).
+        self.amplifier_gain_cache = AmplifierGainCache()
+        # `(frequency, voltage, gain)` of the cached amplifier gain sent with
+        # the current waveform settings (if any).
+        self._seeded_amplifier_gain = None
+        self._actuation_program = None
+        self._actuation_program_settings = None
+        # Host-side mirror of the waveform and amplifier settings of the
+        # control board (see :meth:`_mirrored`).
+        self._settings_mirror = {}
+        # Per-command latency and throughput metrics (see :meth:`stats`).
+        self.metrics = CommandMetrics()
+        self._metrics_dumper = None
+        # Initial series resistor of each analog channel (`-1`: largest, see
+        # :meth:`autorange`).
+        self._initial_series_resistor_index = [-1, -1]
+        # Saturated sampling window counts, per ranging mode (see
+        # :meth:`autorange`).
+        self.saturation_metrics = SaturationMetrics()
+        # Ranging mode of the running non-blocking impedance measurement.
+        self._non_blocking_ranging_mode = None
 
     def force_to_voltage(self, force, frequency):
         '''
         Convert a force in uN/mm to voltage.
 
+        See :meth:`FeedbackCalibration.force_to_voltage` (arrays of forces
+        and frequencies are supported).
+        '''
+        return self.calibration.force_to_voltage(force, frequency)
+
+    @remote_command
+    def set_initial_series_resistor_index(self, channel, index):
+        '''
+        Set the series resistor that the control board enables at the start
+        of each impedance measurement (before adjusting the series resistor
+        to the measured signal).
+
         Parameters
         ----------
-        force : float
-            Force in **uN/mm**.
-        frequency : float
-            Actuation frequency.
+        channel : int
+            Analog channel index.
+        index : int
+            Series resistor index, or ``-1`` to start with the largest series
+            resistor (the default).
+        '''
+        self._set_initial_series_resistor_index(channel, index)
+        self._initial_series_resistor_index[channel] = index
+
+    def predict_series_resistor_indexes(self, capacitance=None, voltage=None,
+                                        frequency=None,
+                                        headroom=DEFAULT_HEADROOM):
+        '''
+        Predict the initial series resistor of each analog channel from the
+        calibration of the control board.
+
+        See :func:`autorange.predict_series_resistor_indexes`.
+
+        Parameters
+        ----------
+        capacitance : float, optional
+            Expected load capacitance (in farads).
+        voltage : float, optional
+            Target actuation voltage (default: current waveform voltage).
+        frequency : float, optional
+            Actuation frequency (default: current waveform frequency).
+        headroom : float, optional
+            Fraction of the peak-to-peak amplitude at which the inputs
+            saturate (see :data:`autorange.MAX_PK_PK`) that the predicted
+            amplitude may reach.
 
         Returns
         -------
-        float
-            Actuation voltage to apply :data:`force` at an actuation frequency
-            of :data:`frequency`.
+        tuple
+            Predicted high-voltage and feedback series resistor indexes.
+        '''
+        if voltage is None:
+            voltage = self.waveform_voltage()
+        if frequency is None:
+            frequency = self.waveform_frequency()
+        return predict_series_resistor_indexes(self.calibration, voltage,
+                                               frequency, capacitance,
+                                               aref=self.__aref__ or 5.,
+                                               headroom=headroom)
+
+    def autorange(self, capacitance=None, voltage=None, frequency=None,
+                  headroom=DEFAULT_HEADROOM):
         '''
-        c_drop = self.calibration.c_drop(frequency)
+        Predict the initial series resistor of each analog channel (see
+        :meth:`predict_series_resistor_indexes`) and send the predictions to
+        the control board, so impedance measurements start in the right
+        range instead of searching down from the largest series resistor.
 
-        # if c_filler hasn't been set, assume c_filler = 0
-        if self.calibration._c_filler:
-            c_filler = self.calibration.c_filler(frequency)
-        else:
-            c_filler = 0
+        Call whenever the target voltage, frequency, or expected load
+        changes (e.g., at the start of each protocol step).  Only changed
+        indexes are sent (in a single batch of commands).
+
+        Returns
+        -------
+        tuple
+            Initial high-voltage and feedback series resistor indexes.
+        '''
+        indexes = self.predict_series_resistor_indexes(capacitance, voltage,
+                                                       frequency, headroom)
+        self._set_initial_series_resistor_indexes(indexes)
+        return indexes
 
-        return np.sqrt(force * 1e-9/ (0.5 * (c_drop - c_filler)))
+    def reset_autorange(self):
+        '''
+        Start impedance measurements with the largest series resistors again.
+        '''
+        self._set_initial_series_resistor_indexes([-1, -1])
+
+    def _ranging_mode(self):
+        '''
+        Returns
+        -------
+        str
+            Ranging mode of impedance measurements started now (see
+            :attr:`saturation_metrics`), i.e., ``'predicted'`` if an initial
+            series resistor is set for either channel, or ``'default'``.
+        '''
+        return ('predicted' if max(self._initial_series_resistor_index) >= 0
+                else 'default')
+
+    def _record_saturation(self, buffer, mode):
+        '''
+        Record the saturated sampling windows of a raw impedance measurement
+        buffer in :attr:`saturation_metrics`.
+
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Raw measurement buffer (see
+            :meth:`measure_impedance_buffer_to_feedback_result`).
+        mode : str
+            Ranging mode in effect when the measurement was started (see
+            :meth:`_ranging_mode`).
+        '''
+        self.saturation_metrics.record(mode, buffer[1:-4:4].astype(int),
+                                       buffer[3:-4:4].astype(int))
+
+    def _set_initial_series_resistor_indexes(self, indexes):
+        changed = [(channel, index) for channel, index in enumerate(indexes)
+                   if self._initial_series_resistor_index[channel] != index]
+        if not changed:
+            return
+        with self.batch() as batch:
+            for channel, index in changed:
+                batch.set_initial_series_resistor_index(channel, index)
+        for channel, index in changed:
+            self._initial_series_resistor_index[channel] = index
 
     @safe_series_resistor_index_read
     def series_capacitance(self, channel, resistor_index=None):
@@ -1282,6 +1765,10 @@ class DMFControlBoard(Base):
                 self.calibration.C_fb[resistor_index] = value
         except:
             pass
+        if self._config_transaction is not None:
+            # The control board rewrites its configuration settings to
+            # persistent memory.
+            self._config_transaction.invalidate()
         return self._set_series_capacitance(channel, value)
 
     @safe_series_resistor_index_write
@@ -1323,6 +1810,10 @@ class DMFControlBoard(Base):
                 self.calibration.R_fb[resistor_index] = value
         except:
             pass
+        if self._config_transaction is not None:
+            # The control board rewrites its configuration settings to
+            # persistent memory.
+            self._config_transaction.invalidate()
         return self._set_series_resistance(channel, value)
 
     @property
@@ -1331,6 +1822,20 @@ class DMFControlBoard(Base):
             self.persistent_read_multibyte(self.PERSISTENT_CONFIG_SETTINGS,
                                            count=3, dtype=np.uint16))
 
+    @property
+    @remote_command
+    def config_checksum(self):
+        '''
+        CRC-16 of the configuration settings stored in persistent memory
+        (including the series resistor and capacitor values), computed by the
+        control board.
+
+        Use to check in a single round trip whether the configuration settings
+        changed since they were last read (e.g., to revalidate host-side
+        caches).
+        '''
+        return self._config_checksum()
+
     @remote_command
     def connect(self, port=None, baud_rate=115200):
         '''
@@ -1367,6 +1872,11 @@ class DMFControlBoard(Base):
             if not ports:
                 raise IOError("Arduino Mega2560 not found on any port.")
 
+        # The control board clears the initial series resistors on reset.
+        self._initial_series_resistor_index = [-1, -1]
+        self._serial_number = None
+        self._seeded_amplifier_gain = None
+
         for comport_i in ports:
             if self.connected():
                 self.disconnect()
@@ -1387,23 +1897,27 @@ class DMFControlBoard(Base):
         else:
             raise RuntimeError('Could not connect to control board on any of '
                                'the following ports: %s' % ports)
+        self._settings_mirror = {}
 
         name = self.name()
         version = self.hardware_version()
         firmware = self.software_version()
         serial_number_string = ""
+        serial_number = None
         try:
-            serial_number_string = ", S/N %03d" % self.serial_number
+            serial_number = self.serial_number
+            serial_number_string = ", S/N %03d" % serial_number
         except:
             # Firmware does not support `serial_number` attribute.
             pass
         logger.info("Connected to %s v%s (Firmware: %s%s)" %
                     (name, version, firmware, serial_number_string))
+        self._serial_number = serial_number
 
         logger.info("Poll control board for series resistors and "
                     "capacitance values.")
 
-        self._read_calibration_data()
+        self._read_calibration_data(serial_number)
 
         try:
             self.__aref__ = self._aref()
@@ -1433,7 +1947,7 @@ class DMFControlBoard(Base):
                 break
 
         # Scan I2C bus to generate list of connected devices.
-        self._i2c_scan()
+        self._i2c_scan(serial_number)
 
         if damaged:
             # At least one of the analog input channels appears to be damaged.
@@ -1446,41 +1960,137 @@ class DMFControlBoard(Base):
 
         return self.RETURN_OK
 
-    def _i2c_scan(self):
+    def _i2c_scan(self, serial_number=None):
+        '''
+        Scan the I2C bus and create an inventory of the devices found.
+
+        Descriptions of the devices are read lazily, i.e., when first
+        accessed (see :class:`I2cDeviceInventory`), unless they are cached
+        for the control board with the specified serial number.
+        '''
         logger.info("Scan i2c bus:")
         # scan for devices on the i2c bus
         try:
-            for address in self.i2c_scan():
-                try:
-                    node = BaseNode(self, address)
-                    description = ("%s v%s (Firmware v%s, S/N %03d)" %
-                                   (node.name(), node.hardware_version(),
-                                    node.software_version(),
-                                    node.serial_number))
-                except:
-                    description = "?" % address
-                self._i2c_devices[address] = description
-                logger.info("\t%d: %s" % (address, description))
+            addresses = self.i2c_scan()
         except:
             # Need to catch exceptions here because this call will generate an
             # error on old firmware which will prevent us from getting the
             # opportunity to apply a firmware update.
-            pass
+            return
+        self._i2c_devices = I2cDeviceInventory(self, addresses,
+                                               serial_number=serial_number)
+        for address in self._i2c_devices.addresses:
+            logger.info("\t%d: %s", address,
+                        self._i2c_devices.describe(address, '<not cached>'))
+
+    @property
+    def i2c_devices(self):
+        '''
+        Inventory of I2C devices found on the bus when the control board was
+        connected (see :meth:`rescan`).
+
+        Returns
+        -------
+        I2cDeviceInventory
+            Mapping from the address of each device to its description.
+        '''
+        return self._i2c_devices
+
+    def rescan(self):
+        '''
+        Scan the I2C bus again and read the description of every device
+        found, replacing any cached inventory (e.g., after adding or
+        replacing a switching board).
+
+        Returns
+        -------
+        I2cDeviceInventory
+            Mapping from the address of each device to its description.
+        '''
+        try:
+            serial_number = self.serial_number
+        except:
+            # Firmware does not support `serial_number` attribute.
+            serial_number = None
+        if isinstance(self._i2c_devices, I2cDeviceInventory):
+            self._i2c_devices.forget_descriptions()
+        self._i2c_devices = {}
+        self._i2c_scan(serial_number)
+        if isinstance(self._i2c_devices, I2cDeviceInventory):
+            # Discard cached descriptions of the new address set, too.
+            self._i2c_devices.forget_descriptions()
+            self._i2c_devices.resolve()
+        return self._i2c_devices
+
+    def _read_calibration_data(self, serial_number=None):
+        '''
+        Read the series resistor and capacitor values of the control board
+        into :attr:`calibration`.
 
-    def _read_calibration_data(self):
-        R_hv = self.a0_series_resistance
-        C_hv = self.a0_series_capacitance
-        R_fb = self.a1_series_resistance
-        C_fb = self.a1_series_capacitance
-        logger.info("R_hv=%s" % R_hv)
-        logger.info("C_hv=%s" % C_hv)
-        logger.info("R_fb=%s" % R_fb)
-        logger.info("C_fb=%s" % C_fb)
-        self.calibration = FeedbackCalibration(R_hv, C_hv, R_fb, C_fb,
+        Parameters
+        ----------
+        serial_number : int, optional
+            Serial number of the control board.  If specified, the values are
+            looked up in :attr:`calibration_cache` by the checksum of the
+            configuration settings (see :attr:`config_checksum`), and are only
+            read from the control board (and recorded in the cache) if the
+            checksum does not match.
+
+            The cache is not used if it is disabled, if the firmware does not
+            support the checksum command, or while packets are captured (see
+            :meth:`capture`).
+        '''
+        hardware_version = self.hardware_version()
+        cache = None if self._capturing else self.calibration_cache
+        checksum = None
+        values = None
+        if serial_number is not None and cache is not None:
+            try:
+                checksum = self.config_checksum
+            except Exception:
+                # e.g., firmware does not support the checksum command.
+                logger.debug('Could not read configuration checksum.',
+                             exc_info=True)
+            else:
+                values = cache.lookup(serial_number, checksum)
+                if values is not None and (values['hardware_version'] !=
+                                           hardware_version):
+                    values = None
+        if values is None:
+            values = {'R_hv': self.a0_series_resistance,
+                      'C_hv': self.a0_series_capacitance,
+                      'R_fb': self.a1_series_resistance,
+                      'C_fb': self.a1_series_capacitance}
+            if checksum is not None:
+                cache.record(serial_number, checksum, hardware_version,
+                             values)
+        else:
+            logger.info('Use cached calibration (configuration checksum: '
+                        '%04x).', checksum)
+        for k in CALIBRATION_KEYS:
+            logger.info("%s=%s" % (k, values[k]))
+        self.calibration = FeedbackCalibration(*[values[k]
+                                                 for k in CALIBRATION_KEYS],
                                                hw_version=
                                                Version.fromstring
-                                               (self
-                                                .hardware_version()))
+                                               (hardware_version))
+
+    def calibration_history(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Calibrations of the control board recorded in
+            :attr:`calibration_cache`, indexed by timestamp.
+
+        Raises
+        ------
+        RuntimeError
+            If the calibration cache is disabled.
+        '''
+        if self.calibration_cache is None:
+            raise RuntimeError('Calibration cache is disabled.')
+        return self.calibration_cache.history(self.serial_number)
 
     def persistent_write(self, address, byte, refresh_config=False):
         '''
@@ -1495,11 +2105,40 @@ class DMFControlBoard(Base):
         refresh_config : bool, optional
             Is ``True``, :meth:`load_config()` is called afterward to refresh
             the configuration settings.
+
+            Within a configuration transaction (see
+            :meth:`config_transaction`), the write is deferred until the
+            transaction is committed, and the configuration settings are
+            refreshed once on commit.
         '''
+        if self._config_transaction is not None:
+            self._config_transaction.write(address, byte)
+            return
         self._persistent_write(address, byte)
         if refresh_config:
             self.load_config(False)
 
+    def persistent_read(self, address):
+        '''
+        Read a single byte from an address in persistent memory.
+
+        Within a configuration transaction (see :meth:`config_transaction`),
+        the value includes any deferred write to the address.
+
+        Parameters
+        ----------
+        address : int
+            Address in persistent memory (e.g., EEPROM).
+
+        Returns
+        -------
+        int
+            Value at address.
+        '''
+        if self._config_transaction is not None:
+            return self._config_transaction.read(address)
+        return Base.persistent_read(self, address)
+
     def persistent_read_multibyte(self, address, count=None, dtype=np.uint8):
         '''
         Read a chunk of data from persistent memory.
@@ -1556,7 +2195,7 @@ class DMFControlBoard(Base):
         '''
         for i, byte in enumerate(data.view(np.uint8)):
             self.persistent_write(address + i, int(byte))
-        if refresh_config:
+        if refresh_config and self._config_transaction is None:
             self.load_config(False)
 
     @property
@@ -1679,13 +2318,14 @@ class DMFControlBoard(Base):
 
     @default_pin_modes.setter
     def default_pin_modes(self, pin_modes):
-        for i in range(0, 53 / 8 + 1):
-            mode = 0
-            for j in range(0, 8):
-                if i * 8 + j <= 53:
-                    mode += pin_modes[i * 8 + j] << j
-            self.persistent_write(self.PERSISTENT_PIN_MODE_ADDRESS + i, ~mode &
-                                  0xFF, True)
+        with self.config_transaction():
+            for i in range(0, 53 / 8 + 1):
+                mode = 0
+                for j in range(0, 8):
+                    if i * 8 + j <= 53:
+                        mode += pin_modes[i * 8 + j] << j
+                self.persistent_write(self.PERSISTENT_PIN_MODE_ADDRESS + i,
+                                      ~mode & 0xFF, True)
 
     @property
     def default_pin_states(self):
@@ -1702,13 +2342,14 @@ class DMFControlBoard(Base):
 
     @default_pin_states.setter
     def default_pin_states(self, pin_states):
-        for i in range(0, 53 / 8 + 1):
-            state = 0
-            for j in range(0, 8):
-                if i * 8 + j <= 53:
-                    state += pin_states[i * 8 + j] << j
-            self.persistent_write(self.PERSISTENT_PIN_STATE_ADDRESS + i, ~state
-                                  & 0xFF, True)
+        with self.config_transaction():
+            for i in range(0, 53 / 8 + 1):
+                state = 0
+                for j in range(0, 8):
+                    if i * 8 + j <= 53:
+                        state += pin_states[i * 8 + j] << j
+                self.persistent_write(self.PERSISTENT_PIN_STATE_ADDRESS + i,
+                                      ~state & 0xFF, True)
 
     @remote_command
     def analog_reads(self, pins, n_samples):
@@ -1738,6 +2379,7 @@ class DMFControlBoard(Base):
         state_ = uint8_tVector()
         for i in range(0, len(state)):
             state_.append(int(state[i]))
+        self._non_blocking_ranging_mode = self._ranging_mode()
         Base.measure_impedance_non_blocking(self,
                                             sampling_window_ms,
                                             n_sampling_windows,
@@ -1761,7 +2403,28 @@ class DMFControlBoard(Base):
                                          interleave_samples, rms,
                                          channel_mask_)
 
-    def measure_impedance_buffer_to_feedback_result(self, buffer):
+    @traced('decode')
+    def measure_impedance_buffer_to_feedback_result(self, buffer, voltage=None,
+                                                    frequency=None):
+        '''
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Raw buffer returned by the base ``get_measure_impedance_data`` (or
+            ``measure_impedance``) method.
+        voltage : float, optional
+            Target actuation voltage during the measurement.  If not
+            specified, the current waveform voltage is used (see
+            :meth:`waveform_voltage`).
+        frequency : float, optional
+            Actuation frequency during the measurement.  If not specified, the
+            current waveform frequency is used (see
+            :meth:`waveform_frequency`).
+
+        Returns
+        -------
+        :class:`FeedbackResults`
+        '''
         amplifier_gain = buffer[-1]
         vgnd_hv = buffer[-2]
         vgnd_fb = buffer[-3]
@@ -1771,76 +2434,272 @@ class DMFControlBoard(Base):
         hv_resistor = buffer[1::4].astype(int)
         V_fb = buffer[2::4] / (64*1023.0) * self.__aref__ / 2.0 / np.sqrt(2)
         fb_resistor = buffer[3::4].astype(int)
-        voltage = self.waveform_voltage()
-        frequency = self.waveform_frequency()
+        if voltage is None:
+            voltage = self.waveform_voltage()
+        if frequency is None:
+            frequency = self.waveform_frequency()
         return FeedbackResults(voltage, frequency, dt_ms, V_hv, hv_resistor,
                                V_fb, fb_resistor, self.calibration,
                                amplifier_gain=amplifier_gain,
                                vgnd_hv=vgnd_hv, vgnd_fb=vgnd_fb)
 
-    def sweep_channels_buffer_to_feedback_result(self, buffer):
-        amplifier_gain = buffer[-1]
-        vgnd_hv = buffer[-2]
-        vgnd_fb = buffer[-3]
+    @traced('decode')
+    def _decode_sweep_channels_buffer(self, buffer, channels, voltage,
+                                      frequency, out):
+        '''
+        Decode a raw sweep buffer into rows of a preallocated array.
+
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Raw buffer returned by the base ``get_sweep_channels_data`` (or
+            ``sweep_channels``) method, *including* the four trailing values
+            (i.e., ``dt_ms``, ``vgnd_fb``, ``vgnd_hv``, ``amplifier_gain``).
+        channels : array-like
+            Indexes of the channels measured, in order, to produce ``buffer``.
+        voltage : float
+            Target actuation voltage during the sweep.
+        frequency : float
+            Actuation frequency during the sweep.
+        out : numpy.ndarray
+            Array to write decoded rows to.  Must have one row per sampling
+            window in ``buffer`` and one column per entry in
+            :data:`SWEEP_CHANNELS_COLUMNS`.
+
+        Returns
+        -------
+        float
+            Time between sampling windows (in milliseconds) as reported by the
+            control board.
+        '''
+        amplifier_gain = buffer[-1]
+        vgnd_hv = buffer[-2]
+        vgnd_fb = buffer[-3]
         dt_ms = buffer[-4]
         buffer = buffer[:-4]
 
-        n_channels_in_mask = np.cumsum(self._channel_mask_cache)[-1]
-        n_samples_per_channel = len(buffer) / 4 / n_channels_in_mask
-
-        voltage = self.waveform_voltage()
-        frequency = self.waveform_frequency()
+        n_samples_per_channel = len(buffer) / 4 / len(channels)
 
         V_hv = buffer[0::4] / (64 * 1023.0) * self.__aref__ / 2.0 / np.sqrt(2)
         hv_resistor = buffer[1::4].astype(int)
         V_fb = buffer[2::4] / (64 * 1023.0) * self.__aref__ / 2.0 / np.sqrt(2)
         fb_resistor = buffer[3::4].astype(int)
 
-        i = 0
-
-        frames = []
-
-        for channel_i, active_i in enumerate(self._channel_mask_cache):
-            if not active_i:
-                continue
-
-            V_hv_i = V_hv[i * n_samples_per_channel:(i + 1) *
-                          n_samples_per_channel]
-            hv_resistor_i = hv_resistor[i * n_samples_per_channel:(i + 1) *
-                                        n_samples_per_channel]
-            V_fb_i = V_fb[i * n_samples_per_channel:(i + 1) *
-                          n_samples_per_channel]
-            fb_resistor_i = fb_resistor[i * n_samples_per_channel:(i + 1) *
-                                        n_samples_per_channel]
-
+        for i, channel_i in enumerate(channels):
+            samples_i = slice(i * n_samples_per_channel,
+                              (i + 1) * n_samples_per_channel)
             feedback_results_i = FeedbackResults(voltage, frequency, dt_ms,
-                                                 V_hv_i, hv_resistor_i, V_fb_i,
-                                                 fb_resistor_i,
+                                                 V_hv[samples_i],
+                                                 hv_resistor[samples_i],
+                                                 V_fb[samples_i],
+                                                 fb_resistor[samples_i],
                                                  self.calibration,
                                                  amplifier_gain=amplifier_gain,
                                                  vgnd_hv=vgnd_hv,
                                                  vgnd_fb=vgnd_fb)
-            df_impedances_i = \
-                feedback_results_to_impedance_frame(feedback_results_i)
-            df_impedances_i.insert(2, 'channel_i', channel_i)
-            frames.append(df_impedances_i)
-            i += 1
+            # Compute the capacitance from the impedance directly (rather
+            # than calling `FeedbackResults.capacitance()`) to avoid
+            # evaluating the transfer functions a second time.
+            Z_device_i = feedback_results_i.Z_device()
+            capacitance_i = np.ma.masked_invalid(1.0 / (2.0 * math.pi *
+                                                        frequency *
+                                                        Z_device_i))
+
+            out_i = out[samples_i]
+            out_i[:, 0] = frequency
+            out_i[:, 1] = voltage
+            out_i[:, 2] = channel_i
+            out_i[:, 3] = feedback_results_i.V_actuation().filled(np.NaN)
+            out_i[:, 4] = capacitance_i.filled(np.NaN)
+            out_i[:, 5] = Z_device_i.filled(np.NaN)
+        return dt_ms
+
+    def _sweep_channels_frame(self, data, dt_ms):
+        '''
+        Wrap array of decoded sweep rows in a `pandas.DataFrame`.
 
-        df_impedances = pd.concat(frames)
+        See :meth:`sweep_channels` for a description of the returned frame.
+        '''
+        df_impedances = pd.DataFrame(data,
+                                     columns=self.SWEEP_CHANNELS_COLUMNS)
+        df_impedances['channel_i'] = df_impedances['channel_i'].astype(int)
         index = pd.Index(dt_ms * np.arange(df_impedances.shape[0]) * 1e-3,
                          name='seconds')
         df_impedances.set_index(index, inplace=True)
         return df_impedances
 
+    @traced('decode')
+    def sweep_channels_buffer_to_feedback_result(self, buffer,
+                                                 channel_mask=None):
+        '''
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Raw buffer returned by the base ``get_sweep_channels_data`` (or
+            ``sweep_channels``) method.
+        channel_mask : array-like, optional
+            Channel mask used for the sweep.  If not specified, the mask from
+            the most recent call to :meth:`sweep_channels_non_blocking` is
+            used.
+
+        Returns
+        -------
+        pandas.DataFrame
+            See :meth:`sweep_channels`.
+        '''
+        if channel_mask is None:
+            channel_mask = self._channel_mask_cache
+        channels = np.flatnonzero(channel_mask)
+
+        voltage = self.waveform_voltage()
+        frequency = self.waveform_frequency()
+
+        data = np.empty(((len(buffer) - 4) / 4,
+                         len(self.SWEEP_CHANNELS_COLUMNS)))
+        dt_ms = self._decode_sweep_channels_buffer(buffer, channels, voltage,
+                                                   frequency, data)
+        return self._sweep_channels_frame(data, dt_ms)
+
+    def _poll_for_reply(self, interrupt=None, duration_ms=0):
+        '''
+        Wait for the reply to the most recent non-blocking command.
+
+        Like the blocking commands, give up if no data is received from the
+        control board for :attr:`TIMEOUT_MILLISECONDS` (in addition to the
+        expected duration of the command).
+
+        Parameters
+        ----------
+        interrupt : threading.Event, optional
+            If set while waiting, send an interrupt to the control board to
+            stop the running measurement early.
+        duration_ms : float, optional
+            Expected time (in milliseconds) the control board takes to run
+            the command before replying.
+
+        Returns
+        -------
+        bool
+            ``True`` if an interrupt was sent to the control board.
+
+        Raises
+        ------
+        RuntimeError
+            If the reply times out.
+        '''
+        interrupted = False
+        timeout_s = 1e-3 * self.TIMEOUT_MILLISECONDS
+        deadline = time.time() + 1e-3 * duration_ms + timeout_s
+        bytes_received = Base.total_bytes_received(self)
+        while Base.waiting_for_reply(self):
+            now = time.time()
+            if (not interrupted and interrupt is not None and
+                    interrupt.is_set()):
+                Base.send_interrupt(self)
+                interrupted = True
+                # The control board replies as soon as it processes the
+                # interrupt.
+                deadline = min(deadline, now + timeout_s)
+            if Base.total_bytes_received(self) != bytes_received:
+                # Reply is arriving.
+                bytes_received = Base.total_bytes_received(self)
+                deadline = max(deadline, now + timeout_s)
+            elif now > deadline:
+                command = Base.waiting_for_reply_to(self)
+                raise RuntimeError('Command 0x%0X (%d) timeout.' %
+                                   (command, command))
+            # Release the GIL so other threads may run while we wait.
+            time.sleep(1e-3)
+        return interrupted
+
     @remote_command
     def get_measure_impedance_data(self):
         buffer = np.array(Base.get_measure_impedance_data(self))
-        return self.measure_impedance_buffer_to_feedback_result(buffer)
+        if self._non_blocking_ranging_mode is not None:
+            self._record_saturation(buffer, self._non_blocking_ranging_mode)
+            self._non_blocking_ranging_mode = None
+        return self._learn_amplifier_gain(
+            self.measure_impedance_buffer_to_feedback_result(buffer))
 
     @remote_command
     def get_sweep_channels_data(self):
         buffer = np.array(Base.get_sweep_channels_data(self))
-        return self.sweep_channels_buffer_to_feedback_result(buffer)
+        df_impedances = self.sweep_channels_buffer_to_feedback_result(buffer)
+        self._update_amplifier_gain(buffer[-1], self.waveform_voltage(),
+                                    self.waveform_frequency(),
+                                    self.auto_adjust_amplifier_gain)
+        return df_impedances
+
+    @remote_command
+    def measure_impedance_stream_non_blocking(self, sampling_window_ms,
+                                              n_sampling_windows_per_frame,
+                                              delay_between_windows_ms,
+                                              interleave_samples, rms, state,
+                                              n_frames=0):
+        # Frames are decoded without updating the mirrored amplifier gain, so
+        # read the gain from the control board after the stream.
+        self._invalidate_settings_mirror('amplifier_gain')
+        state_ = uint8_tVector()
+        for i in range(0, len(state)):
+            state_.append(int(state[i]))
+        Base.measure_impedance_stream_non_blocking(self, sampling_window_ms,
+                                                   n_sampling_windows_per_frame,
+                                                   delay_between_windows_ms,
+                                                   interleave_samples, rms,
+                                                   n_frames, state_)
+
+    @remote_command
+    def get_impedance_stream_frame(self):
+        '''
+        Returns
+        -------
+        tuple or None
+            Sequence number and raw buffer (in the format accepted by
+            :meth:`measure_impedance_buffer_to_feedback_result`) of the next
+            frame of an impedance stream, or ``None`` if the stream has ended.
+        '''
+        buffer = np.array(Base.get_impedance_stream_frame(self))
+        if not buffer.size:
+            return None
+        return int(buffer[-1]), buffer[:-1]
+
+    def measure_impedance_stream(self, sampling_window_ms,
+                                 n_sampling_windows_per_frame,
+                                 delay_between_windows_ms, interleave_samples,
+                                 rms, state, n_frames=0, **kwargs):
+        '''
+        Continuously measure impedance, in fixed-size frames, until the stream
+        is stopped (or ``n_frames`` frames have been measured).
+
+        Parameters
+        ----------
+        n_sampling_windows_per_frame : int
+            Number of RMS/peak-to-peak voltage measurements per frame.
+        n_frames : int, optional
+            Number of frames to measure.  If ``0`` (default), stream until
+            :meth:`ImpedanceStream.stop` is called.
+        **kwargs
+            Extra keyword arguments are passed to :class:`ImpedanceStream`
+            (e.g., ``capacity``).
+
+        See :meth:`measure_impedance` for a description of the other
+        parameters.
+
+        Returns
+        -------
+        ImpedanceStream
+            Iterator over ``(sequence_number, FeedbackResults)`` tuples, one
+            per frame.
+
+        Notes
+        -----
+        No other commands may be sent to the control board until the stream
+        has ended.
+        '''
+        return ImpedanceStream(self, sampling_window_ms,
+                               n_sampling_windows_per_frame,
+                               delay_between_windows_ms, interleave_samples,
+                               rms, state, n_frames=n_frames, **kwargs)
 
     @remote_command
     def measure_impedance(self, sampling_window_ms, n_sampling_windows,
@@ -1894,6 +2753,7 @@ class DMFControlBoard(Base):
         for i in range(0, len(state)):
             state_.append(int(state[i]))
 
+        mode = self._ranging_mode()
         buffer = np.array(Base.measure_impedance(self,
                                                  sampling_window_ms,
                                                  n_sampling_windows,
@@ -1901,7 +2761,422 @@ class DMFControlBoard(Base):
                                                  interleave_samples,
                                                  rms,
                                                  state_))
-        return self.measure_impedance_buffer_to_feedback_result(buffer)
+        self._record_saturation(buffer, mode)
+        return self._learn_amplifier_gain(
+            self.measure_impedance_buffer_to_feedback_result(buffer))
+
+    @traced('decode')
+    def measure_impedance_summary_buffer_to_feedback_result(self, buffer,
+                                                            voltage=None,
+                                                            frequency=None):
+        '''
+        Parameters
+        ----------
+        buffer : numpy.ndarray
+            Raw buffer returned by the base
+            ``get_measure_impedance_summary_data`` method.
+        voltage : float, optional
+            Target actuation voltage during the measurement.  If not
+            specified, the current waveform voltage is used (see
+            :meth:`waveform_voltage`).
+        frequency : float, optional
+            Actuation frequency during the measurement.  If not specified, the
+            current waveform frequency is used (see
+            :meth:`waveform_frequency`).
+
+        Returns
+        -------
+        :class:`FeedbackResults`
+            One measurement per group of sampling windows.
+        '''
+        amplifier_gain = buffer[-1]
+        vgnd_hv = buffer[-2]
+        vgnd_fb = buffer[-3]
+        dt_ms = buffer[-4]
+        # Columns: n_windows, then resistor index, number of saturated
+        # windows, and mean, min, max, and last value of each channel.
+        groups = buffer[:-4].reshape(-1, 13)
+        scale = self.__aref__ / (64*1023.0) / 2.0 / np.sqrt(2)
+        hv = groups[:, 1:7]
+        fb = groups[:, 7:13]
+        summary = {'n_windows': groups[:, 0].astype(int),
+                   'hv_saturated': hv[:, 1].astype(int),
+                   'fb_saturated': fb[:, 1].astype(int)}
+        for name, values in (('hv', hv), ('fb', fb)):
+            for i, suffix in enumerate(('min', 'max', 'last')):
+                summary['V_%s_%s' % (name, suffix)] = values[:, 3 + i] * scale
+        if voltage is None:
+            voltage = self.waveform_voltage()
+        if frequency is None:
+            frequency = self.waveform_frequency()
+        return FeedbackResults(voltage, frequency, dt_ms, hv[:, 2] * scale,
+                               hv[:, 0].astype(int), fb[:, 2] * scale,
+                               fb[:, 0].astype(int), self.calibration,
+                               amplifier_gain=amplifier_gain,
+                               vgnd_hv=vgnd_hv, vgnd_fb=vgnd_fb,
+                               summary=summary)
+
+    @remote_command
+    def measure_impedance_summary_non_blocking(self, sampling_window_ms,
+                                               n_sampling_windows,
+                                               delay_between_windows_ms,
+                                               interleave_samples, rms, state,
+                                               n_windows_per_summary):
+        state_ = uint8_tVector()
+        for i in range(0, len(state)):
+            state_.append(int(state[i]))
+        Base.measure_impedance_summary_non_blocking(self, sampling_window_ms,
+                                                    n_sampling_windows,
+                                                    delay_between_windows_ms,
+                                                    interleave_samples, rms,
+                                                    n_windows_per_summary,
+                                                    state_)
+
+    @remote_command
+    def get_measure_impedance_summary_data(self):
+        buffer = np.array(Base.get_measure_impedance_summary_data(self))
+        return self._learn_amplifier_gain(
+            self.measure_impedance_summary_buffer_to_feedback_result(buffer))
+
+    def measure_impedance_summary(self, sampling_window_ms,
+                                  n_sampling_windows,
+                                  delay_between_windows_ms,
+                                  interleave_samples, rms, state,
+                                  n_windows_per_summary, interrupt=None):
+        '''
+        Measure impedance, but return a summary of each group of
+        ``n_windows_per_summary`` sampling windows instead of every window.
+
+        Each group summary contains the mean, min, max, and last
+        RMS/peak-to-peak voltage of each feedback channel, along with the
+        number of saturated windows.  This reduces the serial traffic (and
+        the memory required on the control board) for long measurements by
+        roughly a factor of ``n_windows_per_summary / 4``.
+
+        A group is closed early whenever the series resistor of either
+        feedback channel changes (e.g., due to auto-ranging), so every group
+        is converted using a single set of series resistors.
+
+        Parameters
+        ----------
+        n_windows_per_summary : int
+            Maximum number of sampling windows summarized per group.
+        interrupt : threading.Event, optional
+            If set while measuring, stop the measurement early.  The result
+            contains the groups measured before the interrupt.
+
+        See :meth:`measure_impedance` for a description of the other
+        parameters.
+
+        Returns
+        -------
+        :class:`FeedbackResults`
+            One measurement per group of sampling windows (see
+            :meth:`FeedbackResults.summary_frame`).
+        '''
+        self.measure_impedance_summary_non_blocking(sampling_window_ms,
+                                                    n_sampling_windows,
+                                                    delay_between_windows_ms,
+                                                    interleave_samples, rms,
+                                                    state,
+                                                    n_windows_per_summary)
+        self._poll_for_reply(interrupt, n_sampling_windows *
+                             (sampling_window_ms + delay_between_windows_ms))
+        return self.get_measure_impedance_summary_data()
+
+    @remote_command
+    def measure_impedance_settle_non_blocking(self, sampling_window_ms,
+                                              max_sampling_windows,
+                                              delay_between_windows_ms,
+                                              interleave_samples, rms, state,
+                                              tolerance, n_settled_windows):
+        state_ = uint8_tVector()
+        for i in range(0, len(state)):
+            state_.append(int(state[i]))
+        Base.measure_impedance_settle_non_blocking(self, sampling_window_ms,
+                                                   max_sampling_windows,
+                                                   delay_between_windows_ms,
+                                                   interleave_samples, rms,
+                                                   tolerance,
+                                                   n_settled_windows, state_)
+
+    @remote_command
+    def get_measure_impedance_settle_data(self):
+        '''
+        Returns
+        -------
+        tuple
+            ``(results, settled, duration_ms)`` (see
+            :meth:`measure_impedance_until_settled`).
+        '''
+        buffer = np.array(Base.get_measure_impedance_settle_data(self))
+        settled = bool(buffer[-1])
+        buffer = buffer[:-1]
+        # Sampling windows are followed by 4 trailing values, the first of
+        # which is the time between windows.
+        duration_ms = buffer[-4] * (buffer.size - 4) / 4
+        return (self._learn_amplifier_gain(
+                    self.measure_impedance_buffer_to_feedback_result(buffer)),
+                settled, duration_ms)
+
+    def measure_impedance_until_settled(self, sampling_window_ms,
+                                        max_duration_ms,
+                                        delay_between_windows_ms,
+                                        interleave_samples, rms, state,
+                                        tolerance=0.01, n_settled_windows=5,
+                                        interrupt=None):
+        '''
+        Measure impedance until the feedback signal settles, or until
+        ``max_duration_ms`` has elapsed.
+
+        The measurement is stopped by the control board as soon as the ratio
+        of the feedback and actuation voltages (i.e., a proxy for the device
+        capacitance) stays within ``tolerance`` for ``n_settled_windows``
+        consecutive sampling windows.  For example, this can be used to end a
+        droplet move as soon as the drop has arrived, instead of always
+        actuating for a fixed duration.
+
+        Parameters
+        ----------
+        max_duration_ms : float
+            Maximum duration of the measurement (in milliseconds).  Limited to
+            the number of sampling windows that fit in a single reply packet.
+        tolerance : float, optional
+            Maximum deviation of the voltage ratio, relative to the first
+            window of the settled band.
+        n_settled_windows : int, optional
+            Number of consecutive windows within the tolerance band required
+            to stop the measurement.
+        interrupt : threading.Event, optional
+            If set while measuring, stop the measurement early.
+
+        See :meth:`measure_impedance` for a description of the other
+        parameters.
+
+        Returns
+        -------
+        tuple
+            ``(results, settled, duration_ms)``, where ``results`` is a
+            :class:`FeedbackResults` instance containing the measured windows,
+            ``settled`` is ``True`` if the measurement stopped because the
+            signal settled, and ``duration_ms`` is the actual duration of the
+            measurement (in milliseconds).
+        '''
+        max_windows = ((self.MAX_PAYLOAD_LENGTH - 4 * 4 - 1) / (2 * (2 + 1)))
+        n_sampling_windows = int(math.ceil(max_duration_ms /
+                                           float(sampling_window_ms +
+                                                 delay_between_windows_ms)))
+        if n_sampling_windows > max_windows:
+            logger.warning('Maximum duration limited to %d sampling windows.',
+                           max_windows)
+            n_sampling_windows = max_windows
+        self.measure_impedance_settle_non_blocking(sampling_window_ms,
+                                                   max(n_sampling_windows, 1),
+                                                   delay_between_windows_ms,
+                                                   interleave_samples, rms,
+                                                   state, tolerance,
+                                                   n_settled_windows)
+        self._poll_for_reply(interrupt, max(n_sampling_windows, 1) *
+                             (sampling_window_ms + delay_between_windows_ms))
+        return self.get_measure_impedance_settle_data()
+
+    @remote_command
+    def set_actuation_program(self, program):
+        '''
+        Upload an actuation program to the control board.
+
+        Parameters
+        ----------
+        program : ActuationProgram
+            Program to upload.  The program is validated against the limits
+            of the control board before it is uploaded.
+
+        Returns
+        -------
+        int
+            Number of steps in the uploaded program.
+
+        Raises
+        ------
+        ValueError
+            If the program is not valid.
+        '''
+        if program.number_of_channels != self.number_of_channels():
+            raise ValueError('Program is for %d channels, but the control '
+                             'board has %d channels.' %
+                             (program.number_of_channels,
+                              self.number_of_channels()))
+        program.validate(max_waveform_voltage=self.max_waveform_voltage,
+                         frequency_range=(self.min_waveform_frequency,
+                                          self.max_waveform_frequency))
+        program_ = uint8_tVector()
+        for byte in program.to_bytes():
+            program_.append(ord(byte))
+        n_steps = Base.set_actuation_program(self, program_)
+        self._actuation_program = program
+        return n_steps
+
+    @remote_command
+    def run_actuation_program_non_blocking(self):
+        # Record the waveform settings in effect before the program starts to
+        # decode the results of steps that do not change them.
+        self._actuation_program_settings = (self.waveform_voltage(),
+                                            self.waveform_frequency())
+        Base.run_actuation_program_non_blocking(self)
+
+    @remote_command
+    def get_actuation_program_results(self):
+        '''
+        Returns
+        -------
+        tuple
+            ``(df_steps, results)`` (see :meth:`run_actuation_program`).
+        '''
+        buffer = np.array(Base.get_actuation_program_results(self))
+        steps, trailer = split_results_buffer(buffer)
+        program = self._actuation_program
+        settings = program.settings(*self._actuation_program_settings)
+        scheduled_start_ms = program.scheduled_start_ms
+
+        results = []
+        for i, (start_us, windows, dt_ms) in enumerate(steps):
+            if windows.size:
+                voltage, frequency = settings[i]
+                buffer_i = np.concatenate([windows, [dt_ms], trailer.values])
+                results.append(self.measure_impedance_buffer_to_feedback_result(
+                    buffer_i, voltage=voltage, frequency=frequency))
+            else:
+                results.append(None)
+        if steps:
+            # Waveform settings in effect at the end of the program.
+            voltage, frequency = settings[len(steps) - 1]
+            self._settings_mirror['waveform_voltage'] = voltage
+            self._settings_mirror['waveform_frequency'] = frequency
+            self._update_amplifier_gain(trailer.amplifier_gain, voltage,
+                                        frequency,
+                                        self.auto_adjust_amplifier_gain)
+        start_ms = np.array([step[0] for step in steps]) * 1e-3
+        df_steps = pd.DataFrame({'scheduled_start_ms':
+                                 scheduled_start_ms[:len(steps)],
+                                 'start_ms': start_ms},
+                                columns=['scheduled_start_ms', 'start_ms'])
+        df_steps['jitter_ms'] = (df_steps.start_ms -
+                                 df_steps.scheduled_start_ms)
+        df_steps.index.name = 'step'
+        return df_steps, results
+
+    def run_actuation_program(self, interrupt=None):
+        '''
+        Run the actuation program uploaded by :meth:`set_actuation_program`.
+
+        The control board executes all steps autonomously and buffers the
+        results, which are returned once the program has finished.
+
+        Parameters
+        ----------
+        interrupt : threading.Event, optional
+            If set while the program is running, stop the program before the
+            next step.
+
+        Returns
+        -------
+        tuple
+            ``(df_steps, results)``, where ``df_steps`` is a
+            :class:`pandas.DataFrame` with the scheduled and actual start
+            time (and the difference between them, i.e., the jitter) of each
+            step that was run, and ``results`` is a list containing a
+            :class:`FeedbackResults` instance for each step that measured
+            impedance (``None`` for other steps).
+        '''
+        if self._actuation_program is None:
+            raise RuntimeError('No actuation program has been uploaded.')
+        self.run_actuation_program_non_blocking()
+        self._poll_for_reply(interrupt, sum(step['duration_ms'] for step in
+                                            self._actuation_program.steps))
+        return self.get_actuation_program_results()
+
+    @contextmanager
+    def batch(self, stop_on_error=True, interrupt=None):
+        '''
+        Context manager to send several commands to the control board in a
+        single packet.
+
+        Commands are queued by calling the methods of the yielded
+        :class:`CommandBatch` and sent when the ``with`` block exits (unless
+        an exception is raised within the block, in which case no command is
+        sent).
+
+        Parameters
+        ----------
+        stop_on_error : bool, optional
+            If ``True`` (default), the control board does not run any command
+            following a failed command.
+        interrupt : threading.Event, optional
+            If set while the batch is running, stop any running impedance
+            measurement early.
+
+        Raises
+        ------
+        BatchError
+            If any command in the batch failed.
+
+        Examples
+        --------
+
+        >>> with proxy.batch() as batch:
+        ...     batch.set_waveform_frequency(10e3)
+        ...     batch.set_waveform_voltage(100)
+        ...     i = batch.measure_impedance(5., 20, 0, True, True, state)
+        >>> results = proxy.measure_impedance_buffer_to_feedback_result(
+        ...     batch.values[i], voltage=100, frequency=10e3)
+        '''
+        batch = CommandBatch(self.number_of_channels(),
+                             stop_on_error=stop_on_error)
+        yield batch
+        if len(batch):
+            self.execute_batch(batch, interrupt=interrupt)
+
+    @remote_command
+    def execute_batch(self, batch, interrupt=None):
+        '''
+        Send a batch of commands to the control board in a single packet.
+
+        Parameters
+        ----------
+        batch : CommandBatch
+            Commands to send.
+        interrupt : threading.Event, optional
+            See :meth:`batch`.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Results of each command in the batch (see
+            :meth:`CommandBatch.decode`).
+
+        Raises
+        ------
+        BatchError
+            If any command in the batch failed.
+        '''
+        batch_ = uint8_tVector()
+        for byte in batch.to_bytes():
+            batch_.append(ord(byte))
+        Base.batch_non_blocking(self, batch_)
+        self._poll_for_reply(interrupt, batch.duration_ms)
+        reply = ''.join(map(chr, Base.get_batch_reply(self)))
+        results = batch.decode(reply)
+        for command, return_code, value in zip(batch.commands,
+                                               results.return_code,
+                                               results.value):
+            if (return_code == RETURN_CODES_BY_NAME.OK and
+                    command['mirror'] is not None):
+                key, mirror_value = command['mirror']
+                self._settings_mirror[key] = (value if mirror_value is None
+                                              else mirror_value)
+        if (results.return_code != RETURN_CODES_BY_NAME.OK).any():
+            raise BatchError(results)
+        return results
 
     @remote_command
     def sweep_channels(self,
@@ -1910,7 +3185,8 @@ class DMFControlBoard(Base):
                        delay_between_windows_ms,
                        interleave_samples,
                        rms,
-                       channel_mask):
+                       channel_mask,
+                       interrupt=None):
         '''
         Measure voltage across load of each of the following control board
         feedback circuits:
@@ -1922,6 +3198,11 @@ class DMFControlBoard(Base):
         ``V2``)_ can be used to compute the impedance of the measured load, the
         input voltage _(i.e., ``V1``)_, etc.
 
+        If the measurements for all channels in the mask do not fit in a
+        single reply packet, the channels are split into chunks.  While the
+        control board is measuring chunk ``i + 1``, the reply for chunk ``i``
+        is decoded on the host.
+
         Parameters
         ----------
         sampling_window_ms : float
@@ -1950,6 +3231,10 @@ class DMFControlBoard(Base):
         channel_mask : array-like
             State of device channels.  Length should be equal to the number of
             device channels.
+        interrupt : threading.Event, optional
+            If set during the sweep, the control board is interrupted and no
+            further chunks are requested.  Only the measurements from chunks
+            that completed *before* the interrupt are returned.
 
         Returns
         -------
@@ -1962,41 +3247,92 @@ class DMFControlBoard(Base):
             Rows are indexed by time since first measurement in frame.
         '''
 
-        channel_cumsum = np.cumsum(channel_mask)
+        channel_mask = np.array(channel_mask, dtype=int)
+        channels = np.flatnonzero(channel_mask)
 
-        # figure out how many channels are in the mask, and how many we can scan
-        # per request
-        n_channels_in_mask = channel_cumsum[-1]
+        # Figure out how many channels we can scan per request and split the
+        # channels in the mask into chunks of at most that many channels.
         max_channels_per_call = (self.MAX_PAYLOAD_LENGTH - 4*4) / \
                                  (3*2) / n_sampling_windows_per_channel
+        chunks = [channels[i:i + max_channels_per_call]
+                  for i in xrange(0, len(channels), max_channels_per_call)]
 
         # cache the channel mask
-        self._channel_mask_cache = np.array(channel_mask)
+        self._channel_mask_cache = channel_mask
 
-        buffer = np.zeros(4)
-        for i in range(int(math.ceil(n_channels_in_mask / max_channels_per_call))):
-            # figure out which channels to include in this call
-            ind = np.logical_and(channel_cumsum >= i * max_channels_per_call,
-                                 channel_cumsum < (i + 1) * max_channels_per_call)
+        # Read the actuation settings once per sweep, rather than once per
+        # chunk.
+        voltage = self.waveform_voltage()
+        frequency = self.waveform_frequency()
+
+        data = np.empty((len(channels) * n_sampling_windows_per_channel,
+                         len(self.SWEEP_CHANNELS_COLUMNS)))
+        dt_ms = 0
 
-            # copy those channels from the cached mask
-            channel_mask_ = np.zeros(len(self._channel_mask_cache), dtype=int)
-            channel_mask_[ind] = self._channel_mask_cache[ind]
+        def send_chunk(chunk):
+            channel_mask_ = np.zeros(len(channel_mask), dtype=int)
+            channel_mask_[chunk] = 1
 
             # convert it to a uint8_tVector
             channel_mask_uint8 = uint8_tVector()
             channel_mask_uint8.extend(channel_mask_)
-
-            buffer = buffer[:-4]
-            buffer = np.concatenate((buffer, np.array(Base.sweep_channels(self,
-                                                     sampling_window_ms,
-                                                     n_sampling_windows_per_channel,
-                                                     delay_between_windows_ms,
-                                                     interleave_samples,
-                                                     rms,
-                                                     channel_mask_uint8))))
-        return self.sweep_channels_buffer_to_feedback_result(buffer)
-
+            Base.sweep_channels_non_blocking(self, sampling_window_ms,
+                                             n_sampling_windows_per_channel,
+                                             delay_between_windows_ms,
+                                             interleave_samples, rms,
+                                             channel_mask_uint8)
+
+        if chunks:
+            # Read before the first chunk is sent, since no other commands
+            # may be sent while a chunk is in flight.
+            auto_adjust = self.auto_adjust_amplifier_gain
+            send_chunk(chunks[0])
+
+        row_i = 0
+        amplifier_gain = None
+        try:
+            for i, chunk_i in enumerate(chunks):
+                # Wait for the reply to the in-flight chunk and copy out the
+                # raw buffer.
+                interrupted = self._poll_for_reply(
+                    interrupt, len(chunk_i) * n_sampling_windows_per_channel *
+                    (sampling_window_ms + delay_between_windows_ms))
+                buffer_i = np.array(Base.get_sweep_channels_data(self))
+                if interrupted:
+                    # The reply to an interrupted chunk holds a variable
+                    # number of windows per channel, so it cannot be
+                    # decoded.  Discard it.
+                    break
+
+                # Start acquisition of the next chunk *before* decoding the
+                # current one, so decoding overlaps with the measurement.
+                stop = interrupt is not None and interrupt.is_set()
+                if i + 1 < len(chunks) and not stop:
+                    send_chunk(chunks[i + 1])
+
+                n_rows_i = len(chunk_i) * n_sampling_windows_per_channel
+                dt_ms = self._decode_sweep_channels_buffer(
+                    buffer_i, chunk_i, voltage, frequency,
+                    data[row_i:row_i + n_rows_i])
+                amplifier_gain = buffer_i[-1]
+                row_i += n_rows_i
+                if stop:
+                    break
+        except:
+            exc_info = sys.exc_info()
+            if Base.waiting_for_reply(self):
+                # Abort the in-flight chunk and discard its reply so the
+                # control board is ready for the next command.
+                Base.send_interrupt(self)
+                try:
+                    Base.get_sweep_channels_data(self)
+                except RuntimeError:
+                    pass
+            raise exc_info[0], exc_info[1], exc_info[2]
+        if amplifier_gain is not None:
+            self._update_amplifier_gain(amplifier_gain, voltage, frequency,
+                                        auto_adjust)
+        return self._sweep_channels_frame(data[:row_i], dt_ms)
 
     @remote_command
     def sweep_channels_slow(self, sampling_window_ms, n_sampling_windows,
@@ -2101,6 +3437,37 @@ class DMFControlBoard(Base):
 
     @remote_command
     def i2c_send_command(self, address, cmd, data, delay_ms=100):
+        '''
+        Send a command to an I2C peripheral and return its reply.
+
+        By default, the reply is read after a fixed delay of ``delay_ms``.
+
+        If polling is enabled for the peripheral (see ``set_i2c_polling``),
+        the peripheral is instead polled (with exponential backoff) until it
+        is ready to send its reply, for at most ``delay_ms``.  Polling starts
+        after the response time learned from previous commands sent to the
+        same address (see ``i2c_latency_estimate``).  Only enable polling
+        for peripherals that reset the length of their reply to zero when a
+        command is received, and only report a non-zero length once the
+        reply is complete (see ``RemoteObject::i2c_send_command``).
+
+        Parameters
+        ----------
+        address : int
+            I2C address of peripheral.
+        cmd : int
+            Command code.
+        data : list
+            Command payload.
+        delay_ms : int, optional
+            Delay (in milliseconds) before reading the reply, or, if polling
+            is enabled, maximum time to wait for the peripheral to be ready.
+
+        Returns
+        -------
+        numpy.ndarray
+            Reply payload (without return code).
+        '''
         data_ = uint8_tVector()
         for i in range(0, len(data)):
             data_.append(int(data[i]))
@@ -2243,21 +3610,264 @@ class DMFControlBoard(Base):
         else:  # hardware_version >= 2.0
             return self.PERSISTENT_CONFIG_SETTINGS + 89
 
+    # Waveform and amplifier settings
+    # ===============================
+    #
+    # The most recent value of each setting is mirrored on the host, so
+    # reading a setting does not cost a round trip to the control board.
+    # Mirrored values are updated by the corresponding setters, by batches
+    # and actuation programs, and by the amplifier gain reported at the end
+    # of each impedance measurement.
+    MIRRORED_SETTINGS = ('waveform_voltage', 'waveform_frequency',
+                         'amplifier_gain', 'auto_adjust_amplifier_gain')
+
+    def _mirrored(self, key, getter, refresh=False):
+        '''
+        Parameters
+        ----------
+        key : str
+            Name of mirrored setting (see :attr:`MIRRORED_SETTINGS`).
+        getter : function
+            Function to read the setting from the control board.
+        refresh : bool, optional
+            If ``True``, read the setting from the control board even if it
+            is mirrored on the host.
+
+        Returns
+        -------
+        object
+            Value of setting.
+        '''
+        if refresh or key not in self._settings_mirror:
+            self._settings_mirror[key] = getter(self)
+        return self._settings_mirror[key]
+
+    def _invalidate_settings_mirror(self, *keys):
+        '''
+        Discard the mirrored value of the specified settings (or of all
+        settings, if no settings are specified), such that the settings are
+        read from the control board the next time they are accessed.
+        '''
+        if not keys:
+            keys = self.MIRRORED_SETTINGS
+        for key in keys:
+            self._settings_mirror.pop(key, None)
+
+    def refresh_settings(self):
+        '''
+        Read all mirrored settings from the control board.
+
+        Returns
+        -------
+        pandas.Series
+            Value of each mirrored setting.
+        '''
+        self._invalidate_settings_mirror()
+        return pd.Series([self.waveform_voltage(), self.waveform_frequency(),
+                          self.amplifier_gain,
+                          self.auto_adjust_amplifier_gain],
+                         index=self.MIRRORED_SETTINGS)
+
+    def waveform_voltage(self, refresh=False):
+        '''
+        Parameters
+        ----------
+        refresh : bool, optional
+            If ``True``, read the voltage from the control board rather than
+            from the host-side mirror.
+
+        Returns
+        -------
+        float
+            Waveform voltage (target RMS output voltage of the amplifier).
+        '''
+        return self._mirrored('waveform_voltage', Base.waveform_voltage,
+                              refresh=refresh)
+
+    def waveform_frequency(self, refresh=False):
+        '''
+        Parameters
+        ----------
+        refresh : bool, optional
+            If ``True``, read the frequency from the control board rather
+            than from the host-side mirror.
+
+        Returns
+        -------
+        float
+            Waveform frequency.
+        '''
+        return self._mirrored('waveform_frequency', Base.waveform_frequency,
+                              refresh=refresh)
+
+    @remote_command
+    def set_waveform_voltage(self, voltage):
+        if self._seed_amplifier_gain(voltage=voltage):
+            return self.RETURN_OK
+        # Discard the mirrored value first, in case the command fails.
+        self._invalidate_settings_mirror('waveform_voltage')
+        return_code = Base.set_waveform_voltage(self, voltage)
+        self._settings_mirror['waveform_voltage'] = voltage
+        return return_code
+
+    @remote_command
+    def set_waveform_frequency(self, frequency):
+        if self._seed_amplifier_gain(frequency=frequency):
+            return self.RETURN_OK
+        self._invalidate_settings_mirror('waveform_frequency')
+        return_code = Base.set_waveform_frequency(self, frequency)
+        self._settings_mirror['waveform_frequency'] = frequency
+        return return_code
+
+    def _seed_amplifier_gain(self, frequency=None, voltage=None):
+        '''
+        If the amplifier gain is adjusted automatically and a converged gain
+        is cached for the specified waveform settings (see
+        :attr:`amplifier_gain_cache`), send the cached gain along with the
+        waveform frequency and voltage in a single batch of commands.
+
+        The current waveform frequency (or voltage) is used if not
+        specified.
+
+        The voltage is sent after the gain, since the control board only
+        applies the gain when the voltage is set.
+
+        Returns
+        -------
+        bool
+            ``True`` if the cached gain and waveform settings were sent.
+        '''
+        self._seeded_amplifier_gain = None
+        if (self._serial_number is None or
+                not self.auto_adjust_amplifier_gain):
+            return False
+        if frequency is None:
+            frequency = self.waveform_frequency()
+        if voltage is None:
+            voltage = self.waveform_voltage()
+        gain = self.amplifier_gain_cache.lookup(self._serial_number,
+                                                frequency, voltage)
+        if gain is None:
+            return False
+        self._invalidate_settings_mirror('waveform_frequency',
+                                         'waveform_voltage', 'amplifier_gain')
+        with self.batch() as batch:
+            batch.set_amplifier_gain(gain)
+            batch.set_waveform_frequency(frequency)
+            batch.set_waveform_voltage(voltage)
+        self._seeded_amplifier_gain = (frequency, voltage, gain)
+        return True
+
+    def _update_amplifier_gain(self, amplifier_gain, voltage, frequency,
+                               auto_adjust):
+        '''
+        Update the mirrored amplifier gain with the gain reported at the end
+        of an impedance measurement, and learn the gain for the waveform
+        settings once it has converged (see :attr:`amplifier_gain_cache`).
+
+        Only called once a measurement command has completed (never by the
+        buffer decoders, which may run while the control board is busy,
+        e.g., streaming).
+
+        Parameters
+        ----------
+        amplifier_gain : float
+            Amplifier gain reported by the control board.
+        voltage, frequency : float
+            Waveform settings during the measurement.
+        auto_adjust : bool
+            Whether the amplifier gain is adjusted automatically (see
+            :attr:`auto_adjust_amplifier_gain`).  The gain is only learned
+            if ``True``.
+        '''
+        previous_gain = self._settings_mirror.get('amplifier_gain')
+        self._settings_mirror['amplifier_gain'] = amplifier_gain
+        if self._serial_number is None or not auto_adjust:
+            return
+        seeded = self._seeded_amplifier_gain
+        if seeded is not None and seeded[:2] == (frequency, voltage):
+            # First measurement since the cached gain was sent.
+            self._seeded_amplifier_gain = None
+            self.amplifier_gain_cache.check(seeded[2], amplifier_gain)
+        self.amplifier_gain_cache.record(self._serial_number, frequency,
+                                         voltage, previous_gain,
+                                         amplifier_gain)
+
+    def _learn_amplifier_gain(self, results):
+        '''
+        Update the amplifier gain from the decoded results of a completed
+        measurement (see :meth:`_update_amplifier_gain`).
+
+        Returns
+        -------
+        FeedbackResults
+            :data:`results`.
+        '''
+        self._update_amplifier_gain(results.amplifier_gain, results.voltage,
+                                    results.frequency,
+                                    self.auto_adjust_amplifier_gain)
+        return results
+
+    def settle_amplifier_gain(self, state=None, sampling_window_ms=5.,
+                              n_sampling_windows=60, n_settled_windows=0):
+        '''
+        Measure impedance to let the automatically adjusted amplifier gain
+        settle at the current waveform settings, unless a converged gain was
+        sent from the cache when the settings were changed (or the gain is
+        not adjusted automatically).
+
+        Parameters
+        ----------
+        state : array-like, optional
+            State of each channel during the measurement (default: all
+            channels off).
+        sampling_window_ms : float, optional
+            Length of each sampling window.
+        n_sampling_windows : int, optional
+            Number of sampling windows to let the gain settle.
+        n_settled_windows : int, optional
+            Number of sampling windows to measure if the gain does not need
+            to settle.
+
+        Returns
+        -------
+        FeedbackResults
+            Results of the measurement, or ``None`` if the gain did not need
+            to settle and :data:`n_settled_windows` is zero.
+        '''
+        if state is None:
+            state = np.zeros(self.number_of_channels())
+        settled = (not self.auto_adjust_amplifier_gain or
+                   self._seeded_amplifier_gain is not None and
+                   self._seeded_amplifier_gain[:2] ==
+                   (self.waveform_frequency(), self.waveform_voltage()))
+        if settled:
+            n_sampling_windows = n_settled_windows
+        if not n_sampling_windows:
+            return None
+        return self.measure_impedance(sampling_window_ms, n_sampling_windows,
+                                      0, True, True, state)
+
     @property
     def auto_adjust_amplifier_gain(self):
-        return self._auto_adjust_amplifier_gain()
+        return self._mirrored('auto_adjust_amplifier_gain',
+                              Base._auto_adjust_amplifier_gain)
 
     @auto_adjust_amplifier_gain.setter
     def auto_adjust_amplifier_gain(self, value):
-        return self._set_auto_adjust_amplifier_gain(value)
+        self._invalidate_settings_mirror('auto_adjust_amplifier_gain')
+        self._set_auto_adjust_amplifier_gain(value)
+        self._settings_mirror['auto_adjust_amplifier_gain'] = bool(value)
 
     @property
     def amplifier_gain(self):
-        return self._amplifier_gain()
+        return self._mirrored('amplifier_gain', Base._amplifier_gain)
 
     @amplifier_gain.setter
     def amplifier_gain(self, value):
-        return self._set_amplifier_gain(value)
+        self._invalidate_settings_mirror('amplifier_gain')
+        self._set_amplifier_gain(value)
+        self._settings_mirror['amplifier_gain'] = value
 
     @property
     def aref(self):
@@ -2404,21 +4014,171 @@ class DMFControlBoard(Base):
                 'max_waveform_voltage', 'use_antialiasing_filter']
 
     def reset_config_to_defaults(self):
+        if self._config_transaction is not None:
+            raise RuntimeError('Configuration cannot be reset to defaults '
+                               'within a configuration transaction.')
         self._reset_config_to_defaults()
+        self._invalidate_settings_mirror('amplifier_gain',
+                                         'auto_adjust_amplifier_gain')
         self._read_calibration_data()
 
+    def load_config(self, use_defaults=False):
+        '''
+        Reload the configuration settings from persistent memory on the
+        control board.
+
+        Parameters
+        ----------
+        use_defaults : bool, optional
+            If ``True``, reset the configuration settings to their default
+            values.
+
+        Within a configuration transaction (see :meth:`config_transaction`),
+        the configuration settings are reloaded once the transaction is
+        committed.
+        '''
+        if self._config_transaction is not None:
+            if use_defaults:
+                raise RuntimeError('Configuration cannot be reset to defaults '
+                                   'within a configuration transaction.')
+            self._config_transaction.refresh_config = True
+            return RETURN_CODES_BY_NAME.OK
+        return_code = Base.load_config(self, use_defaults)
+        # The amplifier gain is loaded from the configuration settings.
+        self._invalidate_settings_mirror('amplifier_gain',
+                                         'auto_adjust_amplifier_gain')
+        return return_code
+
     def read_config(self):
         except_types = (PersistentSettingDoesNotExist, )
         return OrderedDict([(a, safe_getattr(self, a, except_types))
                             for a in self.config_attribute_names])
 
     def write_config(self, config):
-        device_config = self.read_config()
-        common_keys = set(config.keys()).intersection(device_config.keys())
-        for k in device_config.keys():
-            if k in common_keys and (device_config[k] is not None and
-                                     config[k] is not None):
-                setattr(self, k, config[k])
+        # Only the bytes that differ from the current configuration are
+        # written, and the configuration is reloaded once (see
+        # :meth:`config_transaction`).
+        with self.config_transaction():
+            device_config = self.read_config()
+            common_keys = set(config.keys()).intersection(device_config
+                                                          .keys())
+            for k in device_config.keys():
+                if k in common_keys and (device_config[k] is not None and
+                                         config[k] is not None):
+                    setattr(self, k, config[k])
+
+    @contextmanager
+    def config_transaction(self):
+        '''
+        Context manager to group writes to the configuration settings in
+        persistent memory.
+
+        Within the ``with`` block, persistent memory is read in bulk into a
+        snapshot and persistent writes are deferred.  When the block exits,
+        only the bytes that differ from the snapshot are written (in batches
+        of commands), and the configuration settings are reloaded once.  If an
+        exception is raised within the block, the deferred writes are
+        discarded.
+
+        Nested transactions are merged into the outermost transaction.
+
+        Examples
+        --------
+
+        >>> with proxy.config_transaction():
+        ...     proxy.default_pin_modes = pin_modes
+        ...     proxy.default_pin_states = pin_states
+        ...     proxy.voltage_tolerance = 5.
+        '''
+        if self._config_transaction is not None:
+            yield self._config_transaction
+            return
+        transaction = ConfigTransaction(self)
+        self._config_transaction = transaction
+        try:
+            yield transaction
+        except:
+            transaction.rollback()
+            raise
+        finally:
+            self._config_transaction = None
+        changes = transaction.commit()
+        if changes or transaction.refresh_config:
+            self.load_config(False)
+
+    def stats(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Snapshot of the per-command latency and throughput metrics (see
+            :meth:`CommandMetrics.snapshot`).
+        '''
+        return self.metrics.snapshot()
+
+    def start_metrics_dump(self, filepath, interval_s=60., format_=None):
+        '''
+        Periodically dump a snapshot of the command metrics to a file in a
+        background thread.
+
+        Parameters
+        ----------
+        filepath : str
+            Output file path.
+        interval_s : float, optional
+            Time between dumps (in seconds).
+        format_ : str, optional
+            Either ``'csv'`` or ``'json'``.  If not specified, the format is
+            inferred from the file extension (default: CSV).
+        '''
+        self.stop_metrics_dump()
+        self._metrics_dumper = MetricsDumper(self.metrics, filepath,
+                                             interval_s=interval_s,
+                                             format_=format_)
+        self._metrics_dumper.start()
+
+    def stop_metrics_dump(self):
+        '''
+        Stop dumping command metrics (after a final dump).
+        '''
+        if self._metrics_dumper is not None:
+            self._metrics_dumper.stop()
+            self._metrics_dumper = None
+
+    @contextmanager
+    def capture(self, filepath):
+        '''
+        Context manager to log every packet sent to or received from the
+        control board (with timestamps) to a binary capture file.
+
+        The capture may be replayed later without the control board attached
+        using :class:`dmf_control_board_firmware.capture.ReplayControlBoard`.
+
+        The calibration cache is bypassed while capturing (i.e., calibration
+        values are always read from the control board), so the captured
+        packets do not depend on the state of the cache.  To replay a
+        capture, connect using a control board with the calibration cache
+        disabled (i.e., ``DMFControlBoard(calibration_cache=None)``).
+
+        Parameters
+        ----------
+        filepath : str
+            Output capture file path (overwritten if it exists).
+
+        Examples
+        --------
+
+        >>> with proxy.capture('session.dmfcap'):
+        ...     proxy.connect()
+        ...     proxy.measure_impedance(...)
+        '''
+        Base.start_capture(self, str(filepath))
+        self._capturing = True
+        try:
+            yield
+        finally:
+            self._capturing = False
+            Base.stop_capture(self)
 
     def debug_string(self):
         return "".join(map(chr, self.debug_buffer()))
@@ -0,0 +1,280 @@
+'''
+Build actuation programs that are executed autonomously by the control board.
+
+An actuation program is a sequence of steps, each of which may set the state
+of all channels, the waveform voltage, and/or the waveform frequency, and
+optionally measure impedance.  The program is uploaded to the control board
+once (see :meth:`DMFControlBoard.set_actuation_program`) and then run without
+any host interaction (see :meth:`DMFControlBoard.run_actuation_program`), so
+step timing is not affected by host or USB latency.
+
+Example usage:
+
+.. code-block:: python
+
+    program = ActuationProgram(proxy.number_of_channels())
+    for channel in [10, 11, 12]:
+        state = np.zeros(proxy.number_of_channels(), dtype=int)
+        state[channel] = 1
+        program.add_step(500, state=state, n_sampling_windows=20)
+    proxy.set_actuation_program(program)
+    df_steps, results = proxy.run_actuation_program()
+'''
+import struct
+
+import numpy as np
+import pandas as pd
+
+# The following constants mirror the definitions in `DMFControlBoard.h`.
+#
+# Step flags (bit definitions).
+STEP_SET_STATE = 0
+STEP_SET_VOLTAGE = 1
+STEP_SET_FREQUENCY = 2
+STEP_MEASURE = 3
+# Impedance measurement options (bit definitions).
+INTLV = 0
+RMS = 1
+# Maximum size (in bytes) of an encoded actuation program.
+MAX_ACTUATION_PROGRAM_LENGTH = 512
+# Maximum size (in bytes) of a reply packet.
+MAX_PAYLOAD_LENGTH = 2000
+# Maximum ADC sampling rate (in Hz).
+MAX_SAMPLING_RATE = 40e3
+
+# Size (in bytes) of the results of each step (excluding sampling windows),
+# of each sampling window, and of the results trailer.
+STEP_RESULTS_SIZE = 4 + 2 + 4
+WINDOW_RESULTS_SIZE = 2 * (2 + 1)
+RESULTS_TRAILER_SIZE = 3 * 4
+
+
+class ActuationProgram(object):
+    '''
+    Sequence of actuation steps to be executed by the control board.
+
+    Parameters
+    ----------
+    number_of_channels : int
+        Number of channels on the control board (must be a multiple of 8).
+    '''
+    def __init__(self, number_of_channels):
+        if number_of_channels % 8:
+            raise ValueError('Number of channels must be a multiple of 8.')
+        self.number_of_channels = number_of_channels
+        self.steps = []
+
+    def __len__(self):
+        return len(self.steps)
+
+    def add_step(self, duration_ms, state=None, voltage=None, frequency=None,
+                 n_sampling_windows=0, sampling_window_ms=5.,
+                 interleave_samples=True, rms=True):
+        '''
+        Append a step to the program.
+
+        Settings that are not specified (i.e., ``None``) are left unchanged
+        from the previous step.
+
+        Parameters
+        ----------
+        duration_ms : int
+            Duration of the step (in milliseconds), including the time needed
+            to apply the settings and measure impedance.
+        state : list, optional
+            State of all channels.
+        voltage : float, optional
+            Waveform voltage.
+        frequency : float, optional
+            Waveform frequency.
+        n_sampling_windows : int, optional
+            Number of impedance sampling windows to measure at the start of
+            the step.  If ``0`` (default), impedance is not measured.
+        sampling_window_ms : float, optional
+            Length of each sampling window (in milliseconds).
+        interleave_samples, rms : bool, optional
+            See :meth:`DMFControlBoard.measure_impedance`.
+
+        Returns
+        -------
+        int
+            Index of the new step.
+        '''
+        if state is not None:
+            state = np.asarray(state, dtype=bool)
+        self.steps.append({'duration_ms': duration_ms, 'state': state,
+                           'voltage': voltage, 'frequency': frequency,
+                           'n_sampling_windows': n_sampling_windows,
+                           'sampling_window_ms': sampling_window_ms,
+                           'interleave_samples': interleave_samples,
+                           'rms': rms})
+        return len(self.steps) - 1
+
+    @property
+    def scheduled_start_ms(self):
+        '''
+        Scheduled start time of each step (in milliseconds), relative to the
+        start of the program.
+        '''
+        durations = [step['duration_ms'] for step in self.steps]
+        return np.concatenate([[0], np.cumsum(durations)[:-1]])
+
+    @property
+    def results_size(self):
+        '''
+        Size (in bytes) of the results reply sent by the control board after
+        running the program.
+        '''
+        return (RESULTS_TRAILER_SIZE + STEP_RESULTS_SIZE * len(self.steps) +
+                WINDOW_RESULTS_SIZE * sum(step['n_sampling_windows']
+                                          for step in self.steps))
+
+    def validate(self, max_waveform_voltage=None, frequency_range=None):
+        '''
+        Check that the program can be executed by the control board.
+
+        Parameters
+        ----------
+        max_waveform_voltage : float, optional
+            Maximum waveform voltage supported by the control board.
+        frequency_range : tuple, optional
+            Minimum and maximum waveform frequency supported by the control
+            board.
+
+        Raises
+        ------
+        ValueError
+            If the program is not valid.
+        '''
+        if not self.steps:
+            raise ValueError('Program has no steps.')
+        for i, step in enumerate(self.steps):
+            if not 0 < step['duration_ms'] <= 0xFFFF:
+                raise ValueError('Step %d: duration must be between 1 and %d '
+                                 'ms.' % (i, 0xFFFF))
+            if (step['state'] is not None and step['state'].shape !=
+                    (self.number_of_channels, )):
+                raise ValueError('Step %d: state must have length %d.' %
+                                 (i, self.number_of_channels))
+            voltage = step['voltage']
+            if voltage is not None and (voltage < 0 or
+                                        (max_waveform_voltage is not None and
+                                         voltage > max_waveform_voltage)):
+                raise ValueError('Step %d: voltage (%s) is out of range.' %
+                                 (i, voltage))
+            frequency = step['frequency']
+            if frequency is not None and frequency_range is not None and not \
+                    (frequency_range[0] <= frequency <= frequency_range[1]):
+                raise ValueError('Step %d: frequency (%s) is out of range.' %
+                                 (i, frequency))
+            n_sampling_windows = step['n_sampling_windows']
+            if n_sampling_windows:
+                if not 0 < n_sampling_windows <= 0xFFFF:
+                    raise ValueError('Step %d: invalid number of sampling '
+                                     'windows.' % i)
+                # The sampling window length must not overflow the sum^2
+                # variables on the control board.
+                if (step['sampling_window_ms'] / 1000. * MAX_SAMPLING_RATE >=
+                        4096):
+                    raise ValueError('Step %d: sampling window is too long.' %
+                                     i)
+                if (n_sampling_windows * step['sampling_window_ms'] >
+                        step['duration_ms']):
+                    raise ValueError('Step %d: measurement is longer than the '
+                                     'step duration.' % i)
+        if len(self.to_bytes()) > MAX_ACTUATION_PROGRAM_LENGTH:
+            raise ValueError('Program is too long (%d bytes, maximum is %d).'
+                             % (len(self.to_bytes()),
+                                MAX_ACTUATION_PROGRAM_LENGTH))
+        if self.results_size > MAX_PAYLOAD_LENGTH:
+            raise ValueError('Program results are too long (%d bytes, maximum '
+                             'is %d).  Reduce the number of sampling windows.'
+                             % (self.results_size, MAX_PAYLOAD_LENGTH))
+
+    def to_bytes(self):
+        '''
+        Encode the program in the format expected by the control board (see
+        ``DMFControlBoard::validate_actuation_program`` in the firmware).
+
+        Returns
+        -------
+        str
+            Encoded program.
+        '''
+        encoded = []
+        for step in self.steps:
+            flags = 0
+            fields = []
+            if step['state'] is not None:
+                flags |= 1 << STEP_SET_STATE
+                # Bit `i % 8` of byte `i / 8` is the state of channel `i`.
+                fields.append(np.packbits(step['state'][::-1])[::-1]
+                              .tostring())
+            if step['voltage'] is not None:
+                flags |= 1 << STEP_SET_VOLTAGE
+                fields.append(struct.pack('<f', step['voltage']))
+            if step['frequency'] is not None:
+                flags |= 1 << STEP_SET_FREQUENCY
+                fields.append(struct.pack('<f', step['frequency']))
+            if step['n_sampling_windows']:
+                flags |= 1 << STEP_MEASURE
+                options = ((step['interleave_samples'] << INTLV) |
+                           (step['rms'] << RMS))
+                fields.append(struct.pack('<fHB', step['sampling_window_ms'],
+                                          step['n_sampling_windows'],
+                                          options))
+            encoded.append(struct.pack('<BH', flags, step['duration_ms']))
+            encoded.extend(fields)
+        return ''.join(encoded)
+
+    def settings(self, voltage, frequency):
+        '''
+        Parameters
+        ----------
+        voltage, frequency : float
+            Waveform voltage and frequency before the program starts.
+
+        Returns
+        -------
+        list
+            Waveform ``(voltage, frequency)`` in effect during each step.
+        '''
+        settings = []
+        for step in self.steps:
+            if step['voltage'] is not None:
+                voltage = step['voltage']
+            if step['frequency'] is not None:
+                frequency = step['frequency']
+            settings.append((voltage, frequency))
+        return settings
+
+
+def split_results_buffer(buffer):
+    '''
+    Split the raw results of an actuation program into one buffer per step.
+
+    Parameters
+    ----------
+    buffer : numpy.ndarray
+        Raw buffer returned by the base ``get_actuation_program_results``
+        method.
+
+    Returns
+    -------
+    list
+        ``(start_us, sampling_windows, dt_ms)`` tuple for each step that was
+        run, where ``sampling_windows`` is an array of 4 values per sampling
+        window (as in the buffer returned by ``get_measure_impedance_data``).
+    pandas.Series
+        Trailer values: ``vgnd_0``, ``vgnd_1``, and ``amplifier_gain``.
+    '''
+    steps = []
+    i = 0
+    while i < buffer.size - 3:
+        start_us, n_windows, dt_ms = buffer[i:i + 3]
+        n_windows = int(n_windows)
+        steps.append((start_us, buffer[i + 3:i + 3 + 4 * n_windows], dt_ms))
+        i += 3 + 4 * n_windows
+    trailer = pd.Series(buffer[-3:], index=['vgnd_0', 'vgnd_1',
+                                            'amplifier_gain'])
+    return steps, trailer
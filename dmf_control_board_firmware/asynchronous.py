@@ -0,0 +1,428 @@
+'''
+Non-blocking interface to a DMF control board.
+
+All commands issued through an :class:`AsyncDMFControlBoard` are executed, in
+order, by a single I/O thread dedicated to the board.  Each method returns a
+:class:`concurrent.futures.Future`, so board I/O can be mixed with other work
+(e.g., camera capture, database writes) without blocking the caller.
+
+The returned futures may be awaited from an :mod:`asyncio` event loop using
+``asyncio.wrap_future`` (or ``trollius.wrap_future`` on Python 2), e.g.:
+
+.. code-block:: python
+
+    board = AsyncDMFControlBoard()
+    yield From(trollius.wrap_future(board.connect()))
+    results = yield From(trollius.wrap_future(board.measure_impedance(
+        5.0, 100, 0, True, True, state)))
+
+Since the board is only ever touched by the I/O thread, a single
+:class:`AsyncDMFControlBoard` may be shared as a session by several threads
+(e.g., GUI assistants and background acquisition code).  Commands are queued
+by priority, so safety commands (e.g., :meth:`clear_all_channels`) jump ahead
+of queued bulk sweeps.  Code written against the blocking
+:class:`DMFControlBoard` interface can use the session through
+:meth:`AsyncDMFControlBoard.blocking_proxy`.
+'''
+import Queue
+import itertools
+import logging
+import sys
+import threading
+import time
+
+from concurrent.futures import Future
+import numpy as np
+
+from . import DMFControlBoard
+from .metrics import CommandMetrics
+
+logger = logging.getLogger(__name__)
+
+# Command priorities (lower values are executed first).  Commands with the
+# same priority are executed in the order they were queued.
+PRIORITY_SAFETY = 0
+PRIORITY_HIGH = 10
+PRIORITY_NORMAL = 20
+PRIORITY_BULK = 30
+
+PRIORITY_NAMES = {PRIORITY_SAFETY: 'safety', PRIORITY_HIGH: 'high',
+                  PRIORITY_NORMAL: 'normal', PRIORITY_BULK: 'bulk'}
+
+# Priority of the request to stop the I/O thread (i.e., after all queued
+# commands).
+_PRIORITY_CLOSE = sys.maxint
+
+
+class CommandFuture(Future):
+    '''
+    :class:`concurrent.futures.Future` for a command queued on an
+    :class:`AsyncDMFControlBoard`.
+
+    Cancelling a *pending* command removes it from the queue.  Cancelling a
+    *running* measurement sends an interrupt to the control board, which stops
+    the measurement early.  In the latter case, :meth:`cancel` returns
+    ``False`` (as for any running future) and the future resolves with the
+    measurements collected before the interrupt.
+    '''
+    def __init__(self, priority=PRIORITY_NORMAL):
+        super(CommandFuture, self).__init__()
+        self.priority = priority
+        self.interrupt = threading.Event()
+
+    def cancel(self):
+        if super(CommandFuture, self).cancel():
+            return True
+        if self.running():
+            self.interrupt.set()
+        return False
+
+
+class AsyncDMFControlBoard(object):
+    '''
+    Wrap a :class:`DMFControlBoard` such that each command is executed on a
+    dedicated I/O thread and returns a :class:`CommandFuture`.
+
+    Commands are serialized, i.e., each command is sent to the board only
+    after the reply to the previous command has been received.  Queued
+    commands are executed in order of priority (see :data:`PRIORITY_NAMES`),
+    and then in the order they were queued.
+
+    The time each command waits in the queue is recorded per priority in
+    :attr:`wait_metrics` (see :meth:`queue_stats`).
+
+    Parameters
+    ----------
+    proxy : DMFControlBoard, optional
+        Control board to wrap.  If not specified, a new (disconnected)
+        :class:`DMFControlBoard` is created.
+    '''
+    def __init__(self, proxy=None):
+        if proxy is None:
+            proxy = DMFControlBoard()
+        self.proxy = proxy
+        self.wait_metrics = CommandMetrics()
+        self.max_queue_depth = 0
+        self._queue = Queue.PriorityQueue()
+        # Number of queued commands (i.e., excluding the request to stop the
+        # I/O thread), updated under `_lock`.
+        self._queue_depth = 0
+        # Sequence numbers keep commands with the same priority in order.
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._running = None
+        self._thread = threading.Thread(target=self._run,
+                                        name='dmf-control-board-io')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _run(self):
+        while True:
+            priority, sequence, queued_time, item = self._queue.get()
+            if item is None:
+                break
+            with self._lock:
+                self._queue_depth -= 1
+            future, function, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                # Command was cancelled before it was started.
+                continue
+            self.wait_metrics.record(PRIORITY_NAMES.get(priority,
+                                                        str(priority)),
+                                     time.time() - queued_time)
+            with self._lock:
+                self._running = future
+            try:
+                result = function(future, *args, **kwargs)
+            except Exception:
+                logger.debug('Error executing command %s', function,
+                             exc_info=True)
+                future.set_exception(sys.exc_info()[1])
+            else:
+                future.set_result(result)
+            finally:
+                with self._lock:
+                    self._running = None
+
+    def _submit(self, function, *args, **kwargs):
+        priority = kwargs.pop('priority', PRIORITY_NORMAL)
+        if not self._thread.is_alive():
+            raise RuntimeError('I/O thread is not running.')
+        future = CommandFuture(priority)
+        # Queue the command and update the depth under the lock, so the I/O
+        # thread can only count the command as dequeued after it was counted
+        # as queued, and concurrent submissions do not overwrite each
+        # other's update of the maximum depth.
+        with self._lock:
+            self._queue.put((priority, next(self._sequence), time.time(),
+                             (future, function, args, kwargs)))
+            self._queue_depth += 1
+            self.max_queue_depth = max(self.max_queue_depth,
+                                       self._queue_depth)
+        return future
+
+    def _wait(self, future, timeout=None):
+        '''
+        Wait for the result of a queued command.
+
+        Raises
+        ------
+        RuntimeError
+            If called from the I/O thread (i.e., from within a queued
+            command), since the command would never be started.
+        '''
+        if threading.current_thread() is self._thread:
+            raise RuntimeError('Cannot wait for a queued command from the '
+                               'I/O thread (use the wrapped control board, '
+                               '`proxy`, directly instead).')
+        return future.result(timeout)
+
+    @property
+    def queue_depth(self):
+        '''
+        Number of queued commands that have not been started (including
+        cancelled commands that have not been discarded yet).
+        '''
+        with self._lock:
+            return self._queue_depth
+
+    def queue_stats(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by priority name, with the number of commands
+            started (``calls``) and the mean, percentiles, and maximum time
+            (in milliseconds) commands waited in the queue before being
+            started (see :meth:`CommandMetrics.snapshot`).
+        '''
+        df_stats = self.wait_metrics.snapshot()[['calls', 'mean_ms', 'p50_ms',
+                                                 'p95_ms', 'p99_ms',
+                                                 'max_ms']]
+        df_stats.index.name = 'priority'
+        return df_stats
+
+    def close(self):
+        '''
+        Stop the I/O thread after all queued commands have been executed.
+        '''
+        if self._thread.is_alive():
+            self._queue.put((_PRIORITY_CLOSE, next(self._sequence),
+                             time.time(), None))
+            self._thread.join()
+
+    def submit(self, method_name, *args, **kwargs):
+        '''
+        Queue a call to an arbitrary :class:`DMFControlBoard` method.
+
+        Parameters
+        ----------
+        method_name : str
+            Name of :class:`DMFControlBoard` method to call.
+        priority : int, optional
+            Priority of command (keyword-only; default:
+            :data:`PRIORITY_NORMAL`).
+
+        Returns
+        -------
+        CommandFuture
+            Resolves with the return value of the method.
+        '''
+        return self._submit(lambda future, *args_, **kwargs_:
+                            getattr(self.proxy, method_name)(*args_,
+                                                             **kwargs_),
+                            *args, **kwargs)
+
+    def call(self, method_name, *args, **kwargs):
+        '''
+        Queue a call to an arbitrary :class:`DMFControlBoard` method and wait
+        for the result.
+
+        Parameters
+        ----------
+        method_name : str
+            Name of :class:`DMFControlBoard` method to call.
+        priority : int, optional
+            Priority of command (keyword-only; default:
+            :data:`PRIORITY_NORMAL`).
+        timeout : float, optional
+            Maximum time to wait for the result (keyword-only).
+
+        Returns
+        -------
+        object
+            Return value of the method.
+        '''
+        timeout = kwargs.pop('timeout', None)
+        return self._wait(self.submit(method_name, *args, **kwargs), timeout)
+
+    def blocking_proxy(self, priority=PRIORITY_NORMAL):
+        '''
+        Parameters
+        ----------
+        priority : int, optional
+            Priority of the commands queued through the returned proxy.
+
+        Returns
+        -------
+        SessionProxy
+            Drop-in replacement for a :class:`DMFControlBoard` (e.g., for the
+            GUI assistants), which executes each method call and attribute
+            access through this session.
+        '''
+        return SessionProxy(self, priority)
+
+    def connect(self, *args, **kwargs):
+        return self.submit('connect', *args, **kwargs)
+
+    def set_state_of_all_channels(self, state, priority=PRIORITY_NORMAL):
+        return self.submit('set_state_of_all_channels', state,
+                           priority=priority)
+
+    def _clear_all_channels(self, future):
+        self.proxy.set_state_of_all_channels(
+            np.zeros(self.proxy.number_of_channels(), dtype=int))
+
+    def clear_all_channels(self, interrupt_running=True):
+        '''
+        Queue a command to turn off all channels ahead of all other queued
+        commands.
+
+        Parameters
+        ----------
+        interrupt_running : bool, optional
+            If ``True`` (default), also interrupt any running measurement or
+            sweep (see :meth:`CommandFuture.cancel`), so the channels are
+            cleared as soon as possible.
+
+        Returns
+        -------
+        CommandFuture
+        '''
+        future = self._submit(self._clear_all_channels,
+                              priority=PRIORITY_SAFETY)
+        if interrupt_running:
+            with self._lock:
+                running = self._running
+            if running is not None and running.priority > PRIORITY_SAFETY:
+                running.interrupt.set()
+        return future
+
+    def set_waveform_voltage(self, voltage):
+        return self.submit('set_waveform_voltage', voltage)
+
+    def set_waveform_frequency(self, frequency):
+        return self.submit('set_waveform_frequency', frequency)
+
+    def _measure_impedance(self, future, *args):
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms = \
+            args[:3]
+        self.proxy.measure_impedance_non_blocking(*args)
+        self.proxy._poll_for_reply(future.interrupt, n_sampling_windows *
+                                   (sampling_window_ms +
+                                    delay_between_windows_ms))
+        return self.proxy.get_measure_impedance_data()
+
+    def measure_impedance(self, sampling_window_ms, n_sampling_windows,
+                          delay_between_windows_ms, interleave_samples, rms,
+                          state, priority=PRIORITY_NORMAL):
+        '''
+        Queue an impedance measurement.
+
+        See :meth:`DMFControlBoard.measure_impedance` for a description of the
+        parameters.
+
+        Returns
+        -------
+        CommandFuture
+            Resolves with a :class:`FeedbackResults` instance.  If the future
+            is cancelled while the measurement is running, the result contains
+            only the sampling windows collected before the interrupt.
+        '''
+        return self._submit(self._measure_impedance, sampling_window_ms,
+                            n_sampling_windows, delay_between_windows_ms,
+                            interleave_samples, rms, state,
+                            priority=priority)
+
+    def _sweep_channels(self, future, *args):
+        return self.proxy.sweep_channels(*args, interrupt=future.interrupt)
+
+    def sweep_channels(self, sampling_window_ms,
+                       n_sampling_windows_per_channel,
+                       delay_between_windows_ms, interleave_samples, rms,
+                       channel_mask, priority=PRIORITY_BULK):
+        '''
+        Queue a channel sweep.
+
+        See :meth:`DMFControlBoard.sweep_channels` for a description of the
+        parameters.  By default, sweeps are queued with the
+        :data:`PRIORITY_BULK` priority.
+
+        Returns
+        -------
+        CommandFuture
+            Resolves with a :class:`pandas.DataFrame`.  If the future is
+            cancelled while the sweep is running, the frame contains only the
+            chunks of channels measured before the interrupt.
+        '''
+        return self._submit(self._sweep_channels, sampling_window_ms,
+                            n_sampling_windows_per_channel,
+                            delay_between_windows_ms, interleave_samples, rms,
+                            channel_mask, priority=priority)
+
+
+class SessionProxy(object):
+    '''
+    Blocking view of an :class:`AsyncDMFControlBoard` session with the same
+    interface as a :class:`DMFControlBoard`.
+
+    Each method call (or attribute access) is queued on the session and the
+    calling thread waits for the result, so several threads may safely use
+    the same control board.
+
+    A session proxy must not be used from the I/O thread of the session
+    (e.g., from a function queued with :meth:`AsyncDMFControlBoard.submit`),
+    since each call would wait for itself.  Such calls raise a
+    :class:`RuntimeError` instead of blocking forever.
+
+    Parameters
+    ----------
+    session : AsyncDMFControlBoard
+    priority : int, optional
+        Priority of queued commands.
+    '''
+    def __init__(self, session, priority=PRIORITY_NORMAL):
+        self._session = session
+        self._priority = priority
+
+    def __getattr__(self, name):
+        session = self._session
+        priority = self._priority
+        value = session._wait(session._submit(lambda future:
+                                              getattr(session.proxy, name),
+                                              priority=priority))
+        if not callable(value):
+            return value
+
+        def _call(*args, **kwargs):
+            return session._wait(session._submit(lambda future:
+                                                 value(*args, **kwargs),
+                                                 priority=priority))
+        _call.__name__ = name
+        return _call
+
+    def __setattr__(self, name, value):
+        if name in ('_session', '_priority'):
+            super(SessionProxy, self).__setattr__(name, value)
+        else:
+            session = self._session
+            session._wait(session._submit(lambda future:
+                                          setattr(session.proxy, name,
+                                                  value),
+                                          priority=self._priority))
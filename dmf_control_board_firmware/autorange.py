@@ -0,0 +1,263 @@
+'''
+Predictive auto-ranging of the series resistors of the feedback circuits.
+
+At the start of each measurement, the feedback controller enables the largest
+series resistor of the high-voltage (HV) and feedback (FB) channels, and
+steps down one resistor after each saturated sampling window (see
+``FeedbackController::measure_impedance``).  Saturated windows are reported
+with a negative resistor index and discarded (i.e., set to ``NaN``) when
+decoding the results, so each step of a protocol may lose several windows
+while the controller searches for the right range.
+
+Instead, the peak-to-peak amplitude measured through each series resistor can
+be predicted from the calibrated series resistor and capacitor values, the
+target voltage and frequency, and the expected load capacitance.  The series
+resistor with the best resolution that is not expected to saturate is then
+sent to the control board as the initial series resistor of the next
+measurements (see :meth:`DMFControlBoard.autorange`).
+
+The rate of saturated windows with and without predicted initial series
+resistors is recorded in :attr:`DMFControlBoard.saturation_metrics`, e.g.:
+
+.. code-block:: python
+
+    proxy.autorange(capacitance=proxy.calibration.c_drop(frequency) * area)
+    ...
+    print proxy.saturation_metrics.snapshot()
+'''
+import math
+import threading
+
+import numpy as np
+import pandas as pd
+
+# Resistance (in ohms) of the high-voltage attenuator (i.e., ``R1`` in
+# :meth:`FeedbackResults.V_total`).
+HV_ATTENUATOR_RESISTANCE = 10e6
+
+# The following constants mirror the definitions in `FeedbackController.h`.
+ADC_FULL_SCALE = 1023
+SATURATION_THRESHOLD_HIGH = 972
+SATURATION_THRESHOLD_LOW = 51
+# Initial virtual ground (i.e., the mid-point of the input range) of each
+# channel.
+VGND = 512
+
+# The saturation thresholds apply to individual samples, which swing about
+# the virtual ground, so a sampling window saturates if its peak-to-peak
+# amplitude exceeds twice the distance from the virtual ground to the nearest
+# threshold.
+MAX_PK_PK = 2 * min(SATURATION_THRESHOLD_HIGH - VGND,
+                    VGND - SATURATION_THRESHOLD_LOW)
+
+# Fraction of :data:`MAX_PK_PK` that the predicted peak-to-peak amplitude may
+# reach, leaving room for calibration and load errors.
+DEFAULT_HEADROOM = 0.8
+
+# Columns of the frame returned by :meth:`SaturationMetrics.snapshot`.
+SNAPSHOT_COLUMNS = ['measurements', 'windows', 'hv_saturated',
+                    'fb_saturated', 'hv_saturated_rate', 'fb_saturated_rate',
+                    'hv_leading_saturated', 'fb_leading_saturated']
+
+
+def series_impedance(R, C, frequency):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Complex impedance of each series resistor ``R`` in parallel with its
+        stray capacitance ``C`` at the specified frequency.
+    '''
+    omega = 2 * math.pi * frequency
+    R = np.asarray(R, dtype=float)
+    return R / (1 + 1j * omega * R * np.asarray(C, dtype=float))
+
+
+def predict_pk_pk(hardware_major_version, voltage, Z1, Z2, aref=5.):
+    '''
+    Predict the peak-to-peak amplitude (in ADC counts) measured across each
+    series impedance.
+
+    See :meth:`FeedbackResults.V_actuation` for the feedback circuit of each
+    hardware version.
+
+    Parameters
+    ----------
+    hardware_major_version : int
+        Major version of the control board hardware.
+    voltage : float
+        Input voltage ``V1`` (RMS).
+    Z1 : complex
+        Input impedance (i.e., the high-voltage attenuator or the device
+        load).
+    Z2 : numpy.ndarray
+        Complex impedance of each series resistor (see
+        :func:`series_impedance`).
+    aref : float, optional
+        Analog reference voltage.
+
+    Returns
+    -------
+    numpy.ndarray
+        Predicted peak-to-peak amplitude for each series resistor.
+    '''
+    if hardware_major_version == 1:
+        # `V1` is divided across `Z1` and `Z2`.
+        gain = np.abs(Z2 / (Z1 + Z2))
+    else:
+        # Inverting op-amp (i.e., `V2 = V1 * Z2 / Z1`).
+        gain = np.abs(Z2 / Z1)
+    return voltage * gain * 2 * math.sqrt(2) / aref * ADC_FULL_SCALE
+
+
+def choose_series_resistor(pk_pk, headroom=DEFAULT_HEADROOM):
+    '''
+    Parameters
+    ----------
+    pk_pk : numpy.ndarray
+        Predicted peak-to-peak amplitude for each series resistor (see
+        :func:`predict_pk_pk`).
+    headroom : float, optional
+        Fraction of :data:`MAX_PK_PK` that the predicted amplitude may reach.
+
+    Returns
+    -------
+    int
+        Index of the series resistor with the largest predicted amplitude
+        below the limit, or of the series resistor with the smallest
+        predicted amplitude if all are expected to saturate.
+    '''
+    pk_pk = np.asarray(pk_pk, dtype=float)
+    below_limit = np.flatnonzero(pk_pk < headroom * MAX_PK_PK)
+    if not below_limit.size:
+        return int(np.argmin(pk_pk))
+    return int(below_limit[np.argmax(pk_pk[below_limit])])
+
+
+def predict_series_resistor_indexes(calibration, voltage, frequency,
+                                    capacitance=None, aref=5.,
+                                    headroom=DEFAULT_HEADROOM):
+    '''
+    Predict the initial series resistor of the high-voltage and feedback
+    channels for a measurement.
+
+    Parameters
+    ----------
+    calibration : FeedbackCalibration
+        Calibrated series resistor and capacitor values.
+    voltage : float
+        Target actuation voltage (RMS).
+    frequency : float
+        Actuation frequency.
+    capacitance : float, optional
+        Expected load capacitance (in farads), e.g., the capacitance of the
+        actuated electrodes.  If not specified, no feedback series resistor
+        is predicted.
+    aref : float, optional
+        Analog reference voltage.
+    headroom : float, optional
+        See :func:`choose_series_resistor`.
+
+    Returns
+    -------
+    tuple
+        Predicted high-voltage and feedback series resistor indexes (``-1``
+        if no prediction was made, i.e., start with the largest series
+        resistor).
+    '''
+    hw_major = calibration.hw_version.major
+    Z2_hv = series_impedance(calibration.R_hv, calibration.C_hv, frequency)
+    hv_index = choose_series_resistor(predict_pk_pk(hw_major, voltage,
+                                                    HV_ATTENUATOR_RESISTANCE,
+                                                    Z2_hv, aref), headroom)
+    if not capacitance or not frequency:
+        return hv_index, -1
+    Z1_fb = 1. / (1j * 2 * math.pi * frequency * capacitance)
+    Z2_fb = series_impedance(calibration.R_fb, calibration.C_fb, frequency)
+    fb_index = choose_series_resistor(predict_pk_pk(hw_major, voltage, Z1_fb,
+                                                    Z2_fb, aref), headroom)
+    return hv_index, fb_index
+
+
+class SaturationMetrics(object):
+    '''
+    Thread-safe counts of saturated sampling windows, per ranging mode.
+
+    Measurements taken with the default ranging (i.e., starting with the
+    largest series resistors) and with predicted initial series resistors
+    are recorded separately, to compare the saturated window rates.
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        If ``False``, calls to :meth:`record` are ignored.
+    '''
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Discard all recorded counts.
+        '''
+        with self._lock:
+            self._modes = {}
+
+    def record(self, mode, hv_resistor, fb_resistor):
+        '''
+        Record the sampling windows of a single measurement.
+
+        Parameters
+        ----------
+        mode : str
+            Ranging mode (e.g., ``'default'`` or ``'predicted'``).
+        hv_resistor, fb_resistor : numpy.ndarray
+            Series resistor index of each sampling window (negative if the
+            window saturated).
+        '''
+        if not self.enabled:
+            return
+        counts = {'windows': len(hv_resistor)}
+        for name, resistor in (('hv', hv_resistor), ('fb', fb_resistor)):
+            saturated = np.asarray(resistor) < 0
+            # Saturated windows before the first valid window (i.e., windows
+            # spent searching for the right range).
+            leading = (np.argmin(saturated) if not saturated.all()
+                       else saturated.size)
+            counts[name + '_saturated'] = int(saturated.sum())
+            counts[name + '_leading_saturated'] = int(leading)
+        with self._lock:
+            totals = self._modes.setdefault(mode, dict.fromkeys
+                                            (['measurements', 'windows',
+                                              'hv_saturated', 'fb_saturated',
+                                              'hv_leading_saturated',
+                                              'fb_leading_saturated'], 0))
+            totals['measurements'] += 1
+            for key, value in counts.iteritems():
+                totals[key] += value
+
+    def snapshot(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by ranging mode, with the number of measurements
+            and sampling windows, the number and rate of saturated windows
+            for each channel, and the mean number of leading saturated
+            windows per measurement for each channel.
+        '''
+        with self._lock:
+            rows = dict((mode, dict(totals))
+                        for mode, totals in self._modes.iteritems())
+        for row in rows.itervalues():
+            windows = float(max(row['windows'], 1))
+            measurements = float(max(row['measurements'], 1))
+            for name in ('hv', 'fb'):
+                row[name + '_saturated_rate'] = (row[name + '_saturated'] /
+                                                 windows)
+                row[name + '_leading_saturated'] /= measurements
+        df_metrics = pd.DataFrame.from_dict(rows, orient='index')
+        df_metrics = df_metrics.reindex(columns=SNAPSHOT_COLUMNS)
+        df_metrics.index.name = 'mode'
+        return df_metrics.sort_index()
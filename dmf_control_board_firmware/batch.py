@@ -0,0 +1,375 @@
+'''
+Send several commands to the control board in a single packet.
+
+Each command sent to the control board costs at least one USB round trip.
+Sequences of commands that are always sent together (e.g., restoring the
+waveform and amplifier settings, or setting the waveform before measuring
+impedance) may instead be queued in a :class:`CommandBatch` and sent in a
+single packet.  The control board processes the commands in order and replies
+with the return code and reply payload of each command in a single packet.
+
+Example usage:
+
+.. code-block:: python
+
+    with proxy.batch() as batch:
+        batch.set_waveform_voltage(100)
+        batch.set_waveform_frequency(10e3)
+        i = batch.measure_impedance(5., 20, 0, True, True, state)
+    results = batch.values[i]
+
+Only commands that reply with a single packet may be batched (i.e., streaming
+commands, actuation programs, and commands that write directly to the payload
+buffer, such as ``analog_reads``, are not supported).
+'''
+import struct
+
+import numpy as np
+import pandas as pd
+
+from .dmf_control_board_base import DMFControlBoard as Base
+
+# The following constants mirror the definitions in `RemoteObject.h`.
+#
+# Batch flags (bit definitions).
+BATCH_STOP_ON_ERROR = 0
+# Size (in bytes) of the header preceding each command/reply in a batch.
+BATCH_HEADER_LENGTH = 4
+# Maximum size (in bytes) of a packet payload.
+MAX_PAYLOAD_LENGTH = 2000
+# Return codes.
+RETURN_OK = 0x00
+
+# Impedance measurement options (bit definitions, see `DMFControlBoard.h`).
+INTLV = 0
+RMS = 1
+# Layout of each impedance sampling window in a reply.
+IMPEDANCE_WINDOW_DTYPE = [('V_hv', '<u2'), ('hv_resistor', 'i1'),
+                          ('V_fb', '<u2'), ('fb_resistor', 'i1')]
+IMPEDANCE_WINDOW_LENGTH = 2 * (2 + 1)
+# Impedance reply trailer (`dt_ms`, two `vgnd` values, and amplifier gain).
+IMPEDANCE_TRAILER_FORMAT = '<4f'
+
+
+def decode_struct(format_):
+    '''
+    Returns
+    -------
+    function
+        Decode a reply payload containing a single value packed according to
+        the specified :mod:`struct` format.
+    '''
+    def _decode(reply):
+        return struct.unpack(format_, reply)[0]
+    return _decode
+
+
+def decode_impedance_reply(reply):
+    '''
+    Decode the reply to a ``measure_impedance`` command.
+
+    Returns
+    -------
+    numpy.ndarray
+        Buffer in the same layout as the buffer returned by the base
+        ``get_measure_impedance_data`` method (i.e., 4 values per sampling
+        window, followed by ``dt_ms``, the ``vgnd`` values, and the amplifier
+        gain).
+    '''
+    trailer_length = struct.calcsize(IMPEDANCE_TRAILER_FORMAT)
+    windows = np.frombuffer(reply[:-trailer_length],
+                            dtype=IMPEDANCE_WINDOW_DTYPE)
+    buffer = np.column_stack([windows[name].astype(float)
+                              for name, dtype in IMPEDANCE_WINDOW_DTYPE])
+    trailer = struct.unpack(IMPEDANCE_TRAILER_FORMAT,
+                            reply[-trailer_length:])
+    return np.concatenate([buffer.ravel(), trailer])
+
+
+class CommandBatch(object):
+    '''
+    Sequence of commands to be sent to the control board in a single packet.
+
+    Each command method queues a command and returns the index of the
+    command in the batch.  After the batch is executed (see
+    :meth:`DMFControlBoard.batch`), the return code and decoded reply of each
+    command are available in :attr:`results`.
+
+    Parameters
+    ----------
+    number_of_channels : int
+        Number of channels on the control board.
+    stop_on_error : bool, optional
+        If ``True`` (default), the control board does not run any command
+        following a failed command.
+    '''
+    def __init__(self, number_of_channels, stop_on_error=True):
+        self.number_of_channels = number_of_channels
+        self.stop_on_error = stop_on_error
+        self.commands = []
+        self.results = None
+
+    def __len__(self):
+        return len(self.commands)
+
+    def _append(self, name, command_code, payload='', reply_length=0,
+                decode=None, mirror=None, duration_ms=0):
+        '''
+        Queue a command.
+
+        Parameters
+        ----------
+        name : str
+            Name of command.
+        command_code : int
+            Firmware command code.
+        payload : str, optional
+            Encoded command payload.
+        reply_length : int, optional
+            Maximum size (in bytes) of the reply payload.
+        decode : function, optional
+            Function to decode the reply payload.
+        mirror : tuple, optional
+            ``(key, value)`` of the setting mirrored on the host (see
+            :meth:`DMFControlBoard._mirrored`) that is updated if the command
+            succeeds.  If ``value`` is ``None``, the decoded reply is used.
+        duration_ms : float, optional
+            Time (in milliseconds) the control board takes to run the
+            command (e.g., the duration of an impedance measurement).
+
+        Returns
+        -------
+        int
+            Index of the command in the batch.
+        '''
+        self.commands.append({'name': name, 'command_code': command_code,
+                              'payload': payload,
+                              'reply_length': reply_length,
+                              'decode': decode, 'mirror': mirror,
+                              'duration_ms': duration_ms})
+        return len(self.commands) - 1
+
+    def _pack_state(self, state):
+        if len(state) != self.number_of_channels:
+            raise ValueError('State must have length %d.' %
+                             self.number_of_channels)
+        return ''.join(chr(int(bool(s))) for s in state)
+
+    # Batchable commands
+    # ==================
+    def set_waveform_voltage(self, voltage):
+        return self._append('set_waveform_voltage',
+                            Base.CMD_SET_WAVEFORM_VOLTAGE,
+                            struct.pack('<f', voltage),
+                            mirror=('waveform_voltage', voltage))
+
+    def set_waveform_frequency(self, frequency):
+        return self._append('set_waveform_frequency',
+                            Base.CMD_SET_WAVEFORM_FREQUENCY,
+                            struct.pack('<f', frequency),
+                            mirror=('waveform_frequency', frequency))
+
+    def waveform_voltage(self):
+        return self._append('waveform_voltage', Base.CMD_GET_WAVEFORM_VOLTAGE,
+                            reply_length=4, decode=decode_struct('<f'),
+                            mirror=('waveform_voltage', None))
+
+    def waveform_frequency(self):
+        return self._append('waveform_frequency',
+                            Base.CMD_GET_WAVEFORM_FREQUENCY, reply_length=4,
+                            decode=decode_struct('<f'),
+                            mirror=('waveform_frequency', None))
+
+    def set_amplifier_gain(self, gain):
+        return self._append('set_amplifier_gain', Base.CMD_SET_AMPLIFIER_GAIN,
+                            struct.pack('<f', gain),
+                            mirror=('amplifier_gain', gain))
+
+    def amplifier_gain(self):
+        return self._append('amplifier_gain', Base.CMD_GET_AMPLIFIER_GAIN,
+                            reply_length=4, decode=decode_struct('<f'),
+                            mirror=('amplifier_gain', None))
+
+    def set_auto_adjust_amplifier_gain(self, value):
+        return self._append('set_auto_adjust_amplifier_gain',
+                            Base.CMD_SET_AUTO_ADJUST_AMPLIFIER_GAIN,
+                            struct.pack('<B', bool(value)),
+                            mirror=('auto_adjust_amplifier_gain',
+                                    bool(value)))
+
+    def auto_adjust_amplifier_gain(self):
+        return self._append('auto_adjust_amplifier_gain',
+                            Base.CMD_GET_AUTO_ADJUST_AMPLIFIER_GAIN,
+                            reply_length=1,
+                            decode=lambda reply: bool(ord(reply)),
+                            mirror=('auto_adjust_amplifier_gain', None))
+
+    def set_series_resistor_index(self, channel, index):
+        return self._append('set_series_resistor_index',
+                            Base.CMD_SET_SERIES_RESISTOR_INDEX,
+                            struct.pack('<BB', channel, index))
+
+    def set_initial_series_resistor_index(self, channel, index):
+        return self._append('set_initial_series_resistor_index',
+                            Base.CMD_SET_INITIAL_SERIES_RESISTOR_INDEX,
+                            struct.pack('<Bb', channel, index))
+
+    def persistent_read(self, address):
+        return self._append('persistent_read', Base.CMD_PERSISTENT_READ,
+                            struct.pack('<H', address), reply_length=1,
+                            decode=ord)
+
+    def persistent_write(self, address, byte):
+        return self._append('persistent_write', Base.CMD_PERSISTENT_WRITE,
+                            struct.pack('<HB', address, byte))
+
+    def load_config(self, use_defaults=False):
+        return self._append('load_config', Base.CMD_LOAD_CONFIG,
+                            struct.pack('<B', bool(use_defaults)))
+
+    def config_checksum(self):
+        return self._append('config_checksum', Base.CMD_GET_CONFIG_CHECKSUM,
+                            reply_length=2, decode=decode_struct('<H'))
+
+    def set_state_of_all_channels(self, state):
+        return self._append('set_state_of_all_channels',
+                            Base.CMD_SET_STATE_OF_ALL_CHANNELS,
+                            self._pack_state(state))
+
+    def measure_impedance(self, sampling_window_ms, n_sampling_windows,
+                          delay_between_windows_ms, interleave_samples, rms,
+                          state=None):
+        '''
+        Queue an impedance measurement (see
+        :meth:`DMFControlBoard.measure_impedance`).
+
+        The decoded reply is the raw measurement buffer (see
+        :func:`decode_impedance_reply`).  Use
+        :meth:`DMFControlBoard.measure_impedance_buffer_to_feedback_result` to
+        convert it to a :class:`FeedbackResults` instance.
+        '''
+        options = (bool(interleave_samples) << INTLV) | (bool(rms) << RMS)
+        payload = struct.pack('<fHfB', sampling_window_ms, n_sampling_windows,
+                              delay_between_windows_ms, options)
+        if state is not None:
+            payload += self._pack_state(state)
+        reply_length = (IMPEDANCE_WINDOW_LENGTH * n_sampling_windows +
+                        struct.calcsize(IMPEDANCE_TRAILER_FORMAT))
+        return self._append('measure_impedance', Base.CMD_MEASURE_IMPEDANCE,
+                            payload, reply_length=reply_length,
+                            decode=decode_impedance_reply,
+                            duration_ms=n_sampling_windows *
+                            (sampling_window_ms + delay_between_windows_ms))
+
+    # Encoding/decoding
+    # =================
+    @property
+    def reply_length(self):
+        '''
+        Maximum size (in bytes) of the reply to the batch.
+        '''
+        return sum(BATCH_HEADER_LENGTH + command['reply_length']
+                   for command in self.commands)
+
+    @property
+    def duration_ms(self):
+        '''
+        Time (in milliseconds) the control board takes to run the commands in
+        the batch, excluding communication.
+        '''
+        return sum(command['duration_ms'] for command in self.commands)
+
+    def to_bytes(self):
+        '''
+        Encode the batch in the format expected by the control board (see
+        ``RemoteObject::process_batch`` in the firmware).
+
+        Returns
+        -------
+        str
+            Encoded batch.
+
+        Raises
+        ------
+        ValueError
+            If the batch is empty, or if the batch (or its reply) does not
+            fit in a single packet.
+        '''
+        if not self.commands:
+            raise ValueError('Batch has no commands.')
+        encoded = [struct.pack('<B', self.stop_on_error <<
+                               BATCH_STOP_ON_ERROR)]
+        for command in self.commands:
+            encoded.append(struct.pack('<BBH', command['command_code'], 0,
+                                       len(command['payload'])))
+            encoded.append(command['payload'])
+        encoded = ''.join(encoded)
+        # The control board writes replies to the same buffer the commands
+        # are read from, so commands and replies must fit together.
+        if len(encoded) - 1 + self.reply_length > MAX_PAYLOAD_LENGTH:
+            raise ValueError('Batch is too long (%d bytes of commands and %d '
+                             'bytes of replies, maximum is %d in total).' %
+                             (len(encoded) - 1, self.reply_length,
+                              MAX_PAYLOAD_LENGTH))
+        return encoded
+
+    def decode(self, reply):
+        '''
+        Decode the reply to the batch and store the results in
+        :attr:`results`.
+
+        Parameters
+        ----------
+        reply : str
+            Reply payload returned by the control board.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by command index, with the ``name``,
+            ``command_code``, ``return_code`` (``NaN`` if the command was
+            not run), and decoded ``value`` (``None`` if the command has no
+            reply value, failed, or was not run) of each command.
+        '''
+        rows = []
+        i = 0
+        while i + BATCH_HEADER_LENGTH <= len(reply):
+            command_code, return_code, length = \
+                struct.unpack('<BBH', reply[i:i + BATCH_HEADER_LENGTH])
+            i += BATCH_HEADER_LENGTH
+            command = self.commands[len(rows)]
+            if command_code != command['command_code']:
+                raise IOError('Unexpected reply to command %d (command code '
+                              '%d, expected %d).' % (len(rows), command_code,
+                                                     command['command_code']))
+            value = None
+            if return_code == RETURN_OK and command['decode'] is not None:
+                value = command['decode'](reply[i:i + length])
+            rows.append([return_code, value])
+            i += length
+        # Commands that were not run (i.e., following a failed command).
+        rows += [[np.nan, None]] * (len(self.commands) - len(rows))
+        self.results = pd.DataFrame(rows, columns=['return_code', 'value'])
+        self.results.insert(0, 'name', [queued['name']
+                                        for queued in self.commands])
+        self.results.insert(1, 'command_code', [queued['command_code']
+                                                for queued in self.commands])
+        return self.results
+
+    @property
+    def values(self):
+        '''
+        Decoded reply value of each command (see :meth:`decode`).
+        '''
+        if self.results is None:
+            raise RuntimeError('Batch has not been executed.')
+        return self.results.value.tolist()
+
+    @property
+    def failed(self):
+        '''
+        Results of the commands that failed or were not run.
+        '''
+        if self.results is None:
+            raise RuntimeError('Batch has not been executed.')
+        return self.results.loc[self.results.return_code != RETURN_OK]
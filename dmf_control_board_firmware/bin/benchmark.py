@@ -0,0 +1,441 @@
+'''
+End-to-end benchmark suite for the control board driver.
+
+The following are benchmarked:
+
+ - ``connect``: time to connect to the control board.
+ - ``command``: round-trip latency of simple commands.
+ - ``measure_impedance``: time of :meth:`DMFControlBoard.measure_impedance`
+   for different numbers of sampling windows.
+ - ``sweep_channels`` and ``sweep_channels_slow``: time of a sweep for
+   different numbers of channels.
+ - ``decode``: time to decode a raw measurement buffer to a
+   :class:`FeedbackResults`.
+ - ``to_frame``: time of :meth:`FeedbackResults.to_frame`.
+ - ``fit_fb_calibration``: total time of
+   :func:`calibrate.impedance.fit_fb_calibration` for synthetic feedback
+   calibration measurements, for each fit method (independent of the control
+   board).
+
+By default, the benchmarks are run against a :class:`SimulatedControlBoard`
+(without real-time acquisition, so the results reflect the cost of the host
+code and of the serial protocol).  Use ``--port`` to benchmark a connected
+control board instead.
+
+Results are written to a JSON file, which may be compared against the results
+of a previous run (e.g., from a previous commit) to flag regressions.
+
+Example usage:
+
+    # Benchmark the current commit and compare against a baseline.
+    python -m dmf_control_board_firmware.bin.benchmark run -o new.json
+    python -m dmf_control_board_firmware.bin.benchmark compare baseline.json \\
+        new.json
+
+    # Run and compare in one step.
+    python -m dmf_control_board_firmware.bin.benchmark run -o new.json \\
+        -b baseline.json
+'''
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from path_helpers import path
+
+from .. import DMFControlBoard, FeedbackCalibration
+from ..calibrate.impedance import fit_fb_calibration, simulate_experiment
+from ..dmf_control_board_base import DMFControlBoard as Base
+from ..dmf_control_board_base import uint8_tVector
+from ..simulator import SimulatedControlBoard
+
+# Columns of the results table (one row per benchmark case).
+RESULTS_COLUMNS = ['benchmark', 'case', 'repeats', 'min_s', 'median_s',
+                   'mean_s', 'max_s', 'units_per_s']
+
+# Default fraction by which the median time of a case may increase before it
+# is flagged as a regression.
+DEFAULT_THRESHOLD = 0.1
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark control board '
+                                     'driver.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    run = subparsers.add_parser('run', help='Run benchmarks.')
+    run.add_argument('-p', '--port', default=None, help='Benchmark control '
+                     'board on port (default: simulated control board).')
+    run.add_argument('-o', '--output', default='benchmark.json',
+                     help='Output results file (default: %(default)s).')
+    run.add_argument('-r', '--repeats', type=int, default=5)
+    run.add_argument('--connect-repeats', type=int, default=3)
+    run.add_argument('--n-sampling-windows', type=int, nargs='+',
+                     default=[10, 50, 100])
+    run.add_argument('-n', '--channel-counts', type=int, nargs='+',
+                     default=[10, 40, 120])
+    run.add_argument('--sampling-window-ms', type=float, default=5.)
+    run.add_argument('--fit-repeats', type=int, default=3, help='Number of '
+                     'repeats of each calibration fit (default: '
+                     '%(default)s).')
+    run.add_argument('--realtime', action='store_true', help='Simulate '
+                     'acquisition time of the simulated control board.')
+    run.add_argument('-b', '--baseline', default=None, help='Compare results '
+                     'against baseline results file.')
+    run.add_argument('-t', '--threshold', type=float,
+                     default=DEFAULT_THRESHOLD)
+
+    compare = subparsers.add_parser('compare', help='Compare results files.')
+    compare.add_argument('baseline')
+    compare.add_argument('results')
+    compare.add_argument('-t', '--threshold', type=float,
+                         default=DEFAULT_THRESHOLD,
+                         help='Flag cases with a median time more than this '
+                         'fraction above the baseline (default: '
+                         '%(default)s).')
+
+    return parser.parse_args(argv)
+
+
+def time_call(function, repeats):
+    '''
+    Parameters
+    ----------
+    function : function
+        Function to call (without arguments).
+    repeats : int
+        Number of calls.
+
+    Returns
+    -------
+    numpy.ndarray
+        Duration (in seconds) of each call.
+    '''
+    durations = np.empty(repeats)
+    for i in xrange(repeats):
+        start = time.time()
+        function()
+        durations[i] = time.time() - start
+    return durations
+
+
+def summarize(benchmark, case, durations, units=1):
+    '''
+    Parameters
+    ----------
+    benchmark : str
+        Name of benchmark.
+    case : str
+        Name of benchmark case (e.g., ``n_sampling_windows=10``).
+    durations : numpy.ndarray
+        Duration (in seconds) of each repeat.
+    units : int, optional
+        Number of units (e.g., sampling windows, channels) processed in each
+        repeat.
+
+    Returns
+    -------
+    list
+        Row of results table (see :data:`RESULTS_COLUMNS`).
+    '''
+    median_s = np.median(durations)
+    return [benchmark, case, len(durations), durations.min(), median_s,
+            durations.mean(), durations.max(), units / median_s]
+
+
+def benchmark_connect(port, repeats=3):
+    rows = []
+    proxy = DMFControlBoard()
+
+    def _connect():
+        proxy.connect(port)
+        proxy.disconnect()
+
+    rows.append(summarize('connect', 'connect', time_call(_connect, repeats)))
+    return rows
+
+
+def benchmark_commands(proxy, repeats=5):
+    '''
+    Time the round-trip latency of commands with small payloads (the
+    host-side mirrors and caches are bypassed).
+    '''
+    commands = [('name', proxy.name),
+                ('waveform_voltage',
+                 lambda: proxy.waveform_voltage(refresh=True)),
+                ('state_of_all_channels',
+                 lambda: proxy.state_of_all_channels)]
+    return [summarize('command', name, time_call(function, repeats))
+            for name, function in commands]
+
+
+def benchmark_measure_impedance(proxy, n_sampling_windows, repeats=5,
+                                sampling_window_ms=5.):
+    '''
+    Time :meth:`DMFControlBoard.measure_impedance`, the decoding of the
+    measurement buffer, and :meth:`FeedbackResults.to_frame` for each number
+    of sampling windows.
+    '''
+    state = np.zeros(proxy.number_of_channels(), dtype=int)
+    state[0] = 1
+    rows = []
+    for n in n_sampling_windows:
+        case = 'n_sampling_windows=%d' % n
+        args = (sampling_window_ms, n, 0, True, True, state)
+        rows.append(summarize('measure_impedance', case,
+                              time_call(lambda: proxy.measure_impedance(*args),
+                                        repeats), units=n))
+
+        state_ = uint8_tVector()
+        for state_i in state:
+            state_.append(int(state_i))
+        buffer = np.array(Base.measure_impedance(proxy, *(args[:-1] +
+                                                          (state_, ))))
+        rows.append(summarize('decode', case, time_call(
+            lambda: proxy.measure_impedance_buffer_to_feedback_result(buffer),
+            repeats), units=n))
+
+        results = proxy.measure_impedance_buffer_to_feedback_result(buffer)
+        rows.append(summarize('to_frame', case,
+                              time_call(results.to_frame, repeats), units=n))
+    return rows
+
+
+def benchmark_sweep(proxy, channel_counts, repeats=5, sampling_window_ms=5.,
+                    n_sampling_windows=5):
+    '''
+    Time :meth:`DMFControlBoard.sweep_channels` and
+    :meth:`DMFControlBoard.sweep_channels_slow` for each number of channels.
+    '''
+    rows = []
+    for n_channels in channel_counts:
+        channel_mask = np.zeros(proxy.number_of_channels(), dtype=int)
+        channel_mask[:n_channels] = 1
+        n_channels = channel_mask.sum()
+        args = (sampling_window_ms, n_sampling_windows, 0, True, True,
+                channel_mask)
+        for method_name in ('sweep_channels', 'sweep_channels_slow'):
+            method = getattr(proxy, method_name)
+            rows.append(summarize(method_name, 'n_channels=%d' % n_channels,
+                                  time_call(lambda: method(*args), repeats),
+                                  units=n_channels))
+    return rows
+
+
+def benchmark_fit_fb_calibration(repeats=3, methods=('analytic',
+                                                      'symbolic')):
+    '''
+    Time :func:`calibrate.impedance.fit_fb_calibration` for each fit method,
+    using synthetic measurements of the default test loads and frequencies
+    (see :func:`calibrate.impedance.simulate_experiment`).
+    '''
+    calibration = FeedbackCalibration(R_hv=[8.7e4, 6.4e5],
+                                      C_hv=[1.4e-10, 1.69e-10],
+                                      R_fb=[2.1e2, 1.9e3, 2.2e4, 1.8e5, 2.3e6],
+                                      C_fb=[1e-12, 20e-12, 50e-12, 30e-12,
+                                            10e-12])
+    df = simulate_experiment(calibration, seed=0)
+    return [summarize('fit_fb_calibration', 'method=%s' % method,
+                      time_call(lambda: fit_fb_calibration(df, calibration,
+                                                           method=method),
+                                repeats), units=df.shape[0])
+            for method in methods]
+
+
+def git_commit():
+    '''
+    Returns
+    -------
+    str
+        Hash of the current ``git`` commit of the package source (``None`` if
+        the source is not in a ``git`` repository).
+    '''
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'],
+                                       cwd=path(__file__).parent,
+                                       stderr=subprocess.STDOUT).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(port, repeats=5, connect_repeats=3,
+                   n_sampling_windows=(10, 50, 100),
+                   channel_counts=(10, 40, 120), sampling_window_ms=5.,
+                   fit_repeats=3):
+    '''
+    Parameters
+    ----------
+    port : str
+        Port of control board.
+    repeats : int, optional
+        Number of repeats of each benchmark case.
+    connect_repeats : int, optional
+        Number of times to connect to the control board.
+    n_sampling_windows : list, optional
+        Numbers of sampling windows to benchmark ``measure_impedance`` with.
+    channel_counts : list, optional
+        Numbers of channels to benchmark sweeps with.
+    sampling_window_ms : float, optional
+        Length of each sampling window.
+    fit_repeats : int, optional
+        Number of repeats of each calibration fit.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Results table with the columns in :data:`RESULTS_COLUMNS`.
+    '''
+    rows = benchmark_connect(port, repeats=connect_repeats)
+    proxy = DMFControlBoard()
+    proxy.connect(port)
+    try:
+        proxy.set_waveform_voltage(50)
+        rows += benchmark_commands(proxy, repeats=repeats)
+        rows += benchmark_measure_impedance(
+            proxy, n_sampling_windows, repeats=repeats,
+            sampling_window_ms=sampling_window_ms)
+        rows += benchmark_sweep(proxy, channel_counts, repeats=repeats,
+                                sampling_window_ms=sampling_window_ms)
+    finally:
+        proxy.disconnect()
+    rows += benchmark_fit_fb_calibration(repeats=fit_repeats)
+    return pd.DataFrame(rows, columns=RESULTS_COLUMNS)
+
+
+def save_results(filepath, df_results, **metadata):
+    '''
+    Write results table to a JSON file, along with metadata describing the
+    run (commit, time, host, etc.).
+
+    Parameters
+    ----------
+    filepath : str
+        Output file path.
+    df_results : pandas.DataFrame
+        Results table (see :func:`run_benchmarks`).
+    **metadata
+        Extra metadata (e.g., benchmark target).
+    '''
+    metadata.update({'commit': git_commit(),
+                     'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                     'host': platform.node(),
+                     'python': platform.python_version()})
+    with open(filepath, 'w') as output:
+        json.dump({'metadata': metadata,
+                   'results': df_results.to_dict(orient='records')}, output,
+                  indent=2)
+
+
+def load_results(filepath):
+    '''
+    Parameters
+    ----------
+    filepath : str
+        Results file written by :func:`save_results`.
+
+    Returns
+    -------
+    (dict, pandas.DataFrame)
+        Metadata and results table.
+    '''
+    with open(filepath, 'r') as input_:
+        data = json.load(input_)
+    return (data['metadata'],
+            pd.DataFrame(data['results'], columns=RESULTS_COLUMNS))
+
+
+def compare_results(df_baseline, df_results, threshold=DEFAULT_THRESHOLD):
+    '''
+    Parameters
+    ----------
+    df_baseline : pandas.DataFrame
+        Baseline results table.
+    df_results : pandas.DataFrame
+        Results table.
+    threshold : float, optional
+        Fraction by which the median time of a case may increase relative to
+        the baseline before it is flagged as a regression.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table indexed by ``benchmark`` and ``case`` (only cases present in
+        both tables), with the columns ``baseline_s``, ``median_s``,
+        ``change`` (relative change of the median time), and
+        ``regression``.
+    '''
+    df_comparison = pd.merge(df_baseline[['benchmark', 'case', 'median_s']],
+                             df_results[['benchmark', 'case', 'median_s']],
+                             on=['benchmark', 'case'],
+                             suffixes=('_baseline', ''))
+    df_comparison.rename(columns={'median_s_baseline': 'baseline_s'},
+                         inplace=True)
+    df_comparison['change'] = (df_comparison.median_s /
+                               df_comparison.baseline_s - 1)
+    df_comparison['regression'] = df_comparison.change > threshold
+    return df_comparison.set_index(['benchmark', 'case'])
+
+
+def print_comparison(df_comparison):
+    '''
+    Returns
+    -------
+    int
+        Number of regressions.
+    '''
+    print df_comparison
+    regressions = df_comparison.loc[df_comparison.regression]
+    if regressions.shape[0]:
+        print '\n%d regression(s):' % regressions.shape[0]
+        for (benchmark, case), row in regressions.iterrows():
+            print '  %s[%s]: %.3g s -> %.3g s (%+.0f%%)' % (
+                benchmark, case, row.baseline_s, row.median_s,
+                100 * row.change)
+    return regressions.shape[0]
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    if args.command == 'compare':
+        baseline_metadata, df_baseline = load_results(args.baseline)
+        metadata, df_results = load_results(args.results)
+        print 'Baseline: %(commit)s (%(timestamp)s)' % baseline_metadata
+        print 'Results:  %(commit)s (%(timestamp)s)\n' % metadata
+        regressions = print_comparison(compare_results(df_baseline,
+                                                       df_results,
+                                                       args.threshold))
+        sys.exit(1 if regressions else 0)
+
+    kwargs = dict(repeats=args.repeats, connect_repeats=args.connect_repeats,
+                  n_sampling_windows=args.n_sampling_windows,
+                  channel_counts=args.channel_counts,
+                  sampling_window_ms=args.sampling_window_ms,
+                  fit_repeats=args.fit_repeats)
+    if args.port is None:
+        # The simulated control board has a multiple of 40 channels.
+        number_of_channels = 40 * int(np.ceil(max(args.channel_counts) / 40.))
+        with SimulatedControlBoard(number_of_channels=number_of_channels,
+                                   realtime=args.realtime) as board:
+            df_results = run_benchmarks(board.port, **kwargs)
+        target = 'simulator'
+    else:
+        df_results = run_benchmarks(args.port, **kwargs)
+        target = args.port
+    save_results(args.output, df_results, target=target)
+    print df_results.set_index(['benchmark', 'case'])
+
+    if args.baseline is not None:
+        baseline_metadata, df_baseline = load_results(args.baseline)
+        print '\nBaseline: %(commit)s (%(timestamp)s)\n' % baseline_metadata
+        regressions = print_comparison(compare_results(df_baseline,
+                                                       df_results,
+                                                       args.threshold))
+        sys.exit(1 if regressions else 0)
@@ -0,0 +1,159 @@
+'''
+Benchmark step timing jitter of on-board actuation programs against an
+equivalent host-driven loop.
+
+Each step actuates a single channel (and, optionally, measures impedance).
+The jitter of each step is the difference between the actual and the
+scheduled start time of the step.
+
+Example usage:
+
+    python -m dmf_control_board_firmware.bin.benchmark_actuation -p COM3
+'''
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .. import ActuationProgram, DMFControlBoard
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark actuation step '
+                                     'timing jitter.')
+    parser.add_argument('-p', '--port', default=None)
+    parser.add_argument('-n', '--n-steps', type=int, default=20)
+    parser.add_argument('-d', '--step-duration-ms', type=int, default=100)
+    parser.add_argument('--n-sampling-windows', type=int, default=0,
+                        help='Number of impedance sampling windows measured '
+                        'in each step (default: no measurements).')
+    parser.add_argument('--sampling-window-ms', type=float, default=5.)
+
+    return parser.parse_args(argv)
+
+
+def step_states(number_of_channels, n_steps):
+    '''
+    Returns
+    -------
+    list
+        Channel states, each actuating a single channel (cycling through the
+        channels).
+    '''
+    states = []
+    for i in xrange(n_steps):
+        state = np.zeros(number_of_channels, dtype=int)
+        state[i % number_of_channels] = 1
+        states.append(state)
+    return states
+
+
+def host_driven_jitter(proxy, states, step_duration_ms, n_sampling_windows=0,
+                       sampling_window_ms=5.):
+    '''
+    Run steps with one round trip to the control board per step.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Scheduled and actual start time, and jitter, of each step (in
+        milliseconds).
+    '''
+    rows = []
+    start = time.time()
+    for i, state in enumerate(states):
+        scheduled_start_ms = i * step_duration_ms
+        # Wait until the scheduled start of the step.
+        while (time.time() - start) * 1e3 < scheduled_start_ms:
+            time.sleep(0)
+        start_ms = (time.time() - start) * 1e3
+        if n_sampling_windows:
+            proxy.measure_impedance(sampling_window_ms, n_sampling_windows, 0,
+                                    True, True, state)
+        else:
+            proxy.set_state_of_all_channels(state)
+        rows.append([scheduled_start_ms, start_ms])
+    df_steps = pd.DataFrame(rows, columns=['scheduled_start_ms', 'start_ms'])
+    df_steps['jitter_ms'] = df_steps.start_ms - df_steps.scheduled_start_ms
+    return df_steps
+
+
+def on_board_jitter(proxy, states, step_duration_ms, n_sampling_windows=0,
+                    sampling_window_ms=5.):
+    '''
+    Run steps as an on-board actuation program.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Scheduled and actual start time, and jitter, of each step (in
+        milliseconds).
+    '''
+    program = ActuationProgram(proxy.number_of_channels())
+    for state in states:
+        program.add_step(step_duration_ms, state=state,
+                         n_sampling_windows=n_sampling_windows,
+                         sampling_window_ms=sampling_window_ms)
+    proxy.set_actuation_program(program)
+    df_steps, results = proxy.run_actuation_program()
+    return df_steps
+
+
+def benchmark_actuation(proxy, n_steps, step_duration_ms,
+                        n_sampling_windows=0, sampling_window_ms=5.):
+    '''
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    n_steps : int
+        Number of steps.
+    step_duration_ms : int
+        Duration of each step.
+    n_sampling_windows : int, optional
+        Number of impedance sampling windows measured in each step.
+    sampling_window_ms : float, optional
+        Length of each sampling window.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table indexed by method (``host`` or ``on-board``), with the mean,
+        standard deviation, and maximum absolute step jitter (in
+        milliseconds).
+    '''
+    states = step_states(proxy.number_of_channels(), n_steps)
+    kwargs = {'n_sampling_windows': n_sampling_windows,
+              'sampling_window_ms': sampling_window_ms}
+    frames = [('host', host_driven_jitter(proxy, states, step_duration_ms,
+                                          **kwargs)),
+              ('on-board', on_board_jitter(proxy, states, step_duration_ms,
+                                           **kwargs))]
+    # Turn off all channels.
+    proxy.set_state_of_all_channels(np.zeros(proxy.number_of_channels(),
+                                             dtype=int))
+
+    rows = []
+    for method, df_steps in frames:
+        # Jitter relative to the first step (i.e., excluding the time needed
+        # to start the program).
+        jitter = df_steps.jitter_ms - df_steps.jitter_ms.iloc[0]
+        rows.append([method, jitter.mean(), jitter.std(), jitter.abs().max()])
+    return pd.DataFrame(rows, columns=['method', 'mean_jitter_ms',
+                                       'std_jitter_ms', 'max_abs_jitter_ms'])\
+        .set_index('method')
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    proxy = DMFControlBoard()
+    proxy.connect(args.port)
+    print benchmark_actuation(proxy, args.n_steps, args.step_duration_ms,
+                              n_sampling_windows=args.n_sampling_windows,
+                              sampling_window_ms=args.sampling_window_ms)
@@ -0,0 +1,110 @@
+'''
+Benchmark sustained throughput (in samples per second) of impedance
+measurement streams.
+
+By default, the benchmark is run against a simulated control board (see
+:class:`dmf_control_board_firmware.simulator.SimulatedControlBoard`), which
+streams synthetic frames over a pseudo-terminal at the rate permitted by the
+sampling window length and the serial baud rate.  Use ``--port`` to benchmark
+a connected control board instead.
+
+Example usage:
+
+    python -m dmf_control_board_firmware.bin.benchmark_stream -d 10
+'''
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .. import DMFControlBoard
+from ..simulator import SimulatedControlBoard
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark impedance '
+                                     'measurement streams.')
+    parser.add_argument('-p', '--port', default=None, help='Benchmark '
+                        'control board on port (default: simulated board).')
+    parser.add_argument('-d', '--duration', type=float, default=5.,
+                        help='Duration of each stream (seconds).')
+    parser.add_argument('-n', '--n-sampling-windows-per-frame', type=int,
+                        nargs='+', default=[10, 50, 100])
+    parser.add_argument('--sampling-window-ms', type=float, default=5.)
+    parser.add_argument('--baud-rate', type=int, default=115200)
+    parser.add_argument('--raw', action='store_true', help='Do not decode '
+                        'frames to `FeedbackResults`.')
+
+    return parser.parse_args(argv)
+
+
+def benchmark_stream(proxy, duration, n_sampling_windows_per_frame,
+                     sampling_window_ms=5., decode=True):
+    '''
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+    duration : float
+        Duration of stream (in seconds).
+    n_sampling_windows_per_frame : list
+        Frame sizes to benchmark.
+    sampling_window_ms : float, optional
+        Length of each sampling window.
+    decode : bool, optional
+        If ``True``, decode each frame to a :class:`FeedbackResults`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table with one row per frame size and the columns ``frames``,
+        ``dropped_frames``, ``samples``, ``duration_s``, and
+        ``samples_per_s``.
+    '''
+    state = np.zeros(proxy.number_of_channels(), dtype=int)
+    rows = []
+    for n in n_sampling_windows_per_frame:
+        frames = 0
+        start = time.time()
+        with proxy.measure_impedance_stream(sampling_window_ms, n, 0, True,
+                                            True, state,
+                                            decode=decode) as stream:
+            for sequence_number, result in stream:
+                frames += 1
+                if time.time() - start > duration:
+                    stream.stop()
+        duration_s = time.time() - start
+        rows.append([n, frames, stream.dropped_frames, frames * n,
+                     duration_s, frames * n / duration_s])
+    return pd.DataFrame(rows, columns=['n_sampling_windows_per_frame',
+                                       'frames', 'dropped_frames', 'samples',
+                                       'duration_s', 'samples_per_s'])
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    def run(port, simulated=False):
+        proxy = DMFControlBoard()
+        proxy.connect(port, args.baud_rate)
+        try:
+            if simulated:
+                proxy.set_waveform_frequency(10e3)
+                proxy.set_waveform_voltage(100.)
+            return benchmark_stream(proxy, args.duration,
+                                    args.n_sampling_windows_per_frame,
+                                    sampling_window_ms=args.sampling_window_ms,
+                                    decode=not args.raw)
+        finally:
+            proxy.disconnect()
+
+    if args.port is None:
+        with SimulatedControlBoard(baud_rate=args.baud_rate) as simulator:
+            df_results = run(simulator.port, simulated=True)
+    else:
+        df_results = run(args.port)
+    print df_results.set_index('n_sampling_windows_per_frame')
@@ -0,0 +1,93 @@
+'''
+Benchmark chunked :meth:`DMFControlBoard.sweep_channels` against
+:meth:`DMFControlBoard.sweep_channels_slow` for different numbers of channels.
+
+Example usage:
+
+    python -m dmf_control_board_firmware.bin.benchmark_sweep -p COM3
+'''
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from .. import DMFControlBoard
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Benchmark channel sweeps.')
+    parser.add_argument('-p', '--port', default=None)
+    parser.add_argument('-n', '--channel-counts', type=int, nargs='+',
+                        default=[40, 80, 120])
+    parser.add_argument('-r', '--repeats', type=int, default=3)
+    parser.add_argument('--sampling-window-ms', type=float, default=5.)
+    parser.add_argument('--n-sampling-windows', type=int, default=5)
+    parser.add_argument('--slow', action='store_true',
+                        help='Also benchmark `sweep_channels_slow`.')
+
+    return parser.parse_args(argv)
+
+
+def benchmark_sweep(proxy, channel_counts, repeats=3, sampling_window_ms=5.,
+                    n_sampling_windows=5, slow=False):
+    '''
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    channel_counts : list
+        Numbers of channels to sweep.
+    repeats : int, optional
+        Number of sweeps per channel count.
+    sampling_window_ms : float, optional
+        Length of each sampling window.
+    n_sampling_windows : int, optional
+        Number of sampling windows per channel.
+    slow : bool, optional
+        If ``True``, also time :meth:`DMFControlBoard.sweep_channels_slow`.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table with columns ``method``, ``n_channels``, ``repeat``,
+        ``duration_s``, and ``channels_per_s``.
+    '''
+    methods = [('sweep_channels', proxy.sweep_channels)]
+    if slow:
+        methods.append(('sweep_channels_slow', proxy.sweep_channels_slow))
+
+    rows = []
+    for n_channels in channel_counts:
+        channel_mask = np.zeros(proxy.number_of_channels(), dtype=int)
+        channel_mask[:n_channels] = 1
+        n_channels = channel_mask.sum()
+        for method_name, method in methods:
+            for repeat_i in xrange(repeats):
+                start = time.time()
+                method(sampling_window_ms, n_sampling_windows, 0, True, True,
+                       channel_mask)
+                duration_s = time.time() - start
+                rows.append([method_name, n_channels, repeat_i, duration_s,
+                             n_channels / duration_s])
+    return pd.DataFrame(rows, columns=['method', 'n_channels', 'repeat',
+                                       'duration_s', 'channels_per_s'])
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    proxy = DMFControlBoard()
+    proxy.connect(args.port)
+    df_results = benchmark_sweep(proxy, args.channel_counts,
+                                 repeats=args.repeats,
+                                 sampling_window_ms=args.sampling_window_ms,
+                                 n_sampling_windows=args.n_sampling_windows,
+                                 slow=args.slow)
+    print df_results.groupby(['method', 'n_channels'])[['duration_s',
+                                                        'channels_per_s']]\
+        .mean()
@@ -0,0 +1,108 @@
+'''
+On-disk cache of values that are expensive to read from a control board
+(e.g., the I2C device inventory).
+
+Cache files are stored in the directory returned by :func:`cache_dir`, which
+may be overridden by setting the ``DMF_CONTROL_BOARD_CACHE_DIR`` environment
+variable.  Deleting the directory is always safe; cached values are read from
+the control board again as needed.
+'''
+import json
+import logging
+import os
+import threading
+
+from path_helpers import path
+
+logger = logging.getLogger(__name__)
+
+# Environment variable to override the cache directory.
+CACHE_DIR_ENVIRONMENT_VARIABLE = 'DMF_CONTROL_BOARD_CACHE_DIR'
+
+
+def cache_dir():
+    '''
+    Returns
+    -------
+    path_helpers.path
+        Directory containing cache files (not necessarily existing).  Unless
+        overridden by the ``DMF_CONTROL_BOARD_CACHE_DIR`` environment
+        variable, this is ``%LOCALAPPDATA%\\dmf-control-board-firmware`` on
+        Windows, or ``$XDG_CACHE_HOME/dmf-control-board-firmware`` (default:
+        ``~/.cache/dmf-control-board-firmware``) on other platforms.
+    '''
+    if os.environ.get(CACHE_DIR_ENVIRONMENT_VARIABLE):
+        return path(os.environ[CACHE_DIR_ENVIRONMENT_VARIABLE])
+    if os.name == 'nt':
+        base = os.environ.get('LOCALAPPDATA', os.path.expanduser('~'))
+    else:
+        base = os.environ.get('XDG_CACHE_HOME',
+                              os.path.join(os.path.expanduser('~'), '.cache'))
+    return path(base).joinpath('dmf-control-board-firmware')
+
+
+class JsonCache(object):
+    '''
+    Dictionary of JSON-serializable values persisted to a file.
+
+    The file is re-read on each access, so several processes may share the
+    same cache.  Errors reading or writing the file are logged and otherwise
+    ignored (i.e., the cache behaves as if it were empty).
+
+    Parameters
+    ----------
+    name : str
+        Name of cache file (in :func:`cache_dir`), or absolute file path.
+    '''
+    def __init__(self, name):
+        self.filepath = cache_dir().joinpath(name)
+        self._lock = threading.Lock()
+
+    def _read(self):
+        if not self.filepath.isfile():
+            return {}
+        try:
+            with open(self.filepath, 'r') as input_:
+                return json.load(input_)
+        except (IOError, ValueError), exception:
+            logger.warning('Could not read cache `%s`: %s', self.filepath,
+                           exception)
+            return {}
+
+    def _write(self, data):
+        try:
+            if not self.filepath.parent.isdir():
+                self.filepath.parent.makedirs_p()
+            # Write to a temporary file and rename, so the cache file is
+            # never left partially written.
+            temp_path = self.filepath + '.%d.tmp' % os.getpid()
+            with open(temp_path, 'w') as output:
+                json.dump(data, output, indent=2, sort_keys=True)
+            if os.name == 'nt' and self.filepath.isfile():
+                # `os.rename` does not replace existing files on Windows.
+                self.filepath.remove()
+            os.rename(temp_path, self.filepath)
+        except (IOError, OSError), exception:
+            logger.warning('Could not write cache `%s`: %s', self.filepath,
+                           exception)
+
+    def get(self, key, default=None):
+        with self._lock:
+            return self._read().get(key, default)
+
+    def set(self, key, value):
+        with self._lock:
+            data = self._read()
+            data[key] = value
+            self._write(data)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            data = self._read()
+            value = data.pop(key, default)
+            self._write(data)
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._write({})
@@ -14,6 +14,8 @@ from functools32 import lru_cache
 import pandas as pd
 import sympy as sp
 
+from ..tracing import traced
+
 
 def limit_default(equation, symbol_names, default, **kwargs):
     return swap_default('limit_default', equation, symbol_names, default,
@@ -241,6 +243,7 @@ def get_transfer_function(hardware_major_version, solve_for=None, Zs=None):
     return solved
 
 
+@traced('transfer_function')
 def compute_from_transfer_function(hardware_major_version, solve_for,
                                    **kwargs):
     '''
@@ -0,0 +1,235 @@
+# coding: utf-8
+'''
+Recalibrate a fleet of control boards from archived calibration files.
+
+The impedance and reference calibration assistants (see
+:mod:`dmf_control_board_firmware.gui.impedance` and
+:mod:`dmf_control_board_firmware.gui.reference`) save the measurements taken
+during calibration, along with the fitted parameters, to an HDF file.  The
+fits of each archive (and of each resistor within an archive) are
+independent, so a fleet of boards can be refit concurrently: each archive is
+read and fit in a worker process of a
+:class:`concurrent.futures.ProcessPoolExecutor`, and the results of all
+archives are gathered into a single table per fit, tagged with the serial
+number of each board.
+
+Example usage:
+
+.. code-block:: python
+
+    results = refit_archives(path('calibrations').files('*.h5'))
+    print results.fb_calibration.groupby('serial_number').R_fb.describe()
+    print results.errors  # Archives that could not be refit.
+
+To refit the measurements of a single board using a process pool, pass the
+pool to :func:`impedance.fit_fb_calibration` or
+:func:`hv_attenuator.fit_feedback_params` directly:
+
+.. code-block:: python
+
+    with ProcessPoolExecutor() as executor:
+        calibration_df = fit_fb_calibration(df, calibration,
+                                            executor=executor)
+'''
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+import logging
+
+from microdrop_utility import Version
+import numpy as np
+import pandas as pd
+
+from .. import FeedbackCalibration
+from .hv_attenuator import fit_feedback_params
+from .impedance import fit_fb_calibration
+
+logger = logging.getLogger(__name__)
+
+# Groups of the impedance and reference calibration measurements in an
+# archive.
+IMPEDANCE_GROUP = '/feedback/impedance'
+REFERENCE_GROUP = '/feedback/reference'
+
+RefitResults = namedtuple('RefitResults', ['fb_calibration', 'fitted_params',
+                                           'errors'])
+
+
+def _serial_number(info):
+    try:
+        return int(info['serial_number'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def read_archive(filepath):
+    '''
+    Read the calibration measurements from an archived calibration file.
+
+    Parameters
+    ----------
+    filepath : str
+        Calibration file saved by the impedance or reference calibration
+        assistant.
+
+    Returns
+    -------
+    dict
+        Contents of the archive (only keys present in the archive are set):
+
+         - ``serial_number``: Serial number of the control board.
+         - ``impedance_info``, ``reference_info``: Control board information
+           saved with each calibration.
+         - ``impedance_readings``, ``calibration``: Feedback calibration
+           measurements and the calibration the measurements were taken with
+           (see :func:`impedance.fit_fb_calibration`).
+         - ``hv_readings``, ``hv_params``: High-voltage feedback measurements
+           and the previously fitted parameters (see
+           :func:`hv_attenuator.fit_feedback_params`).
+    '''
+    keys = {'impedance_info': IMPEDANCE_GROUP + '/control_board_info',
+            'impedance_readings': IMPEDANCE_GROUP + '/measurements',
+            'calibration': IMPEDANCE_GROUP + '/calibration',
+            'reference_info': REFERENCE_GROUP + '/control_board_info',
+            'hv_readings': REFERENCE_GROUP + '/measurements',
+            'hv_params': REFERENCE_GROUP + '/fitted_params'}
+    archive = {}
+    with pd.HDFStore(str(filepath), 'r') as store:
+        for name, key in keys.iteritems():
+            if key in store:
+                archive[name] = store[key]
+    if 'calibration' in archive:
+        archive['calibration'] = archive['calibration'][0]
+    for name in ('impedance_info', 'reference_info'):
+        if name in archive:
+            archive['serial_number'] = _serial_number(archive[name])
+    return archive
+
+
+def refit_archive(filepath, method='analytic'):
+    '''
+    Refit the calibration measurements from an archived calibration file.
+
+    Parameters
+    ----------
+    filepath : str
+        Calibration file (see :func:`read_archive`).
+    method : str, optional
+        Feedback calibration fit method (see
+        :func:`impedance.fit_fb_calibration`).
+
+    Returns
+    -------
+    tuple
+        Serial number of the control board, feedback calibration table (see
+        :func:`impedance.fit_fb_calibration`), and high-voltage fitted
+        parameters table (see :func:`hv_attenuator.fit_feedback_params`).
+        Tables are ``None`` if the archive does not include the
+        corresponding measurements.
+    '''
+    archive = read_archive(filepath)
+    calibration_df = None
+    fitted_params = None
+    if 'impedance_readings' in archive and 'calibration' in archive:
+        calibration_df = fit_fb_calibration(archive['impedance_readings'],
+                                            archive['calibration'],
+                                            method=method)
+    if 'hv_readings' in archive and 'hv_params' in archive:
+        # Start from the previously fitted values (i.e., the values stored on
+        # the control board at the time of the calibration).
+        hv_params = archive['hv_params']
+        if 'resistor index' in hv_params.columns:
+            hv_params = hv_params.set_index('resistor index')
+        indexes = hv_params.index.values.astype(int)
+        # Values are looked up by resistor index, which may not be
+        # contiguous (e.g., if a resistor had no valid readings).
+        R_hv = np.nan * np.ones(indexes.max() + 1)
+        C_hv = np.nan * np.ones(indexes.max() + 1)
+        R_hv[indexes] = hv_params['original R'].values
+        C_hv[indexes] = hv_params['original C'].values
+        hw_version = Version.fromstring(archive['reference_info']
+                                        ['hardware_version'])
+        calibration = FeedbackCalibration(R_hv=R_hv.tolist(),
+                                          C_hv=C_hv.tolist(),
+                                          hw_version=hw_version)
+        hv_readings = archive['hv_readings']
+        # Only refit resistors with previously fitted values to start from.
+        hv_readings = hv_readings[hv_readings['resistor index']
+                                  .isin(indexes)]
+        fitted_params = fit_feedback_params(calibration, hv_readings)
+    return archive.get('serial_number'), calibration_df, fitted_params
+
+
+def _tag(df, serial_number, filepath):
+    df.insert(0, 'serial_number', serial_number)
+    df.insert(1, 'filepath', filepath)
+    return df
+
+
+def refit_archives(filepaths, method='analytic', executor=None,
+                   max_workers=None):
+    '''
+    Refit the calibration measurements from several archived calibration
+    files concurrently.
+
+    Parameters
+    ----------
+    filepaths : list
+        Calibration files (see :func:`read_archive`).
+    method : str, optional
+        Feedback calibration fit method (see
+        :func:`impedance.fit_fb_calibration`).
+    executor : concurrent.futures.Executor, optional
+        Executor to refit the archives with.  If not specified, a
+        :class:`concurrent.futures.ProcessPoolExecutor` is used.
+    max_workers : int, optional
+        Number of worker processes (only used if ``executor`` is not
+        specified; default: number of processors).
+
+    Returns
+    -------
+    RefitResults
+        Named tuple with:
+
+         - ``fb_calibration``: Feedback calibration tables of all archives
+           (see :func:`impedance.fit_fb_calibration`).
+         - ``fitted_params``: High-voltage fitted parameters tables of all
+           archives (see :func:`hv_attenuator.fit_feedback_params`), with
+           ``resistor index`` as a column.
+         - ``errors``: Exception raised while refitting each archive that
+           failed, keyed by file path.
+
+        Each table row is tagged with the ``serial_number`` of the control
+        board and the ``filepath`` of the archive.
+    '''
+    filepaths = [str(filepath) for filepath in filepaths]
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            return refit_archives(filepaths, method=method,
+                                  executor=executor)
+
+    futures = OrderedDict((filepath, executor.submit(refit_archive, filepath,
+                                                     method))
+                          for filepath in filepaths)
+    fb_frames = []
+    hv_frames = []
+    errors = OrderedDict()
+    for filepath, future in futures.iteritems():
+        try:
+            serial_number, calibration_df, fitted_params = future.result()
+        except Exception, exception:
+            logger.warning('Error refitting calibration archive: %s',
+                           filepath, exc_info=True)
+            errors[filepath] = exception
+            continue
+        if calibration_df is not None:
+            fb_frames.append(_tag(calibration_df, serial_number, filepath))
+        if fitted_params is not None:
+            hv_frames.append(_tag(fitted_params.reset_index(), serial_number,
+                                  filepath))
+
+    def _concat(frames):
+        return (pd.concat(frames, ignore_index=True) if frames
+                else pd.DataFrame(None, columns=['serial_number',
+                                                 'filepath']))
+
+    return RefitResults(_concat(fb_frames), _concat(hv_frames), errors)
@@ -7,6 +7,8 @@ import numpy as np
 import pandas as pd
 import scipy.optimize as optimize
 
+from ..autorange import HV_ATTENUATOR_RESISTANCE
+from ..tracing import span, traced
 from .feedback import compute_from_transfer_function
 
 logger = logging.getLogger(__name__)
@@ -127,13 +129,41 @@ def resistor_max_actuation_readings(control_board, frequencies,
             .apply(max_actuation_reading).reset_index(drop=True))
 
 
-def fit_feedback_params(calibration, max_resistor_readings):
+def _hv_error(p, df, hardware_major_version, R1):
+    v1 = compute_from_transfer_function(hardware_major_version, 'V1',
+                                        V2=df['board measured V'], R1=R1,
+                                        R2=p[0], C2=p[1],
+                                        f=df['frequency'].values)
+    e = df['oscope measured V'] - v1
+    return e
+
+
+def fit_resistor_params(hardware_major_version, resistor_index, p0, df,
+                        R1=HV_ATTENUATOR_RESISTANCE):
     '''
-    Fit model of control board high-voltage feedback resistor and
-    parasitic capacitance values based on measured voltage readings.
+    Fit the resistor and parasitic capacitor values of a single high-voltage
+    feedback resistor.
+
+    Parameters
+    ----------
+    hardware_major_version : int
+        Major version of control board hardware.
+    resistor_index : int
+        Index of the feedback resistor.
+    p0 : list
+        Initial guess of the resistor and capacitor values.
+    df : pandas.DataFrame
+        Readings taken using the feedback resistor (see
+        :func:`resistor_max_actuation_readings`).
+    R1 : float, optional
+        Resistance of the reference resistor on the high-voltage attenuator
+        circuit.
+
+    Returns
+    -------
+    numpy.ndarray
+        Fitted resistor and capacitor values.
     '''
-    R1 = 10e6
-
     # Get transfer function to compute the amplitude of the high-voltage input
     # to the control board _(i.e., the output of the amplifier)_ based on the
     # attenuated voltage measured by the analog-to-digital converter on the
@@ -145,33 +175,47 @@ def fit_feedback_params(calibration, max_resistor_readings):
     #
     # See the `z_transfer_functions` function docstring for definitions of the
     # parameters based on the control board major version.
-    def fit_resistor_params(x):
-        resistor_index = x['resistor index'].values[0]
-        p0 = [calibration.R_hv[resistor_index],
-              calibration.C_hv[resistor_index]]
-
-        def error(p, df, R1):
-            v1 = compute_from_transfer_function(calibration.hw_version.major,
-                                                'V1',
-                                                V2=df['board measured V'],
-                                                R1=R1, R2=p[0], C2=p[1],
-                                                f=df['frequency'].values)
-            e = df['oscope measured V'] - v1
-            return e
-
-        p1, success = optimize.leastsq(error, p0, args=(x, R1))
-        # take the absolute value of the fitted values, since is possible
-        # for the fit to produce negative resistor and capacitor values
-        p1 = np.abs(p1)
-        return pd.DataFrame([p0 + p1.tolist()],
-                            columns=['original R', 'original C',
-                                     'fitted R', 'fitted C']).T
-
-    results = (max_resistor_readings
-               [max_resistor_readings['resistor index'] >= 0]
-               .groupby(['resistor index']).apply(fit_resistor_params))
-    data = results.unstack()
-    data.columns = data.columns.droplevel()
+    with span('leastsq', 'calibration', resistor_index=int(resistor_index),
+              n_samples=df.shape[0]):
+        p1, success = optimize.leastsq(_hv_error, p0,
+                                       args=(df, hardware_major_version, R1))
+    # take the absolute value of the fitted values, since is possible
+    # for the fit to produce negative resistor and capacitor values
+    return np.abs(p1)
+
+
+@traced('calibration')
+def fit_feedback_params(calibration, max_resistor_readings, executor=None):
+    '''
+    Fit model of control board high-voltage feedback resistor and
+    parasitic capacitance values based on measured voltage readings.
+
+    The fits of each feedback resistor are independent.  If an ``executor``
+    is specified (e.g., a :class:`concurrent.futures.ProcessPoolExecutor`),
+    all fits are submitted to the executor at once.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table indexed by ``resistor index``, with the columns ``original R``,
+        ``original C``, ``fitted R``, and ``fitted C``.
+    '''
+    readings = max_resistor_readings[max_resistor_readings['resistor index']
+                                     >= 0]
+    resistor_data = list(readings.groupby('resistor index'))
+    indexes = [resistor_index for resistor_index, x in resistor_data]
+    p0s = [[calibration.R_hv[resistor_index],
+            calibration.C_hv[resistor_index]] for resistor_index in indexes]
+    map_ = map if executor is None else executor.map
+    results = list(map_(fit_resistor_params,
+                        [calibration.hw_version.major] * len(indexes),
+                        indexes, p0s, [x for resistor_index, x in
+                                       resistor_data]))
+
+    data = pd.DataFrame([p0 + p1.tolist() for p0, p1 in zip(p0s, results)],
+                        index=pd.Index(indexes, name='resistor index'),
+                        columns=['original R', 'original C', 'fitted R',
+                                 'fitted C'])
     return data
 
 
@@ -193,7 +237,7 @@ def plot_feedback_params(hw_major_version, max_resistor_readings,
      - Previous model of attenuation.
      - Newly fitted model of attenuation, based on oscilloscope readings.
     '''
-    R1 = 10e6
+    R1 = HV_ATTENUATOR_RESISTANCE
 
     # Since the feedback circuit changed in version 2 of the control board, we
     # use the transfer function that corresponds to the current control board
@@ -8,6 +8,9 @@ import scipy.stats
 import scipy.optimize
 import pandas as pd
 
+from ..autorange import (HV_ATTENUATOR_RESISTANCE,
+                         predict_series_resistor_indexes)
+from ..tracing import span, traced
 from . import capacitive_load_func
 from .feedback import compute_from_transfer_function, get_transfer_function
 
@@ -113,10 +116,12 @@ def run_experiment(proxy, rms_voltage, test_loads=None, frequencies=None,
     proxy.auto_adjust_amplifier_gain = True
     proxy.set_waveform_voltage(0.25 * proxy.max_waveform_voltage)
     state = np.zeros(proxy.number_of_channels())
-    readings = proxy.measure_impedance(5.0, 60, 0, True, True, state)
+    # Let the amplifier gain settle (skipped if a converged gain is cached
+    # for the waveform settings).
+    proxy.settle_amplifier_gain(state, 5.0, 60)
 
     proxy.set_waveform_voltage(rms_voltage)
-    readings = proxy.measure_impedance(5.0, 60, 0, True, True, state)
+    proxy.settle_amplifier_gain(state, 5.0, 60)
 
     previous_frequency = None
     grouped = test_frame.groupby(['frequency', 'test_capacitor',
@@ -162,7 +167,278 @@ def run_experiment(proxy, rms_voltage, test_loads=None, frequencies=None,
     return test_frame.join(df)
 
 
-def fit_fb_calibration(df, calibration):
+def simulate_experiment(calibration, rms_voltage=100, test_loads=None,
+                        frequencies=None, n_sampling_windows=10, noise=0.005,
+                        seed=None):
+    '''
+    Generate synthetic feedback calibration measurements, in the format
+    returned by :func:`run_experiment`, e.g., to test or benchmark
+    :func:`fit_fb_calibration` without a control board.
+
+    The high-voltage and feedback series resistors of each measurement are
+    selected as the control board would (see
+    :func:`autorange.predict_series_resistor_indexes`), and the measured
+    voltages are computed from the transfer functions.
+
+    Parameters
+    ----------
+    calibration : FeedbackCalibration
+        "True" series resistor and capacitor values.
+    rms_voltage : float, optional
+        Actuation voltage.
+    test_loads : pandas.Series, optional
+        Test capacitor values (default: :data:`TEST_LOADS`).
+    frequencies : numpy.ndarray, optional
+        Frequencies to test (default: :data:`FREQUENCIES`).
+    n_sampling_windows : int, optional
+        Number of sampling windows per measurement.
+    noise : float, optional
+        Standard deviation of the relative noise added to each measured
+        voltage.
+    seed : int, optional
+        Random seed.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Test frame (see :func:`get_test_frame`) with the ``V_hv``, ``V_fb``,
+        ``hv_resistor``, and ``fb_resistor`` columns.
+    '''
+    if test_loads is None:
+        test_loads = TEST_LOADS
+    if frequencies is None:
+        frequencies = FREQUENCIES
+
+    df = get_test_frame(frequencies, test_loads, 1, n_sampling_windows,
+                        actuation_voltage=rms_voltage)
+    conditions = df[['frequency', 'test_capacitor']].drop_duplicates()
+    indexes = [predict_series_resistor_indexes(calibration, rms_voltage, f, C)
+               for f, C in conditions.values]
+    resistors = pd.DataFrame(indexes, columns=['hv_resistor', 'fb_resistor'],
+                             index=conditions.index)
+    df = df.merge(conditions.join(resistors), how='left',
+                  on=['frequency', 'test_capacitor'])
+
+    hw_major = calibration.hw_version.major
+    hv_resistor = df.hv_resistor.values
+    fb_resistor = df.fb_resistor.values
+    omega = 2 * np.pi * df.frequency.values
+    V1 = df.V_actuation.values.astype(float)
+    R_hv = calibration.R_hv[hv_resistor]
+    C_hv = calibration.C_hv[hv_resistor]
+    V_hv = V1 / fb_actuation_voltage(hw_major, 1., R_hv, C_hv,
+                                     df.frequency.values)
+    V_fb = -fb_residuals([calibration.R_fb[fb_resistor],
+                          calibration.C_fb[fb_resistor]], 0, V1,
+                         df.test_capacitor.values, omega, hw_major)
+
+    random = np.random.RandomState(seed)
+    df['V_hv'] = V_hv * (1 + noise * random.randn(df.shape[0]))
+    df['V_fb'] = V_fb * (1 + noise * random.randn(df.shape[0]))
+    return df
+
+
+def fb_actuation_voltage(hardware_major_version, V_hv, R_hv, C_hv,
+                         frequency, R1=HV_ATTENUATOR_RESISTANCE):
+    '''
+    Closed-form solution of the high-voltage transfer function for the
+    actuation voltage (i.e., ``V1``), equivalent to
+    ``compute_from_transfer_function(hardware_major_version, 'V1', V2=V_hv,
+    R1=R1, R2=R_hv, C2=C_hv, f=frequency)``.
+
+    The input impedance is the attenuator resistor ``R1`` and the series
+    impedance is ``Z2 = 1 / (1 / R2 + j * omega * C2)``, so::
+
+        V1 = V2 * |R1 / Z2|        (hardware version 2)
+        V1 = V2 * |1 + R1 / Z2|    (hardware version 1)
+    '''
+    omega = 2 * np.pi * np.asarray(frequency)
+    R1_Y2 = R1 * (1. / np.asarray(R_hv) + 1j * omega * np.asarray(C_hv))
+    if hardware_major_version == 1:
+        return np.asarray(V_hv) * np.abs(1 + R1_Y2)
+    return np.asarray(V_hv) * np.abs(R1_Y2)
+
+
+def fb_fit_data(df, calibration):
+    '''
+    Arrays needed to evaluate :func:`fb_residuals` (and :func:`fb_jacobian`)
+    for a set of feedback calibration measurements.
+
+    The actuation voltage does not depend on the fitted parameters, so it is
+    computed once here rather than on each evaluation of the residuals.
+
+    Parameters
+    ----------
+    df : pandas.DataFrame
+        Feedback calibration measurements (see :func:`run_experiment`).
+    calibration : FeedbackCalibration
+        Calibration of the high-voltage series resistors.
+
+    Returns
+    -------
+    tuple
+        ``(V_fb, V1, C1, omega, hardware_major_version)``, where ``V1`` is
+        the actuation voltage and ``C1`` the test capacitance of each
+        measurement.
+    '''
+    hw_major = calibration.hw_version.major
+    hv_resistor = df.hv_resistor.values.astype(int)
+    omega = 2 * np.pi * df.frequency.values
+    V1 = fb_actuation_voltage(hw_major, df.V_hv.values,
+                              calibration.R_hv[hv_resistor],
+                              calibration.C_hv[hv_resistor],
+                              df.frequency.values)
+    return (df.V_fb.values, V1, df.test_capacitor.values, omega, hw_major)
+
+
+def _fb_terms(p, C1, omega, hardware_major_version):
+    R_fb = p[0]
+    # If the parameter vector only contains one variable, the capacitance is
+    # zero.
+    C_fb = p[1] if len(p) == 2 else 0
+    # Capacitance in parallel with the feedback resistor in the denominator
+    # of the transfer function (on hardware version 1, the test capacitor is
+    # in series with the feedback impedance, so it adds to `C_fb`).
+    C_x = C_fb + C1 if hardware_major_version == 1 else C_fb
+    D = 1. / R_fb ** 2 + (omega * C_x) ** 2
+    return R_fb, C_x, D
+
+
+def fb_residuals(p, V_fb, V1, C1, omega, hardware_major_version):
+    '''
+    Residuals between the measured feedback voltages and the voltages
+    predicted by the impedance transfer function for the feedback resistor
+    (and capacitor) values in ``p``.
+
+    Solving the transfer function for ``V2`` (with the test capacitor
+    ``C1`` as the input impedance) gives::
+
+        V2 = V1 * omega * C1 / sqrt(1 / R_fb ** 2 + (omega * C_x) ** 2)
+
+    where ``C_x = C_fb`` on hardware version 2 and ``C_x = C_fb + C1`` on
+    hardware version 1.
+
+    Parameters
+    ----------
+    p : list
+        ``[R_fb]`` (no parasitic capacitance) or ``[R_fb, C_fb]``.
+    V_fb, V1, C1, omega, hardware_major_version
+        See :func:`fb_fit_data`.
+
+    Returns
+    -------
+    numpy.ndarray
+        Measured minus predicted feedback voltage of each measurement.
+    '''
+    R_fb, C_x, D = _fb_terms(p, C1, omega, hardware_major_version)
+    return V_fb - V1 * omega * C1 / np.sqrt(D)
+
+
+def fb_jacobian(p, V_fb, V1, C1, omega, hardware_major_version):
+    '''
+    Returns
+    -------
+    numpy.ndarray
+        Jacobian of :func:`fb_residuals` with respect to ``p`` (one row per
+        measurement and one column per parameter), for use as the ``Dfun``
+        argument of :func:`scipy.optimize.leastsq`.
+    '''
+    R_fb, C_x, D = _fb_terms(p, C1, omega, hardware_major_version)
+    A_D3 = V1 * omega * C1 * D ** -1.5
+    columns = [-A_D3 / R_fb ** 3]
+    if len(p) == 2:
+        columns.append(A_D3 * omega ** 2 * C_x)
+    return np.column_stack(columns)
+
+
+def fit_fb_model(p0, df, calibration):
+    '''
+    Nonlinear least-squares fit of the feedback resistor (and capacitor)
+    values to a set of feedback calibration measurements, using the
+    closed-form residuals and Jacobian.
+
+    Parameters
+    ----------
+    p0 : list
+        Initial guess, ``[R_fb]`` or ``[R_fb, C_fb]``.
+    df : pandas.DataFrame
+        Measurements for a single feedback resistor.
+    calibration : FeedbackCalibration
+        Calibration of the high-voltage series resistors.
+
+    Returns
+    -------
+    tuple
+        ``(p1, E, cov_x)``: fitted parameters, residuals, and covariance
+        estimate (see :func:`scipy.optimize.leastsq`).
+    '''
+    args = fb_fit_data(df, calibration)
+    with span('leastsq', 'calibration', n_parameters=len(p0),
+              n_samples=df.shape[0]):
+        p1, cov_x, infodict, mesg, ier = scipy.optimize.leastsq(
+            fb_residuals, p0, args=args, Dfun=fb_jacobian, full_output=True)
+    p1 = np.abs(p1)
+    E = fb_residuals(p1, *args)
+    return p1, E, cov_x
+
+
+def _fb_residuals_symbolic(p0, df, calibration):
+    # Impedance of the reference resistor on the HV attenuator circuit.
+    Z = HV_ATTENUATOR_RESISTANCE
+    R_fb = p0[0]
+
+    # If the parameter vector only contains one variable, the capacitance
+    # is zero
+    if len(p0) == 2:
+        C_fb = p0[1]
+    else:
+        C_fb = 0
+
+    R_hv = calibration.R_hv[df.hv_resistor.values]
+    C_hv = calibration.C_hv[df.hv_resistor.values]
+
+    # Solve feedback transfer function for the actuation voltage, _(i.e.,
+    # `V1`)_, based on the high-voltage measurements.
+    # Note that the transfer function definition depends on the hardware
+    # version.
+    V_actuation = compute_from_transfer_function(calibration.hw_version
+                                                 .major, 'V1', V2=df.V_hv,
+                                                 R1=Z, R2=R_hv, C2=C_hv,
+                                                 f=df.frequency)
+
+    # Solve feedback transfer function for the expected impedance feedback
+    # voltage, _(i.e., `V2`)_, based on the actuation voltage, the proposed
+    # values for `R2` and `C2`, and the reported `C1` value from the
+    # feedback measurements.
+    # Note that the transfer function definition depends on the hardware
+    # version.
+    # __NB__ If we do not specify a value for `R1`, a symbolic value of
+    # infinity is used.  However, in this case, we have `R1` in both the
+    # numerator and denominator.  The result is a value of zero returned
+    # regardless of the values of the other arguments.  We avoid this issue
+    # by specifying a *very large* value for `R1`.
+    V_impedance = compute_from_transfer_function(calibration.hw_version
+                                                 .major, 'V2',
+                                                 V1=V_actuation,
+                                                 C1=df.test_capacitor,
+                                                 R2=R_fb, C2=C_fb,
+                                                 f=df.frequency)
+    return df.V_fb - V_impedance
+
+
+def _fit_fb_model_symbolic(p0, df, calibration):
+    with span('leastsq', 'calibration', n_parameters=len(p0),
+              n_samples=df.shape[0]):
+        p1, cov_x, infodict, mesg, ier = scipy.optimize.leastsq(
+            _fb_residuals_symbolic, p0, args=(df, calibration),
+            full_output=True)
+    p1 = np.abs(p1)
+    E = _fb_residuals_symbolic(p1, df, calibration)
+    return p1, E, cov_x
+
+
+@traced('calibration')
+def fit_fb_calibration(df, calibration, method='analytic', executor=None):
     '''
     Fit feedback calibration data to solve for values of `C_fb[:]` and
     `R_fb[:]`.
@@ -179,6 +455,19 @@ def fit_fb_calibration(df, calibration):
        is used).
      - C-CI %: Confidence interval for feedback capacitance value.
 
+    By default (``method='analytic'``), the residuals and their Jacobian are
+    evaluated in closed form (see :func:`fb_residuals` and
+    :func:`fb_jacobian`).  With ``method='symbolic'``, the residuals are
+    evaluated from the symbolic transfer functions on each iteration, and
+    the Jacobian is estimated by finite differences (i.e., the original,
+    much slower, implementation; kept as a reference).
+
+    The fits of each feedback resistor and model are independent.  If an
+    ``executor`` is specified (e.g., a
+    :class:`concurrent.futures.ProcessPoolExecutor`), all fits are submitted
+    to the executor at once, and the results are gathered into the same
+    table.
+
     __N.B.__ This function does not actually _update_ the calibration, it only
     performs the fit.
     See `apply_calibration`.
@@ -187,83 +476,45 @@ def fit_fb_calibration(df, calibration):
     R_fb = pd.Series([2e2, 2e3, 2e4, 2e5, 2e6])
     C_fb = pd.Series(len(calibration.C_fb) * [50e-12])
 
-    # Error function.
-    def error(p0, df, calibration):
-        # Impedance of the reference resistor on the HV attenuator circuit.
-        Z = 10e6
-        R_fb = p0[0]
-
-        # If the parameter vector only contains one variable, the capacitance
-        # is zero
-        if len(p0) == 2:
-            C_fb = p0[1]
-        else:
-            C_fb = 0
-
-        R_hv = calibration.R_hv[df.hv_resistor.values]
-        C_hv = calibration.C_hv[df.hv_resistor.values]
-
-        # Solve feedback transfer function for the actuation voltage, _(i.e.,
-        # `V1`)_, based on the high-voltage measurements.
-        # Note that the transfer function definition depends on the hardware
-        # version.
-        V_actuation = compute_from_transfer_function(calibration.hw_version
-                                                     .major, 'V1', V2=df.V_hv,
-                                                     R1=Z, R2=R_hv, C2=C_hv,
-                                                     f=df.frequency)
-
-        # Solve feedback transfer function for the expected impedance feedback
-        # voltage, _(i.e., `V2`)_, based on the actuation voltage, the proposed
-        # values for `R2` and `C2`, and the reported `C1` value from the
-        # feedback measurements.
-        # Note that the transfer function definition depends on the hardware
-        # version.
-        # __NB__ If we do not specify a value for `R1`, a symbolic value of
-        # infinity is used.  However, in this case, we have `R1` in both the
-        # numerator and denominator.  The result is a value of zero returned
-        # regardless of the values of the other arguments.  We avoid this issue
-        # by specifying a *very large* value for `R1`.
-        # TODO Update comment if this works...
-        V_impedance = compute_from_transfer_function(calibration.hw_version
-                                                     .major, 'V2',
-                                                     V1=V_actuation,
-                                                     C1=df.test_capacitor,
-                                                     R2=R_fb, C2=C_fb,
-                                                     f=df.frequency)
-        return df.V_fb - V_impedance
-
-    # Perform a nonlinear least-squares fit of the data.
-    def fit_model(p0, df, calibration):
-        p1, cov_x, infodict, mesg, ier = scipy.optimize.leastsq(
-            error, p0, args=(df, calibration), full_output=True)
-        p1 = np.abs(p1)
-        E = error(p1, df, calibration)
-        return p1, E, cov_x
+    if method == 'analytic':
+        fit_model = fit_fb_model
+    elif method == 'symbolic':
+        fit_model = _fit_fb_model_symbolic
+    else:
+        raise ValueError('Unknown fit method: %r' % method)
+
+    # Only include data points for each feedback resistor (and where
+    # `hv_resistor` is a valid index).
+    resistor_data = [(i, df.loc[(df.fb_resistor == i)].dropna())
+                     for i in range(len(calibration.R_fb))]
+    resistor_data = [(i, df_i) for i, df_i in resistor_data
+                     if df_i.shape[0] >= 2]
+
+    # Fit the data for each feedback resistor assuming no parasitic
+    # capacitance (model 1) and including parasitic capacitance (model 2).
+    p0s = [p0 for i, df_i in resistor_data
+           for p0 in ([R_fb[i]], [R_fb[i], C_fb[i]])]
+    dfs = [df_i for i, df_i in resistor_data for model in (1, 2)]
+    map_ = map if executor is None else executor.map
+    results = list(map_(fit_model, p0s, dfs, [calibration] * len(p0s)))
+    fits = dict(zip([i for i, df_i in resistor_data],
+                    zip(results[::2], results[1::2])))
 
     CI = []
 
     feedback_records = []
-    # Fit feedback parameters for each feedback resistor.
     for i in range(len(calibration.R_fb)):
-        # Only include data points for the given feedback resistor (and where
-        # `hv_resistor` is a valid index).
-        df_i = df.loc[(df.fb_resistor == i)].dropna()
-
-        if df_i.shape[0] < 2:
+        if i not in fits:
             CI.append([0, 0])
             continue
+        (p1_1, E_1, cov_x_1), (p1_2, E_2, cov_x_2) = fits[i]
+        n_samples = len(E_1)
 
-        # Fit the data assuming no parasitic capacitance (model 1).
-        p0_1 = [R_fb[i]]
-        p1_1, E_1, cov_x_1 = fit_model(p0_1, df_i, calibration)
-        df_1 = (len(E_1) - len(p0_1))
+        df_1 = (len(E_1) - len(p1_1))
         chi2_1 = np.sum(E_1 ** 2)
         chi2r_1 = chi2_1 / (df_1 - 1)
 
-        # fit the data including parasitic capacitance (model 2)
-        p0_2 = [R_fb[i], C_fb[i]]
-        p1_2, E_2, cov_x_2 = fit_model(p0_2, df_i, calibration)
-        df_2 = (len(E_2) - len(p0_2))
+        df_2 = (len(E_2) - len(p1_2))
         chi2_2 = np.sum(E_2 ** 2)
         chi2r_2 = chi2_2 / (df_2 - 1)
 
@@ -288,7 +539,7 @@ def fit_fb_calibration(df, calibration):
                 cov_x_1 = [0]
             CI.append((100 * np.sqrt(chi2r_1 * np.diag(cov_x_1)) /
                        p1_1).tolist() + [0])
-        feedback_records.append([int(i), model, df_i.shape[0], R_fb_i, CI[i][0],
+        feedback_records.append([int(i), model, n_samples, R_fb_i, CI[i][0],
                                  C_fb_i, CI[i][1], F, (1e3 * np.sqrt(chi2r)),
                                  p_value])
 
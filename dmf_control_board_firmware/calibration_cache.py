@@ -0,0 +1,165 @@
+'''
+On-disk history of the feedback calibration of each control board.
+
+Reading the series resistor and capacitor values of a control board takes
+several round trips per resistor (select the resistor, read the value, and
+restore the original resistor).  Instead, each time a control board is
+connected, the checksum of its configuration settings (which include the
+series resistor and capacitor values, see
+:attr:`DMFControlBoard.config_checksum`) is read in a single round trip, and
+compared against the checksum of the most recent calibration cached for the
+serial number of the board.  The calibration values are only read from the
+board if the checksums differ (or if the firmware does not support the
+checksum command).
+
+Each distinct calibration is recorded with a timestamp (see
+:mod:`dmf_control_board_firmware.cache`), so the calibration of a board at the
+time of an experiment can be recovered offline, e.g.:
+
+.. code-block:: python
+
+    cache = CalibrationCache()
+    print cache.history(serial_number)
+    calibration = cache.calibration(serial_number, timestamp='2016-03-01')
+'''
+from datetime import datetime
+import logging
+
+import pandas as pd
+
+from .cache import JsonCache
+
+logger = logging.getLogger(__name__)
+
+# Name of the calibration cache file.
+CALIBRATION_CACHE = 'calibration.json'
+
+# Calibration values stored for each entry.
+CALIBRATION_KEYS = ['R_hv', 'C_hv', 'R_fb', 'C_fb']
+
+
+class CalibrationCache(object):
+    '''
+    History of the calibration of each control board, keyed by serial
+    number.
+
+    Each entry is a dictionary with the ``timestamp`` (UTC, ISO 8601),
+    configuration ``checksum``, ``hardware_version``, and calibration values
+    (see :data:`CALIBRATION_KEYS`) of a calibration.
+
+    Parameters
+    ----------
+    cache : JsonCache, optional
+        Calibration cache (default: :data:`CALIBRATION_CACHE`).
+    '''
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else \
+            JsonCache(CALIBRATION_CACHE)
+
+    def entries(self, serial_number):
+        '''
+        Returns
+        -------
+        list
+            Entries recorded for the control board, oldest first.
+        '''
+        return self.cache.get(str(serial_number), [])
+
+    def lookup(self, serial_number, checksum):
+        '''
+        Returns
+        -------
+        dict
+            Most recent entry for the control board, or ``None`` if there is
+            no entry or its checksum does not match.
+        '''
+        entries = self.entries(serial_number)
+        if entries and entries[-1]['checksum'] == checksum:
+            return entries[-1]
+        return None
+
+    def record(self, serial_number, checksum, hardware_version, values,
+               timestamp=None):
+        '''
+        Record the current calibration of a control board.
+
+        The entry is not added if the most recent entry has the same checksum
+        and values.
+
+        Parameters
+        ----------
+        serial_number : int
+            Serial number of the control board.
+        checksum : int
+            Configuration checksum (see
+            :attr:`DMFControlBoard.config_checksum`).
+        hardware_version : str
+            Hardware version of the control board.
+        values : dict
+            Calibration values, keyed by :data:`CALIBRATION_KEYS`.
+        timestamp : datetime.datetime, optional
+            Time of calibration (default: now).
+
+        Returns
+        -------
+        dict
+            Most recent entry for the control board.
+        '''
+        entries = self.entries(serial_number)
+        entry = dict((k, [float(v) for v in values[k]])
+                     for k in CALIBRATION_KEYS)
+        entry.update(checksum=checksum,
+                     hardware_version=str(hardware_version))
+        if entries and all(entries[-1].get(k) == v
+                           for k, v in entry.iteritems()):
+            return entries[-1]
+        entry['timestamp'] = (timestamp or datetime.utcnow()).isoformat()
+        entries.append(entry)
+        self.cache.set(str(serial_number), entries)
+        return entry
+
+    def history(self, serial_number):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table of recorded calibrations of the control board, indexed by
+            timestamp.
+        '''
+        entries = self.entries(serial_number)
+        columns = ['checksum', 'hardware_version'] + CALIBRATION_KEYS
+        df_history = pd.DataFrame(entries, columns=['timestamp'] + columns)
+        df_history['timestamp'] = pd.to_datetime(df_history['timestamp'])
+        return df_history.set_index('timestamp')
+
+    def calibration(self, serial_number, timestamp=None):
+        '''
+        Parameters
+        ----------
+        serial_number : int
+            Serial number of the control board.
+        timestamp : datetime.datetime or str, optional
+            Time of interest (UTC).  If not specified, the most recent
+            calibration is returned.
+
+        Returns
+        -------
+        FeedbackCalibration
+            Calibration of the control board in effect at the specified time,
+            or ``None`` if there is no such calibration.
+        '''
+        # Imported here to avoid a circular import.
+        from . import FeedbackCalibration
+        from microdrop_utility import Version
+
+        entries = self.entries(serial_number)
+        if timestamp is not None:
+            timestamp = pd.Timestamp(timestamp)
+            entries = [e for e in entries
+                       if pd.Timestamp(e['timestamp']) <= timestamp]
+        if not entries:
+            return None
+        entry = entries[-1]
+        return FeedbackCalibration(*[entry[k] for k in CALIBRATION_KEYS],
+                                   hw_version=Version.fromstring
+                                   (entry['hardware_version']))
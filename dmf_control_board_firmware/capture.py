@@ -0,0 +1,219 @@
+'''
+Capture and replay of the packets exchanged with a control board.
+
+While capturing (see :meth:`DMFControlBoard.capture`), the host transport
+logs every packet sent to or received from the control board, with a
+timestamp, to a compact binary capture file.  A :class:`ReplayControlBoard`
+then serves the captured replies on a pseudo-terminal, either as fast as
+possible or at the original timing, so the connect sequence and measurements
+(e.g., ``measure_impedance`` and ``sweep_channels``) can be re-run
+deterministically without the rig attached (e.g., to profile the decode and
+analysis path in CI benchmarks).
+
+Example usage:
+
+.. code-block:: python
+
+    proxy = DMFControlBoard()
+    with proxy.capture('session.dmfcap'):
+        proxy.connect()
+        proxy.sweep_channels(...)
+    proxy.disconnect()
+
+    # Later, without the control board attached (the calibration cache is
+    # bypassed while capturing, so it must be disabled for the replay)...
+    with ReplayControlBoard('session.dmfcap') as board:
+        proxy = DMFControlBoard(calibration_cache=None)
+        proxy.connect(board.port)
+        proxy.sweep_channels(...)
+
+Capture file format
+-------------------
+
+A capture file starts with the 6-byte magic string ``DMFCAP``, followed by
+the file format version (``uint16``).  Each packet is then logged as::
+
+    [uint32 microseconds since previous packet][uint8 direction]
+    [uint8 command][uint16 payload length][payload]
+
+with all values in little-endian byte order.  The direction is either
+:data:`HOST_TO_DEVICE` or :data:`DEVICE_TO_HOST`, and the payload of each
+reply includes the trailing return code.
+'''
+import logging
+import struct
+import time
+
+import numpy as np
+import pandas as pd
+from path_helpers import path
+
+from .dmf_control_board_base import DMFControlBoard as Base
+from .simulator import PseudoTerminalDevice, encode_packet
+
+logger = logging.getLogger(__name__)
+
+CAPTURE_MAGIC = 'DMFCAP'
+CAPTURE_VERSION = 1
+HEADER_FORMAT = '<6sH'
+RECORD_FORMAT = '<IBBH'
+
+# Packet directions (see `RemoteObject.h`).
+HOST_TO_DEVICE = 0
+DEVICE_TO_HOST = 1
+
+CAPTURE_COLUMNS = ['time_s', 'direction', 'command', 'payload']
+
+
+def read_capture(filepath):
+    '''
+    Parameters
+    ----------
+    filepath : str
+        Capture file path.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table with one row per packet and the columns ``time_s`` (time since
+        the start of the capture), ``direction``, ``command``, and
+        ``payload``.
+
+    Raises
+    ------
+    IOError
+        If the file is not a capture file or is truncated.
+    '''
+    with open(filepath, 'rb') as input_:
+        data = input_.read()
+    header_length = struct.calcsize(HEADER_FORMAT)
+    magic, version = struct.unpack(HEADER_FORMAT, data[:header_length])
+    if magic != CAPTURE_MAGIC:
+        raise IOError('`%s` is not a capture file.' % filepath)
+    elif version > CAPTURE_VERSION:
+        raise IOError('Unsupported capture file version: %d' % version)
+
+    record_length = struct.calcsize(RECORD_FORMAT)
+    rows = []
+    i = header_length
+    time_us = 0
+    while i < len(data):
+        if i + record_length > len(data):
+            raise IOError('Capture file `%s` is truncated.' % filepath)
+        dt_us, direction, command, length = \
+            struct.unpack(RECORD_FORMAT, data[i:i + record_length])
+        i += record_length
+        if i + length > len(data):
+            raise IOError('Capture file `%s` is truncated.' % filepath)
+        time_us += dt_us
+        rows.append([1e-6 * time_us, direction, command, data[i:i + length]])
+        i += length
+    return pd.DataFrame(rows, columns=CAPTURE_COLUMNS)
+
+
+def write_capture(filepath, df_packets):
+    '''
+    Write packets to a capture file (e.g., to trim a capture read using
+    :func:`read_capture`).
+
+    Parameters
+    ----------
+    filepath : str
+        Output file path.
+    df_packets : pandas.DataFrame
+        Table in the format returned by :func:`read_capture`.
+    '''
+    times_us = np.round(1e6 * df_packets.time_s.values).astype(np.int64)
+    dts_us = np.diff(np.concatenate([[0], times_us])).clip(0, 0xFFFFFFFF)
+    with open(filepath, 'wb') as output:
+        output.write(struct.pack(HEADER_FORMAT, CAPTURE_MAGIC,
+                                 CAPTURE_VERSION))
+        for dt_us, (i, packet) in zip(dts_us, df_packets.iterrows()):
+            output.write(struct.pack(RECORD_FORMAT, dt_us, packet.direction,
+                                     packet.command, len(packet.payload)))
+            output.write(packet.payload)
+
+
+class ReplayControlBoard(PseudoTerminalDevice):
+    '''
+    Serve the replies from a capture file on a pseudo-terminal.
+
+    Each packet received from the host is matched against the next captured
+    host packet, and the captured device packets that followed it are sent in
+    reply.  The capture is rewound each time the host opens the port, so the
+    capture of a session is replayed from the connect sequence onwards.
+
+    If a received packet does not match the command of the next captured
+    host packet, the replay has diverged from the capture: the packet is
+    counted in :attr:`mismatches` and is replied to with
+    ``RETURN_GENERAL_ERROR``.
+
+    Parameters
+    ----------
+    capture : str or pandas.DataFrame
+        Capture file path, or packets in the format returned by
+        :func:`read_capture`.
+    realtime : bool, optional
+        If ``True``, send each reply at its original time relative to the
+        host packet it followed.  Otherwise, send replies as fast as
+        possible.
+    baud_rate : int, optional
+        See :class:`PseudoTerminalDevice`.
+    '''
+    def __init__(self, capture, realtime=False, baud_rate=None):
+        super(ReplayControlBoard, self).__init__(baud_rate=baud_rate)
+        if isinstance(capture, pd.DataFrame):
+            self.df_packets = capture
+        else:
+            self.df_packets = read_capture(path(capture))
+        self.realtime = realtime
+        self._packets = [tuple(packet) for packet in
+                         self.df_packets[CAPTURE_COLUMNS].values]
+        self.mismatches = 0
+        self.rewind()
+
+    def rewind(self):
+        '''
+        Restart the replay from the first captured packet.
+        '''
+        self._position = 0
+
+    @property
+    def remaining(self):
+        '''
+        Number of captured packets that have not been replayed.
+        '''
+        return len(self._packets) - self._position
+
+    def on_open(self):
+        self.rewind()
+        super(ReplayControlBoard, self).on_open()
+
+    def handle_packet(self, command, payload):
+        received_time = time.time()
+        # Find the next captured host packet.
+        while (self._position < len(self._packets) and
+               self._packets[self._position][1] != HOST_TO_DEVICE):
+            self._position += 1
+        if (self._position == len(self._packets) or
+                self._packets[self._position][2] != command):
+            self.mismatches += 1
+            logger.warning('Replay diverged from capture: received command '
+                           '0x%02X at packet %d.', command, self._position)
+            self._write(encode_packet(command ^ 0x80,
+                                      chr(Base.RETURN_GENERAL_ERROR)))
+            return
+        captured_time = self._packets[self._position][0]
+        self._position += 1
+        # Send the captured device packets that followed the host packet.
+        while (self._position < len(self._packets) and
+               self._packets[self._position][1] == DEVICE_TO_HOST):
+            time_s, direction, command_i, payload_i = \
+                self._packets[self._position]
+            if self.realtime:
+                delay = ((time_s - captured_time) -
+                         (time.time() - received_time))
+                if delay > 0:
+                    time.sleep(delay)
+            self._write(encode_packet(command_i, payload_i))
+            self._position += 1
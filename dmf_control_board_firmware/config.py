@@ -0,0 +1,170 @@
+'''
+Transactional writes to the configuration settings stored in the persistent
+memory (e.g., EEPROM) of a control board.
+
+Without a transaction, each configuration setter writes its bytes to
+persistent memory with one command per byte, and then asks the control board
+to reload its configuration settings (i.e., ``load_config``).  Within a
+transaction (see :meth:`DMFControlBoard.config_transaction`):
+
+ - Persistent memory is read in bulk (in batches of commands, see
+   :mod:`dmf_control_board_firmware.batch`) into a snapshot, from which all
+   persistent reads are served.
+ - Persistent writes are staged, and only the bytes that differ from the
+   snapshot are written, in bulk, when the transaction is committed.
+ - The configuration settings are reloaded exactly once, after the writes.
+
+Example usage:
+
+.. code-block:: python
+
+    with proxy.config_transaction():
+        proxy.default_pin_modes = pin_modes
+        proxy.default_pin_states = pin_states
+        proxy.voltage_tolerance = 5.
+'''
+import logging
+
+from .batch import BATCH_HEADER_LENGTH, MAX_PAYLOAD_LENGTH, CommandBatch
+
+logger = logging.getLogger(__name__)
+
+# Persistent memory is read into the snapshot in aligned blocks of this many
+# bytes (i.e., neighbouring settings are read in the same batch).
+SNAPSHOT_BLOCK_SIZE = 32
+
+# Maximum number of single-byte persistent read/write commands per batch
+# (commands and replies share the packet; each command has a payload of at
+# most 3 bytes and each reply has a payload of at most 1 byte).
+MAX_COMMANDS_PER_BATCH = (MAX_PAYLOAD_LENGTH //
+                          (2 * BATCH_HEADER_LENGTH + 3 + 1))
+
+
+class ConfigTransaction(object):
+    '''
+    Staged writes to the persistent memory of a control board.
+
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    '''
+    def __init__(self, proxy):
+        self.proxy = proxy
+        # Snapshot of persistent memory, keyed by address.
+        self.snapshot = {}
+        # Staged writes, keyed by address.
+        self.pending = {}
+        # `True` if `load_config` was called within the transaction (i.e.,
+        # the configuration settings must be reloaded on commit even if no
+        # bytes changed).
+        self.refresh_config = False
+
+    def _execute(self, append, items):
+        '''
+        Execute commands in as few batches as possible.
+
+        Parameters
+        ----------
+        append : function
+            Called as ``append(batch, item)`` to queue the command for each
+            item.
+        items : list
+            Items to queue commands for.
+
+        Returns
+        -------
+        list
+            Decoded reply value of each command.
+        '''
+        values = []
+        for i in xrange(0, len(items), MAX_COMMANDS_PER_BATCH):
+            batch = CommandBatch(self.proxy.number_of_channels())
+            for item in items[i:i + MAX_COMMANDS_PER_BATCH]:
+                append(batch, item)
+            self.proxy.execute_batch(batch)
+            values.extend(batch.values)
+        return values
+
+    def prefetch(self, addresses):
+        '''
+        Read the blocks of persistent memory containing the specified
+        addresses into the snapshot (skipping addresses that are already in
+        the snapshot).
+        '''
+        blocks = set(address // SNAPSHOT_BLOCK_SIZE for address in addresses
+                     if address not in self.snapshot)
+        to_read = sorted(address for block in blocks
+                         for address in xrange(block * SNAPSHOT_BLOCK_SIZE,
+                                               (block + 1) *
+                                               SNAPSHOT_BLOCK_SIZE)
+                         if address not in self.snapshot)
+        if not to_read:
+            return
+        values = self._execute(lambda batch, address:
+                               batch.persistent_read(address), to_read)
+        self.snapshot.update(zip(to_read, values))
+
+    def read(self, address):
+        '''
+        Returns
+        -------
+        int
+            Value of the byte at the specified address, including staged
+            writes.
+        '''
+        if address in self.pending:
+            return self.pending[address]
+        self.prefetch([address])
+        return self.snapshot[address]
+
+    def write(self, address, byte):
+        '''
+        Stage a write of a byte to persistent memory.
+        '''
+        self.pending[address] = int(byte) & 0xFF
+
+    def invalidate(self):
+        '''
+        Discard the snapshot (e.g., after the control board wrote to its
+        persistent memory).  Staged writes are kept.
+        '''
+        self.snapshot.clear()
+
+    @property
+    def changes(self):
+        '''
+        Staged writes that differ from the snapshot, keyed by address.
+        '''
+        self.prefetch(self.pending.keys())
+        return dict((address, byte) for address, byte in
+                    self.pending.iteritems()
+                    if self.snapshot[address] != byte)
+
+    def commit(self):
+        '''
+        Write the changed bytes to persistent memory and reload the
+        configuration settings (once) if anything was written.
+
+        Returns
+        -------
+        dict
+            Bytes written, keyed by address.
+        '''
+        changes = self.changes
+        if changes:
+            self._execute(lambda batch, (address, byte):
+                          batch.persistent_write(address, byte),
+                          sorted(changes.iteritems()))
+            self.snapshot.update(changes)
+        logger.debug('Committed %d changed byte(s) of %d staged write(s).',
+                     len(changes), len(self.pending))
+        self.pending.clear()
+        return changes
+
+    def rollback(self):
+        '''
+        Discard staged writes.
+        '''
+        self.pending.clear()
+        self.refresh_config = False
@@ -0,0 +1,196 @@
+'''
+On-disk cache of the converged amplifier gain of each control board, per
+waveform frequency and voltage.
+
+When the amplifier gain is adjusted automatically (see
+:attr:`DMFControlBoard.auto_adjust_amplifier_gain`), the control board
+updates its estimate of the gain after each impedance measurement, so the
+first measurements after changing the waveform frequency or voltage are
+typically thrown away while the gain settles (e.g., in
+:func:`calibrate.impedance.run_experiment`).
+
+Instead, the gain reported at the end of each measurement is recorded once
+it has converged (i.e., it changed by at most :data:`GAIN_TOLERANCE` during
+the measurement), keyed by the serial number of the control board and the
+waveform frequency and voltage.  When the frequency or voltage is changed,
+the cached gain for the nearest recorded frequency and voltage (if any) is
+sent to the control board along with the new setting, and warm-up
+measurements are skipped (see :meth:`DMFControlBoard.settle_amplifier_gain`).
+
+The number of times a cached gain was used, and how often it needed
+correcting, are available from :meth:`AmplifierGainCache.summary`.
+'''
+from collections import Counter
+import logging
+
+import pandas as pd
+
+from .cache import JsonCache
+
+logger = logging.getLogger(__name__)
+
+# Name of the amplifier gain cache file.
+AMPLIFIER_GAIN_CACHE = 'amplifier_gain.json'
+
+# Maximum relative difference between the frequency (or voltage) of a cached
+# gain and the requested frequency (or voltage).
+FREQUENCY_TOLERANCE = 0.05
+VOLTAGE_TOLERANCE = 0.1
+
+# Maximum relative change in gain that is considered converged (or a correct
+# cached gain).
+GAIN_TOLERANCE = 0.02
+
+
+def _relative_difference(value, reference):
+    return abs(value - reference) / float(abs(reference))
+
+
+class AmplifierGainCache(object):
+    '''
+    Converged amplifier gain of each control board, keyed by serial number,
+    waveform frequency, and waveform voltage.
+
+    Entries of each control board are read from the cache file once, and the
+    file is only written when a new gain is learned (or a cached gain is
+    corrected).
+
+    Parameters
+    ----------
+    cache : JsonCache, optional
+        Amplifier gain cache (default: :data:`AMPLIFIER_GAIN_CACHE`).
+
+    Attributes
+    ----------
+    stats : collections.Counter
+        Number of ``lookups`` and cache ``hits``, ``checks`` of a cached gain
+        against the gain reported by the following measurement, cached gains
+        that needed ``corrections``, and ``updates`` of the cache file.
+    '''
+    def __init__(self, cache=None):
+        self.cache = cache if cache is not None else \
+            JsonCache(AMPLIFIER_GAIN_CACHE)
+        self._entries = {}
+        self.stats = Counter()
+
+    def entries(self, serial_number):
+        '''
+        Returns
+        -------
+        list
+            Entries (i.e., dictionaries with ``frequency``, ``voltage``, and
+            ``gain`` keys) recorded for the control board.
+        '''
+        key = str(serial_number)
+        if key not in self._entries:
+            self._entries[key] = self.cache.get(key, [])
+        return self._entries[key]
+
+    def _nearest(self, entries, frequency, voltage):
+        '''
+        Returns
+        -------
+        int
+            Index of the entry with the nearest frequency and voltage within
+            tolerance, or ``None`` if there is no such entry.
+        '''
+        if frequency <= 0 or voltage <= 0:
+            return None
+        best = None
+        for i, entry in enumerate(entries):
+            df = _relative_difference(frequency, entry['frequency'])
+            dv = _relative_difference(voltage, entry['voltage'])
+            if df > FREQUENCY_TOLERANCE or dv > VOLTAGE_TOLERANCE:
+                continue
+            if best is None or df + dv < best[0]:
+                best = (df + dv, i)
+        return None if best is None else best[1]
+
+    def lookup(self, serial_number, frequency, voltage):
+        '''
+        Returns
+        -------
+        float
+            Cached gain for the nearest frequency and voltage within
+            tolerance, or ``None`` if there is no such gain.
+        '''
+        entries = self.entries(serial_number)
+        i = self._nearest(entries, frequency, voltage)
+        self.stats['lookups'] += 1
+        if i is None:
+            return None
+        self.stats['hits'] += 1
+        return entries[i]['gain']
+
+    def check(self, cached_gain, gain):
+        '''
+        Compare a cached gain against the gain reported by the first
+        measurement after it was used.
+
+        Returns
+        -------
+        bool
+            ``True`` if the cached gain needed correcting.
+        '''
+        self.stats['checks'] += 1
+        corrected = _relative_difference(gain, cached_gain) > GAIN_TOLERANCE
+        if corrected:
+            self.stats['corrections'] += 1
+            logger.debug('Cached amplifier gain %.1f corrected to %.1f.',
+                         cached_gain, gain)
+        return corrected
+
+    def record(self, serial_number, frequency, voltage, previous_gain, gain):
+        '''
+        Record the gain reported at the end of an impedance measurement, if
+        it converged.
+
+        Parameters
+        ----------
+        serial_number : int
+            Serial number of the control board.
+        frequency, voltage : float
+            Waveform frequency and voltage during the measurement.
+        previous_gain : float
+            Gain before the measurement.
+        gain : float
+            Gain reported at the end of the measurement.
+
+        Returns
+        -------
+        bool
+            ``True`` if the cache was updated.
+        '''
+        if (not previous_gain or frequency <= 0 or voltage <= 0 or
+                _relative_difference(gain, previous_gain) > GAIN_TOLERANCE):
+            # Gain has not converged yet.
+            return False
+        entries = self.entries(serial_number)
+        i = self._nearest(entries, frequency, voltage)
+        if i is not None:
+            if _relative_difference(gain, entries[i]['gain']) <= \
+                    GAIN_TOLERANCE:
+                return False
+            del entries[i]
+        entries.append({'frequency': float(frequency),
+                        'voltage': float(voltage), 'gain': float(gain)})
+        self.cache.set(str(serial_number), entries)
+        self.stats['updates'] += 1
+        return True
+
+    def summary(self):
+        '''
+        Returns
+        -------
+        pandas.Series
+            Counts from :attr:`stats`, along with the cache ``hit_rate`` and
+            the ``correction_rate`` of checked cached gains.
+        '''
+        keys = ['lookups', 'hits', 'checks', 'corrections', 'updates']
+        summary = pd.Series([self.stats[k] for k in keys], index=keys,
+                            dtype=float)
+        summary['hit_rate'] = (summary.hits / summary.lookups
+                               if summary.lookups else 0)
+        summary['correction_rate'] = (summary.corrections / summary.checks
+                                      if summary.checks else 0)
+        return summary
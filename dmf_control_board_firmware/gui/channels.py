@@ -34,8 +34,10 @@ def sweep_channels(proxy, test_loads, voltage=10, frequency=None,
     # Set device frequency and voltage.
     proxy.set_waveform_frequency(frequency)
     proxy.set_waveform_voltage(voltage)
-    # Measure impedance to trigger auto-amplifier gain update.
-    results = proxy.measure_impedance(5, 100, 0, True, True, [])
+    # Measure impedance to trigger auto-amplifier gain update (only
+    # `n_samples` windows are measured if a converged gain is cached).
+    results = proxy.settle_amplifier_gain([], 5, 100,
+                                          n_settled_windows=n_samples)
     # store the capacitance with all switches off
     C_off = np.max(results.capacitance()[-n_samples:])
     n_channels = proxy.number_of_channels()
@@ -167,13 +169,15 @@ class AssistantView(WindowView):
 
     def restore_settings(self):
         if self.control_board is not None:
-            for k in ('amplifier_gain', 'auto_adjust_amplifier_gain'):
-                setattr(self.control_board, k, self.settings[k])
-            self.control_board.set_waveform_frequency(self
-                                                      .settings['frequency'])
-            self.control_board.set_waveform_voltage(self.settings['voltage'])
-            self.control_board.set_state_of_all_channels(
-                self.settings['channel_states'])
+            # Restore all settings in a single round trip.
+            with self.control_board.batch() as batch:
+                batch.set_amplifier_gain(self.settings['amplifier_gain'])
+                batch.set_auto_adjust_amplifier_gain(
+                    self.settings['auto_adjust_amplifier_gain'])
+                batch.set_waveform_frequency(self.settings['frequency'])
+                batch.set_waveform_voltage(self.settings['voltage'])
+                batch.set_state_of_all_channels(
+                    self.settings['channel_states'])
 
     def create_ui(self):
         self.widget = gtk.Assistant()
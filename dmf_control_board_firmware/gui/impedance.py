@@ -44,13 +44,15 @@ class AssistantView(WindowView):
 
     def restore_settings(self):
         if self.control_board is not None:
-            for k in ('amplifier_gain', 'auto_adjust_amplifier_gain'):
-                setattr(self.control_board, k, self.settings[k])
-            self.control_board.set_waveform_frequency(self
-                                                      .settings['frequency'])
-            self.control_board.set_waveform_voltage(self.settings['voltage'])
-            self.control_board.set_state_of_all_channels(
-                self.settings['channel_states'])
+            # Restore all settings in a single round trip.
+            with self.control_board.batch() as batch:
+                batch.set_amplifier_gain(self.settings['amplifier_gain'])
+                batch.set_auto_adjust_amplifier_gain(
+                    self.settings['auto_adjust_amplifier_gain'])
+                batch.set_waveform_frequency(self.settings['frequency'])
+                batch.set_waveform_voltage(self.settings['voltage'])
+                batch.set_state_of_all_channels(
+                    self.settings['channel_states'])
 
     def create_ui(self):
         self.widget = gtk.Assistant()
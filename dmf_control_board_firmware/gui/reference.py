@@ -43,10 +43,13 @@ class AssistantView(WindowView):
         super(AssistantView, self).__init__(self)
 
     def restore_settings(self):
-        for k in ('amplifier_gain', 'auto_adjust_amplifier_gain'):
-            setattr(self.control_board, k, self.settings[k])
-        self.control_board.set_waveform_frequency(self.settings['frequency'])
-        self.control_board.set_waveform_voltage(self.settings['voltage'])
+        # Restore all settings in a single round trip.
+        with self.control_board.batch() as batch:
+            batch.set_amplifier_gain(self.settings['amplifier_gain'])
+            batch.set_auto_adjust_amplifier_gain(
+                self.settings['auto_adjust_amplifier_gain'])
+            batch.set_waveform_frequency(self.settings['frequency'])
+            batch.set_waveform_voltage(self.settings['voltage'])
 
     def create_ui(self):
         self.widget = gtk.Assistant()
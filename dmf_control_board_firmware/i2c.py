@@ -0,0 +1,194 @@
+'''
+Inventory of the I2C devices (e.g., high-voltage switching boards) connected
+to a control board.
+
+Describing a device takes several I2C-through-serial round trips (name,
+hardware version, software version, and serial number), so descriptions are
+only read when first accessed and are cached on disk (see
+:mod:`dmf_control_board_firmware.cache`), keyed by the serial number of the
+control board and the set of addresses found by the I2C scan.
+'''
+import collections
+import logging
+
+from base_node import BaseNode
+
+from .cache import JsonCache
+
+logger = logging.getLogger(__name__)
+
+# Name of the I2C inventory cache file.
+I2C_INVENTORY_CACHE = 'i2c-inventory.json'
+
+
+def describe_i2c_device(proxy, address):
+    '''
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    address : int
+        I2C address of device.
+
+    Returns
+    -------
+    str
+        Description of the device (``'?'`` if the device could not be
+        queried).
+    '''
+    try:
+        node = BaseNode(proxy, address)
+        return ("%s v%s (Firmware v%s, S/N %03d)" %
+                (node.name(), node.hardware_version(),
+                 node.software_version(), node.serial_number))
+    except:
+        logger.debug('Could not describe I2C device at address %d.', address,
+                     exc_info=True)
+        return "?"
+
+
+def inventory_key(serial_number, addresses):
+    '''
+    Returns
+    -------
+    str
+        Cache key for the I2C inventory of a control board.
+    '''
+    return '%s:%s' % (serial_number, ','.join(str(a)
+                                              for a in sorted(addresses)))
+
+
+class I2cDeviceInventory(collections.MutableMapping):
+    '''
+    Mapping from the I2C address of each device found on the bus to a
+    description of the device.
+
+    Descriptions are read from the device when first accessed (unless they
+    were cached), and are then written to the cache.
+
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    addresses : list
+        Addresses found by the I2C scan.
+    serial_number : int, optional
+        Serial number of the control board.  If ``None``, descriptions are
+        not cached.
+    cache : JsonCache, optional
+        Inventory cache (default: :data:`I2C_INVENTORY_CACHE`).
+    '''
+    def __init__(self, proxy, addresses, serial_number=None, cache=None):
+        self.proxy = proxy
+        self.addresses = sorted(int(a) for a in addresses)
+        self.serial_number = serial_number
+        self.cache = cache if cache is not None else \
+            JsonCache(I2C_INVENTORY_CACHE)
+        self._descriptions = {}
+        if self.serial_number is not None:
+            cached = self.cache.get(self.key, {})
+            self._descriptions.update((int(address), description)
+                                      for address, description in
+                                      cached.iteritems()
+                                      if int(address) in self.addresses)
+
+    @property
+    def key(self):
+        return inventory_key(self.serial_number, self.addresses)
+
+    @property
+    def unresolved(self):
+        '''
+        Addresses of devices that have not been described yet.
+        '''
+        return [a for a in self.addresses if a not in self._descriptions]
+
+    def describe(self, address, default=None):
+        '''
+        Description of a device, *without* reading it from the device.
+
+        Parameters
+        ----------
+        address : int
+            I2C address of device.
+        default : object, optional
+            Value returned if the device has not been described yet.
+
+        Returns
+        -------
+        str
+            Description of the device (read earlier or cached), or
+            ``default``.
+        '''
+        return self._descriptions.get(address, default)
+
+    def forget_descriptions(self):
+        '''
+        Discard the description of every device (including cached
+        descriptions), such that each device is described again when next
+        accessed.  Unlike :meth:`clear`, the addresses found by the I2C scan
+        are kept.
+        '''
+        self._descriptions.clear()
+        if self.serial_number is not None:
+            self.cache.pop(self.key)
+
+    def clear(self):
+        '''
+        Remove every device, without reading the description of devices
+        that have not been described yet (the cache is not modified).
+        '''
+        self.addresses = []
+        self._descriptions.clear()
+
+    def resolve(self):
+        '''
+        Read the description of every device that has not been described
+        yet.
+        '''
+        for address in self.unresolved:
+            self[address]
+        return self
+
+    def _save(self):
+        if self.serial_number is None:
+            return
+        # Do not cache devices that could not be described, so they are
+        # queried again next time.
+        self.cache.set(self.key, dict((str(address), description)
+                                      for address, description in
+                                      self._descriptions.iteritems()
+                                      if description != '?'))
+
+    def __getitem__(self, address):
+        if address not in self._descriptions:
+            if address not in self.addresses:
+                raise KeyError(address)
+            description = describe_i2c_device(self.proxy, address)
+            self._descriptions[address] = description
+            logger.info("\t%d: %s" % (address, description))
+            self._save()
+        return self._descriptions[address]
+
+    def __setitem__(self, address, description):
+        if address not in self.addresses:
+            self.addresses = sorted(self.addresses + [address])
+        self._descriptions[address] = description
+
+    def __delitem__(self, address):
+        self.addresses.remove(address)
+        self._descriptions.pop(address, None)
+
+    def __iter__(self):
+        return iter(self.addresses)
+
+    def __len__(self):
+        return len(self.addresses)
+
+    def __contains__(self, address):
+        return address in self.addresses
+
+    def __repr__(self):
+        return '<%s %s>' % (self.__class__.__name__,
+                            dict((a, self._descriptions.get(a, '<unresolved>'))
+                                 for a in self.addresses))
@@ -0,0 +1,244 @@
+'''
+Per-command latency and throughput metrics for control board commands.
+
+Every command wrapped by :func:`remote_command` is recorded in the
+:attr:`DMFControlBoard.metrics` registry (unless the registry is disabled),
+including the number of calls, a latency histogram, the number of bytes sent
+and received, timeouts, and firmware error codes.
+
+Example usage:
+
+.. code-block:: python
+
+    proxy = DMFControlBoard()
+    proxy.connect()
+    ...
+    print proxy.stats()[['calls', 'p50_ms', 'p99_ms']]
+
+    # Dump a snapshot of the metrics every 5 minutes.
+    proxy.start_metrics_dump('metrics.csv', interval_s=300)
+'''
+from collections import Counter
+import json
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from path_helpers import path
+
+logger = logging.getLogger(__name__)
+
+# Upper edges (in seconds) of the latency histogram buckets: 20 buckets per
+# decade from 10 us to 100 s.  Latencies above the last edge are counted in
+# the last bucket.
+LATENCY_BUCKET_EDGES = np.logspace(-5, 2, 7 * 20 + 1)
+
+# Columns of the frame returned by :meth:`CommandMetrics.snapshot`.
+SNAPSHOT_COLUMNS = ['calls', 'errors', 'timeouts', 'bytes_sent',
+                    'bytes_received', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+                    'max_ms', 'error_codes']
+
+
+class CommandMetrics(object):
+    '''
+    Thread-safe registry of per-command metrics.
+
+    Latencies are accumulated in a fixed histogram (see
+    :data:`LATENCY_BUCKET_EDGES`), so memory use does not grow with the
+    number of calls.  Percentiles are reported as the upper edge of the
+    histogram bucket containing the percentile (i.e., with a resolution of
+    about 12%).
+
+    Parameters
+    ----------
+    enabled : bool, optional
+        If ``False``, calls to :meth:`record` are ignored.
+    '''
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Discard all recorded metrics.
+        '''
+        with self._lock:
+            self._commands = {}
+            self.start_time = time.time()
+
+    def _command(self, name):
+        if name not in self._commands:
+            self._commands[name] = {'calls': 0, 'timeouts': 0,
+                                    'bytes_sent': 0, 'bytes_received': 0,
+                                    'total_s': 0., 'max_s': 0.,
+                                    'latency_hist':
+                                    np.zeros(len(LATENCY_BUCKET_EDGES),
+                                             dtype=int),
+                                    'error_codes': Counter()}
+        return self._commands[name]
+
+    def record(self, name, duration_s, bytes_sent=0, bytes_received=0,
+               return_code=None, timeout=False):
+        '''
+        Record a single call to a command.
+
+        Parameters
+        ----------
+        name : str
+            Name of command.
+        duration_s : float
+            Duration of the call (in seconds).
+        bytes_sent, bytes_received : int, optional
+            Number of bytes sent to and received from the control board
+            during the call.
+        return_code : str or int, optional
+            Firmware return code, if the call failed.
+        timeout : bool, optional
+            ``True`` if the call timed out waiting for a reply.
+        '''
+        if not self.enabled:
+            return
+        i = min(np.searchsorted(LATENCY_BUCKET_EDGES, duration_s),
+                len(LATENCY_BUCKET_EDGES) - 1)
+        with self._lock:
+            command = self._command(name)
+            command['calls'] += 1
+            command['bytes_sent'] += bytes_sent
+            command['bytes_received'] += bytes_received
+            command['total_s'] += duration_s
+            command['max_s'] = max(command['max_s'], duration_s)
+            command['latency_hist'][i] += 1
+            if timeout:
+                command['timeouts'] += 1
+            if return_code is not None:
+                command['error_codes'][return_code] += 1
+
+    def snapshot(self):
+        '''
+        Returns
+        -------
+        pandas.DataFrame
+            Table indexed by command name, with the following columns:
+
+             - ``calls``: number of calls.
+             - ``errors``: number of calls that failed with a firmware error
+               (including timeouts).
+             - ``timeouts``: number of calls that timed out.
+             - ``bytes_sent``, ``bytes_received``: total number of bytes sent
+               to and received from the control board.
+             - ``mean_ms``, ``p50_ms``, ``p95_ms``, ``p99_ms``, ``max_ms``:
+               mean, percentiles, and maximum call latency (in
+               milliseconds).
+             - ``error_codes``: number of calls that failed with each
+               firmware return code.
+        '''
+        rows = []
+        names = []
+        with self._lock:
+            for name, command in sorted(self._commands.iteritems()):
+                cumulative = np.cumsum(command['latency_hist'])
+                percentiles_ms = [1e3 * LATENCY_BUCKET_EDGES
+                                  [np.searchsorted(cumulative,
+                                                   q * command['calls'])]
+                                  for q in (.5, .95, .99)]
+                names.append(name)
+                rows.append([command['calls'],
+                             sum(command['error_codes'].values()),
+                             command['timeouts'], command['bytes_sent'],
+                             command['bytes_received'],
+                             1e3 * command['total_s'] / command['calls']] +
+                            percentiles_ms +
+                            [1e3 * command['max_s'],
+                             dict(command['error_codes'])])
+        return pd.DataFrame(rows, columns=SNAPSHOT_COLUMNS,
+                            index=pd.Index(names, name='command'))
+
+    def dump(self, filepath, format_=None):
+        '''
+        Write a snapshot of the metrics to a file.
+
+        Parameters
+        ----------
+        filepath : str
+            Output file path.
+        format_ : str, optional
+            Either ``'csv'`` or ``'json'``.  If not specified, the format is
+            inferred from the file extension (default: CSV).
+
+        Returns
+        -------
+        pandas.DataFrame
+            Snapshot written to the file (see :meth:`snapshot`).
+        '''
+        filepath = path(filepath)
+        if format_ is None:
+            format_ = 'json' if filepath.ext.lower() == '.json' else 'csv'
+        df_snapshot = self.snapshot()
+        if format_ == 'json':
+            data = {'timestamp': time.time(),
+                    'start_time': self.start_time,
+                    'commands': [dict(command=name,
+                                      **df_snapshot.loc[name].to_dict())
+                                 for name in df_snapshot.index]}
+            with filepath.open('w') as output:
+                json.dump(data, output, indent=2, default=float)
+        elif format_ == 'csv':
+            df_snapshot = df_snapshot.copy()
+            df_snapshot['error_codes'] = df_snapshot.error_codes.map(
+                json.dumps)
+            df_snapshot.to_csv(filepath)
+        else:
+            raise ValueError('Unsupported format: %s' % format_)
+        return df_snapshot
+
+
+class MetricsDumper(threading.Thread):
+    '''
+    Background thread to periodically dump a snapshot of a metrics registry
+    to a file (see :meth:`CommandMetrics.dump`).
+
+    Each dump overwrites the previous one, so the file always contains the
+    most recent snapshot.
+
+    Parameters
+    ----------
+    metrics : CommandMetrics
+        Metrics registry.
+    filepath : str
+        Output file path.
+    interval_s : float, optional
+        Time between dumps (in seconds).
+    format_ : str, optional
+        See :meth:`CommandMetrics.dump`.
+    '''
+    def __init__(self, metrics, filepath, interval_s=60., format_=None):
+        super(MetricsDumper, self).__init__()
+        self.daemon = True
+        self.metrics = metrics
+        self.filepath = filepath
+        self.interval_s = interval_s
+        self.format_ = format_
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval_s):
+            self._dump()
+        # Dump the final state of the metrics.
+        self._dump()
+
+    def _dump(self):
+        try:
+            self.metrics.dump(self.filepath, self.format_)
+        except Exception:
+            logger.warning('Error dumping metrics to `%s`.', self.filepath,
+                           exc_info=True)
+
+    def stop(self):
+        '''
+        Stop dumping metrics (after a final dump).
+        '''
+        self._stop_event.set()
+        self.join()
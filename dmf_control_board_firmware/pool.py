@@ -0,0 +1,361 @@
+'''
+Drive several control boards connected to the same host.
+
+Each board in a :class:`BoardPool` is owned by its own
+:class:`AsyncDMFControlBoard` session (i.e., its own I/O thread), so
+operations run on all boards concurrently.  An error on one board (e.g., a
+timeout or a disconnected cable) is recorded in :attr:`BoardPool.errors` and
+does not affect the operations running on the other boards.
+
+Example usage:
+
+.. code-block:: python
+
+    with BoardPool() as pool:  # Discover and connect to all boards.
+        pool.set_waveform_voltage(100)
+        df_sweeps = pool.sweep_channels(5., 10, 0, True, True, channel_mask)
+        # One row per channel per board, tagged with the board serial number.
+        print df_sweeps.groupby('serial_number').capacitance.mean()
+'''
+from collections import OrderedDict
+import logging
+
+import numpy as np
+import pandas as pd
+
+from . import DMFControlBoard, serial_ports
+from .asynchronous import AsyncDMFControlBoard, PRIORITY_BULK
+
+logger = logging.getLogger(__name__)
+
+
+def feedback_results_frame(results):
+    '''
+    Parameters
+    ----------
+    results : FeedbackResults
+        Impedance measurement results.
+
+    Returns
+    -------
+    pandas.DataFrame
+        Table indexed by the time of each sampling window (in seconds), with
+        the columns ``V_actuation``, ``capacitance``, ``Z_device``,
+        ``hv_resistor``, and ``fb_resistor``.
+    '''
+    return pd.DataFrame(OrderedDict([('V_actuation',
+                                      results.V_actuation().filled(np.NaN)),
+                                     ('capacitance',
+                                      results.capacitance().filled(np.NaN)),
+                                     ('Z_device',
+                                      results.Z_device().filled(np.NaN)),
+                                     ('hv_resistor', results.hv_resistor),
+                                     ('fb_resistor', results.fb_resistor)]),
+                        index=pd.Index(results.time * 1e-3, name='seconds'))
+
+
+class BoardPool(object):
+    '''
+    Pool of control boards, each driven by a dedicated I/O thread.
+
+    Parameters
+    ----------
+    ports : list, optional
+        Ports of control boards.  If not specified, all ports matching the
+        USB IDs of the control board (see :func:`serial_ports`) are used.
+    baud_rate : int, optional
+        Baud rate to connect at.
+    connect : bool, optional
+        If ``True`` (default), connect to all boards (see :meth:`connect`).
+    timeout : float, optional
+        Maximum time to wait for each board to connect.
+
+    Attributes
+    ----------
+    sessions : collections.OrderedDict
+        Session of each connected board, keyed by port.
+    serial_numbers : dict
+        Serial number of each connected board, keyed by port.
+    errors : dict
+        Most recent exception raised by each board that failed (to connect
+        or to execute an operation), keyed by port.
+    '''
+    def __init__(self, ports=None, baud_rate=115200, connect=True,
+                 timeout=None):
+        if ports is None:
+            ports = serial_ports().index.tolist()
+        self.requested_ports = list(ports)
+        self.baud_rate = baud_rate
+        self.sessions = OrderedDict()
+        self.serial_numbers = {}
+        self.errors = {}
+        if connect:
+            self.connect(timeout=timeout)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def ports(self):
+        '''
+        Ports of connected boards.
+        '''
+        return self.sessions.keys()
+
+    def connect(self, timeout=None):
+        '''
+        Connect to all boards in parallel.
+
+        Boards that fail to connect are logged and recorded in
+        :attr:`errors`.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time to wait for each board to connect.
+
+        Returns
+        -------
+        list
+            Ports of connected boards.
+        '''
+        sessions = OrderedDict((port, AsyncDMFControlBoard(DMFControlBoard()))
+                               for port in self.requested_ports
+                               if port not in self.sessions)
+        futures = OrderedDict((port, session.connect(port, self.baud_rate))
+                              for port, session in sessions.iteritems())
+        self._gather(futures, timeout)
+        for port, session in sessions.iteritems():
+            if port in self.errors:
+                session.close()
+            else:
+                self.sessions[port] = session
+        serial_numbers = self._gather(self._getattr('serial_number'), timeout)
+        self.serial_numbers.update(serial_numbers)
+        if not self.sessions:
+            logger.warning('No control boards connected.')
+        return self.ports
+
+    def close(self):
+        '''
+        Disconnect from all boards and stop the I/O threads (after all queued
+        operations have been executed).
+        '''
+        futures = OrderedDict((port, session.submit('disconnect'))
+                              for port, session in self.sessions.iteritems())
+        self._gather(futures)
+        for session in self.sessions.itervalues():
+            session.close()
+        self.sessions.clear()
+
+    def _gather(self, futures, timeout=None):
+        '''
+        Wait for the future of each board.
+
+        Parameters
+        ----------
+        futures : collections.OrderedDict
+            Future of each board, keyed by port.
+        timeout : float, optional
+            Maximum time to wait for each future.
+
+        Returns
+        -------
+        collections.OrderedDict
+            Result of each board that succeeded, keyed by port.  The
+            exception raised by each board that failed is recorded in
+            :attr:`errors`.
+        '''
+        results = OrderedDict()
+        for port, future in futures.iteritems():
+            try:
+                results[port] = future.result(timeout)
+            except Exception, exception:
+                logger.error('Control board on port %s failed: %s', port,
+                             exception)
+                self.errors[port] = exception
+            else:
+                self.errors.pop(port, None)
+        return results
+
+    def _getattr(self, name):
+        '''
+        Queue a read of a :class:`DMFControlBoard` attribute (e.g., a
+        property) on all boards.
+
+        Returns
+        -------
+        collections.OrderedDict
+            :class:`CommandFuture` of each board, keyed by port.
+        '''
+        def _getattr(future, proxy):
+            return getattr(proxy, name)
+
+        return OrderedDict((port, session._submit(_getattr, session.proxy))
+                           for port, session in self.sessions.iteritems())
+
+    def submit(self, method_name, *args, **kwargs):
+        '''
+        Queue a call to a :class:`DMFControlBoard` method on all boards.
+
+        Returns
+        -------
+        collections.OrderedDict
+            :class:`CommandFuture` of each board, keyed by port.
+        '''
+        return OrderedDict((port, session.submit(method_name, *args,
+                                                 **kwargs))
+                           for port, session in self.sessions.iteritems())
+
+    def submit_each(self, method_name, args_by_port):
+        '''
+        Queue a call to a :class:`DMFControlBoard` method with different
+        arguments for each board.
+
+        Parameters
+        ----------
+        method_name : str
+            Name of :class:`DMFControlBoard` method to call.
+        args_by_port : dict
+            Tuple of arguments for each board, keyed by port.  Only the boards
+            in the dictionary are called.
+
+        Returns
+        -------
+        collections.OrderedDict
+            :class:`CommandFuture` of each board, keyed by port.
+        '''
+        return OrderedDict((port, self.sessions[port].submit(method_name,
+                                                             *args))
+                           for port, args in args_by_port.iteritems())
+
+    def broadcast(self, method_name, *args, **kwargs):
+        '''
+        Call a :class:`DMFControlBoard` method on all boards concurrently and
+        wait for the results.
+
+        Parameters
+        ----------
+        method_name : str
+            Name of :class:`DMFControlBoard` method to call.
+        timeout : float, optional
+            Maximum time to wait for each board (keyword-only).
+
+        Returns
+        -------
+        collections.OrderedDict
+            Result of each board that succeeded, keyed by port (failures are
+            recorded in :attr:`errors`).
+        '''
+        timeout = kwargs.pop('timeout', None)
+        return self._gather(self.submit(method_name, *args, **kwargs),
+                            timeout)
+
+    def _to_frame(self, results):
+        '''
+        Concatenate the frames of all boards into one frame, tagged with the
+        port and serial number of each board.
+        '''
+        frames = []
+        for port, df_i in results.iteritems():
+            df_i = df_i.reset_index()
+            df_i.insert(0, 'port', port)
+            df_i.insert(0, 'serial_number', self.serial_numbers.get(port))
+            frames.append(df_i)
+        if not frames:
+            return pd.DataFrame(columns=['serial_number', 'port'])
+        return pd.concat(frames, ignore_index=True)
+
+    def set_waveform_voltage(self, voltage):
+        return self.broadcast('set_waveform_voltage', voltage)
+
+    def set_waveform_frequency(self, frequency):
+        return self.broadcast('set_waveform_frequency', frequency)
+
+    def set_state_of_all_channels(self, state):
+        '''
+        Actuate channels on all boards.
+
+        Parameters
+        ----------
+        state : array-like or dict
+            State of channels to set on all boards, or state of each board
+            keyed by port.
+        '''
+        if isinstance(state, dict):
+            return self._gather(self.submit_each('set_state_of_all_channels',
+                                                 dict((port, (state_i, ))
+                                                      for port, state_i in
+                                                      state.iteritems())))
+        return self.broadcast('set_state_of_all_channels', state)
+
+    def clear_all_channels(self):
+        '''
+        Turn off all channels on all boards, ahead of any queued operations.
+        '''
+        return self._gather(OrderedDict((port, session.clear_all_channels())
+                                        for port, session in
+                                        self.sessions.iteritems()))
+
+    def measure_impedance(self, sampling_window_ms, n_sampling_windows,
+                          delay_between_windows_ms, interleave_samples, rms,
+                          state, timeout=None):
+        '''
+        Measure impedance on all boards concurrently.
+
+        See :meth:`DMFControlBoard.measure_impedance` for a description of the
+        parameters.  The ``state`` may also be a dictionary with the state of
+        each board, keyed by port.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Measurements of all boards that succeeded (see
+            :func:`feedback_results_frame`), with ``serial_number`` and
+            ``port`` columns.
+        '''
+        futures = OrderedDict()
+        for port, session in self.sessions.iteritems():
+            state_i = state.get(port) if isinstance(state, dict) else state
+            if state_i is None:
+                continue
+            futures[port] = session.measure_impedance(sampling_window_ms,
+                                                      n_sampling_windows,
+                                                      delay_between_windows_ms,
+                                                      interleave_samples, rms,
+                                                      state_i)
+        results = self._gather(futures, timeout)
+        return self._to_frame(OrderedDict((port, feedback_results_frame(r))
+                                          for port, r in results.iteritems()))
+
+    def sweep_channels(self, sampling_window_ms,
+                       n_sampling_windows_per_channel,
+                       delay_between_windows_ms, interleave_samples, rms,
+                       channel_mask, timeout=None):
+        '''
+        Sweep channels on all boards concurrently.
+
+        See :meth:`DMFControlBoard.sweep_channels` for a description of the
+        parameters.  The ``channel_mask`` may also be a dictionary with the
+        mask of each board, keyed by port.
+
+        Returns
+        -------
+        pandas.DataFrame
+            Sweeps of all boards that succeeded, with ``serial_number`` and
+            ``port`` columns.
+        '''
+        futures = OrderedDict()
+        for port, session in self.sessions.iteritems():
+            mask_i = (channel_mask.get(port) if isinstance(channel_mask, dict)
+                      else channel_mask)
+            if mask_i is None:
+                continue
+            futures[port] = session.sweep_channels(
+                sampling_window_ms, n_sampling_windows_per_channel,
+                delay_between_windows_ms, interleave_samples, rms, mask_i,
+                priority=PRIORITY_BULK)
+        return self._to_frame(self._gather(futures, timeout))
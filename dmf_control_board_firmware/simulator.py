@@ -0,0 +1,1337 @@
+'''
+Simulated control board speaking the firmware serial protocol over a
+pseudo-terminal.
+
+The simulator implements the packet framing of ``RemoteObject`` (frame
+boundaries, escapes, CRC, and long payload lengths) and the ``DMFControlBoard``
+command set needed by the host driver, so an unmodified
+:meth:`DMFControlBoard.connect` works against the pseudo-terminal as if it
+were the serial port of a real control board.  This makes it possible to
+benchmark and regression-test the driver without hardware attached.
+
+Simulated state includes persistent memory (including the configuration
+settings and serial number), channel states, waveform settings, series
+resistor indexes, and the amplifier gain.  Impedance measurements (i.e.,
+``measure_impedance``, ``measure_impedance_summary``,
+``measure_impedance_settle``, and ``sweep_channels``) are synthesized from a
+capacitance model of the device: the load capacitance is the sum of the
+capacitance of each actuated channel (see :attr:`channel_capacitance`) and a
+stray capacitance.  I2C peripherals may be attached to the simulated bus (see
+:class:`SimulatedI2cDevice`).
+
+Example usage:
+
+.. code-block:: python
+
+    from dmf_control_board_firmware import DMFControlBoard
+    from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+    with SimulatedControlBoard(number_of_channels=120) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        ...
+
+To run a simulator in a separate process (e.g., to connect from a GUI)::
+
+    python -m dmf_control_board_firmware.simulator --baud-rate 115200
+
+.. note::
+    Pseudo-terminals are only available on POSIX platforms.
+'''
+from collections import Counter, OrderedDict
+from contextlib import closing
+import argparse
+import errno
+import logging
+import math
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+import numpy as np
+
+from .autorange import HV_ATTENUATOR_RESISTANCE
+from .dmf_control_board_base import DMFControlBoard as Base
+
+logger = logging.getLogger(__name__)
+
+# The following constants mirror the definitions in `RemoteObject.h`.
+FRAME_BOUNDARY = 0x7E
+CONTROL_ESCAPE = 0x7D
+ESCAPE_XOR = 0x20
+MAX_PAYLOAD_LENGTH = 2000
+
+# Size (in bytes) of the simulated persistent memory (i.e., the EEPROM of an
+# Arduino Mega2560).
+PERSISTENT_MEMORY_SIZE = 4096
+
+# Layout of the `ConfigSettings` structure in persistent memory for hardware
+# major version 2 (see `DMFControlBoard.h`).
+CONFIG_SETTINGS_FIELDS = OrderedDict([('version', '3H'),
+                                      ('switching_board_i2c_address', 'B'),
+                                      ('signal_generator_board_i2c_address',
+                                       'B'),
+                                      ('A0_series_resistance', '3f'),
+                                      ('A0_series_capacitance', '3f'),
+                                      ('A1_series_resistance', '5f'),
+                                      ('A1_series_capacitance', '5f'),
+                                      ('amplifier_gain', 'f'),
+                                      ('voltage_tolerance', 'f'),
+                                      ('use_antialiasing_filter', '?'),
+                                      ('waveform_frequency_range', '2f'),
+                                      ('max_waveform_voltage', 'f')])
+CONFIG_SETTINGS_FORMAT = '<' + ''.join(CONFIG_SETTINGS_FIELDS.values())
+
+# Default configuration settings (see `DMFControlBoard::load_config`).
+DEFAULT_CONFIG_SETTINGS = OrderedDict([('version', (0, 0, 5)),
+                                       ('switching_board_i2c_address', 0x20),
+                                       ('signal_generator_board_i2c_address',
+                                        10),
+                                       ('A0_series_resistance',
+                                        (20e3, 200e3, 2e6)),
+                                       ('A0_series_capacitance',
+                                        (0, 0, 50e-12)),
+                                       ('A1_series_resistance',
+                                        (2e2, 2e3, 2e4, 2e5, 2e6)),
+                                       ('A1_series_capacitance',
+                                        (50e-12, ) * 5),
+                                       ('amplifier_gain', 300.),
+                                       ('voltage_tolerance', 5.),
+                                       ('use_antialiasing_filter', False),
+                                       ('waveform_frequency_range',
+                                        (100., 20e3)),
+                                       ('max_waveform_voltage', 200.)])
+
+# Maximum sampling rate of the feedback controller (see
+# `FeedbackController.h`).
+MAX_SAMPLING_RATE = 40e3
+# Full-scale value of the 10-bit ADC.
+ADC_FULL_SCALE = 1023
+# Size (in bytes) of each serialized window group summary (see
+# `FeedbackController.h`).
+SUMMARY_SIZE = 2 + 2 * (2 + 4 * 2)
+# Impedance measurement options (bit definitions, see `DMFControlBoard.h`).
+INTLV = 0
+RMS = 1
+
+# Default capacitance (in farads) of each actuated channel.
+DEFAULT_CHANNEL_CAPACITANCE = 10e-12
+# Default stray capacitance (in farads) of the device load.
+DEFAULT_STRAY_CAPACITANCE = 1e-12
+
+
+def crc16(data, crc=0xFFFF):
+    '''
+    Parameters
+    ----------
+    data : str or bytearray
+        Bytes to compute checksum of.
+    crc : int, optional
+        Initial checksum value.
+
+    Returns
+    -------
+    int
+        CRC-16 (polynomial ``0xA001``) checksum as computed by
+        ``RemoteObject::update_crc``.
+    '''
+    for byte in bytearray(data):
+        crc ^= byte
+        for i in xrange(8):
+            if crc & 1:
+                crc = (crc >> 1) ^ 0xA001
+            else:
+                crc >>= 1
+    return crc
+
+
+def summarize_windows(windows):
+    '''
+    Serialize the summary of a group of sampling windows, as serialized by
+    ``FeedbackController::serialize_summaries``.
+
+    Parameters
+    ----------
+    windows : list
+        Sampling windows, each a ``(V_hv, hv_index, V_fb, fb_index)`` tuple.
+
+    Returns
+    -------
+    str
+        Serialized summary (:data:`SUMMARY_SIZE` bytes).
+    '''
+    data = [struct.pack('<H', len(windows))]
+    for channel in xrange(2):
+        valid = [(window[2 * channel], window[2 * channel + 1])
+                 for window in windows if window[2 * channel + 1] >= 0]
+        n_saturated = min(len(windows) - len(valid), 0xFF)
+        if valid:
+            values = [value for value, index in valid]
+            data.append(struct.pack('<bBHHHH', valid[-1][1], n_saturated,
+                                    sum(values) // len(values), min(values),
+                                    max(values), values[-1]))
+        else:
+            data.append(struct.pack('<bBHHHH', -1, n_saturated, 0, 0, 0, 0))
+    return ''.join(data)
+
+
+def encode_packet(command, payload='', crc_enabled=True):
+    '''
+    Parameters
+    ----------
+    command : int
+        Command code (replies have the most-significant bit cleared).
+    payload : str, optional
+        Packet payload (for replies, *including* the trailing return code).
+    crc_enabled : bool, optional
+        If ``True``, append CRC checksum to packet.
+
+    Returns
+    -------
+    str
+        Framed and escaped packet, as sent by ``RemoteObject::send_preamble``
+        and ``RemoteObject::send_payload``.
+    '''
+    length = len(payload)
+    if length > MAX_PAYLOAD_LENGTH:
+        raise ValueError('Payload length (%d) exceeds maximum (%d).' %
+                         (length, MAX_PAYLOAD_LENGTH))
+    if length < 128:
+        header = [command, length]
+    else:
+        header = [command, (0x8000 | length) >> 8, length & 0xFF]
+    packet = bytearray(header) + bytearray(payload)
+    if crc_enabled:
+        crc = crc16(packet)
+        packet += bytearray([crc & 0xFF, crc >> 8])
+    framed = bytearray([FRAME_BOUNDARY])
+    for byte in packet:
+        if byte in (FRAME_BOUNDARY, CONTROL_ESCAPE):
+            framed += bytearray([CONTROL_ESCAPE, byte ^ ESCAPE_XOR])
+        else:
+            framed.append(byte)
+    return str(framed)
+
+
+class PacketParser(object):
+    '''
+    Incremental packet parser, equivalent to
+    ``RemoteObject::process_serial_input``.
+
+    Packets with an invalid CRC checksum are dropped (and counted in
+    :attr:`crc_errors`), as done by the firmware.
+
+    Parameters
+    ----------
+    crc_enabled : bool, optional
+        If ``True``, each packet is expected to end with a CRC checksum.
+    '''
+    def __init__(self, crc_enabled=True):
+        self.crc_enabled = crc_enabled
+        self.crc_errors = 0
+        self.reset()
+
+    def reset(self):
+        '''
+        Discard any partially received packet.
+        '''
+        self._escaping = False
+        self._bytes_received = 0
+        self._command = None
+        self._header_length = 2
+        self._payload_length = 0
+        self._payload = bytearray()
+        self._crc = 0xFFFF
+
+    def parse(self, data):
+        '''
+        Parameters
+        ----------
+        data : str or bytearray
+            Bytes received.
+
+        Returns
+        -------
+        list
+            ``(command, payload)`` tuple for each packet completed by
+            ``data``.
+        '''
+        packets = []
+        for byte in bytearray(data):
+            if byte == CONTROL_ESCAPE:
+                self._escaping = True
+                continue
+            escaped = self._escaping
+            self._escaping = False
+            if escaped:
+                byte ^= ESCAPE_XOR
+            elif byte == FRAME_BOUNDARY:
+                # Start of a new packet (discard any partial packet).
+                self._bytes_received = 0
+                continue
+
+            if self._bytes_received == 0:
+                self._command = byte
+                self._payload = bytearray()
+                self._crc = 0xFFFF
+            elif self._bytes_received == 1:
+                if byte & 0x80:
+                    self._header_length = 3
+                    self._payload_length = (byte & 0x7F) << 8
+                else:
+                    self._header_length = 2
+                    self._payload_length = byte
+            elif self._bytes_received == 2 and self._header_length == 3:
+                self._payload_length += byte
+            elif (self._bytes_received - self._header_length <
+                  self._payload_length):
+                self._payload.append(byte)
+            if self.crc_enabled:
+                self._crc = crc16(chr(byte), self._crc)
+            self._bytes_received += 1
+
+            if (self._bytes_received > 1 and self._bytes_received ==
+                    self._payload_length + self._header_length +
+                    2 * self.crc_enabled):
+                self._bytes_received = 0
+                if self.crc_enabled and self._crc != 0:
+                    self.crc_errors += 1
+                    logger.debug('Dropped packet (command 0x%02X) with bad '
+                                 'CRC.', self._command)
+                else:
+                    packets.append((self._command, str(self._payload)))
+        return packets
+
+
+class CommandError(Exception):
+    '''
+    Raised by a command handler to reply with a non-zero return code.
+    '''
+    def __init__(self, return_code):
+        super(CommandError, self).__init__(return_code)
+        self.return_code = return_code
+
+
+class SimulatedI2cDevice(object):
+    '''
+    Simulated I2C peripheral, replying to commands sent using
+    ``RemoteObject::i2c_send_command``.
+
+    The reply to each command (including the return code) is ready
+    :attr:`response_time_s` after the command is received.  Until then, a
+    single byte read returns zero.  Once the reply is ready, a single byte
+    read returns the length of the reply, and the next read returns the
+    reply.  Any reply that was not read is discarded when a new command is
+    received.
+
+    Parameters
+    ----------
+    response_time_s : float, optional
+        Time (in seconds) to process each command.
+    handler : function, optional
+        Called with the command code and payload of each command, returning
+        the return code and the reply data.  By default, the payload is
+        echoed back with ``RETURN_OK``.
+
+    Attributes
+    ----------
+    n_length_reads : int
+        Number of times the length of a reply was read (i.e., the number of
+        times the peripheral was polled).
+    '''
+    def __init__(self, response_time_s=0., handler=None):
+        self.response_time_s = response_time_s
+        if handler is None:
+            handler = lambda command, payload: (Base.RETURN_OK, payload)
+        self.handler = handler
+        self.n_length_reads = 0
+        self._reply = ''
+        self._ready_time = None
+        self._length_sent = False
+
+    def write(self, data):
+        return_code, reply = self.handler(ord(data[0]), data[1:])
+        self._reply = reply + chr(return_code)
+        self._ready_time = time.time() + self.response_time_s
+        self._length_sent = False
+
+    def read(self, n_bytes):
+        if not self._reply or time.time() < self._ready_time:
+            self.n_length_reads += n_bytes == 1
+            return '\x00' * n_bytes
+        if not self._length_sent:
+            self.n_length_reads += 1
+            self._length_sent = True
+            return chr(len(self._reply))
+        reply, self._reply = self._reply[:n_bytes], ''
+        return reply
+
+
+class PseudoTerminalDevice(object):
+    '''
+    Device attached to a pseudo-terminal, exchanging packets framed like
+    ``RemoteObject`` packets with the host.
+
+    Sub-classes must implement :meth:`handle_packet`.
+
+    Parameters
+    ----------
+    baud_rate : int, optional
+        If set, throttle the transfer of each packet to the time it would
+        take at the specified baud rate (10 bits per byte on the wire).
+    latency_s : float, optional
+        Delay (in seconds) injected before handling each packet.
+    '''
+    def __init__(self, baud_rate=None, latency_s=0.):
+        self.baud_rate = baud_rate
+        self.latency_s = latency_s
+        self.port = None
+        self._master_fd = None
+        self._thread = None
+        self._stop_event = threading.Event()
+        self._port_open = False
+        self._parser = PacketParser()
+
+    def start(self):
+        '''
+        Open a pseudo-terminal and start serving commands on a background
+        thread.
+
+        Returns
+        -------
+        str
+            Path of the pseudo-terminal to connect to (see :attr:`port`).
+        '''
+        import pty
+        import tty
+
+        if self._thread is not None:
+            raise RuntimeError('Device is already running.')
+        master_fd, slave_fd = pty.openpty()
+        # Disable echo and line buffering on the port.
+        tty.setraw(slave_fd)
+        self.port = os.ttyname(slave_fd)
+        # Close the slave end, so the device can detect when the host
+        # opens the port (reads from the master end fail with `EIO` while no
+        # process has the slave end open).
+        os.close(slave_fd)
+        self._master_fd = master_fd
+        self._port_open = False
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+        self._thread.start()
+        return self.port
+
+    def stop(self):
+        '''
+        Stop serving commands and close the pseudo-terminal.
+        '''
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        os.close(self._master_fd)
+        self._master_fd = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            try:
+                ready = select.select([self._master_fd], [], [], .01)[0]
+                data = os.read(self._master_fd, 4096) if ready else ''
+            except OSError, exception:
+                if exception.errno != errno.EIO:
+                    raise
+                # No process has the port open.
+                if self._port_open:
+                    logger.debug('Port %s closed.', self.port)
+                self._port_open = False
+                self._parser.reset()
+                time.sleep(.01)
+                continue
+            if not self._port_open:
+                logger.debug('Port %s opened.', self.port)
+                self._port_open = True
+                self.on_open()
+            if data:
+                self._throttle(len(data))
+                for command, payload in self._parser.parse(data):
+                    if self.latency_s:
+                        time.sleep(self.latency_s)
+                    self.handle_packet(command, payload)
+
+    def _throttle(self, n_bytes):
+        if self.baud_rate:
+            time.sleep(10. * n_bytes / self.baud_rate)
+
+    def _write(self, data):
+        self._throttle(len(data))
+        try:
+            while data:
+                data = data[os.write(self._master_fd, data):]
+        except OSError, exception:
+            if exception.errno != errno.EIO:
+                raise
+            logger.debug('Port %s closed before reply was sent.', self.port)
+
+    def on_open(self):
+        '''
+        Called when the host opens the port.
+
+        Like the firmware after a reset, send a startup message for the host
+        to flush.
+        '''
+        time.sleep(.05)
+        self._write(self.startup_message)
+
+    @property
+    def startup_message(self):
+        return 'Analog Reference=5.00 V\r\n'
+
+    def handle_packet(self, command, payload):
+        '''
+        Handle a packet received from the host.
+
+        Replies must be sent using :meth:`_write`.
+
+        Parameters
+        ----------
+        command : int
+            Command code.
+        payload : str
+            Packet payload.
+        '''
+        raise NotImplementedError
+
+
+class SimulatedControlBoard(PseudoTerminalDevice):
+    '''
+    Simulated control board attached to a pseudo-terminal.
+
+    Parameters
+    ----------
+    number_of_channels : int, optional
+        Number of channels (must be a multiple of 40).
+    hardware_version : str, optional
+        Reported hardware version (only major version 2 is simulated).
+    software_version : str, optional
+        Reported firmware version.
+    serial_number : int, optional
+        Serial number written to persistent memory.
+    baud_rate : int, optional
+        If set, throttle the transfer of each packet to the time it would
+        take at the specified baud rate (10 bits per byte on the wire).
+    latency_s : float, optional
+        Delay (in seconds) injected before processing each command.
+    realtime : bool, optional
+        If ``True``, impedance measurements take as long as they would on a
+        real control board (i.e., ``sampling_window_ms +
+        delay_between_windows_ms`` per sampling window).
+    channel_capacitance : float or array-like, optional
+        Capacitance (in farads) of each channel when actuated.
+    stray_capacitance : float, optional
+        Capacitance (in farads) of the load with no channels actuated.
+    noise : float, optional
+        Relative standard deviation of measured voltages.
+    aref : float, optional
+        Analog reference voltage.
+    seed : int, optional
+        Seed for the measurement noise.
+
+    Attributes
+    ----------
+    channel_capacitance : numpy.ndarray
+        Capacitance (in farads) of each channel when actuated.  May be
+        modified while the simulator is running (e.g., to simulate a drop
+        moving between channels).
+    command_counts : collections.Counter
+        Number of packets processed for each command code.
+    unresponsive_commands : set
+        Command codes that are processed without sending a reply (e.g., to
+        simulate a control board that stops responding mid-command).
+    i2c_devices : dict
+        Simulated I2C peripherals (see :class:`SimulatedI2cDevice`), keyed by
+        address.
+    '''
+    def __init__(self, number_of_channels=120, hardware_version='2.1',
+                 software_version='1.0.0', serial_number=0, baud_rate=None,
+                 latency_s=0., realtime=True,
+                 channel_capacitance=DEFAULT_CHANNEL_CAPACITANCE,
+                 stray_capacitance=DEFAULT_STRAY_CAPACITANCE, noise=0.01,
+                 aref=5., seed=None):
+        if number_of_channels % 40:
+            raise ValueError('Number of channels must be a multiple of 40.')
+        if not hardware_version.startswith('2.'):
+            raise ValueError('Only hardware major version 2 is simulated.')
+        self.number_of_channels = number_of_channels
+        self.hardware_version = hardware_version
+        self.software_version = software_version
+        super(SimulatedControlBoard, self).__init__(baud_rate=baud_rate,
+                                                    latency_s=latency_s)
+        self.realtime = realtime
+        self.channel_capacitance = (np.ones(number_of_channels) *
+                                    channel_capacitance)
+        self.stray_capacitance = stray_capacitance
+        self.noise = noise
+        self.aref = aref
+        self.random_state = np.random.RandomState(seed)
+        self.command_counts = Counter()
+        self.unresponsive_commands = set()
+        self.i2c_devices = {}
+
+        # Persistent memory is initialized the way the firmware initializes
+        # blank EEPROM (see `RemoteObject::begin` and
+        # `DMFControlBoard::load_config`).
+        self.amplifier_gain = DEFAULT_CONFIG_SETTINGS['amplifier_gain']
+        self.persistent_memory = bytearray([0xFF] * PERSISTENT_MEMORY_SIZE)
+        self._persistent_write_multibyte(Base.PERSISTENT_BAUD_RATE_ADDRESS,
+                                         struct.pack('<I', 115200))
+        self._persistent_write_multibyte(Base.PERSISTENT_SERIAL_NUMBER_ADDRESS,
+                                         struct.pack('<I', serial_number))
+        self.load_config()
+
+        self.state_of_channels = np.zeros(number_of_channels, dtype=bool)
+        self.waveform_voltage = 0.
+        self.waveform_frequency = 1e3
+        self.series_resistor_index = [0, 0]
+        # Series resistor to start each measurement with (`-1`: largest).
+        self.initial_series_resistor_index = [-1, -1]
+
+        self._handlers = {
+            Base.CMD_GET_PROTOCOL_NAME:
+            self._string_handler('DMF Control Protocol'),
+            Base.CMD_GET_PROTOCOL_VERSION: self._string_handler('0.1'),
+            Base.CMD_GET_DEVICE_NAME:
+            self._string_handler('Arduino DMF Controller'),
+            Base.CMD_GET_MANUFACTURER:
+            self._string_handler('Wheeler Microfluidics Lab'),
+            Base.CMD_GET_HARDWARE_VERSION:
+            self._string_handler(hardware_version),
+            Base.CMD_GET_SOFTWARE_VERSION:
+            self._string_handler(software_version),
+            Base.CMD_GET_URL:
+            self._string_handler('http://microfluidics.utoronto.ca/'
+                                 'dmf_control_board'),
+            Base.CMD_GET_MCU_TYPE: self._string_handler('ATmega2560'),
+            Base.CMD_GET_AREF: self._get_aref,
+            Base.CMD_ANALOG_READ: self._analog_read,
+            Base.CMD_PERSISTENT_READ: self._persistent_read,
+            Base.CMD_PERSISTENT_WRITE: self._persistent_write,
+            Base.CMD_I2C_SCAN: self._i2c_scan,
+            Base.CMD_I2C_WRITE: self._i2c_write,
+            Base.CMD_I2C_READ: self._i2c_read,
+            Base.CMD_BATCH: self._batch,
+            Base.CMD_GET_NUMBER_OF_CHANNELS: self._get_number_of_channels,
+            Base.CMD_GET_STATE_OF_ALL_CHANNELS:
+            self._get_state_of_all_channels,
+            Base.CMD_SET_STATE_OF_ALL_CHANNELS:
+            self._set_state_of_all_channels,
+            Base.CMD_GET_STATE_OF_CHANNEL: self._get_state_of_channel,
+            Base.CMD_SET_STATE_OF_CHANNEL: self._set_state_of_channel,
+            Base.CMD_GET_WAVEFORM_VOLTAGE: self._get_waveform_voltage,
+            Base.CMD_SET_WAVEFORM_VOLTAGE: self._set_waveform_voltage,
+            Base.CMD_GET_WAVEFORM_FREQUENCY: self._get_waveform_frequency,
+            Base.CMD_SET_WAVEFORM_FREQUENCY: self._set_waveform_frequency,
+            Base.CMD_GET_SERIES_RESISTOR_INDEX:
+            self._get_series_resistor_index,
+            Base.CMD_SET_SERIES_RESISTOR_INDEX:
+            self._set_series_resistor_index,
+            Base.CMD_SET_INITIAL_SERIES_RESISTOR_INDEX:
+            self._set_initial_series_resistor_index,
+            Base.CMD_GET_SERIES_RESISTANCE:
+            self._series_value_getter('series_resistance'),
+            Base.CMD_SET_SERIES_RESISTANCE:
+            self._series_value_setter('series_resistance'),
+            Base.CMD_GET_SERIES_CAPACITANCE:
+            self._series_value_getter('series_capacitance'),
+            Base.CMD_SET_SERIES_CAPACITANCE:
+            self._series_value_setter('series_capacitance'),
+            Base.CMD_GET_AMPLIFIER_GAIN: self._get_amplifier_gain,
+            Base.CMD_SET_AMPLIFIER_GAIN: self._set_amplifier_gain,
+            Base.CMD_GET_AUTO_ADJUST_AMPLIFIER_GAIN:
+            self._get_auto_adjust_amplifier_gain,
+            Base.CMD_SET_AUTO_ADJUST_AMPLIFIER_GAIN:
+            self._set_auto_adjust_amplifier_gain,
+            Base.CMD_MEASURE_IMPEDANCE: self._measure_impedance,
+            Base.CMD_MEASURE_IMPEDANCE_STREAM: self._measure_impedance_stream,
+            Base.CMD_MEASURE_IMPEDANCE_SUMMARY:
+            self._measure_impedance_summary,
+            Base.CMD_MEASURE_IMPEDANCE_SETTLE: self._measure_impedance_settle,
+            Base.CMD_SWEEP_CHANNELS: self._sweep_channels,
+            Base.CMD_LOAD_CONFIG: self._load_config,
+            Base.CMD_GET_CONFIG_CHECKSUM: self._get_config_checksum}
+
+    # Packet processing
+    # =================
+    @property
+    def startup_message(self):
+        return 'Analog Reference=%.2f V\r\n' % self.aref
+
+    def handle_packet(self, command, payload):
+        reply = self.process_packet(command, payload)
+        if command not in self.unresponsive_commands:
+            self._write(reply)
+
+    def process_packet(self, command, payload):
+        '''
+        Process a command packet.
+
+        Parameters
+        ----------
+        command : int
+            Command code (including the most-significant bit).
+        payload : str
+            Command payload.
+
+        Returns
+        -------
+        str
+            Framed reply packet (empty if the packet is not a command).
+        '''
+        if not command & 0x80:
+            # Not a command (e.g., a byte sent to interrupt a command).
+            return ''
+        self.command_counts[command] += 1
+        return_code, data = self.process_command(command, payload)
+        return encode_packet(command ^ 0x80, data + chr(return_code))
+
+    def process_command(self, command, payload):
+        '''
+        Parameters
+        ----------
+        command : int
+            Command code.
+        payload : str
+            Command payload.
+
+        Returns
+        -------
+        tuple
+            Return code and reply data (excluding the return code).
+        '''
+        handler = self._handlers.get(command)
+        if handler is None:
+            return Base.RETURN_UNKNOWN_COMMAND, ''
+        try:
+            return Base.RETURN_OK, handler(payload)
+        except CommandError, exception:
+            return exception.return_code, ''
+        except struct.error:
+            return Base.RETURN_BAD_PACKET_SIZE, ''
+
+    # Persistent memory/configuration
+    # ===============================
+    def _persistent_write_multibyte(self, address, data):
+        self.persistent_memory[address:address + len(data)] = data
+
+    def load_config(self, use_defaults=False):
+        '''
+        Load configuration settings from persistent memory, as done by
+        ``DMFControlBoard::load_config`` (blank or outdated settings are
+        replaced by the defaults).
+        '''
+        address = Base.PERSISTENT_CONFIG_SETTINGS
+        data = str(self.persistent_memory[address:address +
+                                          struct.calcsize(
+                                              CONFIG_SETTINGS_FORMAT)])
+        values = list(struct.unpack(CONFIG_SETTINGS_FORMAT, data))
+        config = OrderedDict()
+        for name, format_ in CONFIG_SETTINGS_FIELDS.iteritems():
+            count = struct.calcsize('<' + format_) / struct.calcsize(
+                '<' + format_[-1])
+            if len(format_) > 1:
+                config[name] = values[:count]
+            else:
+                config[name] = values[0]
+            values = values[count:]
+        self.config = config
+        if use_defaults or tuple(config['version']) != (0, 0, 5):
+            self.config = OrderedDict((name, list(value)
+                                       if isinstance(value, tuple) else value)
+                                      for name, value in
+                                      DEFAULT_CONFIG_SETTINGS.iteritems())
+            self.save_config()
+        if self.config['amplifier_gain'] > 0:
+            self.amplifier_gain = self.config['amplifier_gain']
+
+    def save_config(self):
+        '''
+        Write configuration settings to persistent memory.
+        '''
+        values = []
+        for name in CONFIG_SETTINGS_FIELDS:
+            value = self.config[name]
+            if isinstance(value, (list, tuple)):
+                values.extend(value)
+            else:
+                values.append(value)
+        self._persistent_write_multibyte(Base.PERSISTENT_CONFIG_SETTINGS,
+                                         struct.pack(CONFIG_SETTINGS_FORMAT,
+                                                     *values))
+
+    @property
+    def auto_adjust_amplifier_gain(self):
+        return self.config['amplifier_gain'] <= 0
+
+    # Measurement model
+    # =================
+    def load_capacitance(self, state=None):
+        '''
+        Parameters
+        ----------
+        state : array-like, optional
+            Channel states (default: current channel states).
+
+        Returns
+        -------
+        float
+            Capacitance (in farads) of the device load.
+        '''
+        if state is None:
+            state = self.state_of_channels
+        return (self.stray_capacitance +
+                self.channel_capacitance[np.asarray(state, dtype=bool)].sum())
+
+    def _measure_window(self, channel, V2):
+        '''
+        Measure a single sampling window on an analog input channel, and
+        adjust the series resistor of the channel like the feedback controller
+        does (i.e., step down on saturation and step up if the signal is
+        below 5% of the input range).
+
+        Returns
+        -------
+        tuple
+            Measured peak-to-peak value (scaled by 64) and resistor index
+            (``-1`` if the input saturated).
+        '''
+        index = self.series_resistor_index[channel]
+        n_resistors = len(self.config['A%d_series_resistance' % channel])
+        V2 *= 1 + self.noise * self.random_state.randn()
+        pk_pk = V2 * 2 * math.sqrt(2) / self.aref * ADC_FULL_SCALE
+        if pk_pk > ADC_FULL_SCALE:
+            self.series_resistor_index[channel] = max(index - 1, 0)
+            return 64 * ADC_FULL_SCALE, -1
+        if pk_pk < ADC_FULL_SCALE / 20. and index < n_resistors - 1:
+            self.series_resistor_index[channel] = index + 1
+        return int(round(64 * max(pk_pk, 0))), index
+
+    def _series_impedance(self, channel, omega):
+        index = self.series_resistor_index[channel]
+        R = self.config['A%d_series_resistance' % channel][index]
+        C = self.config['A%d_series_capacitance' % channel][index]
+        return abs(R / (1 + 1j * omega * R * C))
+
+    def _measure_windows(self, n_sampling_windows, sampling_window_ms,
+                         delay_between_windows_ms):
+        '''
+        Synthesize impedance measurements for the current channel states.
+
+        Like the feedback controller, each channel starts with its initial
+        series resistor (see :attr:`initial_series_resistor_index`), or the
+        largest series resistor if no valid initial resistor is set, and the
+        original series resistors are restored when the generator is
+        exhausted or closed (i.e., use :func:`contextlib.closing` to stop
+        measuring early).
+
+        Yields
+        ------
+        tuple
+            ``(V_hv, hv_index, V_fb, fb_index)`` of each sampling window.
+        '''
+        omega = 2 * math.pi * self.waveform_frequency
+        V1 = self.waveform_voltage
+        C = self.load_capacitance()
+        original_index = list(self.series_resistor_index)
+        for channel in xrange(2):
+            n_resistors = len(self.config['A%d_series_resistance' % channel])
+            index = self.initial_series_resistor_index[channel]
+            self.series_resistor_index[channel] = \
+                index if 0 <= index < n_resistors else n_resistors - 1
+        try:
+            for i in xrange(n_sampling_windows):
+                if self.realtime:
+                    time.sleep(1e-3 * (sampling_window_ms +
+                                       delay_between_windows_ms))
+                # High-voltage attenuator: `V2 = V1 * Z2 / R1`.
+                V_hv, hv_index = self._measure_window(
+                    0, V1 * self._series_impedance(0, omega) /
+                    HV_ATTENUATOR_RESISTANCE)
+                # Device load feedback: `V2 = V1 * Z2 / Z1`, where
+                # `Z1 = 1 / (omega * C)`.
+                V_fb, fb_index = self._measure_window(
+                    1, V1 * self._series_impedance(1, omega) * omega * C)
+                yield V_hv, hv_index, V_fb, fb_index
+        finally:
+            self.series_resistor_index = original_index
+
+    def _measure(self, n_sampling_windows, sampling_window_ms,
+                 delay_between_windows_ms):
+        '''
+        Synthesize impedance measurements for the current channel states (see
+        :meth:`_measure_windows`).
+
+        Returns
+        -------
+        str
+            Serialized sampling windows (as serialized by
+            ``FeedbackController::measure_impedance``).
+        '''
+        with closing(self._measure_windows(n_sampling_windows,
+                                           sampling_window_ms,
+                                           delay_between_windows_ms)) \
+                as windows:
+            return ''.join(struct.pack('<HbHb', *window)
+                           for window in windows)
+
+    def _host_data_available(self):
+        '''
+        Returns
+        -------
+        bool
+            ``True`` if the host has sent data that has not been read yet
+            (i.e., like ``Serial.available() > 0`` in the firmware).
+        '''
+        return bool(select.select([self._master_fd], [], [], 0)[0])
+
+    def _measurement_trailer(self, dt_ms):
+        return struct.pack('<4f', dt_ms, 512., 512., self.amplifier_gain)
+
+    def _read_measurement_options(self, payload):
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms, \
+            options = struct.unpack('<fHfB', payload[:11])
+        max_windows = ((MAX_PAYLOAD_LENGTH - 4 * 4) / (2 * (2 + 1)))
+        if (n_sampling_windows > max_windows or sampling_window_ms / 1000. *
+                MAX_SAMPLING_RATE >= 4096):
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        return sampling_window_ms, n_sampling_windows, delay_between_windows_ms
+
+    def _read_state(self, payload):
+        if len(payload) != self.number_of_channels:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        return np.fromstring(payload, dtype=np.uint8) > 0
+
+    # Command handlers
+    # ================
+    def _string_handler(self, value):
+        def _handler(payload):
+            if payload:
+                raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+            return value
+        return _handler
+
+    def _get_aref(self, payload):
+        return struct.pack('<f', self.aref)
+
+    def _analog_read(self, payload):
+        n_channels = ord(payload[0])
+        if len(payload) == 2 and n_channels == 1:
+            n_samples = 1
+        elif len(payload) == 1 + n_channels + 2:
+            n_samples = struct.unpack('<H', payload[-2:])[0]
+        else:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        if n_samples > MAX_PAYLOAD_LENGTH / 2:
+            raise CommandError(Base.RETURN_MAX_PAYLOAD_EXCEEDED)
+        # All analog inputs sit at virtual ground (i.e., half of the input
+        # range).
+        samples = (512 + self.random_state.randn(n_samples)).round()
+        return samples.astype('<u2').tostring()
+
+    def _persistent_read(self, payload):
+        address = struct.unpack('<H', payload)[0]
+        if address >= PERSISTENT_MEMORY_SIZE:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        return chr(self.persistent_memory[address])
+
+    def _persistent_write(self, payload):
+        address, value = struct.unpack('<HB', payload)
+        if address >= PERSISTENT_MEMORY_SIZE:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        self.persistent_memory[address] = value
+        return ''
+
+    def _i2c_scan(self, payload):
+        return ''.join(chr(address) for address in sorted(self.i2c_devices))
+
+    def _i2c_write(self, payload):
+        if not payload:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        device = self.i2c_devices.get(ord(payload[0]))
+        # Like `Wire.endTransmission`, writes to missing devices are ignored.
+        if device is not None and len(payload) > 1:
+            device.write(payload[1:])
+        return ''
+
+    def _i2c_read(self, payload):
+        address, n_bytes = struct.unpack('<BB', payload)
+        device = self.i2c_devices.get(address)
+        if device is None:
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        data = device.read(n_bytes)
+        if len(data) != n_bytes:
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        return data
+
+    def _batch(self, payload):
+        # See `RemoteObject::process_batch`.
+        flags = ord(payload[0])
+        stop_on_error = flags & 1
+        replies = []
+        i = 1
+        while i < len(payload):
+            command, reserved, length = struct.unpack('<BBH',
+                                                      payload[i:i + 4])
+            i += 4
+            if i + length > len(payload):
+                raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+            if command == Base.CMD_BATCH:
+                # Batches can't be nested.
+                return_code, data = Base.RETURN_GENERAL_ERROR, ''
+            else:
+                return_code, data = self.process_command(command,
+                                                         payload[i:i +
+                                                                 length])
+            i += length
+            replies.append(struct.pack('<BBH', command, return_code,
+                                       len(data)) + data)
+            if return_code != Base.RETURN_OK and stop_on_error:
+                break
+        return ''.join(replies)
+
+    def _get_number_of_channels(self, payload):
+        return struct.pack('<H', self.number_of_channels)
+
+    def _get_state_of_all_channels(self, payload):
+        return self.state_of_channels.astype(np.uint8).tostring()
+
+    def _set_state_of_all_channels(self, payload):
+        self.state_of_channels = self._read_state(payload)
+        return ''
+
+    def _get_state_of_channel(self, payload):
+        channel = struct.unpack('<H', payload)[0]
+        if channel >= self.number_of_channels:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        return chr(int(self.state_of_channels[channel]))
+
+    def _set_state_of_channel(self, payload):
+        channel, state = struct.unpack('<HB', payload)
+        if channel >= self.number_of_channels:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        self.state_of_channels[channel] = state > 0
+        return ''
+
+    def _get_waveform_voltage(self, payload):
+        return struct.pack('<f', self.waveform_voltage)
+
+    def _set_waveform_voltage(self, payload):
+        voltage = struct.unpack('<f', payload)[0]
+        if not 0 <= voltage <= self.config['max_waveform_voltage']:
+            raise CommandError(Base.RETURN_BAD_VALUE)
+        self.waveform_voltage = voltage
+        return ''
+
+    def _get_waveform_frequency(self, payload):
+        return struct.pack('<f', self.waveform_frequency)
+
+    def _set_waveform_frequency(self, payload):
+        frequency = struct.unpack('<f', payload)[0]
+        min_frequency, max_frequency = self.config['waveform_frequency_range']
+        # Allow a 1% margin, like the firmware.
+        if not (.99 * min_frequency <= frequency <= 1.01 * max_frequency):
+            raise CommandError(Base.RETURN_BAD_VALUE)
+        self.waveform_frequency = frequency
+        return ''
+
+    def _get_series_resistor_index(self, payload):
+        channel = struct.unpack('<B', payload)[0]
+        if channel > 1:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        return chr(self.series_resistor_index[channel])
+
+    def _set_series_resistor_index(self, payload):
+        channel, index = struct.unpack('<BB', payload)
+        if (channel > 1 or index >=
+                len(self.config['A%d_series_resistance' % channel])):
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        self.series_resistor_index[channel] = index
+        return ''
+
+    def _set_initial_series_resistor_index(self, payload):
+        channel, index = struct.unpack('<Bb', payload)
+        if channel > 1:
+            raise CommandError(Base.RETURN_BAD_INDEX)
+        self.initial_series_resistor_index[channel] = index
+        return ''
+
+    def _series_value_getter(self, name):
+        def _handler(payload):
+            channel = struct.unpack('<B', payload)[0]
+            if channel > 1:
+                raise CommandError(Base.RETURN_BAD_INDEX)
+            values = self.config['A%d_%s' % (channel, name)]
+            return struct.pack('<f', values[self.series_resistor_index
+                                            [channel]])
+        return _handler
+
+    def _series_value_setter(self, name):
+        def _handler(payload):
+            channel, value = struct.unpack('<Bf', payload)
+            if channel > 1:
+                raise CommandError(Base.RETURN_BAD_INDEX)
+            values = self.config['A%d_%s' % (channel, name)]
+            values[self.series_resistor_index[channel]] = value
+            self.save_config()
+            return ''
+        return _handler
+
+    def _get_amplifier_gain(self, payload):
+        return struct.pack('<f', self.amplifier_gain)
+
+    def _set_amplifier_gain(self, payload):
+        value = struct.unpack('<f', payload)[0]
+        if value <= 0:
+            raise CommandError(Base.RETURN_BAD_VALUE)
+        self.amplifier_gain = value
+        if not self.auto_adjust_amplifier_gain:
+            self.config['amplifier_gain'] = value
+            self.save_config()
+        return ''
+
+    def _get_auto_adjust_amplifier_gain(self, payload):
+        return chr(int(self.auto_adjust_amplifier_gain))
+
+    def _set_auto_adjust_amplifier_gain(self, payload):
+        value = struct.unpack('<B', payload)[0]
+        self.config['amplifier_gain'] = 0 if value else self.amplifier_gain
+        self.save_config()
+        return ''
+
+    def _measure_impedance(self, payload):
+        if len(payload) == 11 + self.number_of_channels:
+            self.state_of_channels = self._read_state(payload[11:])
+        elif len(payload) != 11:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms = \
+            self._read_measurement_options(payload)
+        windows = self._measure(n_sampling_windows, sampling_window_ms,
+                                delay_between_windows_ms)
+        return windows + self._measurement_trailer(sampling_window_ms +
+                                                   delay_between_windows_ms)
+
+    def _measure_impedance_stream(self, payload):
+        # See `DMFControlBoard::process_command` in the firmware.  Each frame
+        # is written as a separate reply packet while the stream is running,
+        # so streaming requires the pseudo-terminal (see :meth:`start`).
+        if len(payload) == 13 + self.number_of_channels:
+            state = self._read_state(payload[13:])
+        elif len(payload) == 13:
+            state = None
+        else:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms, \
+            options, n_frames = struct.unpack('<fHfBH', payload[:13])
+        max_windows = ((MAX_PAYLOAD_LENGTH - 4 * 4 - 2) / (2 * (2 + 1)))
+        if (not 0 < n_sampling_windows <= max_windows or sampling_window_ms /
+                1000. * MAX_SAMPLING_RATE >= 4096):
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        if state is not None:
+            self.state_of_channels = state
+        frame = 0
+        while n_frames == 0 or frame < n_frames:
+            windows = self._measure(n_sampling_windows, sampling_window_ms,
+                                    delay_between_windows_ms)
+            # Stop if the host has sent data (i.e., an interrupt), discarding
+            # the frame.
+            if self._host_data_available() or self._stop_event.is_set():
+                break
+            data = (windows +
+                    self._measurement_trailer(sampling_window_ms +
+                                              delay_between_windows_ms) +
+                    struct.pack('<H', frame))
+            self._write(encode_packet(Base.CMD_MEASURE_IMPEDANCE_STREAM ^
+                                      0x80, data + chr(Base.RETURN_OK)))
+            frame = (frame + 1) % (1 << 16)
+        # The final reply marks the end of the stream and only contains the
+        # number of frames that were sent.
+        return struct.pack('<H', frame)
+
+    def _measure_impedance_summary(self, payload):
+        # See `DMFControlBoard::process_command` and
+        # `FeedbackController::measure_impedance` in the firmware.
+        if len(payload) not in (13, 13 + self.number_of_channels):
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms, \
+            options, n_windows_per_summary = struct.unpack('<fHfBH',
+                                                           payload[:13])
+        # The number of sampling windows is not limited by the output buffer
+        # (the measurement stops early if the buffer is full).
+        if (not n_windows_per_summary or not n_sampling_windows or
+                sampling_window_ms / 1000. * MAX_SAMPLING_RATE >= 4096):
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        if len(payload) > 13:
+            self.state_of_channels = self._read_state(payload[13:])
+        max_summaries = (MAX_PAYLOAD_LENGTH - 4 * 4) / SUMMARY_SIZE
+        summaries = []
+        group = []
+        with closing(self._measure_windows(n_sampling_windows,
+                                           sampling_window_ms,
+                                           delay_between_windows_ms)) \
+                as windows:
+            for window in windows:
+                # Close the current group if the series resistor of either
+                # channel has changed.
+                if any(window[i] >= 0 and
+                       any(0 <= grouped[i] != window[i] for grouped in group)
+                       for i in (1, 3)):
+                    if len(summaries) + 1 >= max_summaries:
+                        # There is no room for a new group after closing the
+                        # current one, so discard this window.
+                        break
+                    summaries.append(summarize_windows(group))
+                    group = []
+                group.append(window)
+                if len(group) >= n_windows_per_summary:
+                    summaries.append(summarize_windows(group))
+                    group = []
+                    if len(summaries) >= max_summaries:
+                        break
+        # Serialize the last (partial) group.
+        if group:
+            summaries.append(summarize_windows(group))
+        return ''.join(summaries) + self._measurement_trailer(
+            sampling_window_ms + delay_between_windows_ms)
+
+    def _measure_impedance_settle(self, payload):
+        # See `DMFControlBoard::process_command` and
+        # `FeedbackController::measure_impedance` in the firmware.
+        if len(payload) not in (17, 17 + self.number_of_channels):
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        sampling_window_ms, max_sampling_windows, delay_between_windows_ms, \
+            options, tolerance, n_settle_windows = \
+            struct.unpack('<fHfBfH', payload[:17])
+        # Leave room for the trailing `settled` flag.
+        max_windows = ((MAX_PAYLOAD_LENGTH - 4 * 4 - 1) / (2 * (2 + 1)))
+        if (not n_settle_windows or tolerance < 0 or
+                not 0 < max_sampling_windows <= max_windows or
+                sampling_window_ms / 1000. * MAX_SAMPLING_RATE >= 4096):
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        if len(payload) > 17:
+            self.state_of_channels = self._read_state(payload[17:])
+        windows = []
+        settled = False
+        n_settled = 0
+        reference = 0
+        settle_index = None
+        with closing(self._measure_windows(max_sampling_windows,
+                                           sampling_window_ms,
+                                           delay_between_windows_ms)) \
+                as measured:
+            for window in measured:
+                windows.append(struct.pack('<HbHb', *window))
+                V_hv, hv_index, V_fb, fb_index = window
+                if hv_index < 0 or fb_index < 0 or not V_hv:
+                    n_settled = 0
+                    continue
+                ratio = float(V_fb) / V_hv
+                if (n_settled and (hv_index, fb_index) == settle_index and
+                        abs(ratio - reference) <= tolerance * reference):
+                    n_settled += 1
+                else:
+                    # Start a new band around this window.
+                    reference = ratio
+                    settle_index = hv_index, fb_index
+                    n_settled = 1
+                if n_settled >= n_settle_windows:
+                    settled = True
+                    break
+        return (''.join(windows) +
+                self._measurement_trailer(sampling_window_ms +
+                                          delay_between_windows_ms) +
+                chr(settled))
+
+    def _sweep_channels(self, payload):
+        if len(payload) != 11 + self.number_of_channels:
+            raise CommandError(Base.RETURN_BAD_PACKET_SIZE)
+        channel_mask = self._read_state(payload[11:])
+        sampling_window_ms, n_sampling_windows, delay_between_windows_ms = \
+            self._read_measurement_options(payload)
+        channels = np.flatnonzero(channel_mask)
+        if (len(channels) * n_sampling_windows >
+                (MAX_PAYLOAD_LENGTH - 4 * 4) / (2 * (2 + 1))):
+            raise CommandError(Base.RETURN_GENERAL_ERROR)
+        windows = []
+        # Actuate each channel in the mask on its own, and leave all channels
+        # cleared (see `DMFControlBoard::process_command`).
+        for channel in channels:
+            self.state_of_channels[:] = False
+            self.state_of_channels[channel] = True
+            windows.append(self._measure(n_sampling_windows,
+                                         sampling_window_ms,
+                                         delay_between_windows_ms))
+        self.state_of_channels[:] = False
+        dt_ms = len(channels) * (sampling_window_ms + delay_between_windows_ms)
+        return ''.join(windows) + self._measurement_trailer(dt_ms)
+
+    def _load_config(self, payload):
+        use_defaults = struct.unpack('<B', payload)[0] > 0
+        self.load_config(use_defaults)
+        return ''
+
+    def _get_config_checksum(self, payload):
+        address = Base.PERSISTENT_CONFIG_SETTINGS
+        data = self.persistent_memory[address:address +
+                                      struct.calcsize(CONFIG_SETTINGS_FORMAT)]
+        return struct.pack('<H', crc16(data))
+
+
+def parse_args(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+
+    parser = argparse.ArgumentParser(description='Simulate a DMF control '
+                                     'board on a pseudo-terminal.')
+    parser.add_argument('-n', '--number-of-channels', type=int, default=120)
+    parser.add_argument('--serial-number', type=int, default=0)
+    parser.add_argument('--baud-rate', type=int, default=None,
+                        help='Throttle transfers to baud rate (default: no '
+                        'throttling).')
+    parser.add_argument('--latency-ms', type=float, default=0.,
+                        help='Latency injected before processing each '
+                        'command.')
+    parser.add_argument('--no-realtime', action='store_true',
+                        help='Reply to impedance measurements immediately.')
+    parser.add_argument('--seed', type=int, default=None)
+
+    return parser.parse_args(argv)
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    simulator = SimulatedControlBoard(args.number_of_channels,
+                                      serial_number=args.serial_number,
+                                      baud_rate=args.baud_rate,
+                                      latency_s=1e-3 * args.latency_ms,
+                                      realtime=not args.no_realtime,
+                                      seed=args.seed)
+    with simulator:
+        print 'Simulated control board on port: %s' % simulator.port
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
@@ -269,6 +269,23 @@ uint8_t DMFControlBoard::process_command(uint8_t cmd) {
         return_code_ = RETURN_BAD_PACKET_SIZE;
       }
       break;
+    case CMD_SET_INITIAL_SERIES_RESISTOR_INDEX:
+      if (payload_length() == sizeof(uint8_t) + sizeof(int8_t)) {
+        uint8_t channel = read_uint8();
+        int8_t index = read_int8();
+        if (channel <= 1) {
+          // A negative index (or an index past the last series resistor)
+          // starts measurements with the largest series resistor.
+          feedback_controller_.set_initial_series_resistor_index(channel,
+                                                                 index);
+          return_code_ = RETURN_OK;
+        } else {
+          return_code_ = RETURN_BAD_INDEX;
+        }
+      } else {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      }
+      break;
     case CMD_GET_SERIES_RESISTANCE:
       if (payload_length() == sizeof(uint8_t)) {
         uint8_t channel = read_uint8();
@@ -553,6 +570,284 @@ uint8_t DMFControlBoard::process_command(uint8_t cmd) {
         return_code_ = RETURN_BAD_PACKET_SIZE;
       }
       break;
+    case CMD_MEASURE_IMPEDANCE_STREAM:
+      if (payload_length() < (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+          2 * sizeof(float))) {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      } else {
+        float sampling_window_ms = read_float();
+        uint16_t n_sampling_windows = read_uint16();
+        float delay_between_windows_ms = read_float();
+        uint8_t options = read_uint8();
+        // number of frames to send (0 to stream until interrupted)
+        uint16_t n_frames = read_uint16();
+
+        // decode impedance option bits
+        // IMPOPT: - - - - - - RMS INTLV
+        bool interleave_samples = (options & (1 << INTLV)) > 0;
+        bool rms =  (options & (1 << RMS)) > 0;
+
+        // command packet can optionally include state of the channels
+        if (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+            2 * sizeof(float)) || \
+            (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+                2 * sizeof(float) + number_of_channels_ * sizeof(uint8_t)))) {
+          // make sure that a frame (including the frame sequence number)
+          // fits in the output buffer and that the sampling window length
+          // will not overflow the sum^2 variables
+          if (n_sampling_windows > 0 && \
+              (n_sampling_windows <= (MAX_PAYLOAD_LENGTH - 4 * sizeof(float) \
+                                      - sizeof(uint16_t)) /
+                (FeedbackController::NUMBER_OF_ADC_CHANNELS * \
+                 (sizeof(int8_t) + sizeof(int16_t)))) && \
+                 (sampling_window_ms / 1000 * \
+                   feedback_controller_.MAX_SAMPLING_RATE < 4096)) {
+            return_code_ = RETURN_OK;
+
+            // update the channels (if they were included in the packet)
+            if (payload_length() == (sizeof(uint8_t) + \
+                2 * sizeof(uint16_t) + 2 * sizeof(float) + \
+                number_of_channels_ * sizeof(uint8_t))) {
+              update_all_channels();
+            }
+
+            // Send one reply packet per frame.  Each frame has exactly
+            // `n_sampling_windows` windows and the same layout as the reply
+            // to `CMD_MEASURE_IMPEDANCE`, followed by the frame sequence
+            // number.
+            uint16_t frame = 0;
+            while (n_frames == 0 || frame < n_frames) {
+              watchdog_reset();
+              long start_time = micros();
+              return_code_ = feedback_controller_.measure_impedance(
+                                                     sampling_window_ms,
+                                                     n_sampling_windows,
+                                                     delay_between_windows_ms,
+                                                     waveform_frequency_,
+                                                     interleave_samples,
+                                                     rms);
+              // Stop if there was an error or if the host has sent data
+              // (i.e., an interrupt).  In the latter case, the measurement
+              // may have been cut short, so the frame is discarded.
+              if (return_code_ != RETURN_OK || Serial.available() > 0) {
+                break;
+              }
+              // return the time between sampling windows (dt) in ms
+              float dt_ms = (float)(micros() - start_time) / \
+                  (1000.0 * n_sampling_windows);
+              serialize(&dt_ms, sizeof(dt_ms));
+
+              // return the vgnd values
+              for (uint8_t index = 0;
+                   index < FeedbackController::NUMBER_OF_ADC_CHANNELS;
+                   index++) {
+                serialize(&
+                  feedback_controller_.channels()[index].vgnd_exp_filtered,
+                  sizeof(float));
+              }
+              // return the amplifier gain
+              float gain = amplifier_gain();
+              serialize(&gain, sizeof(float));
+              serialize(&frame, sizeof(frame));
+              send_reply(RETURN_OK);
+              frame++;
+            }
+            // The final reply marks the end of the stream and only contains
+            // the number of frames that were sent.
+            clear_payload();
+            if (return_code_ == RETURN_OK) {
+              serialize(&frame, sizeof(frame));
+            }
+          } else {
+            return_code_ = RETURN_GENERAL_ERROR;
+          }
+        } else {
+          return_code_ = RETURN_BAD_PACKET_SIZE;
+        }
+      }
+      break;
+    case CMD_MEASURE_IMPEDANCE_SUMMARY:
+      if (payload_length() < (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+          2 * sizeof(float))) {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      } else {
+        float sampling_window_ms = read_float();
+        uint16_t n_sampling_windows = read_uint16();
+        float delay_between_windows_ms = read_float();
+        uint8_t options = read_uint8();
+        uint16_t n_windows_per_summary = read_uint16();
+
+        // decode impedance option bits
+        // IMPOPT: - - - - - - RMS INTLV
+        bool interleave_samples = (options & (1 << INTLV)) > 0;
+        bool rms =  (options & (1 << RMS)) > 0;
+
+        // command packet can optionally include state of the channels
+        if (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+            2 * sizeof(float)) || \
+            (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+                2 * sizeof(float) + number_of_channels_ * sizeof(uint8_t)))) {
+          // The number of sampling windows is not limited by the output
+          // buffer (the measurement stops early if the buffer is full), but
+          // the sampling window length must not overflow the sum^2
+          // variables.
+          if (n_windows_per_summary > 0 && n_sampling_windows > 0 && \
+              (sampling_window_ms / 1000 * \
+               feedback_controller_.MAX_SAMPLING_RATE < 4096)) {
+            return_code_ = RETURN_OK;
+
+            // update the channels (if they were included in the packet)
+            if (payload_length() == (sizeof(uint8_t) + \
+                2 * sizeof(uint16_t) + 2 * sizeof(float) + \
+                number_of_channels_ * sizeof(uint8_t))) {
+              update_all_channels();
+            }
+
+            long start_time = micros();
+            return_code_ = feedback_controller_.measure_impedance(
+                                                   sampling_window_ms,
+                                                   n_sampling_windows,
+                                                   delay_between_windows_ms,
+                                                   waveform_frequency_,
+                                                   interleave_samples,
+                                                   rms,
+                                                   n_windows_per_summary);
+            if (return_code_ == RETURN_OK) {
+              // return the time between sampling windows (dt) in ms
+              float dt_ms = (float)(micros() - start_time) / \
+                  (1000.0 * feedback_controller_.n_windows_measured());
+              serialize(&dt_ms, sizeof(dt_ms));
+
+              // return the vgnd values
+              for (uint8_t index = 0;
+                   index < FeedbackController::NUMBER_OF_ADC_CHANNELS;
+                   index++) {
+                serialize(&
+                  feedback_controller_.channels()[index].vgnd_exp_filtered,
+                  sizeof(float));
+              }
+              // return the amplifier gain
+              float gain = amplifier_gain();
+              serialize(&gain, sizeof(float));
+            }
+          } else {
+            return_code_ = RETURN_GENERAL_ERROR;
+          }
+        } else {
+          return_code_ = RETURN_BAD_PACKET_SIZE;
+        }
+      }
+      break;
+    case CMD_MEASURE_IMPEDANCE_SETTLE:
+      if (payload_length() < (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+          3 * sizeof(float))) {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      } else {
+        float sampling_window_ms = read_float();
+        uint16_t max_sampling_windows = read_uint16();
+        float delay_between_windows_ms = read_float();
+        uint8_t options = read_uint8();
+        float settle_tolerance = read_float();
+        uint16_t n_settle_windows = read_uint16();
+
+        // decode impedance option bits
+        // IMPOPT: - - - - - - RMS INTLV
+        bool interleave_samples = (options & (1 << INTLV)) > 0;
+        bool rms =  (options & (1 << RMS)) > 0;
+
+        // command packet can optionally include state of the channels
+        if (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+            3 * sizeof(float)) || \
+            (payload_length() == (sizeof(uint8_t) + 2 * sizeof(uint16_t) + \
+                3 * sizeof(float) + number_of_channels_ * sizeof(uint8_t)))) {
+          // make sure that the number of sampling windows doesn't exceed the
+          // limits of the output buffer (including the trailing `settled`
+          // flag) and that the sampling window length will not overflow the
+          // sum^2 variables
+          if (n_settle_windows > 0 && settle_tolerance >= 0 && \
+              max_sampling_windows > 0 && \
+              (max_sampling_windows <= (MAX_PAYLOAD_LENGTH - 4 * sizeof(float) -
+                                        sizeof(uint8_t)) /
+                (FeedbackController::NUMBER_OF_ADC_CHANNELS * \
+                 (sizeof(int8_t) + sizeof(int16_t)))) && \
+                 (sampling_window_ms / 1000 * \
+                   feedback_controller_.MAX_SAMPLING_RATE < 4096)) {
+            return_code_ = RETURN_OK;
+
+            // update the channels (if they were included in the packet)
+            if (payload_length() == (sizeof(uint8_t) + \
+                2 * sizeof(uint16_t) + 3 * sizeof(float) + \
+                number_of_channels_ * sizeof(uint8_t))) {
+              update_all_channels();
+            }
+
+            long start_time = micros();
+            return_code_ = feedback_controller_.measure_impedance(
+                                                   sampling_window_ms,
+                                                   max_sampling_windows,
+                                                   delay_between_windows_ms,
+                                                   waveform_frequency_,
+                                                   interleave_samples,
+                                                   rms,
+                                                   0,
+                                                   settle_tolerance,
+                                                   n_settle_windows);
+            if (return_code_ == RETURN_OK) {
+              // return the time between sampling windows (dt) in ms
+              float dt_ms = (float)(micros() - start_time) / \
+                  (1000.0 * feedback_controller_.n_windows_measured());
+              serialize(&dt_ms, sizeof(dt_ms));
+
+              // return the vgnd values
+              for (uint8_t index = 0;
+                   index < FeedbackController::NUMBER_OF_ADC_CHANNELS;
+                   index++) {
+                serialize(&
+                  feedback_controller_.channels()[index].vgnd_exp_filtered,
+                  sizeof(float));
+              }
+              // return the amplifier gain
+              float gain = amplifier_gain();
+              serialize(&gain, sizeof(float));
+              // return whether the measurement stopped because the signal
+              // settled
+              uint8_t settled = feedback_controller_.settled();
+              serialize(&settled, sizeof(settled));
+            }
+          } else {
+            return_code_ = RETURN_GENERAL_ERROR;
+          }
+        } else {
+          return_code_ = RETURN_BAD_PACKET_SIZE;
+        }
+      }
+      break;
+    case CMD_SET_ACTUATION_PROGRAM:
+      if (payload_length() > MAX_ACTUATION_PROGRAM_LENGTH) {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      } else {
+        uint16_t n_steps;
+        uint16_t length = payload_length();
+        for (uint16_t i = 0; i < length; i++) {
+          actuation_program_[i] = read_uint8();
+        }
+        return_code_ = validate_actuation_program(length, &n_steps);
+        if (return_code_ == RETURN_OK) {
+          actuation_program_length_ = length;
+          serialize(&n_steps, sizeof(n_steps));
+        } else {
+          // discard invalid program
+          actuation_program_length_ = 0;
+        }
+      }
+      break;
+    case CMD_RUN_ACTUATION_PROGRAM:
+      if (payload_length() == 0) {
+        return_code_ = run_actuation_program();
+      } else {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      }
+      break;
     case CMD_LOAD_CONFIG:
       if (payload_length() == 1) {
         return_code_ = RETURN_OK;
@@ -562,6 +857,15 @@ uint8_t DMFControlBoard::process_command(uint8_t cmd) {
         return_code_ = RETURN_BAD_PACKET_SIZE;
       }
       break;
+    case CMD_GET_CONFIG_CHECKSUM:
+      if (payload_length() == 0) {
+        return_code_ = RETURN_OK;
+        uint16_t checksum = config_checksum();
+        serialize(&checksum, sizeof(checksum));
+      } else {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      }
+      break;
 #if ___ATX_POWER_CONTROL___
     case CMD_GET_POWER_SUPPLY_PIN:
       if (payload_length() == 0) {
@@ -679,6 +983,9 @@ void DMFControlBoard::begin() {
   // default amplifier gain
   amplifier_gain_ = 300;
 
+  // no actuation program
+  actuation_program_length_ = 0;
+
   load_config();
 
   // set all digital pots
@@ -857,6 +1164,213 @@ void DMFControlBoard::update_all_channels() {
   }
 }
 
+// set the state of all channels from a bit-packed array (bit `i % 8` of
+// byte `i / 8` is the state of channel `i`)
+void DMFControlBoard::set_all_channels(const uint8_t* packed_state) {
+  // See update_all_channels
+  uint8_t data[2];
+  for (uint8_t chip=0; chip<number_of_channels_/40; chip++) {
+    for (uint8_t port = 0; port < 5; port++) {
+      data[0] = PCA9505_OUTPUT_PORT_REGISTER_ + port;
+      // outputs are active-low
+      data[1] = ~packed_state[5 * chip + port];
+      i2c_write(config_settings_.switching_board_i2c_address + chip,
+                data, 2);
+    }
+  }
+}
+
+// Check that an actuation program is well formed and that the results of
+// running it will fit in a single reply packet.
+//
+// A program is a sequence of variable length steps.  Each step contains:
+//
+//  - Step flags (`uint8_t`, see `STEP_SET_STATE`, etc.).
+//  - Step duration in ms (`uint16_t`), including the time needed to apply
+//    the step settings and to measure impedance.
+//  - If `STEP_SET_STATE`: bit-packed state of all channels (one bit per
+//    channel).
+//  - If `STEP_SET_VOLTAGE`: waveform voltage (`float`).
+//  - If `STEP_SET_FREQUENCY`: waveform frequency (`float`).
+//  - If `STEP_MEASURE`: sampling window length in ms (`float`), number of
+//    sampling windows (`uint16_t`) and impedance options (`uint8_t`, see
+//    `INTLV` and `RMS`).
+uint8_t DMFControlBoard::validate_actuation_program(uint16_t length,
+                                                    uint16_t* n_steps) {
+  uint16_t offset = 0;
+  // results trailer: vgnd (one float per channel) and amplifier gain
+  uint32_t reply_length = 3 * sizeof(float);
+  *n_steps = 0;
+  while (offset < length) {
+    if (length - offset < sizeof(uint8_t) + sizeof(uint16_t)) {
+      return RETURN_BAD_PACKET_SIZE;
+    }
+    uint8_t flags = actuation_program_[offset];
+    offset += sizeof(uint8_t) + sizeof(uint16_t);
+    if (flags & (1 << STEP_SET_STATE)) {
+      offset += number_of_channels_ / 8;
+    }
+    if (flags & (1 << STEP_SET_VOLTAGE)) {
+      offset += sizeof(float);
+    }
+    if (flags & (1 << STEP_SET_FREQUENCY)) {
+      offset += sizeof(float);
+    }
+    // step results: start time (`uint32_t`), number of sampling windows
+    // (`uint16_t`) and time between windows (`float`)
+    reply_length += sizeof(uint32_t) + sizeof(uint16_t) + sizeof(float);
+    if (flags & (1 << STEP_MEASURE)) {
+      if (length - offset < sizeof(float) + sizeof(uint16_t) + \
+          sizeof(uint8_t)) {
+        return RETURN_BAD_PACKET_SIZE;
+      }
+      float sampling_window_ms;
+      uint16_t n_sampling_windows;
+      memcpy(&sampling_window_ms, &actuation_program_[offset], sizeof(float));
+      memcpy(&n_sampling_windows, &actuation_program_[offset + sizeof(float)],
+             sizeof(uint16_t));
+      offset += sizeof(float) + sizeof(uint16_t) + sizeof(uint8_t);
+      // make sure that the sampling window length will not overflow the
+      // sum^2 variables
+      if (n_sampling_windows == 0 || sampling_window_ms / 1000 * \
+          feedback_controller_.MAX_SAMPLING_RATE >= 4096) {
+        return RETURN_GENERAL_ERROR;
+      }
+      reply_length += n_sampling_windows * \
+        FeedbackController::NUMBER_OF_ADC_CHANNELS * \
+        (sizeof(int8_t) + sizeof(int16_t));
+    }
+    if (offset > length) {
+      return RETURN_BAD_PACKET_SIZE;
+    }
+    (*n_steps)++;
+  }
+  if (reply_length > MAX_PAYLOAD_LENGTH) {
+    return RETURN_GENERAL_ERROR;
+  }
+  return RETURN_OK;
+}
+
+// Run the actuation program set by `CMD_SET_ACTUATION_PROGRAM`.
+//
+// Steps are scheduled relative to the start of the program (i.e., step `i`
+// is started `sum(duration[:i])` ms after the program starts), so delays do
+// not accumulate from step to step.
+//
+// The results of each step are serialized as:
+//
+//  - Actual start time of the step in us, relative to the start of the
+//    program (`uint32_t`).
+//  - Number of sampling windows measured (`uint16_t`, `0` if the step does
+//    not measure impedance).
+//  - Time between sampling windows in ms (`float`).
+//  - Sampling windows, as in the reply to `CMD_MEASURE_IMPEDANCE`.
+//
+// followed by the vgnd value of each feedback channel and the amplifier gain
+// (`float`) after the last step.
+//
+// The program stops early if there is data available on the serial port
+// (i.e., an interrupt).
+uint8_t DMFControlBoard::run_actuation_program() {
+  uint8_t return_code = RETURN_OK;
+  uint16_t offset = 0;
+  // number of bytes serialized so far (the reply starts at the beginning of
+  // the payload buffer)
+  uint16_t reply_offset = 0;
+  uint32_t step_start_us = 0;
+  uint32_t program_start_us = micros();
+
+  while (offset < actuation_program_length_ && return_code == RETURN_OK) {
+    watchdog_reset();
+    uint8_t flags = actuation_program_[offset];
+    uint16_t duration_ms;
+    memcpy(&duration_ms, &actuation_program_[offset + sizeof(uint8_t)],
+           sizeof(uint16_t));
+    offset += sizeof(uint8_t) + sizeof(uint16_t);
+
+    // wait until the scheduled start of the step
+    while (micros() - program_start_us < step_start_us) {}
+    uint32_t start_us = micros() - program_start_us;
+
+    if (flags & (1 << STEP_SET_STATE)) {
+      set_all_channels(&actuation_program_[offset]);
+      offset += number_of_channels_ / 8;
+    }
+    if (flags & (1 << STEP_SET_VOLTAGE)) {
+      float voltage;
+      memcpy(&voltage, &actuation_program_[offset], sizeof(float));
+      offset += sizeof(float);
+      return_code = set_waveform_voltage(voltage);
+    }
+    if (flags & (1 << STEP_SET_FREQUENCY)) {
+      float frequency;
+      memcpy(&frequency, &actuation_program_[offset], sizeof(float));
+      offset += sizeof(float);
+      if (return_code == RETURN_OK) {
+        return_code = set_waveform_frequency(frequency);
+      }
+    }
+    if (return_code != RETURN_OK) {
+      break;
+    }
+
+    uint16_t n_windows = 0;
+    float dt_ms = 0;
+    serialize(&start_us, sizeof(start_us));
+    // the number of windows and dt are updated below, once they are known
+    uint16_t step_header_offset = reply_offset + sizeof(start_us);
+    serialize(&n_windows, sizeof(n_windows));
+    serialize(&dt_ms, sizeof(dt_ms));
+    reply_offset += sizeof(start_us) + sizeof(n_windows) + sizeof(dt_ms);
+
+    if (flags & (1 << STEP_MEASURE)) {
+      float sampling_window_ms;
+      uint16_t n_sampling_windows;
+      memcpy(&sampling_window_ms, &actuation_program_[offset], sizeof(float));
+      offset += sizeof(float);
+      memcpy(&n_sampling_windows, &actuation_program_[offset],
+             sizeof(uint16_t));
+      offset += sizeof(uint16_t);
+      uint8_t options = actuation_program_[offset];
+      offset += sizeof(uint8_t);
+
+      long measure_start_us = micros();
+      return_code = feedback_controller_.measure_impedance(
+          sampling_window_ms, n_sampling_windows, 0, waveform_frequency_,
+          (options & (1 << INTLV)) > 0, (options & (1 << RMS)) > 0);
+      n_windows = feedback_controller_.n_windows_measured();
+      if (n_windows > 0) {
+        dt_ms = (float)(micros() - measure_start_us) / (1000.0 * n_windows);
+      }
+      memcpy(payload() + step_header_offset, &n_windows, sizeof(n_windows));
+      memcpy(payload() + step_header_offset + sizeof(n_windows), &dt_ms,
+             sizeof(dt_ms));
+      reply_offset += n_windows * FeedbackController::NUMBER_OF_ADC_CHANNELS * \
+        (sizeof(int8_t) + sizeof(int16_t));
+    }
+
+    // There is a new request available on the serial port.  Stop the
+    // program so we can service the new request.
+    if (Serial.available() > 0) { break; }
+
+    step_start_us += 1000UL * duration_ms;
+  }
+
+  if (return_code == RETURN_OK) {
+    // return the vgnd values
+    for (uint8_t index = 0;
+         index < FeedbackController::NUMBER_OF_ADC_CHANNELS;
+         index++) {
+      serialize(&feedback_controller_.channels()[index].vgnd_exp_filtered,
+                sizeof(float));
+    }
+    // return the amplifier gain
+    float gain = amplifier_gain();
+    serialize(&gain, sizeof(float));
+  }
+  return return_code;
+}
+
 // clear the state of all channels
 void DMFControlBoard::clear_all_channels() {
   // See update_all_channels
@@ -1036,6 +1550,18 @@ void DMFControlBoard::load_config(bool use_defaults) {
   }
 }
 
+/* Compute a CRC-16 of the configuration settings (including the series
+ * resistor and capacitor values) as stored in persistent memory, so the host
+ * can tell whether the settings changed since it last read them. */
+uint16_t DMFControlBoard::config_checksum() {
+  uint16_t crc = 0xFFFF;
+  for (uint16_t i = 0; i < sizeof(ConfigSettings); i++) {
+    crc = update_crc(crc, this->persistent_read(PERSISTENT_CONFIG_SETTINGS +
+                                                i));
+  }
+  return crc;
+}
+
 void DMFControlBoard::save_config() {
   uint8_t* p = (uint8_t * )&config_settings_;
   for (uint16_t i = 0; i < sizeof(ConfigSettings); i++) {
@@ -1297,6 +1823,14 @@ uint8_t DMFControlBoard::set_series_resistor_index(const uint8_t channel,
                             "set_series_resistor_index()", index);
 }
 
+uint8_t DMFControlBoard::set_initial_series_resistor_index(
+                                                    const uint8_t channel,
+                                                    const int8_t index) {
+    serialize(&channel, sizeof(channel));
+    return send_set_command(CMD_SET_INITIAL_SERIES_RESISTOR_INDEX,
+                            "set_initial_series_resistor_index()", index);
+}
+
 uint8_t DMFControlBoard::set_series_resistance(const uint8_t channel,
                                                float resistance) {
     serialize(&channel, sizeof(channel));
@@ -1477,6 +2011,227 @@ std::vector<float> DMFControlBoard::get_impedance_data(uint8_t cmd) {
   return std::vector<float>(); // return an empty vector
 }
 
+void DMFControlBoard::measure_impedance_stream_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t n_sampling_windows_per_frame,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      uint16_t n_frames,
+                                      const std::vector<uint8_t> state) {
+  const char* function_name = "measure_impedance_stream_non_blocking()";
+  log_separator();
+  log_message("send command", function_name);
+  serialize(&sampling_window_ms, sizeof(sampling_window_ms));
+  serialize(&n_sampling_windows_per_frame,
+            sizeof(n_sampling_windows_per_frame));
+  serialize(&delay_between_windows_ms, sizeof(delay_between_windows_ms));
+
+  // set impedance options
+  // IMPOPT: - - - - - - RMS INTLV
+  uint8_t options = (interleave_samples << INTLV) + \
+    (rms << RMS);
+
+  serialize(&options, sizeof(options));
+  serialize(&n_frames, sizeof(n_frames));
+  if (state.size()) {
+    serialize(&state[0], state.size() * sizeof(uint8_t));
+  }
+  send_non_blocking_command(CMD_MEASURE_IMPEDANCE_STREAM);
+}
+
+std::vector<float> DMFControlBoard::get_impedance_stream_frame() {
+  const char* function_name = "get_impedance_stream_frame()";
+  if (validate_reply(CMD_MEASURE_IMPEDANCE_STREAM) == RETURN_OK) {
+    if (payload_length() == sizeof(uint16_t)) {
+      // end of stream (payload only contains the number of frames sent)
+      log_message(str(format("End of stream (%d frames)") % read_uint16())
+                  .c_str(), function_name);
+      return std::vector<float>();
+    }
+    uint16_t n_samples = (payload_length() - 4 * sizeof(float) -
+                          sizeof(uint16_t)) / \
+        (2 * sizeof(int16_t) + 2 * sizeof(int8_t));
+    log_message(str(format("Read %d impedance samples") % n_samples).c_str(),
+                function_name);
+    std::vector <float> frame_buffer(4 * n_samples + 5);
+    for (uint16_t i = 0; i < n_samples; i++) {
+      frame_buffer[4 * i] = read_uint16();     // V_hv
+      frame_buffer[4 * i + 1] = read_int8();  // hv_resistor
+      frame_buffer[4 * i + 2] = read_uint16(); // V_fb
+      frame_buffer[4 * i + 3] = read_int8();  // fb_resistor
+    }
+    for (uint16_t i = 0; i < 4; i++) {
+      frame_buffer[4 * n_samples + i] = read_float();
+    }
+    frame_buffer[4 * n_samples + 4] = read_uint16(); // sequence number
+    // keep listening for the next frame
+    expect_reply(CMD_MEASURE_IMPEDANCE_STREAM);
+    return frame_buffer;
+  }
+  return std::vector<float>(); // return an empty vector
+}
+
+void DMFControlBoard::measure_impedance_summary_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t n_sampling_windows,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      uint16_t n_windows_per_summary,
+                                      const std::vector<uint8_t> state) {
+  const char* function_name = "measure_impedance_summary_non_blocking()";
+  log_separator();
+  log_message("send command", function_name);
+  serialize(&sampling_window_ms, sizeof(sampling_window_ms));
+  serialize(&n_sampling_windows, sizeof(n_sampling_windows));
+  serialize(&delay_between_windows_ms, sizeof(delay_between_windows_ms));
+
+  // set impedance options
+  // IMPOPT: - - - - - - RMS INTLV
+  uint8_t options = (interleave_samples << INTLV) + \
+    (rms << RMS);
+
+  serialize(&options, sizeof(options));
+  serialize(&n_windows_per_summary, sizeof(n_windows_per_summary));
+  if (state.size()) {
+    serialize(&state[0], state.size() * sizeof(uint8_t));
+  }
+  send_non_blocking_command(CMD_MEASURE_IMPEDANCE_SUMMARY);
+}
+
+std::vector<float> DMFControlBoard::get_measure_impedance_summary_data() {
+  const char* function_name = "get_measure_impedance_summary_data()";
+  if (validate_reply(CMD_MEASURE_IMPEDANCE_SUMMARY) == RETURN_OK) {
+    // Each group summary contains the number of windows in the group,
+    // followed by the resistor index, number of saturated windows, and the
+    // mean, min, max and last values for each channel.
+    const uint8_t summary_size = sizeof(uint16_t) + \
+      2 * (2 * sizeof(uint8_t) + 4 * sizeof(uint16_t));
+    const uint8_t values_per_summary = 13;
+    uint16_t n_summaries = (payload_length() - 4 * sizeof(float)) / \
+      summary_size;
+    log_message(str(format("Read %d impedance summaries") % n_summaries)
+                .c_str(), function_name);
+    std::vector <float> summary_buffer(values_per_summary * n_summaries + 4);
+    for (uint16_t i = 0; i < n_summaries; i++) {
+      uint32_t j = values_per_summary * i;
+      summary_buffer[j] = read_uint16();  // n_windows
+      for (uint8_t channel = 0; channel < 2; channel++) {
+        summary_buffer[j + 1] = read_int8();  // resistor index
+        summary_buffer[j + 2] = read_uint8();  // n_saturated
+        summary_buffer[j + 3] = read_uint16();  // mean
+        summary_buffer[j + 4] = read_uint16();  // min
+        summary_buffer[j + 5] = read_uint16();  // max
+        summary_buffer[j + 6] = read_uint16();  // last
+        j += 6;
+      }
+    }
+    for (uint16_t i = 0; i < 4; i++) {
+      summary_buffer[values_per_summary * n_summaries + i] = read_float();
+    }
+    return summary_buffer;
+  }
+  return std::vector<float>(); // return an empty vector
+}
+
+void DMFControlBoard::measure_impedance_settle_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t max_sampling_windows,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      float settle_tolerance,
+                                      uint16_t n_settle_windows,
+                                      const std::vector<uint8_t> state) {
+  const char* function_name = "measure_impedance_settle_non_blocking()";
+  log_separator();
+  log_message("send command", function_name);
+  serialize(&sampling_window_ms, sizeof(sampling_window_ms));
+  serialize(&max_sampling_windows, sizeof(max_sampling_windows));
+  serialize(&delay_between_windows_ms, sizeof(delay_between_windows_ms));
+
+  // set impedance options
+  // IMPOPT: - - - - - - RMS INTLV
+  uint8_t options = (interleave_samples << INTLV) + \
+    (rms << RMS);
+
+  serialize(&options, sizeof(options));
+  serialize(&settle_tolerance, sizeof(settle_tolerance));
+  serialize(&n_settle_windows, sizeof(n_settle_windows));
+  if (state.size()) {
+    serialize(&state[0], state.size() * sizeof(uint8_t));
+  }
+  send_non_blocking_command(CMD_MEASURE_IMPEDANCE_SETTLE);
+}
+
+std::vector<float> DMFControlBoard::get_measure_impedance_settle_data() {
+  // The reply has the same layout as the reply to `CMD_MEASURE_IMPEDANCE`,
+  // followed by a flag indicating whether the signal settled.
+  std::vector<float> impedance_buffer = \
+    get_impedance_data(CMD_MEASURE_IMPEDANCE_SETTLE);
+  if (impedance_buffer.size()) {
+    impedance_buffer.push_back(read_uint8());
+  }
+  return impedance_buffer;
+}
+
+uint16_t DMFControlBoard::set_actuation_program(
+                                      const std::vector<uint8_t> program) {
+  const char* function_name = "set_actuation_program()";
+  log_separator();
+  log_message("send command", function_name);
+  if (program.size()) {
+    serialize(&program[0], program.size() * sizeof(uint8_t));
+  }
+  if (send_command(CMD_SET_ACTUATION_PROGRAM) == RETURN_OK) {
+    uint16_t n_steps = read_uint16();
+    log_message(str(format("n_steps=%d") % n_steps).c_str(), function_name);
+    return n_steps;
+  }
+  return 0;
+}
+
+void DMFControlBoard::run_actuation_program_non_blocking() {
+  const char* function_name = "run_actuation_program_non_blocking()";
+  log_separator();
+  log_message("send command", function_name);
+  send_non_blocking_command(CMD_RUN_ACTUATION_PROGRAM);
+}
+
+std::vector<float> DMFControlBoard::get_actuation_program_results() {
+  const char* function_name = "get_actuation_program_results()";
+  std::vector<float> results;
+  if (validate_reply(CMD_RUN_ACTUATION_PROGRAM) == RETURN_OK) {
+    // Each step contains the start time (in us), the number of sampling
+    // windows and the time between windows, followed by the sampling
+    // windows (4 values per window).  The steps are followed by the vgnd
+    // values and the amplifier gain.
+    const uint16_t trailer_length = 3 * sizeof(float);
+    const uint16_t window_length = 2 * (sizeof(uint16_t) + sizeof(int8_t));
+    uint16_t n_steps = 0;
+    while (payload_length() - bytes_read() > trailer_length) {
+      results.push_back(read<uint32_t>());  // start time
+      uint16_t n_windows = read_uint16();
+      results.push_back(n_windows);
+      results.push_back(read_float());  // dt_ms
+      for (uint16_t i = 0; i < n_windows; i++) {
+        results.push_back(read_uint16());  // V_hv
+        results.push_back(read_int8());  // hv_resistor
+        results.push_back(read_uint16());  // V_fb
+        results.push_back(read_int8());  // fb_resistor
+      }
+      n_steps++;
+    }
+    for (uint16_t i = 0; i < 3; i++) {
+      results.push_back(read_float());
+    }
+    log_message(str(format("Read results of %d steps") % n_steps).c_str(),
+                function_name);
+  }
+  return results;
+}
+
 uint8_t DMFControlBoard::load_config(bool use_defaults) {
 	const char* function_name = "load_config()";
   log_separator();
@@ -1489,4 +2244,9 @@ uint8_t DMFControlBoard::load_config(bool use_defaults) {
   return return_code();
 }
 
+uint16_t DMFControlBoard::config_checksum() {
+  return send_read_command<uint16_t>(CMD_GET_CONFIG_CHECKSUM,
+                                     "config_checksum()");
+}
+
 #endif // defined(AVR) || defined(__SAM3X8E__)
@@ -52,6 +52,15 @@ public:
   static const uint8_t INTLV = 0;
   static const uint8_t RMS = 1;
 
+  // actuation program step flags (bit definitions)
+  // STEP: - - - - MEASURE FREQUENCY VOLTAGE STATE
+  static const uint8_t STEP_SET_STATE = 0;
+  static const uint8_t STEP_SET_VOLTAGE = 1;
+  static const uint8_t STEP_SET_FREQUENCY = 2;
+  static const uint8_t STEP_MEASURE = 3;
+  // maximum size (in bytes) of an actuation program
+  static const uint16_t MAX_ACTUATION_PROGRAM_LENGTH = 512;
+
 #if ___HARDWARE_MAJOR_VERSION___ == 1
   static const uint8_t WAVEFORM_SELECT_ = 9;
 #endif
@@ -239,6 +248,13 @@ public:
   static const uint8_t CMD_MEASURE_IMPEDANCE =              0xF4;
   static const uint8_t CMD_LOAD_CONFIG =                    0xF5;
   static const uint8_t CMD_SWEEP_CHANNELS =                 0xF6;
+  static const uint8_t CMD_MEASURE_IMPEDANCE_STREAM =       0xF7;
+  static const uint8_t CMD_MEASURE_IMPEDANCE_SUMMARY =      0xF8;
+  static const uint8_t CMD_MEASURE_IMPEDANCE_SETTLE =       0xF9;
+  static const uint8_t CMD_SET_ACTUATION_PROGRAM =          0xFA;
+  static const uint8_t CMD_RUN_ACTUATION_PROGRAM =          0xFB;
+  static const uint8_t CMD_GET_CONFIG_CHECKSUM =            0xFC;
+  static const uint8_t CMD_SET_INITIAL_SERIES_RESISTOR_INDEX = 0xFD;
 
   //////////////////////////////////////////////////////////////////////////////
   //
@@ -317,6 +333,20 @@ public:
         return std::string("CMD_MEASURE_IMPEDANCE");
       } else if (command == CMD_SWEEP_CHANNELS) {
         return std::string("CMD_SWEEP_CHANNELS");
+      } else if (command == CMD_MEASURE_IMPEDANCE_STREAM) {
+        return std::string("CMD_MEASURE_IMPEDANCE_STREAM");
+      } else if (command == CMD_MEASURE_IMPEDANCE_SUMMARY) {
+        return std::string("CMD_MEASURE_IMPEDANCE_SUMMARY");
+      } else if (command == CMD_MEASURE_IMPEDANCE_SETTLE) {
+        return std::string("CMD_MEASURE_IMPEDANCE_SETTLE");
+      } else if (command == CMD_SET_ACTUATION_PROGRAM) {
+        return std::string("CMD_SET_ACTUATION_PROGRAM");
+      } else if (command == CMD_RUN_ACTUATION_PROGRAM) {
+        return std::string("CMD_RUN_ACTUATION_PROGRAM");
+      } else if (command == CMD_GET_CONFIG_CHECKSUM) {
+        return std::string("CMD_GET_CONFIG_CHECKSUM");
+      } else if (command == CMD_SET_INITIAL_SERIES_RESISTOR_INDEX) {
+        return std::string("CMD_SET_INITIAL_SERIES_RESISTOR_INDEX");
 #if ___ATX_POWER_CONTROL___
       } else if (command == CMD_GET_ATX_POWER_STATE) {
         return std::string("CMD_GET_ATX_POWER_STATE");
@@ -355,6 +385,8 @@ public:
   uint8_t set_waveform(bool waveform);
   uint8_t set_series_resistor_index(const uint8_t channel,
                                     const uint8_t index);
+  uint8_t set_initial_series_resistor_index(const uint8_t channel,
+                                            const int8_t index);
   uint8_t set_series_resistance(const uint8_t channel,
                                 float resistance);
   uint8_t set_series_capacitance(const uint8_t channel,
@@ -383,6 +415,37 @@ public:
                                    const std::vector<uint8_t> channel_mask);
   std::vector<float> get_sweep_channels_data();
   std::vector<float> get_impedance_data(uint8_t cmd);
+  void measure_impedance_stream_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t n_sampling_windows_per_frame,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      uint16_t n_frames,
+                                      const std::vector<uint8_t> state);
+  std::vector<float> get_impedance_stream_frame();
+  void measure_impedance_summary_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t n_sampling_windows,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      uint16_t n_windows_per_summary,
+                                      const std::vector<uint8_t> state);
+  std::vector<float> get_measure_impedance_summary_data();
+  void measure_impedance_settle_non_blocking(
+                                      float sampling_window_ms,
+                                      uint16_t max_sampling_windows,
+                                      float delay_between_windows_ms,
+                                      bool interleave_samples,
+                                      bool rms,
+                                      float settle_tolerance,
+                                      uint16_t n_settle_windows,
+                                      const std::vector<uint8_t> state);
+  std::vector<float> get_measure_impedance_settle_data();
+  uint16_t set_actuation_program(const std::vector<uint8_t> program);
+  void run_actuation_program_non_blocking();
+  std::vector<float> get_actuation_program_results();
   std::vector<float> measure_impedance(float sampling_window_ms,
                                        uint16_t n_sampling_windows,
                                        float delay_between_windows_ms,
@@ -397,6 +460,7 @@ public:
                                     const std::vector<uint8_t> channel_mask);
   uint8_t reset_config_to_defaults() { return load_config(true); }
   uint8_t load_config(bool use_defaults);
+  uint16_t config_checksum();
 
   std::string host_name() { return NAME_; }
   std::string host_manufacturer() { return MANUFACTURER_; }
@@ -531,11 +595,15 @@ private:
 #if defined(AVR) || defined(__SAM3X8E__)
   uint8_t update_channel(const uint16_t channel, const uint8_t state);
   void update_all_channels();
+  void set_all_channels(const uint8_t* packed_state);
+  uint8_t validate_actuation_program(uint16_t length, uint16_t* n_steps);
+  uint8_t run_actuation_program();
   void send_spi(uint8_t pin, uint8_t address, uint8_t data);
   uint8_t set_pot(uint8_t index, uint8_t value);
   void load_config(bool use_defaults=false);
   void save_config();
   version_t config_version();
+  uint16_t config_checksum();
 #endif
 
   //private members
@@ -548,6 +616,8 @@ private:
   float amplifier_gain_;
   bool auto_adjust_amplifier_gain_;
   ConfigSettings config_settings_;
+  uint8_t actuation_program_[MAX_ACTUATION_PROGRAM_LENGTH];
+  uint16_t actuation_program_length_;
 #endif  // #ifdef AVR
 };
 #endif // _DMF_CONTROL_BOARD_H_
@@ -12,6 +12,12 @@ FeedbackController::ADCChannel FeedbackController::channels_[] = {
     FeedbackController::ADCChannel(),
     FeedbackController::ADCChannel()
 };
+int8_t FeedbackController::initial_resistor_index_[] = {-1, -1};
+FeedbackController::WindowSummary FeedbackController::summaries_[
+  FeedbackController::NUMBER_OF_ADC_CHANNELS];
+uint16_t FeedbackController::summary_n_windows_;
+uint16_t FeedbackController::n_windows_measured_;
+bool FeedbackController::settled_;
 
 void FeedbackController::begin(DMFControlBoard* parent,
                                uint8_t hv_channel,
@@ -203,7 +209,10 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
                                           float delay_between_windows_ms,
                                           float frequency,
                                           bool interleave_samples,
-                                          bool rms) {
+                                          bool rms,
+                                          uint16_t n_windows_per_summary,
+                                          float settle_tolerance,
+                                          uint16_t n_settle_windows) {
   // # `measure_impedance` #
   //
   // ## Pins ##
@@ -246,6 +255,30 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
   //  - High-voltage resistor index.
   //  - Feedback amplitude.
   //  - Feedback resistor index.
+  //
+  // ## Summary mode ##
+  //
+  // If `n_windows_per_summary` is greater than zero, sampling windows are
+  // aggregated in groups of (up to) `n_windows_per_summary` windows and only
+  // one summary per group is serialized (see `serialize_summaries`).
+  //
+  // A group is closed early if the series resistor of either channel
+  // changes, such that all unsaturated windows in a group were measured with
+  // the same series resistor.  This way, the host can apply the
+  // (resistor-dependent) transfer functions to the aggregated values.
+  // Measurement stops early if there is no room left in the output buffer
+  // for another summary.
+  //
+  // ## Early stop ##
+  //
+  // If `n_settle_windows` is greater than zero, measurement stops as soon as
+  // the ratio of the feedback and high-voltage amplitudes (which is
+  // proportional to the device capacitance for a fixed pair of series
+  // resistors) stays within `settle_tolerance` (relative to the ratio of the
+  // first window in the band) for `n_settle_windows` consecutive windows.
+  // The band is restarted whenever either channel saturates or changes
+  // series resistor.  Use `settled()` to check whether the measurement
+  // ended early.
 
   // save the rms flag
   rms_ =  rms;
@@ -279,9 +312,15 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
     original_resistor_index[channel_index] = \
       channels_[channel_index].series_resistor_index;
 
-    // enable the largest series resistors
-    resistor_index[channel_index] = \
-      parent_->config_settings().n_series_resistors(channel_index) - 1;
+    // enable the initial series resistors predicted by the host (if set and
+    // valid), otherwise the largest series resistors
+    uint8_t n_series_resistors = \
+      parent_->config_settings().n_series_resistors(channel_index);
+    resistor_index[channel_index] = initial_resistor_index_[channel_index];
+    if (resistor_index[channel_index] < 0 ||
+        resistor_index[channel_index] >= n_series_resistors) {
+      resistor_index[channel_index] = n_series_resistors - 1;
+    }
     set_series_resistor_index(channel_index, resistor_index[channel_index]);
   }
 
@@ -329,6 +368,15 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
   }
 
   current_limit_exceeded_ = false;
+  n_windows_measured_ = 0;
+  summary_n_windows_ = 0;
+  uint16_t n_summaries = 0;
+  const uint16_t max_summaries = (parent_->MAX_PAYLOAD_LENGTH - \
+                                  4 * sizeof(float)) / SUMMARY_SIZE;
+  settled_ = false;
+  uint16_t n_settled = 0;
+  float settle_reference = 0;
+  int8_t settle_resistor_index[NUMBER_OF_ADC_CHANNELS];
 
   for (uint16_t i = 0; i < n_sampling_windows; i++) {
     for (uint8_t channel_index = 0; channel_index < NUMBER_OF_ADC_CHANNELS;
@@ -500,9 +548,75 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
             channels_[channel_index].series_resistor_index + 1);
       }
 
-      // Serialize measurements to the return buffer.
-      parent_->serialize(&measured_pk_pk[channel_index], sizeof(uint16_t));
-      parent_->serialize(&resistor_index[channel_index], sizeof(uint8_t));
+      if (n_windows_per_summary == 0) {
+        // Serialize measurements to the return buffer.
+        parent_->serialize(&measured_pk_pk[channel_index], sizeof(uint16_t));
+        parent_->serialize(&resistor_index[channel_index], sizeof(uint8_t));
+      }
+    }
+    n_windows_measured_++;
+
+    if (n_windows_per_summary > 0) {
+      // Close the current group if the series resistor of either channel
+      // has changed.
+      bool resistor_changed = false;
+      for (uint8_t channel_index = 0; channel_index < NUMBER_OF_ADC_CHANNELS;
+           channel_index++) {
+        WindowSummary& summary = summaries_[channel_index];
+        if (summary_n_windows_ > 0 && resistor_index[channel_index] >= 0 &&
+            summary.n_valid > 0 &&
+            summary.resistor_index != resistor_index[channel_index]) {
+          resistor_changed = true;
+        }
+      }
+      if (resistor_changed) {
+        if (n_summaries + 1 >= max_summaries) {
+          // There is no room for a new group after closing the current one,
+          // so discard this window and stop measuring.
+          n_windows_measured_--;
+          break;
+        }
+        serialize_summaries();
+        n_summaries++;
+      }
+      add_to_summaries(measured_pk_pk, resistor_index);
+      if (summary_n_windows_ >= n_windows_per_summary) {
+        serialize_summaries();
+        n_summaries++;
+        if (n_summaries >= max_summaries) { break; }
+      }
+    }
+
+    if (n_settle_windows > 0) {
+      if (resistor_index[HV_CHANNEL_INDEX] >= 0 &&
+          resistor_index[FB_CHANNEL_INDEX] >= 0 &&
+          measured_pk_pk[HV_CHANNEL_INDEX] > 0) {
+        float ratio = (float)measured_pk_pk[FB_CHANNEL_INDEX] / \
+          measured_pk_pk[HV_CHANNEL_INDEX];
+        if (n_settled > 0 &&
+            settle_resistor_index[HV_CHANNEL_INDEX] == \
+              resistor_index[HV_CHANNEL_INDEX] &&
+            settle_resistor_index[FB_CHANNEL_INDEX] == \
+              resistor_index[FB_CHANNEL_INDEX] &&
+            abs(ratio - settle_reference) <= \
+              settle_tolerance * settle_reference) {
+          n_settled++;
+        } else {
+          // start a new band around this window
+          settle_reference = ratio;
+          settle_resistor_index[HV_CHANNEL_INDEX] = \
+            resistor_index[HV_CHANNEL_INDEX];
+          settle_resistor_index[FB_CHANNEL_INDEX] = \
+            resistor_index[FB_CHANNEL_INDEX];
+          n_settled = 1;
+        }
+        if (n_settled >= n_settle_windows) {
+          settled_ = true;
+          break;
+        }
+      } else {
+        n_settled = 0;
+      }
     }
 
     // There is a new request available on the serial port.  Stop what we're
@@ -513,6 +627,11 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
     while( (micros() - delta_t_start) < delay_between_windows_ms*1000) {}
   }
 
+  // Serialize the last (partial) group.
+  if (n_windows_per_summary > 0 && summary_n_windows_ > 0) {
+    serialize_summaries();
+  }
+
   // Set the resistors back to their original states.
   for (uint8_t channel_index = 0; channel_index < NUMBER_OF_ADC_CHANNELS;
        channel_index++) {
@@ -524,6 +643,64 @@ uint8_t FeedbackController::measure_impedance(float sampling_window_ms,
   return parent_->RETURN_OK;
 }
 
+void FeedbackController::add_to_summaries(uint16_t* measured_pk_pk,
+                                          int8_t* resistor_index) {
+  for (uint8_t channel_index = 0; channel_index < NUMBER_OF_ADC_CHANNELS;
+       channel_index++) {
+    WindowSummary& summary = summaries_[channel_index];
+    if (summary_n_windows_ == 0) {
+      // first window in group
+      summary.resistor_index = -1;
+      summary.n_saturated = 0;
+      summary.n_valid = 0;
+      summary.sum = 0;
+      summary.min_value = 0xFFFF;
+      summary.max_value = 0;
+      summary.last_value = 0;
+    }
+    if (resistor_index[channel_index] < 0) {
+      if (summary.n_saturated < 0xFF) {
+        summary.n_saturated++;
+      }
+    } else {
+      uint16_t value = measured_pk_pk[channel_index];
+      summary.resistor_index = resistor_index[channel_index];
+      summary.n_valid++;
+      summary.sum += value;
+      if (value < summary.min_value) {
+        summary.min_value = value;
+      }
+      if (value > summary.max_value) {
+        summary.max_value = value;
+      }
+      summary.last_value = value;
+    }
+  }
+  summary_n_windows_++;
+}
+
+void FeedbackController::serialize_summaries() {
+  // See `SUMMARY_SIZE` for the layout of each serialized group summary.
+  parent_->serialize(&summary_n_windows_, sizeof(uint16_t));
+  for (uint8_t channel_index = 0; channel_index < NUMBER_OF_ADC_CHANNELS;
+       channel_index++) {
+    WindowSummary& summary = summaries_[channel_index];
+    uint16_t mean = 0;
+    if (summary.n_valid > 0) {
+      mean = summary.sum / summary.n_valid;
+    } else {
+      summary.min_value = 0;
+    }
+    parent_->serialize(&summary.resistor_index, sizeof(int8_t));
+    parent_->serialize(&summary.n_saturated, sizeof(uint8_t));
+    parent_->serialize(&mean, sizeof(uint16_t));
+    parent_->serialize(&summary.min_value, sizeof(uint16_t));
+    parent_->serialize(&summary.max_value, sizeof(uint16_t));
+    parent_->serialize(&summary.last_value, sizeof(uint16_t));
+  }
+  summary_n_windows_ = 0;
+}
+
 void FeedbackController::find_sampling_rate(float sampling_window_ms,
                                           float frequency,
                                           float max_sampling_rate,
@@ -52,6 +52,25 @@ public:
     float vgnd_exp_filtered;
   };
 
+  // Aggregate of the measurements of one channel over a group of sampling
+  // windows (see `measure_impedance`).
+  struct WindowSummary {
+    int8_t resistor_index; // series resistor of unsaturated windows (or -1)
+    uint8_t n_saturated; // number of saturated windows
+    uint16_t n_valid; // number of unsaturated windows
+    uint32_t sum;
+    uint16_t min_value;
+    uint16_t max_value;
+    uint16_t last_value;
+  };
+
+  // Size of each serialized group summary:
+  //  - number of windows in group (uint16_t)
+  //  - for each channel: resistor index (int8_t), number of saturated
+  //    windows (uint8_t) and mean, min, max and last values (uint16_t)
+  static const uint8_t SUMMARY_SIZE = sizeof(uint16_t) + \
+    2 * (2 * sizeof(uint8_t) + 4 * sizeof(uint16_t));
+
   static const uint8_t NUMBER_OF_ADC_CHANNELS = 2;
   static const uint8_t HV_CHANNEL_INDEX = 0;
   static const uint8_t FB_CHANNEL_INDEX = 1;
@@ -65,13 +84,27 @@ public:
   static uint8_t series_resistor_index(uint8_t channel_index) {
     return channels_[channel_index].series_resistor_index;
   }
+  // Series resistor to start each measurement with (or -1 to start with the
+  // largest series resistor).
+  static void set_initial_series_resistor_index(const uint8_t channel_index,
+                                                const int8_t index) {
+    initial_resistor_index_[channel_index] = index;
+  }
+  static int8_t initial_series_resistor_index(uint8_t channel_index) {
+    return initial_resistor_index_[channel_index];
+  }
 
   static uint8_t measure_impedance(float sampling_window_ms,
                              uint16_t n_sampling_windows,
                              float delay_between_windows_ms,
                              float frequency,
                              bool interleave_samples,
-                             bool rms);
+                             bool rms,
+                             uint16_t n_windows_per_summary=0,
+                             float settle_tolerance=0,
+                             uint16_t n_settle_windows=0);
+  static uint16_t n_windows_measured() { return n_windows_measured_; }
+  static bool settled() { return settled_; }
   static void interleaved_callback(uint8_t channel_index, uint16_t value);
   static void hv_channel_callback(uint8_t channel_index, uint16_t value);
   static void fb_channel_callback(uint8_t channel_index, uint16_t value);
@@ -82,7 +115,15 @@ private:
                                  float max_sampling_rate,
                                  float* sampling_rate_out,
                                  uint16_t* n_samples_per_window_out);
+  static void add_to_summaries(uint16_t* measured_pk_pk,
+                               int8_t* resistor_index);
+  static void serialize_summaries();
   static ADCChannel channels_[];
+  static int8_t initial_resistor_index_[];
+  static WindowSummary summaries_[];
+  static uint16_t summary_n_windows_;
+  static uint16_t n_windows_measured_;
+  static bool settled_;
   static uint16_t n_samples_per_window_;
   static DMFControlBoard* parent_;
   static bool rms_;
@@ -40,6 +40,7 @@ const uint8_t RemoteObject::RETURN_BAD_CRC;
 const uint8_t RemoteObject::RETURN_BAD_VALUE;
 const uint8_t RemoteObject::RETURN_MAX_PAYLOAD_EXCEEDED;
 const uint16_t RemoteObject::MAX_PAYLOAD_LENGTH;
+const uint32_t RemoteObject::TIMEOUT_MILLISECONDS;
 const uint8_t DMFControlBoard::SINE;
 const uint8_t DMFControlBoard::SQUARE;
 const uint16_t DMFControlBoard::PERSISTENT_CONFIG_SETTINGS;
@@ -64,6 +65,7 @@ const uint8_t RemoteObject::CMD_GET_SOFTWARE_VERSION;
 const uint8_t RemoteObject::CMD_GET_URL;
 const uint8_t RemoteObject::CMD_I2C_READ;
 const uint8_t RemoteObject::CMD_I2C_SCAN;
+const uint8_t RemoteObject::CMD_BATCH;
 const uint8_t RemoteObject::CMD_I2C_WRITE;
 const uint8_t RemoteObject::CMD_ONEWIRE_GET_ADDRESS;
 const uint8_t RemoteObject::CMD_ONEWIRE_READ;
@@ -97,6 +99,14 @@ const uint8_t DMFControlBoard::CMD_GET_WAVEFORM_VOLTAGE;
 const uint8_t DMFControlBoard::CMD_LOAD_CONFIG;
 const uint8_t DMFControlBoard::CMD_MEASURE_IMPEDANCE;
 const uint8_t DMFControlBoard::CMD_SWEEP_CHANNELS;
+const uint8_t DMFControlBoard::CMD_MEASURE_IMPEDANCE_STREAM;
+const uint8_t DMFControlBoard::CMD_MEASURE_IMPEDANCE_SUMMARY;
+const uint8_t DMFControlBoard::CMD_MEASURE_IMPEDANCE_SETTLE;
+const uint8_t DMFControlBoard::CMD_SET_ACTUATION_PROGRAM;
+const uint8_t DMFControlBoard::CMD_RUN_ACTUATION_PROGRAM;
+const uint8_t DMFControlBoard::CMD_GET_CONFIG_CHECKSUM;
+const uint8_t DMFControlBoard::CMD_SET_INITIAL_SERIES_RESISTOR_INDEX;
+const uint16_t DMFControlBoard::MAX_ACTUATION_PROGRAM_LENGTH;
 const uint8_t DMFControlBoard::CMD_SET_AMPLIFIER_GAIN;
 const uint8_t DMFControlBoard::CMD_SET_AUTO_ADJUST_AMPLIFIER_GAIN;
 const uint8_t DMFControlBoard::CMD_SET_SERIES_CAPACITANCE;
@@ -152,6 +162,12 @@ object DMFControlBoard_class
     .def("connected",&DMFControlBoard::connected)
     .def("return_code",&DMFControlBoard::return_code)
     .def("set_debug",&DMFControlBoard::set_debug)
+    .def("total_bytes_sent",&DMFControlBoard::total_bytes_sent)
+    .def("total_bytes_received",&DMFControlBoard::total_bytes_received)
+    .def("waiting_for_reply_to",&DMFControlBoard::waiting_for_reply_to)
+    .def("start_capture",&DMFControlBoard::start_capture)
+    .def("stop_capture",&DMFControlBoard::stop_capture)
+    .def("capturing",&DMFControlBoard::capturing)
     .def("protocol_name",&DMFControlBoard::protocol_name)
     .def("protocol_version",&DMFControlBoard::protocol_version)
     .def("name",&DMFControlBoard::name)
@@ -175,7 +191,14 @@ object DMFControlBoard_class
     .def("i2c_read",&DMFControlBoard::i2c_read)
     .def("i2c_write",&DMFControlBoard::i2c_write)
     .def("i2c_send_command",&DMFControlBoard::i2c_send_command)
+    .def("set_i2c_polling",&DMFControlBoard::set_i2c_polling)
+    .def("i2c_polling",&DMFControlBoard::i2c_polling)
+    .def("i2c_latency_estimate",&DMFControlBoard::i2c_latency_estimate)
+    .def("reset_i2c_latency_estimates",
+         &DMFControlBoard::reset_i2c_latency_estimates)
     .def("i2c_scan",&DMFControlBoard::i2c_scan)
+    .def("batch_non_blocking",&DMFControlBoard::batch_non_blocking)
+    .def("get_batch_reply",&DMFControlBoard::get_batch_reply)
     .def("spi_set_bit_order",&DMFControlBoard::spi_set_bit_order)
     .def("spi_set_clock_divider",&DMFControlBoard::spi_set_clock_divider)
     .def("spi_set_data_mode",&DMFControlBoard::spi_set_data_mode)
@@ -206,6 +229,8 @@ object DMFControlBoard_class
     .def("set_adc_prescaler",&DMFControlBoard::set_adc_prescaler)
     .def("set_series_resistor_index",
          &DMFControlBoard::set_series_resistor_index)
+    .def("_set_initial_series_resistor_index",
+         &DMFControlBoard::set_initial_series_resistor_index)
     .def("_set_series_resistance",&DMFControlBoard::set_series_resistance)
     .def("_set_series_capacitance",&DMFControlBoard::set_series_capacitance)
     .def("_set_amplifier_gain",&DMFControlBoard::set_amplifier_gain)
@@ -221,9 +246,27 @@ object DMFControlBoard_class
     .def("send_interrupt",&DMFControlBoard::send_interrupt)
     .def("get_measure_impedance_data",&DMFControlBoard::get_measure_impedance_data)
     .def("get_sweep_channels_data",&DMFControlBoard::get_sweep_channels_data)
+    .def("measure_impedance_stream_non_blocking",
+         &DMFControlBoard::measure_impedance_stream_non_blocking)
+    .def("get_impedance_stream_frame",
+         &DMFControlBoard::get_impedance_stream_frame)
+    .def("measure_impedance_summary_non_blocking",
+         &DMFControlBoard::measure_impedance_summary_non_blocking)
+    .def("get_measure_impedance_summary_data",
+         &DMFControlBoard::get_measure_impedance_summary_data)
+    .def("measure_impedance_settle_non_blocking",
+         &DMFControlBoard::measure_impedance_settle_non_blocking)
+    .def("get_measure_impedance_settle_data",
+         &DMFControlBoard::get_measure_impedance_settle_data)
+    .def("set_actuation_program", &DMFControlBoard::set_actuation_program)
+    .def("run_actuation_program_non_blocking",
+         &DMFControlBoard::run_actuation_program_non_blocking)
+    .def("get_actuation_program_results",
+         &DMFControlBoard::get_actuation_program_results)
     .def("waiting_for_reply",&DMFControlBoard::waiting_for_reply)
     .def("_reset_config_to_defaults",&DMFControlBoard::reset_config_to_defaults)
     .def("load_config",&DMFControlBoard::load_config)
+    .def("_config_checksum",&DMFControlBoard::config_checksum)
     .def("flush",&DMFControlBoard::flush)
     .def("host_name",&DMFControlBoard::host_name)
     .def("host_manufacturer",&DMFControlBoard::host_manufacturer)
@@ -250,6 +293,8 @@ DMFControlBoard_class.attr("PERSISTENT_CONFIG_SETTINGS") = \
     DMFControlBoard::PERSISTENT_CONFIG_SETTINGS;
 DMFControlBoard_class.attr("MAX_PAYLOAD_LENGTH") = \
     DMFControlBoard::MAX_PAYLOAD_LENGTH;
+DMFControlBoard_class.attr("TIMEOUT_MILLISECONDS") = \
+    DMFControlBoard::TIMEOUT_MILLISECONDS;
 
 /* # Remote return codes # */
 DMFControlBoard_class.attr("RETURN_OK") = DMFControlBoard::RETURN_OK;
@@ -289,6 +334,7 @@ DMFControlBoard_class.attr("CMD_GET_SOFTWARE_VERSION") = RemoteObject::CMD_GET_S
 DMFControlBoard_class.attr("CMD_GET_URL") = RemoteObject::CMD_GET_URL;
 DMFControlBoard_class.attr("CMD_I2C_READ") = RemoteObject::CMD_I2C_READ;
 DMFControlBoard_class.attr("CMD_I2C_SCAN") = RemoteObject::CMD_I2C_SCAN;
+DMFControlBoard_class.attr("CMD_BATCH") = RemoteObject::CMD_BATCH;
 DMFControlBoard_class.attr("CMD_I2C_WRITE") = RemoteObject::CMD_I2C_WRITE;
 DMFControlBoard_class.attr("CMD_ONEWIRE_GET_ADDRESS") = RemoteObject::CMD_ONEWIRE_GET_ADDRESS;
 DMFControlBoard_class.attr("CMD_ONEWIRE_READ") = RemoteObject::CMD_ONEWIRE_READ;
@@ -322,6 +368,22 @@ DMFControlBoard_class.attr("CMD_GET_WAVEFORM_VOLTAGE") = DMFControlBoard::CMD_GE
 DMFControlBoard_class.attr("CMD_LOAD_CONFIG") = DMFControlBoard::CMD_LOAD_CONFIG;
 DMFControlBoard_class.attr("CMD_MEASURE_IMPEDANCE") = DMFControlBoard::CMD_MEASURE_IMPEDANCE;
 DMFControlBoard_class.attr("CMD_SWEEP_CHANNELS") = DMFControlBoard::CMD_SWEEP_CHANNELS;
+DMFControlBoard_class.attr("CMD_MEASURE_IMPEDANCE_STREAM") = \
+    DMFControlBoard::CMD_MEASURE_IMPEDANCE_STREAM;
+DMFControlBoard_class.attr("CMD_MEASURE_IMPEDANCE_SUMMARY") = \
+    DMFControlBoard::CMD_MEASURE_IMPEDANCE_SUMMARY;
+DMFControlBoard_class.attr("CMD_MEASURE_IMPEDANCE_SETTLE") = \
+    DMFControlBoard::CMD_MEASURE_IMPEDANCE_SETTLE;
+DMFControlBoard_class.attr("CMD_SET_ACTUATION_PROGRAM") = \
+    DMFControlBoard::CMD_SET_ACTUATION_PROGRAM;
+DMFControlBoard_class.attr("CMD_RUN_ACTUATION_PROGRAM") = \
+    DMFControlBoard::CMD_RUN_ACTUATION_PROGRAM;
+DMFControlBoard_class.attr("CMD_GET_CONFIG_CHECKSUM") = \
+    DMFControlBoard::CMD_GET_CONFIG_CHECKSUM;
+DMFControlBoard_class.attr("CMD_SET_INITIAL_SERIES_RESISTOR_INDEX") = \
+    DMFControlBoard::CMD_SET_INITIAL_SERIES_RESISTOR_INDEX;
+DMFControlBoard_class.attr("MAX_ACTUATION_PROGRAM_LENGTH") = \
+    DMFControlBoard::MAX_ACTUATION_PROGRAM_LENGTH;
 DMFControlBoard_class.attr("CMD_SET_AMPLIFIER_GAIN") = DMFControlBoard::CMD_SET_AMPLIFIER_GAIN;
 DMFControlBoard_class.attr("CMD_SET_AUTO_ADJUST_AMPLIFIER_GAIN") = DMFControlBoard::CMD_SET_AUTO_ADJUST_AMPLIFIER_GAIN;
 DMFControlBoard_class.attr("CMD_SET_SERIES_CAPACITANCE") = DMFControlBoard::CMD_SET_SERIES_CAPACITANCE;
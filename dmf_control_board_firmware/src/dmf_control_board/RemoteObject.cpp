@@ -70,6 +70,11 @@ RemoteObject::RemoteObject(bool crc_enabled
     bytes_read_ = 0;
     bytes_written_ = 0;
     debug_ = false;
+    in_batch_ = false;
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+    total_bytes_sent_ = 0;
+    total_bytes_received_ = 0;
+#endif
 
 #if defined(AVR) || defined(__SAM3X8E__)
     // Initialize pin mode and state of digital pins from persistent storage
@@ -100,10 +105,14 @@ void RemoteObject::send_byte(const uint8_t b) {
 #endif
         Serial.write(CONTROL_ESCAPE);
         Serial.write(b ^ ESCAPE_XOR);
+#if !( defined(AVR) || defined(__SAM3X8E__) ) 
+        total_bytes_sent_ += 2;
+#endif
     } else {
 #if !( defined(AVR) || defined(__SAM3X8E__) ) 
         log_message(str(format("write (0x%0X)") % (int)b).c_str(),
                     function_name);
+        total_bytes_sent_++;
 #endif
         Serial.write(b);
     }
@@ -131,6 +140,7 @@ void RemoteObject::send_preamble(const uint8_t cmd) {
   const char* function_name = "send_preamble()";
   log_message(str(format("command=0x%0X (%d), payload_length=%d") %
     (int)cmd % (int)cmd % payload_length_).c_str(), function_name);
+  total_bytes_sent_++;
 #endif
   Serial.write(FRAME_BOUNDARY);
   if (crc_enabled_) {
@@ -204,6 +214,10 @@ void RemoteObject::send_payload() {
 #if !( defined(AVR) || defined(__SAM3X8E__) ) 
   const char* function_name = "send_payload()";
   log_message(str(format("%d bytes") % payload_length_).c_str(), function_name);
+  if (capture_file_.is_open()) {
+    capture_packet(CAPTURE_HOST_TO_DEVICE, packet_cmd_, payload_,
+                   payload_length_);
+  }
 #endif
   for (uint16_t i = 0; i < payload_length_; i++) {
     if (crc_enabled_) {
@@ -290,6 +304,13 @@ uint8_t RemoteObject::validate_reply(const uint8_t cmd) {
 }
 
 void RemoteObject::process_packet() {
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+    if (capture_file_.is_open()) {
+        // Log the packet as received (i.e., including the return code).
+        capture_packet(CAPTURE_DEVICE_TO_HOST, packet_cmd_, payload_,
+                       payload_length_);
+    }
+#endif
     if (packet_cmd_ & 0x80) {
         /* Commands have MSB == 1, so this packet contains a command.  Start
          * preparing the response and process the command. */
@@ -688,9 +709,23 @@ uint8_t RemoteObject::process_command(uint8_t cmd) {
         return_code_ = RETURN_BAD_PACKET_SIZE;
       }
       break;
+    case CMD_BATCH:
+      if (in_batch_) {
+        // batches can't be nested
+        return_code_ = RETURN_GENERAL_ERROR;
+      } else if (payload_length() >= sizeof(uint8_t)) {
+        return_code_ = process_batch();
+      } else {
+        return_code_ = RETURN_BAD_PACKET_SIZE;
+      }
+      break;
 #endif
   }
-  send_reply(return_code_);
+  // Commands processed as part of a batch are replied to all together (see
+  // `process_batch()`).
+  if (!in_batch_) {
+    send_reply(return_code_);
+  }
   return return_code_;
 }
 
@@ -882,7 +917,19 @@ void RemoteObject::process_serial_input(uint8_t byte) {
 
 void RemoteObject::listen() {
     while (Serial.available() > 0) {
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+        uint8_t waiting_for_reply_to = waiting_for_reply_to_;
+        total_bytes_received_++;
+#endif
         process_serial_input(Serial.read());
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+        /* Stop at the end of the expected reply, so that its payload is not
+         * overwritten by any packets that follow it (e.g., when the device
+         * is streaming measurement frames). */
+        if (waiting_for_reply_to && !waiting_for_reply_to_) {
+            break;
+        }
+#endif
     }
 }
 
@@ -935,6 +982,81 @@ void /* DEVICE */ RemoteObject::i2c_scan(bool serialize_to_payload) {
   }
 }
 
+uint8_t /* DEVICE */ RemoteObject::process_batch() {
+  /* Process each of the commands in a batch and reply to all of them in a
+   * single packet.
+   *
+   * The batch payload consists of a flags byte, followed by a list of
+   * commands, each encoded as:
+   *
+   *     [uint8 cmd][uint8 reserved][uint16 payload length][payload]
+   *
+   * The reply payload is a list of replies, each encoded as:
+   *
+   *     [uint8 cmd][uint8 return code][uint16 payload length][payload]
+   *
+   * Since the replies are written to the same buffer as the commands, the
+   * commands are first moved to the end of the payload buffer, so replies
+   * can be written from the start of the buffer without overwriting any
+   * command that has not been processed yet. */
+  const uint8_t flags = read<uint8_t>();
+  const uint16_t batch_length = payload_length_ - bytes_read_;
+  uint16_t r = MAX_PAYLOAD_LENGTH - batch_length;  // read offset
+  uint16_t w = 0;  // write offset
+  uint8_t return_code = RETURN_OK;
+
+  memmove(payload_ + r, payload_ + bytes_read_, batch_length);
+  in_batch_ = true;
+  while (r < MAX_PAYLOAD_LENGTH) {
+    if (r + BATCH_HEADER_LENGTH > MAX_PAYLOAD_LENGTH) {
+      return_code = RETURN_BAD_PACKET_SIZE;
+      break;
+    }
+    const uint8_t cmd = payload_[r];
+    uint16_t length;
+    memcpy(&length, payload_ + r + 2, sizeof(length));
+    if (r + BATCH_HEADER_LENGTH + length > MAX_PAYLOAD_LENGTH) {
+      return_code = RETURN_BAD_PACKET_SIZE;
+      break;
+    } else if (w + BATCH_HEADER_LENGTH > r) {
+      // Not enough space left for the reply.
+      return_code = RETURN_MAX_PAYLOAD_EXCEEDED;
+      break;
+    }
+    payload_length_ = length;
+    bytes_read_ = r + BATCH_HEADER_LENGTH;
+    bytes_written_ = w + BATCH_HEADER_LENGTH;
+    r += BATCH_HEADER_LENGTH + length;
+    if (cmd == CMD_BATCH) {
+      return_code_ = RETURN_GENERAL_ERROR;
+    } else {
+      return_code_ = RETURN_UNKNOWN_COMMAND;
+      process_command(cmd);
+    }
+    if (bytes_written_ > r) {
+      /* The reply has overwritten commands that have not been processed
+       * yet (or has overflowed the payload buffer). */
+      return_code = RETURN_MAX_PAYLOAD_EXCEEDED;
+      break;
+    }
+    length = bytes_written_ - w - BATCH_HEADER_LENGTH;
+    payload_[w] = cmd;
+    payload_[w + 1] = return_code_;
+    memcpy(payload_ + w + 2, &length, sizeof(length));
+    w = bytes_written_;
+    if (return_code_ != RETURN_OK && (flags >> BATCH_STOP_ON_ERROR) & 0x01) {
+      break;
+    }
+  }
+  in_batch_ = false;
+  if (return_code == RETURN_OK) {
+    bytes_written_ = w;
+  } else {
+    bytes_written_ = 0;
+  }
+  return return_code;
+}
+
 void /* DEVICE */ RemoteObject::i2c_write(const uint8_t address,
                                           const uint8_t data) {
     Wire.beginTransmission(address);
@@ -1030,6 +1152,59 @@ uint8_t /* HOST */ RemoteObject::connect(const char* port,
     port).c_str());
 }
 
+void /* HOST */ RemoteObject::start_capture(const char* path) {
+  /* A capture file starts with the 6-byte magic string `DMFCAP`, followed by
+   * the file format version (uint16).  Each packet is then logged as:
+   *
+   *     [uint32 microseconds since previous packet][uint8 direction]
+   *     [uint8 cmd][uint16 payload length][payload]
+   *
+   * with all values in little-endian byte order. */
+  const char* function_name = "start_capture()";
+  stop_capture();
+  capture_file_.open(path, std::ios::out | std::ios::binary |
+                     std::ios::trunc);
+  if (!capture_file_.is_open()) {
+    throw runtime_error(str(format("Could not open capture file %s.") %
+      path).c_str());
+  }
+  const uint8_t header[] = {'D', 'M', 'F', 'C', 'A', 'P', 1, 0};
+  capture_file_.write((const char*)header, sizeof(header));
+  last_capture_time_ = boost::posix_time::microsec_clock::universal_time();
+  log_message(str(format("path=%s") % path).c_str(), function_name);
+}
+
+void /* HOST */ RemoteObject::stop_capture() {
+  if (capture_file_.is_open()) {
+    capture_file_.close();
+  }
+}
+
+void /* HOST */ RemoteObject::capture_packet(uint8_t direction, uint8_t cmd,
+                                             const uint8_t* data,
+                                             uint16_t length) {
+  boost::posix_time::ptime now =
+    boost::posix_time::microsec_clock::universal_time();
+  long long dt_us = (now - last_capture_time_).total_microseconds();
+  last_capture_time_ = now;
+  uint32_t dt = 0;
+  if (dt_us > 0xFFFFFFFFLL) {
+    dt = 0xFFFFFFFF;
+  } else if (dt_us > 0) {
+    dt = (uint32_t)dt_us;
+  }
+  uint8_t header[8];
+  for (uint8_t i = 0; i < 4; i++) {
+    header[i] = (uint8_t)(dt >> (8 * i));
+  }
+  header[4] = direction;
+  header[5] = cmd;
+  header[6] = (uint8_t)length;
+  header[7] = (uint8_t)(length >> 8);
+  capture_file_.write((const char*)header, sizeof(header));
+  capture_file_.write((const char*)data, length);
+}
+
 void /* HOST */ RemoteObject::set_debug(const bool debug) {
   debug_ = debug;
 }
@@ -1349,6 +1524,27 @@ std::vector<uint8_t> /* HOST */ RemoteObject::i2c_scan() {
   return std::vector<uint8_t>();
 }
 
+void /* HOST */ RemoteObject::batch_non_blocking(std::vector<uint8_t> batch) {
+  const char* function_name = "batch_non_blocking()";
+  log_separator();
+  log_message("send command", function_name);
+  serialize(&batch[0], batch.size());
+  send_non_blocking_command(CMD_BATCH);
+}
+
+std::vector<uint8_t> /* HOST */ RemoteObject::get_batch_reply() {
+  const char* function_name = "get_batch_reply()";
+  std::vector<uint8_t> reply;
+  if (validate_reply(CMD_BATCH) == RETURN_OK) {
+    for (uint16_t i = 0; i < payload_length(); i++) {
+      reply.push_back(read<uint8_t>());
+    }
+    log_message(str(format("%d bytes") % reply.size()).c_str(),
+                function_name);
+  }
+  return reply;
+}
+
 std::vector<uint8_t> /* HOST */ RemoteObject::i2c_read(uint8_t address,
                                                        uint8_t
                                                        n_bytes_to_read) {
@@ -1379,8 +1575,14 @@ std::vector<uint8_t> /* HOST */ RemoteObject::i2c_send_command(uint8_t address,
   const char* function_name = "i2c_send_command()";
   data.insert(data.begin(), cmd);
   i2c_write(address, data);
-  boost::this_thread::sleep(boost::posix_time::milliseconds(delay_ms));
-  uint8_t n_bytes = i2c_read(address, 1)[0];
+  uint8_t n_bytes;
+  if (i2c_polling(address)) {
+    n_bytes = i2c_poll_reply_length(address, delay_ms);
+  } else {
+    boost::this_thread::sleep(boost::posix_time::milliseconds(delay_ms));
+    std::vector<uint8_t> length = i2c_read(address, 1);
+    n_bytes = length.empty() ? 0 : length[0];
+  }
   if (n_bytes == 0) {
     throw runtime_error(str(format("Error sending command 0x%0X (%d). "
       "No return code provided.") % (int)cmd % (int)cmd).c_str());
@@ -1397,6 +1599,89 @@ std::vector<uint8_t> /* HOST */ RemoteObject::i2c_send_command(uint8_t address,
   return out;
 }
 
+void /* HOST */ RemoteObject::set_i2c_polling(uint8_t address, bool enabled) {
+  if (enabled) {
+    i2c_polled_addresses_.insert(address);
+  } else {
+    i2c_polled_addresses_.erase(address);
+  }
+}
+
+uint8_t /* HOST */ RemoteObject::i2c_poll_reply_length(uint8_t address,
+                                                       uint8_t delay_ms) {
+  /* Poll the peripheral at the specified address (see `i2c_send_command()`)
+   * until it reports the length of its reply, or `delay_ms` has elapsed.
+   *
+   * Wait for (slightly less than) the learned response time of the
+   * peripheral before the first poll, then poll with exponential backoff.
+   * Returns 0 if the peripheral is not ready by the deadline. */
+  const char* function_name = "i2c_poll_reply_length()";
+  boost::posix_time::ptime start =
+    boost::posix_time::microsec_clock::universal_time();
+  uint32_t wait_ms = I2C_POLL_INITIAL_WAIT_MS;
+  std::map<uint8_t, float>::iterator estimate = i2c_latency_ms_.find(address);
+  if (estimate != i2c_latency_ms_.end()) {
+    wait_ms = std::min<uint32_t>((uint32_t)(0.9 * estimate->second),
+                                 delay_ms);
+  }
+  uint32_t backoff_ms = I2C_POLL_INITIAL_WAIT_MS;
+  const uint32_t max_backoff_ms = I2C_POLL_MAX_BACKOFF_MS;
+  uint8_t n_bytes = 0;
+  uint16_t n_polls = 0;
+  float elapsed_ms = 0;
+  while (true) {
+    boost::this_thread::sleep(boost::posix_time::milliseconds(wait_ms));
+    n_bytes = i2c_read_reply_length(address);
+    n_polls++;
+    elapsed_ms = 1e-3 * (boost::posix_time::microsec_clock::universal_time() -
+                         start).total_microseconds();
+    if (n_bytes > 0 || elapsed_ms >= delay_ms) {
+      break;
+    }
+    // Do not sleep past the deadline (i.e., poll one last time at the
+    // deadline).
+    wait_ms = std::min<uint32_t>(backoff_ms,
+                                 (uint32_t)(delay_ms - elapsed_ms) + 1);
+    backoff_ms = std::min<uint32_t>(2 * backoff_ms, max_backoff_ms);
+  }
+  log_message(str(format("address %d %s after %.1f ms (%d polls)") %
+                  (int)address % (n_bytes > 0 ? "ready" : "not ready") %
+                  elapsed_ms % n_polls).c_str(), function_name);
+  if (n_bytes > 0) {
+    if (estimate != i2c_latency_ms_.end()) {
+      estimate->second = 0.75 * estimate->second + 0.25 * elapsed_ms;
+    } else {
+      i2c_latency_ms_[address] = elapsed_ms;
+    }
+  }
+  return n_bytes;
+}
+
+uint8_t /* HOST */ RemoteObject::i2c_read_reply_length(uint8_t address) {
+  /* Returns the length of the reply (including the return code) of the
+   * peripheral at the specified address, or 0 if the peripheral is not ready
+   * (i.e., it does not have a reply yet, or it does not respond). */
+  try {
+    std::vector<uint8_t> length = i2c_read(address, 1);
+    return length.empty() ? 0 : length[0];
+  } catch (runtime_error& e) {
+    if (return_code_ != RETURN_GENERAL_ERROR) {
+      // e.g., timeout waiting for the control board.
+      throw;
+    }
+    // The peripheral did not send any bytes.
+    return 0;
+  }
+}
+
+float /* HOST */ RemoteObject::i2c_latency_estimate(uint8_t address) {
+  std::map<uint8_t, float>::iterator estimate = i2c_latency_ms_.find(address);
+  if (estimate == i2c_latency_ms_.end()) {
+    return -1;
+  }
+  return estimate->second;
+}
+
 void /* HOST */ RemoteObject::spi_set_bit_order(bool order) {
     send_set_command(CMD_SPI_SET_BIT_ORDER, "spi_set_bit_order()", order);
 }
@@ -73,7 +73,11 @@ __________________________________________________________________________
 #if !( defined(AVR) || defined(__SAM3X8E__) ) 
   #include "Logging.h"
   #include "SimpleSerial.h"
+  #include <algorithm>
   #include <string>
+  #include <fstream>
+  #include <map>
+  #include <set>
   #include <boost/format.hpp>
 #endif
 
@@ -130,6 +134,12 @@ public:
   static const uint8_t CMD_SET_ADC_PRESCALER =          0x9C;
   static const uint8_t CMD_GET_AREF =                   0x9D;
   static const uint8_t CMD_I2C_SCAN =                   0x9E;
+  static const uint8_t CMD_BATCH =                      0x9F;
+
+  // batch flags (bit definitions)
+  static const uint8_t BATCH_STOP_ON_ERROR =            0;
+  // size of the header preceding each command/reply in a batch
+  static const uint8_t BATCH_HEADER_LENGTH =            4;
 
   // reserved return codes
   static const uint8_t RETURN_OK =                      0x00;
@@ -143,6 +153,17 @@ public:
   static const uint8_t RETURN_BAD_VALUE =               0x08;
   static const uint8_t RETURN_MAX_PAYLOAD_EXCEEDED =    0x09;
 
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+  // Direction of packets logged to a capture file (see `start_capture()`).
+  static const uint8_t CAPTURE_HOST_TO_DEVICE =         0x00;
+  static const uint8_t CAPTURE_DEVICE_TO_HOST =         0x01;
+
+  // Polling of I2C peripherals for the reply to a command (see
+  // `i2c_send_command()`).
+  static const uint16_t I2C_POLL_INITIAL_WAIT_MS =      1;
+  static const uint16_t I2C_POLL_MAX_BACKOFF_MS =       16;
+#endif
+
   static const char MCU_TYPE_[];
 
   RemoteObject(bool crc_enabled_
@@ -190,6 +211,7 @@ public:
                            uint8_t* data,
                            uint8_t delay_ms);
   void i2c_scan(bool serialize_to_payload=false);
+  uint8_t process_batch();
    /* The following two `persistent...` methods provide sub-classes a mechanism
    * to customize persistent storage.  For example, the Arduino DUE does not
    * support the `EEPROM` library used by the AVR chips. */
@@ -270,6 +292,21 @@ public:
   }
 
   bool serial_data_available() { return Serial.available() > 0; }
+  /**\brief Get the total number of bytes sent to the remote device
+  (including framing, escape and CRC bytes).*/
+  uint32_t total_bytes_sent() { return total_bytes_sent_; }
+  /**\brief Get the total number of bytes received from the remote device
+  (including framing, escape and CRC bytes).*/
+  uint32_t total_bytes_received() { return total_bytes_received_; }
+  /**\brief Get the command that a reply is expected to (0 if no reply is
+  expected).*/
+  uint8_t waiting_for_reply_to() { return waiting_for_reply_to_; }
+  /**\brief Start logging every packet sent to or received from the remote
+  device to a capture file (see `capture.py` for the file format).*/
+  void start_capture(const char* path);
+  /**\brief Stop logging packets and close the capture file.*/
+  void stop_capture();
+  bool capturing() { return capture_file_.is_open(); }
   /////////////////////////////////////////////////////////////////////////
   //
   // Remote accessors
@@ -310,11 +347,56 @@ public:
   void i2c_write(uint8_t address, std::vector<uint8_t> data);
   std::vector<uint8_t> i2c_read(uint8_t address,
                                 uint8_t n_bytes_to_read);
+  /**\brief Send a command to an I2C peripheral and return its reply.
+
+  After the command is written, the length of the reply (including the return
+  code) is read from the peripheral (a single byte), followed by the reply.
+
+  By default, the length is read once, after a fixed delay of `delay_ms`.
+
+  If polling is enabled for the peripheral (see `set_i2c_polling()`), the
+  length is instead polled (with exponential backoff) until it is non-zero,
+  for at most `delay_ms`.  Polling starts after the learned response time of
+  the peripheral (see `i2c_latency_estimate()`), so calls return as soon as
+  the peripheral is done.  Polling requires the following of the peripheral:
+
+   - When a command is received, the length of the previous reply is reset
+     to zero *before* the command is processed (i.e., a reply that was never
+     read is discarded and can not be mistaken for the reply to the new
+     command).
+   - A single byte read returns zero (or no bytes) until the complete reply
+     (including the return code) is ready, and the length of the reply
+     afterwards.*/
   std::vector<uint8_t> i2c_send_command(uint8_t address,
                                         uint8_t cmd,
                                         std::vector<uint8_t> data,
                                         uint8_t delay_ms);
+  /**\brief Enable/disable polling of the I2C peripheral at the specified
+  address for replies (see `i2c_send_command()`).  Only enable polling for
+  peripherals that meet the requirements listed there.*/
+  void set_i2c_polling(uint8_t address, bool enabled);
+  bool i2c_polling(uint8_t address) const {
+    return i2c_polled_addresses_.count(address) > 0;
+  }
+  /**\brief Get the learned response time (in milliseconds) of the I2C
+  peripheral at the specified address (or -1 if no command has been polled
+  for at the peripheral).*/
+  float i2c_latency_estimate(uint8_t address);
+  void reset_i2c_latency_estimates() { i2c_latency_ms_.clear(); }
   std::vector<uint8_t> i2c_scan();
+  /**Send a batch of commands to be processed by the remote device in a
+  single packet.  Each command is encoded as a uint8 command code, a
+  (reserved) uint8, a uint16 payload length and the payload.
+  \param batch flags byte, followed by the encoded commands.
+  \sa get_batch_reply()
+  */
+  void batch_non_blocking(std::vector<uint8_t> batch);
+  /**Get the reply to the last batch.  Each command reply is encoded as a
+  uint8 command code, a uint8 return code, a uint16 payload length and the
+  payload.
+  \returns concatenated command replies.
+  */
+  std::vector<uint8_t> get_batch_reply();
 
   /**Set the order of the bits shifted out of and into the SPI bus, either
   LSBFIRST (least-significant bit first) or MSBFIRST (most-significant bit
@@ -419,6 +501,13 @@ protected:
   // know what you are doing!  In most cases you can just use serialize().
   uint8_t* payload() { return payload_; } // pointer to the payload buffer
   void bytes_written(uint16_t bytes) { bytes_written_+=bytes; }
+  // discard any data serialized since the last packet was sent
+  void clear_payload() { bytes_written_ = 0; }
+#if !( defined(AVR) || defined(__SAM3X8E__) )
+  // keep waiting for replies to a command that sends more than one reply
+  // (e.g., a stream of measurement frames)
+  void expect_reply(const uint8_t cmd) { waiting_for_reply_to_ = cmd; }
+#endif
 
   void send_reply(const uint8_t return_code);
 
@@ -460,6 +549,10 @@ protected:
   uint8_t send_command(const uint8_t cmd);
   void send_non_blocking_command(const uint8_t cmd);
   uint8_t validate_reply(const uint8_t cmd);
+  /**
+  Update a CRC-16 (polynomial 0xA001, as used for packets) with one byte.
+  */
+  uint16_t update_crc(uint16_t crc, uint8_t data);
 
 #if ( defined(AVR) || defined(__SAM3X8E__) )
   char debug_buffer_[MAX_DEBUG_BUFFER_LENGTH];
@@ -491,7 +584,6 @@ private:
   void send_preamble(const uint8_t cmd);
   void send_payload();
   void send_byte(uint8_t b);
-  uint16_t update_crc(uint16_t crc, uint8_t data);
   void process_serial_input(const uint8_t byte);
   void process_packet();
 
@@ -510,10 +602,25 @@ private:
   uint16_t tx_crc_;
   uint16_t rx_crc_;
   bool debug_;
+  bool in_batch_; // flag that we are processing the commands in a batch
 #if !( defined(AVR) || defined(__SAM3X8E__) ) 
   SimpleSerial Serial;
   std::string class_name_;
   boost::posix_time::ptime time_cmd_sent_;
+  uint32_t total_bytes_sent_;
+  uint32_t total_bytes_received_;
+  std::ofstream capture_file_;
+  boost::posix_time::ptime last_capture_time_;
+  void capture_packet(uint8_t direction, uint8_t cmd, const uint8_t* data,
+                      uint16_t length);
+  // Exponentially weighted moving average of the response time of each I2C
+  // peripheral (in milliseconds), keyed by address.
+  std::map<uint8_t, float> i2c_latency_ms_;
+  // Addresses of I2C peripherals polled for replies (see
+  // `set_i2c_polling()`).
+  std::set<uint8_t> i2c_polled_addresses_;
+  uint8_t i2c_read_reply_length(uint8_t address);
+  uint8_t i2c_poll_reply_length(uint8_t address, uint8_t delay_ms);
 #endif
 };
 
@@ -0,0 +1,226 @@
+'''
+Host-side handling of impedance measurement streams.
+
+See :meth:`dmf_control_board_firmware.DMFControlBoard.measure_impedance_stream`.
+'''
+import logging
+import sys
+import threading
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Frame sequence numbers are sent by the firmware as `uint16_t`.
+SEQUENCE_NUMBER_MODULUS = 1 << 16
+
+
+class FrameRingBuffer(object):
+    '''
+    Fixed-capacity, thread-safe FIFO of equal-length frames, backed by a
+    preallocated array.
+
+    If the buffer is full, pushing a new frame overwrites the oldest frame.
+
+    Parameters
+    ----------
+    capacity : int
+        Maximum number of frames held in the buffer.
+    frame_length : int
+        Number of values per frame.
+    dtype : numpy.dtype, optional
+        Data type of frame values.
+    '''
+    def __init__(self, capacity, frame_length, dtype=float):
+        self.capacity = capacity
+        self.frames = np.empty((capacity, frame_length), dtype=dtype)
+        self.sequence_numbers = np.empty(capacity, dtype=int)
+        # Number of frames overwritten before they were read.
+        self.overflow_count = 0
+        self._head = 0
+        self._count = 0
+        self._not_empty = threading.Condition(threading.Lock())
+
+    def __len__(self):
+        return self._count
+
+    def push(self, sequence_number, frame):
+        with self._not_empty:
+            if self._count == self.capacity:
+                # Drop the oldest frame.
+                self._head = (self._head + 1) % self.capacity
+                self._count -= 1
+                self.overflow_count += 1
+            tail = (self._head + self._count) % self.capacity
+            self.frames[tail] = frame
+            self.sequence_numbers[tail] = sequence_number
+            self._count += 1
+            self._not_empty.notify()
+
+    def pop(self, timeout=None):
+        '''
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum time (in seconds) to wait for a frame.  If ``None``, wait
+            indefinitely.
+
+        Returns
+        -------
+        tuple or None
+            Sequence number and (a copy of) the oldest frame in the buffer, or
+            ``None`` if no frame was available before the timeout.
+        '''
+        with self._not_empty:
+            if not self._count:
+                self._not_empty.wait(timeout)
+            if not self._count:
+                return None
+            i = self._head
+            result = (int(self.sequence_numbers[i]), self.frames[i].copy())
+            self._head = (i + 1) % self.capacity
+            self._count -= 1
+            return result
+
+    def notify(self):
+        '''
+        Wake up any thread blocked in :meth:`pop`.
+        '''
+        with self._not_empty:
+            self._not_empty.notify_all()
+
+
+class ImpedanceStream(object):
+    '''
+    Iterator over the frames of an impedance measurement stream.
+
+    On creation, the stream is started on the control board and a reader
+    thread moves each frame from the serial port to a
+    :class:`FrameRingBuffer` as soon as it arrives, so a slow consumer does
+    not stall the control board.  If the consumer falls more than
+    ``capacity`` frames behind, the oldest frames are dropped.
+
+    Each iteration yields a ``(sequence_number, result)`` tuple, where
+    ``result`` is a :class:`FeedbackResults` instance (or the raw frame
+    buffer if ``decode=False``).  Gaps in the sequence numbers (i.e., dropped
+    frames) are counted in :attr:`dropped_frames`.
+
+    Parameters
+    ----------
+    proxy : DMFControlBoard
+        Connected control board.
+    capacity : int, optional
+        Number of frames held in the ring buffer.
+    decode : bool, optional
+        If ``False``, yield raw frame buffers instead of
+        :class:`FeedbackResults` instances.
+
+    See :meth:`DMFControlBoard.measure_impedance_stream` for a description of
+    the other parameters.
+    '''
+    def __init__(self, proxy, sampling_window_ms, n_sampling_windows_per_frame,
+                 delay_between_windows_ms, interleave_samples, rms, state,
+                 n_frames=0, capacity=64, decode=True):
+        self.proxy = proxy
+        self.decode = decode
+        self.n_sampling_windows_per_frame = n_sampling_windows_per_frame
+        # Time (in milliseconds) the control board takes to measure a frame.
+        self.frame_duration_ms = (n_sampling_windows_per_frame *
+                                  (sampling_window_ms +
+                                   delay_between_windows_ms))
+        # The control board cannot be queried while it is streaming, so read
+        # the actuation settings up front.
+        self.voltage = proxy.waveform_voltage()
+        self.frequency = proxy.waveform_frequency()
+        self.ring_buffer = FrameRingBuffer(capacity,
+                                           4 * n_sampling_windows_per_frame +
+                                           4)
+        self.dropped_frames = 0
+        self.frames_read = 0
+        self._last_sequence_number = None
+        self._exc_info = None
+        self._stop_requested = threading.Event()
+        self._finished = threading.Event()
+
+        proxy.measure_impedance_stream_non_blocking(sampling_window_ms,
+                                                    n_sampling_windows_per_frame,
+                                                    delay_between_windows_ms,
+                                                    interleave_samples, rms,
+                                                    state, n_frames)
+        self._thread = threading.Thread(target=self._read_frames,
+                                        name='impedance-stream')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def __iter__(self):
+        return self
+
+    def _read_frames(self):
+        interrupt = self._stop_requested
+        try:
+            while True:
+                if self.proxy._poll_for_reply(interrupt,
+                                              self.frame_duration_ms):
+                    # Only send a single interrupt.
+                    interrupt = None
+                frame = self.proxy.get_impedance_stream_frame()
+                if frame is None:
+                    # End of stream.
+                    break
+                self.ring_buffer.push(*frame)
+                self.frames_read += 1
+        except Exception:
+            logger.debug('Error reading impedance stream.', exc_info=True)
+            self._exc_info = sys.exc_info()
+        finally:
+            self._finished.set()
+            self.ring_buffer.notify()
+
+    @property
+    def finished(self):
+        '''
+        ``True`` if the control board has ended the stream.
+        '''
+        return self._finished.is_set()
+
+    def stop(self, timeout=None):
+        '''
+        Stop the stream and wait for the control board to end it.
+
+        Frames received before the stream ended remain available for
+        iteration.
+        '''
+        self._stop_requested.set()
+        self._thread.join(timeout)
+
+    def next(self):
+        while True:
+            item = self.ring_buffer.pop(timeout=0.1)
+            if item is not None:
+                break
+            elif self._finished.is_set() and not len(self.ring_buffer):
+                if self._exc_info is not None:
+                    exc_info, self._exc_info = self._exc_info, None
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                raise StopIteration
+
+        sequence_number, frame = item
+        if self._last_sequence_number is not None:
+            n_dropped = ((sequence_number - self._last_sequence_number - 1) %
+                         SEQUENCE_NUMBER_MODULUS)
+            if n_dropped:
+                logger.warning('Dropped %d impedance stream frame(s) before '
+                               'frame %d.', n_dropped, sequence_number)
+                self.dropped_frames += n_dropped
+        self._last_sequence_number = sequence_number
+
+        if self.decode:
+            frame = self.proxy.measure_impedance_buffer_to_feedback_result(
+                frame, voltage=self.voltage, frequency=self.frequency)
+        return sequence_number, frame
@@ -0,0 +1,30 @@
+'''
+The tests use a temporary cache directory (see
+:mod:`dmf_control_board_firmware.cache`), so they neither depend on nor modify
+the cache of the user running them.
+'''
+import os
+import tempfile
+
+from path_helpers import path
+
+from dmf_control_board_firmware.cache import CACHE_DIR_ENVIRONMENT_VARIABLE
+
+_cache_dir = None
+_original_cache_dir = None
+
+
+def setup_package():
+    global _cache_dir, _original_cache_dir
+
+    _original_cache_dir = os.environ.get(CACHE_DIR_ENVIRONMENT_VARIABLE)
+    _cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    os.environ[CACHE_DIR_ENVIRONMENT_VARIABLE] = str(_cache_dir)
+
+
+def teardown_package():
+    if _original_cache_dir is None:
+        os.environ.pop(CACHE_DIR_ENVIRONMENT_VARIABLE, None)
+    else:
+        os.environ[CACHE_DIR_ENVIRONMENT_VARIABLE] = _original_cache_dir
+    _cache_dir.rmtree()
@@ -0,0 +1,78 @@
+import struct
+
+import numpy as np
+from nose.tools import raises
+
+from dmf_control_board_firmware.actuation import (ActuationProgram,
+                                                  split_results_buffer,
+                                                  STEP_SET_STATE,
+                                                  STEP_SET_VOLTAGE,
+                                                  STEP_MEASURE)
+
+
+def test_encode_state():
+    program = ActuationProgram(16)
+    state = np.zeros(16, dtype=int)
+    state[[0, 9]] = 1
+    program.add_step(100, state=state)
+    encoded = program.to_bytes()
+    assert(encoded == struct.pack('<BHBB', 1 << STEP_SET_STATE, 100, 0x01,
+                                  0x02))
+
+
+def test_encode_voltage_and_measure():
+    program = ActuationProgram(8)
+    program.add_step(200, voltage=100., n_sampling_windows=10,
+                     sampling_window_ms=5.)
+    flags, duration_ms, voltage, sampling_window_ms, n_sampling_windows, \
+        options = struct.unpack('<BHffHB', program.to_bytes())
+    assert(flags == (1 << STEP_SET_VOLTAGE) | (1 << STEP_MEASURE))
+    assert(duration_ms == 200)
+    assert(voltage == 100.)
+    assert(n_sampling_windows == 10)
+    assert(options == 3)
+
+
+def test_scheduled_start():
+    program = ActuationProgram(8)
+    for duration_ms in (100, 50, 25):
+        program.add_step(duration_ms)
+    assert((program.scheduled_start_ms == [0, 100, 150]).all())
+
+
+def test_settings():
+    program = ActuationProgram(8)
+    program.add_step(100)
+    program.add_step(100, voltage=50.)
+    program.add_step(100, frequency=1e3)
+    assert(program.settings(100., 10e3) == [(100., 10e3), (50., 10e3),
+                                            (50., 1e3)])
+
+
+@raises(ValueError)
+def test_validate_measurement_longer_than_step():
+    program = ActuationProgram(8)
+    program.add_step(10, n_sampling_windows=10, sampling_window_ms=5.)
+    program.validate()
+
+
+@raises(ValueError)
+def test_validate_results_too_long():
+    program = ActuationProgram(8)
+    for i in range(3):
+        program.add_step(1000, n_sampling_windows=150,
+                         sampling_window_ms=5.)
+    program.validate()
+
+
+def test_split_results_buffer():
+    buffer = np.array([0, 0, 0,
+                       1000, 2, 5.] + range(8) +
+                      [1., 2., 300.])
+    steps, trailer = split_results_buffer(buffer)
+    assert(len(steps) == 2)
+    assert(steps[0][1].size == 0)
+    assert(steps[1][0] == 1000)
+    assert((steps[1][1] == range(8)).all())
+    assert(steps[1][2] == 5.)
+    assert(trailer.amplifier_gain == 300.)
@@ -0,0 +1,106 @@
+import threading
+
+import numpy as np
+
+from dmf_control_board_firmware.asynchronous import (AsyncDMFControlBoard,
+                                                     PRIORITY_BULK,
+                                                     PRIORITY_HIGH)
+
+
+class RecordingBoard(object):
+    '''
+    Object with the interface of a (disconnected) control board that records
+    the order of calls.
+    '''
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.voltage = 0
+
+    def wait(self):
+        self.release.wait()
+
+    def number_of_channels(self):
+        return 40
+
+    def set_state_of_all_channels(self, state):
+        self.calls.append(('set_state_of_all_channels', np.sum(state)))
+
+    def record(self, name):
+        self.calls.append(name)
+        return name
+
+
+def test_priority():
+    board = RecordingBoard()
+    with AsyncDMFControlBoard(board) as session:
+        # Block the I/O thread until all commands are queued.
+        waiting = session.submit('wait')
+        while session._running is not waiting:
+            pass
+        futures = [session.submit('record', 'bulk', priority=PRIORITY_BULK),
+                   session.submit('record', 'normal'),
+                   session.submit('record', 'high', priority=PRIORITY_HIGH),
+                   session.clear_all_channels()]
+        assert(session.queue_depth == 4)
+        board.release.set()
+        [future.result(5) for future in futures]
+    assert(board.calls == [('set_state_of_all_channels', 0), 'high',
+                           'normal', 'bulk'])
+    df_stats = session.queue_stats()
+    assert(df_stats.loc['safety', 'calls'] == 1)
+    assert(df_stats.loc['normal', 'calls'] == 2)
+    assert(session.max_queue_depth == 4)
+
+
+def test_clear_interrupts_running():
+    board = RecordingBoard()
+    with AsyncDMFControlBoard(board) as session:
+        running = session._submit(lambda future: future.interrupt.wait(5),
+                                  priority=PRIORITY_BULK)
+        while session._running is not running:
+            pass
+        session.clear_all_channels().result(5)
+        assert(running.result(5))
+
+
+def test_blocking_proxy():
+    board = RecordingBoard()
+    with AsyncDMFControlBoard(board) as session:
+        proxy = session.blocking_proxy()
+        assert(proxy.record('a') == 'a')
+        proxy.voltage = 10
+        assert(proxy.voltage == 10)
+    assert(board.voltage == 10)
+
+
+def test_blocking_proxy_io_thread():
+    # Waiting for a queued command from within a queued command would block
+    # the I/O thread forever.
+    board = RecordingBoard()
+    with AsyncDMFControlBoard(board) as session:
+        proxy = session.blocking_proxy()
+        future = session._submit(lambda future: proxy.record('a'))
+        assert(isinstance(future.exception(5), RuntimeError))
+        assert(proxy.record('b') == 'b')
+    assert(board.calls == ['b'])
+
+
+def test_max_queue_depth():
+    board = RecordingBoard()
+    with AsyncDMFControlBoard(board) as session:
+        waiting = session.submit('wait')
+        while session._running is not waiting:
+            pass
+
+        def _submit():
+            for i in range(50):
+                session.submit('record', 'a')
+
+        threads = [threading.Thread(target=_submit) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert(session.max_queue_depth == 200)
+        board.release.set()
@@ -0,0 +1,90 @@
+import numpy as np
+from microdrop_utility import Version
+
+from dmf_control_board_firmware import DMFControlBoard, FeedbackCalibration
+from dmf_control_board_firmware.autorange import (
+    DEFAULT_HEADROOM, MAX_PK_PK, SATURATION_THRESHOLD_HIGH, SaturationMetrics,
+    choose_series_resistor, predict_series_resistor_indexes)
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def test_choose_series_resistor():
+    limit = DEFAULT_HEADROOM * MAX_PK_PK
+    assert(choose_series_resistor([10., 100., limit + 1]) == 1)
+    assert(choose_series_resistor([10., 100., limit - 1]) == 2)
+    assert(choose_series_resistor([10., 100., 500.]) == 2)
+    # Samples swing about the virtual ground, so the amplitude is limited by
+    # both saturation thresholds (i.e., not only by the high threshold).
+    assert(MAX_PK_PK == 920)
+    assert(choose_series_resistor([100., DEFAULT_HEADROOM *
+                                   SATURATION_THRESHOLD_HIGH - 1]) == 0)
+    assert(choose_series_resistor([100., MAX_PK_PK - 1], headroom=1.) == 1)
+    # Smallest amplitude if all series resistors are expected to saturate.
+    assert(choose_series_resistor([2000., 3000.]) == 0)
+
+
+def test_predict_series_resistor_indexes():
+    calibration = FeedbackCalibration(R_hv=[20e3, 200e3, 2e6],
+                                      C_hv=[1e-15, 1e-15, 50e-12],
+                                      R_fb=[2e2, 2e3, 2e4, 2e5, 2e6],
+                                      C_fb=[50e-12] * 5,
+                                      hw_version=Version(2, 1))
+    assert(predict_series_resistor_indexes(calibration, 50., 1e3, 11e-12) ==
+           (1, 3))
+    # Larger load (or voltage) calls for smaller series resistors.
+    assert(predict_series_resistor_indexes(calibration, 100., 1e3, 110e-12)
+           == (0, 1))
+    # No feedback prediction without an expected load.
+    assert(predict_series_resistor_indexes(calibration, 50., 1e3)[1] == -1)
+
+
+def test_saturation_metrics():
+    metrics = SaturationMetrics()
+    metrics.record('default', np.array([-1, -1, 1, 1]),
+                   np.array([-1, 3, 3, -1]))
+    metrics.record('predicted', np.array([1, 1, 1, 1]),
+                   np.array([3, 3, 3, 3]))
+    df_metrics = metrics.snapshot()
+    assert(df_metrics.loc['default', 'hv_saturated_rate'] == .5)
+    assert(df_metrics.loc['default', 'fb_leading_saturated'] == 1)
+    assert(df_metrics.loc['predicted', 'fb_saturated'] == 0)
+    metrics.enabled = False
+    metrics.record('default', np.array([-1]), np.array([-1]))
+    assert(metrics.snapshot().loc['default', 'measurements'] == 1)
+
+
+def test_simulated_autorange():
+    with SimulatedControlBoard(number_of_channels=40, realtime=False,
+                               noise=0) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_waveform_voltage(50)
+            state = np.zeros(40, dtype=int)
+            state[0] = 1
+            proxy.measure_impedance(5., 10, 0, True, True, state)
+            indexes = proxy.autorange(board.load_capacitance(state))
+            assert(indexes == (1, 3))
+            assert(board.initial_series_resistor_index == [1, 3])
+            proxy.measure_impedance(5., 10, 0, True, True, state)
+
+            df_metrics = proxy.saturation_metrics.snapshot()
+            # Starting with the largest series resistors, the first window
+            # of each channel saturates.
+            assert(df_metrics.loc['default', 'hv_leading_saturated'] == 1)
+            assert(df_metrics.loc['default', 'fb_leading_saturated'] == 1)
+            assert(df_metrics.loc['predicted', 'hv_saturated'] == 0)
+            assert(df_metrics.loc['predicted', 'fb_saturated'] == 0)
+
+            proxy.reset_autorange()
+            assert(board.initial_series_resistor_index == [-1, -1])
+
+            # Each measurement is recorded once, in the ranging mode in
+            # effect when it was taken (decoding a buffer is not recorded).
+            with proxy.batch() as batch:
+                i = batch.measure_impedance(5., 10, 0, True, True, state)
+            proxy.measure_impedance_buffer_to_feedback_result(batch.values[i])
+            df_metrics = proxy.saturation_metrics.snapshot()
+            assert(df_metrics.measurements.tolist() == [1, 1])
+        finally:
+            proxy.disconnect()
@@ -0,0 +1,94 @@
+import struct
+
+import numpy as np
+from nose.tools import raises
+
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.batch import (CommandBatch,
+                                              decode_impedance_reply,
+                                              BATCH_STOP_ON_ERROR)
+
+
+def test_encode():
+    batch = CommandBatch(8)
+    batch.set_waveform_voltage(100.)
+    batch.waveform_frequency()
+    encoded = batch.to_bytes()
+    assert(encoded == struct.pack('<BBBHfBBH', 1 << BATCH_STOP_ON_ERROR,
+                                  Base.CMD_SET_WAVEFORM_VOLTAGE, 0, 4, 100.,
+                                  Base.CMD_GET_WAVEFORM_FREQUENCY, 0, 0))
+
+
+def test_encode_state():
+    batch = CommandBatch(8, stop_on_error=False)
+    batch.set_state_of_all_channels([1, 0, 0, 1, 0, 0, 0, 0])
+    assert(batch.to_bytes() == struct.pack('<BBBH8B', 0,
+                                           Base.CMD_SET_STATE_OF_ALL_CHANNELS,
+                                           0, 8, 1, 0, 0, 1, 0, 0, 0, 0))
+
+
+def test_duration():
+    batch = CommandBatch(8)
+    batch.set_waveform_voltage(100.)
+    batch.measure_impedance(5., 20, 1., True, True)
+    batch.measure_impedance(10., 10, 0, True, True)
+    assert(batch.duration_ms == 20 * 6. + 10 * 10.)
+
+
+@raises(ValueError)
+def test_state_length():
+    CommandBatch(8).set_state_of_all_channels([1, 0])
+
+
+@raises(ValueError)
+def test_reply_too_long():
+    batch = CommandBatch(8)
+    for i in range(2):
+        batch.measure_impedance(5., 200, 0, True, True)
+    batch.to_bytes()
+
+
+def test_decode():
+    batch = CommandBatch(8)
+    batch.set_waveform_voltage(100.)
+    batch.waveform_frequency()
+    batch.auto_adjust_amplifier_gain()
+    # The second command fails, so the third command is not run.
+    reply = struct.pack('<BBH', Base.CMD_SET_WAVEFORM_VOLTAGE, 0, 0) + \
+        struct.pack('<BBH', Base.CMD_GET_WAVEFORM_FREQUENCY,
+                    Base.RETURN_TIMEOUT, 0)
+    results = batch.decode(reply)
+    assert(results.return_code.tolist()[:2] == [0, Base.RETURN_TIMEOUT])
+    assert(np.isnan(results.return_code.iloc[2]))
+    assert(batch.failed.index.tolist() == [1, 2])
+
+
+def test_decode_values():
+    batch = CommandBatch(8)
+    batch.waveform_voltage()
+    batch.auto_adjust_amplifier_gain()
+    reply = struct.pack('<BBHf', Base.CMD_GET_WAVEFORM_VOLTAGE, 0, 4, 50.) + \
+        struct.pack('<BBHB', Base.CMD_GET_AUTO_ADJUST_AMPLIFIER_GAIN, 0, 1, 1)
+    batch.decode(reply)
+    assert(batch.values == [50., True])
+    assert(batch.failed.empty)
+
+
+def test_decode_impedance_reply():
+    reply = (struct.pack('<HbHb', 1000, 1, 2000, 2) +
+             struct.pack('<HbHb', 3000, 0, 4000, -1) +
+             struct.pack('<4f', 5., 1., 2., 300.))
+    buffer = decode_impedance_reply(reply)
+    assert((buffer == [1000, 1, 2000, 2, 3000, 0, 4000, -1,
+                       5., 1., 2., 300.]).all())
+
+
+def test_mirrored_settings():
+    batch = CommandBatch(8)
+    batch.set_waveform_voltage(100.)
+    batch.amplifier_gain()
+    batch.set_series_resistor_index(0, 1)
+    assert(batch.commands[0]['mirror'] == ('waveform_voltage', 100.))
+    assert(batch.commands[1]['mirror'] == ('amplifier_gain', None))
+    assert(batch.commands[2]['mirror'] is None)
@@ -0,0 +1,30 @@
+import pandas as pd
+
+from dmf_control_board_firmware.bin.benchmark import (RESULTS_COLUMNS,
+                                                      compare_results)
+
+
+def _results(median_s):
+    return pd.DataFrame([['command', 'name', 5, t, t, t, t, 1. / t]
+                         for t in median_s], columns=RESULTS_COLUMNS)
+
+
+def test_compare_results():
+    df_baseline = _results([1.])
+    df_baseline.loc[1] = ['decode', 'n_sampling_windows=10', 5, 2., 2., 2.,
+                          2., 5.]
+    df_results = df_baseline.copy()
+    df_results.loc[0, 'median_s'] = 1.05
+    df_results.loc[1, 'median_s'] = 3.
+    df_comparison = compare_results(df_baseline, df_results, threshold=.1)
+    assert(not df_comparison.loc[('command', 'name'), 'regression'])
+    assert(df_comparison.loc[('decode', 'n_sampling_windows=10'),
+                             'regression'])
+    assert(abs(df_comparison.loc[('decode', 'n_sampling_windows=10'),
+                                 'change'] - .5) < 1e-9)
+
+
+def test_compare_new_case():
+    # Cases that are not in the baseline are not compared.
+    df_comparison = compare_results(_results([]), _results([1.]))
+    assert(df_comparison.shape[0] == 0)
@@ -0,0 +1,86 @@
+from datetime import datetime
+import tempfile
+
+from path_helpers import path
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.cache import JsonCache
+from dmf_control_board_firmware.calibration_cache import CalibrationCache
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+VALUES = {'R_hv': [1e4, 1e5], 'C_hv': [1e-12, 2e-12],
+          'R_fb': [1e3, 1e4, 1e5], 'C_fb': [3e-12, 4e-12, 5e-12]}
+
+
+def test_calibration_history():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = CalibrationCache(JsonCache(cache_dir
+                                           .joinpath('calibration.json')))
+        assert(cache.lookup(7, 1234) is None)
+        assert(cache.calibration(7) is None)
+
+        cache.record(7, 1234, '2.1', VALUES,
+                     timestamp=datetime(2016, 1, 1))
+        # Recording the same calibration again does not add an entry.
+        cache.record(7, 1234, '2.1', VALUES)
+        assert(len(cache.entries(7)) == 1)
+        assert(cache.lookup(7, 1234)['R_fb'] == VALUES['R_fb'])
+        assert(cache.lookup(7, 4321) is None)
+
+        values = dict(VALUES, R_hv=[2e4, 2e5])
+        cache.record(7, 4321, '2.1', values, timestamp=datetime(2016, 2, 1))
+        assert(cache.lookup(7, 1234) is None)
+        df_history = cache.history(7)
+        assert(df_history.checksum.tolist() == [1234, 4321])
+
+        # Calibration in effect at a given time.
+        calibration = cache.calibration(7, timestamp='2016-01-15')
+        assert(calibration.R_hv.tolist() == VALUES['R_hv'])
+        assert(cache.calibration(7).R_hv.tolist() == [2e4, 2e5])
+        assert(cache.calibration(7, timestamp='2015-12-31') is None)
+        assert(cache.history(8).empty)
+    finally:
+        cache_dir.rmtree()
+
+
+def _connect(board, calibration_cache):
+    proxy = DMFControlBoard(calibration_cache=calibration_cache)
+    proxy.connect(board.port)
+    try:
+        return proxy.calibration
+    finally:
+        proxy.disconnect()
+
+
+def test_connect_cached_calibration():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = CalibrationCache(JsonCache(cache_dir
+                                           .joinpath('calibration.json')))
+        with SimulatedControlBoard(number_of_channels=40, serial_number=7,
+                                   realtime=False) as board:
+            calibration = _connect(board, cache)
+            n_reads = board.command_counts[Base.CMD_GET_SERIES_RESISTANCE]
+            assert(n_reads > 0)
+            assert(len(cache.entries(7)) == 1)
+
+            # Calibration values are not read again while the configuration
+            # checksum is unchanged.
+            cached = _connect(board, cache)
+            assert(board.command_counts[Base.CMD_GET_SERIES_RESISTANCE] ==
+                   n_reads)
+            assert(cached.R_fb.tolist() == calibration.R_fb.tolist())
+
+            # Cache is not used (or read) when disabled.
+            n_checksums = board.command_counts[Base.CMD_GET_CONFIG_CHECKSUM]
+            _connect(board, None)
+            assert(board.command_counts[Base.CMD_GET_SERIES_RESISTANCE] ==
+                   2 * n_reads)
+            assert(board.command_counts[Base.CMD_GET_CONFIG_CHECKSUM] ==
+                   n_checksums)
+    finally:
+        cache_dir.rmtree()
@@ -0,0 +1,92 @@
+import tempfile
+
+import numpy as np
+import pandas as pd
+from path_helpers import path
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.capture import (ReplayControlBoard,
+                                                read_capture, write_capture,
+                                                HOST_TO_DEVICE,
+                                                DEVICE_TO_HOST)
+from dmf_control_board_firmware.simulator import (SimulatedControlBoard,
+                                                  PacketParser)
+
+
+def _simulated_capture(board, commands):
+    '''
+    Build a capture of the packets exchanged with a simulated control board.
+    '''
+    rows = []
+    for i, (command, payload) in enumerate(commands):
+        rows.append([1e-3 * i, HOST_TO_DEVICE, command, payload])
+        for reply in PacketParser().parse(board.process_packet(command,
+                                                               payload)):
+            rows.append([1e-3 * i + 5e-4, DEVICE_TO_HOST] + list(reply))
+    return pd.DataFrame(rows, columns=['time_s', 'direction', 'command',
+                                       'payload'])
+
+
+def test_round_trip():
+    board = SimulatedControlBoard(realtime=False)
+    df_packets = _simulated_capture(board, [(Base.CMD_GET_DEVICE_NAME, ''),
+                                            (Base.CMD_GET_NUMBER_OF_CHANNELS,
+                                             '')])
+    output_dir = path(tempfile.mkdtemp(prefix='dmf-capture-'))
+    try:
+        write_capture(output_dir.joinpath('test.dmfcap'), df_packets)
+        df_read = read_capture(output_dir.joinpath('test.dmfcap'))
+        assert((df_read.payload == df_packets.payload).all())
+        assert((df_read.command == df_packets.command).all())
+        assert((df_read.direction == df_packets.direction).all())
+        assert(np.allclose(df_read.time_s, df_packets.time_s))
+    finally:
+        output_dir.rmtree()
+
+
+def test_replay_mismatch():
+    board = SimulatedControlBoard(realtime=False)
+    df_packets = _simulated_capture(board, [(Base.CMD_GET_DEVICE_NAME, '')])
+    replay = ReplayControlBoard(df_packets)
+    replay._write = lambda data: None
+    replay.handle_packet(Base.CMD_GET_DEVICE_NAME, '')
+    assert(replay.mismatches == 0)
+    assert(replay.remaining == 0)
+    replay.handle_packet(Base.CMD_GET_DEVICE_NAME, '')
+    assert(replay.mismatches == 1)
+
+
+def test_capture_replay():
+    output_dir = path(tempfile.mkdtemp(prefix='dmf-capture-'))
+    capture_path = output_dir.joinpath('session.dmfcap')
+    state = np.zeros(40, dtype=int)
+    state[0] = 1
+    try:
+        with SimulatedControlBoard(number_of_channels=40, serial_number=3,
+                                   realtime=False) as board:
+            proxy = DMFControlBoard()
+            with proxy.capture(capture_path):
+                proxy.connect(board.port)
+                try:
+                    expected = proxy.measure_impedance(5., 10, 0, True, True,
+                                                       state)
+                finally:
+                    proxy.disconnect()
+
+        # Calibration values were read from the control board while
+        # capturing, so they must be read again during the replay.
+        with ReplayControlBoard(capture_path) as replay:
+            proxy = DMFControlBoard(calibration_cache=None)
+            proxy.connect(replay.port)
+            try:
+                assert(proxy.serial_number == 3)
+                result = proxy.measure_impedance(5., 10, 0, True, True,
+                                                 state)
+            finally:
+                proxy.disconnect()
+            assert(replay.mismatches == 0)
+        assert(np.allclose(result.capacitance(), expected.capacitance()))
+    finally:
+        output_dir.rmtree()
@@ -0,0 +1,96 @@
+import struct
+
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.config import (ConfigTransaction,
+                                               MAX_COMMANDS_PER_BATCH,
+                                               SNAPSHOT_BLOCK_SIZE)
+
+
+class PersistentMemory(object):
+    '''
+    Minimal stand-in for a control board, executing batches of persistent
+    read/write commands against a byte array.
+    '''
+    def __init__(self, size=1024):
+        self.memory = bytearray(size)
+        self.batches = []
+
+    def number_of_channels(self):
+        return 8
+
+    def execute_batch(self, batch):
+        batch.to_bytes()  # Check that the batch fits in a packet.
+        self.batches.append([command['name'] for command in batch.commands])
+        reply = []
+        for command in batch.commands:
+            if command['command_code'] == Base.CMD_PERSISTENT_READ:
+                address, = struct.unpack('<H', command['payload'])
+                reply.append(struct.pack('<BBHB', command['command_code'], 0,
+                                         1, self.memory[address]))
+            else:
+                address, byte = struct.unpack('<HB', command['payload'])
+                self.memory[address] = byte
+                reply.append(struct.pack('<BBH', command['command_code'], 0,
+                                         0))
+        return batch.decode(''.join(reply))
+
+
+def test_read_prefetch():
+    proxy = PersistentMemory()
+    proxy.memory[40] = 7
+    transaction = ConfigTransaction(proxy)
+    assert(transaction.read(40) == 7)
+    # The aligned block containing the address is read in one batch.
+    assert(len(proxy.batches) == 1)
+    assert(len(proxy.batches[0]) == SNAPSHOT_BLOCK_SIZE)
+    transaction.read(41)
+    assert(len(proxy.batches) == 1)
+
+
+def test_commit_changed_bytes():
+    proxy = PersistentMemory()
+    proxy.memory[0:3] = '\x01\x02\x03'
+    transaction = ConfigTransaction(proxy)
+    assert(transaction.read(1) == 2)
+    transaction.write(0, 1)
+    transaction.write(1, 5)
+    transaction.write(2, 3)
+    assert(transaction.read(1) == 5)
+    assert(proxy.memory[1] == 2)
+    del proxy.batches[:]
+    # Only the byte that differs from persistent memory is written.
+    assert(transaction.commit() == {1: 5})
+    assert(proxy.batches == [['persistent_write']])
+    assert(proxy.memory[0:3] == bytearray('\x01\x05\x03'))
+    assert(not transaction.pending)
+
+
+def test_commit_chunks():
+    proxy = PersistentMemory(size=4 * MAX_COMMANDS_PER_BATCH)
+    transaction = ConfigTransaction(proxy)
+    for address in xrange(2 * MAX_COMMANDS_PER_BATCH):
+        transaction.write(address, 0xFF)
+    transaction.commit()
+    assert([len(batch) for batch in proxy.batches
+            if batch[0] == 'persistent_write'] ==
+           [MAX_COMMANDS_PER_BATCH] * 2)
+    assert(proxy.memory[:2 * MAX_COMMANDS_PER_BATCH] ==
+           bytearray([0xFF] * 2 * MAX_COMMANDS_PER_BATCH))
+
+
+def test_rollback_and_invalidate():
+    proxy = PersistentMemory()
+    transaction = ConfigTransaction(proxy)
+    transaction.write(3, 9)
+    transaction.rollback()
+    assert(transaction.commit() == {})
+    assert(proxy.memory[3] == 0)
+
+    # Bytes written by the control board itself are re-read after
+    # invalidating the snapshot.
+    assert(transaction.read(3) == 0)
+    proxy.memory[3] = 9
+    transaction.invalidate()
+    transaction.write(3, 9)
+    assert(transaction.commit() == {})
@@ -0,0 +1,67 @@
+import cPickle as pickle
+
+import numpy as np
+
+from dmf_control_board_firmware import FeedbackCalibration, FrequencyTable
+
+
+def _calibration():
+    return FeedbackCalibration(c_drop={'frequency': [10e3, 1e3, 5e3],
+                                       'capacitance': [1e-12, 3e-12, 2e-12]},
+                               c_filler=1e-13)
+
+
+def test_frequency_table():
+    table = FrequencyTable([3., 1., 2., 2.], [30., 10., 10., 30.])
+    assert(table.frequency.tolist() == [1., 2., 3.])
+    # Values at duplicate frequencies are averaged.
+    assert(table.values.tolist() == [10., 20., 30.])
+    assert(np.allclose(table([0., 1.5, 2.5, 4.]), [10., 15., 25., 30.]))
+    assert(FrequencyTable.from_calibration(5.) is None)
+    assert(FrequencyTable.from_calibration(None) is None)
+
+
+def test_c_drop_vectorised():
+    calibration = _calibration()
+    frequencies = np.array([1e3, 2e3, 7.5e3, 20e3])
+    c_drop = calibration.c_drop(frequencies)
+    assert(np.allclose(c_drop, [calibration.c_drop(f) for f in frequencies]))
+    assert(np.allclose(c_drop, [3e-12, 2.75e-12, 1.5e-12, 1e-12]))
+    # Scalar calibration values apply to all frequencies.
+    assert(calibration.c_filler(frequencies) == 1e-13)
+
+    # Table is compiled again if the calibration data is replaced.
+    calibration._c_drop = {'frequency': [1e3], 'capacitance': [4e-12]}
+    assert(calibration.c_drop(2e3) == 4e-12)
+
+    # In-place modifications are only applied once the tables are
+    # invalidated.
+    calibration._c_drop['capacitance'][0] = 5e-12
+    assert(calibration.c_drop(2e3) == 4e-12)
+    calibration.invalidate_tables()
+    assert(calibration.c_drop(2e3) == 5e-12)
+    calibration._c_drop['frequency'].append(3e3)
+    calibration._c_drop['capacitance'].append(7e-12)
+    calibration.invalidate_tables()
+    assert(np.allclose(calibration.c_drop(2e3), 6e-12))
+
+
+def test_force_to_voltage():
+    calibration = _calibration()
+    forces = np.array([10., 20., 30.])
+    frequencies = np.array([1e3, 5e3, 10e3])
+    voltages = calibration.force_to_voltage(forces, frequencies)
+    assert(np.allclose(voltages, [calibration.force_to_voltage(F, f)
+                                  for F, f in zip(forces, frequencies)]))
+
+    df_surface = calibration.force_to_voltage_surface(frequencies, forces)
+    assert(df_surface.shape == (3, 3))
+    assert(np.allclose(np.diag(df_surface.values), voltages))
+
+
+def test_pickle():
+    calibration = _calibration()
+    calibration.c_drop(1e3)
+    loaded = pickle.loads(pickle.dumps(calibration))
+    assert('_frequency_tables' not in loaded.__dict__)
+    assert(loaded.c_drop(1e3) == 3e-12)
@@ -0,0 +1,134 @@
+from concurrent.futures import ProcessPoolExecutor
+import tempfile
+
+from microdrop_utility import Version
+import numpy as np
+import pandas as pd
+from path_helpers import path
+
+from dmf_control_board_firmware import FeedbackCalibration
+from dmf_control_board_firmware.calibrate.fleet import (refit_archive,
+                                                        refit_archives)
+from dmf_control_board_firmware.calibrate.hv_attenuator import \
+    fit_feedback_params
+from dmf_control_board_firmware.calibrate.impedance import (
+    fb_actuation_voltage, fit_fb_calibration, simulate_experiment)
+
+
+def _calibration():
+    return FeedbackCalibration(R_hv=[8.7e4, 6.4e5], C_hv=[1.4e-10, 1.69e-10],
+                               R_fb=[2.1e2, 1.9e3, 2.2e4, 1.8e5, 2.3e6],
+                               C_fb=[1e-12, 20e-12, 50e-12, 30e-12, 10e-12],
+                               hw_version=Version(2, 1))
+
+
+def _hv_readings(calibration, seed=None):
+    # Synthetic readings (see `hv_attenuator.resistor_max_actuation_readings`)
+    # for resistor and capacitor values 10% off from the calibration.
+    random = np.random.RandomState(seed)
+    frequency = np.tile(np.logspace(2, 4, 8), len(calibration.R_hv))
+    resistor_index = np.repeat(range(len(calibration.R_hv)), 8)
+    R_hv = 1.1 * calibration.R_hv[resistor_index]
+    C_hv = .9 * calibration.C_hv[resistor_index]
+    oscope_V = 100 * np.ones(frequency.shape)
+    board_V = oscope_V / fb_actuation_voltage(2, 1., R_hv, C_hv, frequency)
+    board_V *= 1 + 1e-3 * random.randn(frequency.size)
+    return pd.DataFrame({'resistor index': resistor_index,
+                         'frequency': frequency, 'actuation index': 0,
+                         'board measured V': board_V,
+                         'oscope measured V': oscope_V})
+
+
+def _write_archive(filepath, serial_number, calibration, seed,
+                   resistor_indexes=None):
+    # Same layout as the impedance and reference calibration assistants.
+    info = pd.Series({'serial_number': str(serial_number),
+                      'hardware_version': '2.1'})
+    df = simulate_experiment(calibration, frequencies=np.logspace(2, 4, 5),
+                             n_sampling_windows=5, seed=seed)
+    info.to_hdf(filepath, '/feedback/impedance/control_board_info',
+                format='t')
+    df.to_hdf(filepath, '/feedback/impedance/measurements', format='t',
+              data_columns=df.columns)
+    pd.Series([calibration]).to_hdf(filepath,
+                                    '/feedback/impedance/calibration')
+
+    hv_readings = _hv_readings(calibration, seed)
+    if resistor_indexes is not None:
+        hv_readings = hv_readings[hv_readings['resistor index']
+                                  .isin(resistor_indexes)]
+    fitted_params = fit_feedback_params(calibration, hv_readings)
+    info.to_hdf(filepath, '/feedback/reference/control_board_info',
+                format='t')
+    hv_readings.to_hdf(filepath, '/feedback/reference/measurements',
+                       format='t', data_columns=hv_readings.columns)
+    fitted_params.to_hdf(filepath, '/feedback/reference/fitted_params',
+                         format='t', data_columns=fitted_params.columns)
+    return df, hv_readings
+
+
+def test_executor():
+    calibration = _calibration()
+    df = simulate_experiment(calibration, frequencies=np.logspace(2, 4, 5),
+                             n_sampling_windows=5, seed=0)
+    hv_readings = _hv_readings(calibration, seed=0)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert(fit_fb_calibration(df, calibration, executor=executor)
+               .equals(fit_fb_calibration(df, calibration)))
+        assert(fit_feedback_params(calibration, hv_readings,
+                                   executor=executor)
+               .equals(fit_feedback_params(calibration, hv_readings)))
+
+
+def test_refit_archives():
+    calibration = _calibration()
+    archive_dir = path(tempfile.mkdtemp(prefix='dmf-calibration-'))
+    try:
+        filepaths = [archive_dir.joinpath('%d-calibration.h5' % i)
+                     for i in xrange(3)]
+        data = dict((str(filepaths[i]),
+                     _write_archive(filepaths[i], i + 1, calibration, i))
+                    for i in xrange(2))
+        # Third archive does not exist.
+        results = refit_archives(filepaths, max_workers=2)
+        assert(results.errors.keys() == [str(filepaths[2])])
+
+        assert(sorted(results.fb_calibration.serial_number.unique()) ==
+               [1, 2])
+        for filepath, (df, hv_readings) in data.iteritems():
+            calibration_df = (results.fb_calibration
+                              .loc[results.fb_calibration.filepath ==
+                                   filepath].drop(['serial_number',
+                                                   'filepath'], axis=1))
+            expected = fit_fb_calibration(df, calibration)
+            assert(np.allclose(calibration_df[['R_fb', 'C_fb']],
+                               expected[['R_fb', 'C_fb']]))
+
+            fitted_params = (results.fitted_params
+                             .loc[results.fitted_params.filepath == filepath]
+                             .set_index('resistor index'))
+            expected = fit_feedback_params(calibration, hv_readings)
+            assert(np.allclose(fitted_params[expected.columns], expected))
+            # Fitted values are 10% off from the archived calibration.
+            assert(np.allclose(fitted_params['fitted R'],
+                               1.1 * calibration.R_hv, rtol=1e-2))
+    finally:
+        archive_dir.rmtree()
+
+
+def test_refit_archive_missing_resistor():
+    # No readings (and no fitted values) for the first resistor.
+    calibration = _calibration()
+    archive_dir = path(tempfile.mkdtemp(prefix='dmf-calibration-'))
+    try:
+        filepath = archive_dir.joinpath('calibration.h5')
+        _write_archive(filepath, 1, calibration, 0, resistor_indexes=[1])
+        serial_number, calibration_df, fitted_params = refit_archive(filepath)
+        assert(serial_number == 1)
+        assert(fitted_params.index.tolist() == [1])
+        # Fits start from the archived values of the same resistor.
+        assert(np.allclose(fitted_params['original R'], calibration.R_hv[1]))
+        assert(np.allclose(fitted_params['fitted R'],
+                           1.1 * calibration.R_hv[1], rtol=1e-2))
+    finally:
+        archive_dir.rmtree()
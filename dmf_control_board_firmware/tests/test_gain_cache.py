@@ -0,0 +1,111 @@
+import tempfile
+
+import numpy as np
+from path_helpers import path
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.cache import JsonCache
+from dmf_control_board_firmware.gain_cache import AmplifierGainCache
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def _cache(cache_dir):
+    return AmplifierGainCache(JsonCache(cache_dir.joinpath('gain.json')))
+
+
+def test_record_converged_gain():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = _cache(cache_dir)
+        # Gain changed by more than the tolerance during the measurement.
+        assert(not cache.record(5, 1e3, 100., 250., 300.))
+        assert(cache.lookup(5, 1e3, 100.) is None)
+        assert(cache.record(5, 1e3, 100., 299., 300.))
+        # Gain within tolerance of the cached gain is not written again.
+        assert(not cache.record(5, 1e3, 100., 300., 301.))
+        assert(cache.stats['updates'] == 1)
+
+        # Nearest frequency and voltage within tolerance.
+        assert(cache.lookup(5, 1.02e3, 95.) == 300.)
+        assert(cache.lookup(5, 2e3, 100.) is None)
+        assert(cache.lookup(6, 1e3, 100.) is None)
+        # Entries are persisted.
+        assert(_cache(cache_dir).lookup(5, 1e3, 100.) == 300.)
+
+        # A corrected gain replaces the cached gain.
+        assert(cache.check(300., 320.))
+        assert(cache.record(5, 1e3, 100., 320., 320.))
+        assert(cache.entries(5) == [{'frequency': 1e3, 'voltage': 100.,
+                                     'gain': 320.}])
+        summary = cache.summary()
+        assert(summary.correction_rate == 1)
+        assert(summary.hits == 1)
+    finally:
+        cache_dir.rmtree()
+
+
+def test_simulated_settle_amplifier_gain():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        with SimulatedControlBoard(number_of_channels=40, serial_number=9,
+                                   realtime=False) as board:
+            proxy = DMFControlBoard()
+            proxy.amplifier_gain_cache = _cache(cache_dir)
+            proxy.connect(board.port)
+            try:
+                proxy.auto_adjust_amplifier_gain = True
+                proxy.set_waveform_frequency(1e3)
+                proxy.set_waveform_voltage(50)
+                state = np.zeros(40)
+                # No cached gain, so the gain must settle.
+                assert(proxy.settle_amplifier_gain(state, 5., 10)
+                       is not None)
+                proxy.settle_amplifier_gain(state, 5., 10)
+                assert(proxy.amplifier_gain_cache.lookup(9, 1e3, 50.) ==
+                       board.amplifier_gain)
+
+                proxy.set_waveform_frequency(10e3)
+                board.amplifier_gain = 1.
+                proxy.set_waveform_frequency(1e3)
+                # Cached gain was sent with the frequency.
+                assert(board.amplifier_gain == 300.)
+                assert(proxy.settle_amplifier_gain(state, 5., 10) is None)
+                result = proxy.settle_amplifier_gain(state, 5., 10,
+                                                     n_settled_windows=2)
+                assert(len(result.V_hv) == 2)
+                assert(proxy.amplifier_gain_cache.stats['checks'] == 1)
+                assert(proxy.amplifier_gain_cache.stats['corrections'] == 0)
+            finally:
+                proxy.disconnect()
+    finally:
+        cache_dir.rmtree()
+
+
+def test_decode_without_side_effects():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        with SimulatedControlBoard(number_of_channels=40, serial_number=9,
+                                   realtime=False) as board:
+            proxy = DMFControlBoard()
+            proxy.amplifier_gain_cache = _cache(cache_dir)
+            proxy.connect(board.port)
+            try:
+                proxy.auto_adjust_amplifier_gain = True
+                n_commands = sum(board.command_counts.values())
+                # 10 sampling windows followed by `dt_ms`, `vgnd_fb`,
+                # `vgnd_hv`, and `amplifier_gain`.
+                buffer = np.array([512., 0, 256., 1] * 10 +
+                                  [5., 0, 0, 300.])
+                for i in xrange(2):
+                    results = (proxy
+                               .measure_impedance_buffer_to_feedback_result(
+                                   buffer, voltage=50., frequency=1e3))
+                    assert(results.amplifier_gain == 300.)
+                # Decoding neither sends commands to the control board nor
+                # learns the gain.
+                assert(sum(board.command_counts.values()) == n_commands)
+                assert(proxy.amplifier_gain_cache.entries(9) == [])
+            finally:
+                proxy.disconnect()
+    finally:
+        cache_dir.rmtree()
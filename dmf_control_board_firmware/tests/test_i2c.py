@@ -0,0 +1,165 @@
+import tempfile
+import time
+
+from path_helpers import path
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.cache import JsonCache
+from dmf_control_board_firmware.i2c import I2cDeviceInventory, inventory_key
+from dmf_control_board_firmware.simulator import (SimulatedControlBoard,
+                                                  SimulatedI2cDevice)
+
+
+def test_inventory_cache():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = JsonCache(cache_dir.joinpath('i2c-inventory.json'))
+        cache.set(inventory_key(7, [33, 32]), {'32': 'HV switching board'})
+
+        # Cached descriptions are used without querying the control board.
+        inventory = I2cDeviceInventory(None, [32, 33], serial_number=7,
+                                       cache=cache)
+        assert(inventory.unresolved == [33])
+        assert(inventory[32] == 'HV switching board')
+        assert(sorted(inventory) == [32, 33])
+        assert(inventory.get(40) is None)
+
+        # Devices that cannot be described are not cached.
+        assert(inventory[33] == '?')
+        assert(cache.get(inventory.key) == {'32': 'HV switching board'})
+
+        # Cache is keyed by the set of addresses found by the scan.
+        inventory = I2cDeviceInventory(None, [32], serial_number=7,
+                                       cache=cache)
+        assert(inventory.unresolved == [32])
+    finally:
+        cache_dir.rmtree()
+
+
+def test_inventory_forget_descriptions():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = JsonCache(cache_dir.joinpath('i2c-inventory.json'))
+        cache.set(inventory_key(7, [32, 33]), {'32': 'HV switching board'})
+        inventory = I2cDeviceInventory(None, [32, 33], serial_number=7,
+                                       cache=cache)
+        # Descriptions are looked up without querying the control board.
+        assert(inventory.describe(32) == 'HV switching board')
+        assert(inventory.describe(33) is None)
+        assert(inventory.describe(33, '<unresolved>') == '<unresolved>')
+
+        inventory.forget_descriptions()
+        assert(inventory.unresolved == [32, 33])
+        assert(sorted(inventory) == [32, 33])
+        assert(cache.get(inventory.key) is None)
+
+        # Clearing the mapping removes the devices, too.
+        inventory[32] = 'HV switching board'
+        inventory.clear()
+        assert(len(inventory) == 0)
+        assert(inventory.describe(32) is None)
+    finally:
+        cache_dir.rmtree()
+
+
+def test_json_cache():
+    cache_dir = path(tempfile.mkdtemp(prefix='dmf-cache-'))
+    try:
+        cache = JsonCache(cache_dir.joinpath('subdir', 'test.json'))
+        assert(cache.get('a') is None)
+        cache.set('a', [1, 2])
+        assert(JsonCache(cache.filepath).get('a') == [1, 2])
+        assert(cache.pop('a') == [1, 2])
+        assert(cache.get('a') is None)
+        # A corrupt cache file behaves as an empty cache.
+        cache.filepath.write_text('{')
+        assert(cache.get('a') is None)
+    finally:
+        cache_dir.rmtree()
+
+
+def _send_command(proxy, delay_ms):
+    '''
+    Returns
+    -------
+    tuple
+        Reply and duration (in milliseconds) of the command.
+    '''
+    start = time.time()
+    reply = proxy.i2c_send_command(32, 0x10, [1, 2, 3], delay_ms)
+    return reply.tolist(), 1e3 * (time.time() - start)
+
+
+def _assert_no_reply(proxy, delay_ms):
+    start = time.time()
+    try:
+        proxy.i2c_send_command(32, 0x10, [1, 2, 3], delay_ms)
+    except RuntimeError, exception:
+        assert('No return code provided' in str(exception))
+    else:
+        raise AssertionError('Expected command to fail.')
+    return 1e3 * (time.time() - start)
+
+
+def test_i2c_send_command_fixed_delay():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        device = SimulatedI2cDevice()
+        board.i2c_devices[32] = device
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            # Peripherals are not polled unless polling is enabled.
+            assert(not proxy.i2c_polling(32))
+            reply, duration_ms = _send_command(proxy, 50)
+            assert(reply == [1, 2, 3])
+            assert(duration_ms >= 50)
+            assert(device.n_length_reads == 1)
+
+            # Peripheral is not ready after the delay.
+            device.response_time_s = .2
+            _assert_no_reply(proxy, 20)
+            assert(device.n_length_reads == 2)
+        finally:
+            proxy.disconnect()
+
+
+def test_i2c_send_command_polling():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        device = SimulatedI2cDevice()
+        board.i2c_devices[32] = device
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_i2c_polling(32, True)
+            assert(proxy.i2c_polling(32))
+
+            # Ready: the reply is read as soon as the peripheral is done,
+            # rather than after `delay_ms`.
+            reply, duration_ms = _send_command(proxy, 250)
+            assert(reply == [1, 2, 3])
+            assert(duration_ms < 250)
+            assert(proxy.i2c_latency_estimate(32) >= 0)
+
+            # Late: the peripheral is polled until it is ready.
+            device.response_time_s = 30e-3
+            n_length_reads = device.n_length_reads
+            reply, duration_ms = _send_command(proxy, 250)
+            assert(reply == [1, 2, 3])
+            assert(30 <= duration_ms < 250)
+            assert(device.n_length_reads - n_length_reads > 1)
+
+            # Timeout: the peripheral is not ready by the deadline.
+            device.response_time_s = 1.
+            duration_ms = _assert_no_reply(proxy, 50)
+            assert(50 <= duration_ms < 1000)
+
+            # The fixed delay is used again once polling is disabled.
+            device.response_time_s = 0
+            proxy.set_i2c_polling(32, False)
+            reply, duration_ms = _send_command(proxy, 50)
+            assert(reply == [1, 2, 3])
+            assert(duration_ms >= 50)
+        finally:
+            proxy.disconnect()
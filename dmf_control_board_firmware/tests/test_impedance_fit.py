@@ -0,0 +1,74 @@
+import numpy as np
+from microdrop_utility import Version
+
+from dmf_control_board_firmware import FeedbackCalibration
+from dmf_control_board_firmware.calibrate.feedback import \
+    compute_from_transfer_function
+from dmf_control_board_firmware.calibrate.impedance import (
+    HV_ATTENUATOR_RESISTANCE, fb_actuation_voltage, fb_jacobian,
+    fb_residuals, fit_fb_calibration, simulate_experiment)
+
+
+def _calibration(hw_major):
+    return FeedbackCalibration(R_hv=[8.7e4, 6.4e5], C_hv=[1.4e-10, 1.69e-10],
+                               R_fb=[2.1e2, 1.9e3, 2.2e4, 1.8e5, 2.3e6],
+                               C_fb=[1e-12, 20e-12, 50e-12, 30e-12, 10e-12],
+                               hw_version=Version(hw_major, 0))
+
+
+def _check_transfer_functions(hw_major):
+    frequency = np.array([100., 1e3, 10e3])
+    omega = 2 * np.pi * frequency
+    V_hv = np.array([1., 2., 3.])
+    R_hv = np.array([8.7e4, 6.4e5, 8.7e4])
+    C_hv = np.array([1.4e-10, 1.69e-10, 1.4e-10])
+    V1 = fb_actuation_voltage(hw_major, V_hv, R_hv, C_hv, frequency)
+    assert(np.allclose(V1, compute_from_transfer_function
+                       (hw_major, 'V1', V2=V_hv, R1=HV_ATTENUATOR_RESISTANCE,
+                        R2=R_hv, C2=C_hv, f=frequency)))
+
+    C1 = np.array([1e-12, 10e-12, 100e-12])
+    for p in ([2e4], [2e4, 30e-12]):
+        C_fb = p[1] if len(p) == 2 else 0
+        V_fb = compute_from_transfer_function(hw_major, 'V2', V1=V1, C1=C1,
+                                              R2=p[0], C2=C_fb, f=frequency)
+        args = (V_fb, V1, C1, omega, hw_major)
+        assert(np.allclose(fb_residuals(p, *args), 0))
+
+        # Compare Jacobian against central differences.
+        jacobian = fb_jacobian(p, *args)
+        assert(jacobian.shape == (3, len(p)))
+        for i in xrange(len(p)):
+            h = 1e-4 * p[i]
+            p_plus, p_minus = list(p), list(p)
+            p_plus[i] += h
+            p_minus[i] -= h
+            difference = (fb_residuals(p_plus, *args) -
+                          fb_residuals(p_minus, *args)) / (2 * h)
+            assert(np.allclose(jacobian[:, i], difference, rtol=1e-4))
+
+
+def test_transfer_functions():
+    for hw_major in (1, 2):
+        _check_transfer_functions(hw_major)
+
+
+def _check_fit(hw_major):
+    calibration = _calibration(hw_major)
+    df = simulate_experiment(calibration, frequencies=np.logspace(2, 4, 5),
+                             n_sampling_windows=5, seed=0)
+    analytic = fit_fb_calibration(df, calibration)
+    symbolic = fit_fb_calibration(df, calibration, method='symbolic')
+    assert((analytic.Model == symbolic.Model).all())
+    assert(np.allclose(analytic.R_fb, symbolic.R_fb, rtol=1e-6))
+    assert(np.allclose(analytic.C_fb, symbolic.C_fb, rtol=1e-4))
+    assert(np.allclose(analytic['R-CI %'], symbolic['R-CI %'], rtol=1e-4))
+    # Fitted resistors match the simulated resistors.
+    R_fb = calibration.R_fb[analytic.fb_resistor.values]
+    assert(np.allclose(analytic.R_fb, R_fb, rtol=.01))
+
+
+def test_fit_fb_calibration():
+    # The analytic fit matches the (original) symbolic fit.
+    for hw_major in (1, 2):
+        _check_fit(hw_major)
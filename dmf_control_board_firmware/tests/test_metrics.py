@@ -0,0 +1,71 @@
+import json
+import shutil
+import tempfile
+
+import pandas as pd
+from path_helpers import path
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.metrics import CommandMetrics
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def test_snapshot():
+    metrics = CommandMetrics()
+    for i in range(99):
+        metrics.record('waveform_voltage', 1e-3, bytes_sent=5,
+                       bytes_received=9)
+    metrics.record('waveform_voltage', 1., return_code='TIMEOUT',
+                   timeout=True)
+    df_stats = metrics.snapshot()
+    stats = df_stats.loc['waveform_voltage']
+    assert(stats.calls == 100)
+    assert(stats.errors == 1)
+    assert(stats.timeouts == 1)
+    assert(stats.bytes_sent == 99 * 5)
+    # Percentiles are reported with the resolution of the histogram.
+    assert(1. <= stats.p50_ms < 1.2)
+    assert(1. <= stats.p95_ms < 1.2)
+    assert(stats.max_ms == 1e3)
+    assert(stats.error_codes == {'TIMEOUT': 1})
+
+
+def test_disabled():
+    metrics = CommandMetrics(enabled=False)
+    metrics.record('waveform_voltage', 1e-3)
+    assert(metrics.snapshot().empty)
+
+
+def test_dump():
+    metrics = CommandMetrics()
+    metrics.record('measure_impedance', 0.1, return_code='BAD_VALUE')
+    output_dir = path(tempfile.mkdtemp(prefix='dmf-metrics-'))
+    try:
+        metrics.dump(output_dir.joinpath('metrics.csv'))
+        df_stats = pd.read_csv(output_dir.joinpath('metrics.csv'),
+                               index_col='command')
+        assert(df_stats.loc['measure_impedance', 'calls'] == 1)
+
+        metrics.dump(output_dir.joinpath('metrics.json'))
+        with output_dir.joinpath('metrics.json').open('r') as input_:
+            data = json.load(input_)
+        assert(data['commands'][0]['command'] == 'measure_impedance')
+        assert(data['commands'][0]['error_codes'] == {'BAD_VALUE': 1})
+    finally:
+        shutil.rmtree(output_dir)
+
+
+def test_waveform_setters():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_waveform_voltage(50.)
+            proxy.set_waveform_frequency(5e3)
+            df_stats = proxy.metrics.snapshot()
+            for command in ('set_waveform_voltage', 'set_waveform_frequency'):
+                assert(df_stats.loc[command, 'calls'] == 1)
+                assert(df_stats.loc[command, 'bytes_sent'] > 0)
+        finally:
+            proxy.disconnect()
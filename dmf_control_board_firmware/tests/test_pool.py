@@ -0,0 +1,33 @@
+import numpy as np
+
+from dmf_control_board_firmware.pool import BoardPool
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def test_pool():
+    with SimulatedControlBoard(number_of_channels=40, serial_number=1,
+                               realtime=False) as board_a:
+        with SimulatedControlBoard(number_of_channels=40, serial_number=2,
+                                   realtime=False) as board_b:
+            ports = [board_a.port, '/dev/does-not-exist', board_b.port]
+            with BoardPool(ports) as pool:
+                # Failure to connect to one board does not affect the others.
+                assert(pool.ports == [board_a.port, board_b.port])
+                assert('/dev/does-not-exist' in pool.errors)
+                assert(pool.serial_numbers == {board_a.port: 1,
+                                               board_b.port: 2})
+
+                pool.set_waveform_voltage(50)
+                channel_mask = np.zeros(40, dtype=int)
+                channel_mask[:5] = 1
+                df_sweeps = pool.sweep_channels(5., 5, 0, True, True,
+                                                channel_mask)
+                assert(sorted(df_sweeps.serial_number.unique()) == [1, 2])
+                assert((df_sweeps.groupby('serial_number').channel_i
+                        .nunique() == 5).all())
+
+                state = np.zeros(40, dtype=int)
+                state[0] = 1
+                df_impedance = pool.measure_impedance(5., 10, 0, True, True,
+                                                      {board_b.port: state})
+                assert((df_impedance.serial_number == 2).all())
@@ -0,0 +1,67 @@
+import numpy as np
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def _measure_until_settled(noise, max_duration_ms, tolerance=0.01,
+                           n_settled_windows=5):
+    with SimulatedControlBoard(number_of_channels=40, realtime=False,
+                               noise=noise, seed=0) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_waveform_voltage(100)
+            state = np.zeros(40, dtype=int)
+            state[[1, 2]] = 1
+            return proxy.measure_impedance_until_settled(
+                5., max_duration_ms, 0, True, True, state,
+                tolerance=tolerance, n_settled_windows=n_settled_windows)
+        finally:
+            proxy.disconnect()
+
+
+def test_settle_early_stop():
+    results, settled, duration_ms = _measure_until_settled(0, 500)
+    n_windows = len(results.V_hv)
+    assert(settled)
+    # Stops as soon as the last 5 windows are within the tolerance band,
+    # well before the maximum duration (i.e., 100 windows).
+    assert(5 <= n_windows < 100)
+    assert(np.allclose(duration_ms, n_windows * 5.))
+    last = slice(-5, None)
+    assert((results.hv_resistor[last] >= 0).all())
+    assert((results.fb_resistor[last] >= 0).all())
+    assert(len(set(results.hv_resistor[last])) == 1)
+    assert(len(set(results.fb_resistor[last])) == 1)
+    ratio = results.V_fb[last] / results.V_hv[last]
+    assert((abs(ratio - ratio[0]) <= 0.01 * ratio[0]).all())
+
+
+def test_settle_never_settles():
+    # Noise is much larger than the tolerance band.
+    results, settled, duration_ms = _measure_until_settled(.05, 500,
+                                                           tolerance=1e-3)
+    assert(not settled)
+    assert(len(results.V_hv) == 100)
+    assert(np.allclose(duration_ms, 500.))
+
+
+def test_settle_duration_cap():
+    # The duration is rounded up to a whole number of sampling windows.
+    results, settled, duration_ms = _measure_until_settled(.05, 42,
+                                                           tolerance=1e-3)
+    assert(not settled)
+    assert(len(results.V_hv) == 9)
+    assert(np.allclose(duration_ms, 45.))
+
+
+def test_settle_max_windows():
+    # Only the sampling windows that fit in a single reply packet (including
+    # the trailing `settled` flag) are measured.
+    max_windows = (DMFControlBoard.MAX_PAYLOAD_LENGTH - 4 * 4 - 1) / (2 * 3)
+    results, settled, duration_ms = _measure_until_settled(.05, 1e6,
+                                                           tolerance=1e-3)
+    assert(not settled)
+    assert(len(results.V_hv) == max_windows)
+    assert(np.allclose(duration_ms, max_windows * 5.))
@@ -0,0 +1,157 @@
+import struct
+import time
+
+import numpy as np
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.batch import decode_impedance_reply
+from dmf_control_board_firmware.simulator import (SimulatedControlBoard,
+                                                  PacketParser, crc16,
+                                                  encode_packet)
+
+
+def test_crc16():
+    # Check value of CRC-16 with polynomial `0xA001` and initial value
+    # `0xFFFF`.
+    assert(crc16('123456789') == 0x4B37)
+
+
+def test_framing():
+    payloads = ['', 'abc', '\x7e\x7d' * 10,
+                ''.join(chr(i % 256) for i in xrange(300)), 'x' * 2000]
+    data = ''.join(encode_packet(0x80 | i, payload)
+                   for i, payload in enumerate(payloads))
+    # Escaped bytes are not sent as is.
+    assert('\x7e\x7d\x7e' not in data)
+    parser = PacketParser()
+    packets = []
+    # Parse one byte at a time, starting with bytes outside of any packet
+    # (e.g., a startup message).
+    for byte in 'Analog Reference=5.00 V\r\n' + data:
+        packets += parser.parse(byte)
+    assert(packets == [(0x80 | i, payload)
+                       for i, payload in enumerate(payloads)])
+
+
+def test_bad_crc():
+    packet = bytearray(encode_packet(Base.CMD_GET_DEVICE_NAME))
+    packet[-1] ^= 0x01
+    parser = PacketParser()
+    assert(parser.parse(packet) == [])
+    assert(parser.crc_errors == 1)
+
+
+def test_process_packet():
+    board = SimulatedControlBoard(realtime=False)
+    reply = board.process_packet(Base.CMD_GET_DEVICE_NAME, '')
+    assert(PacketParser().parse(reply) ==
+           [(Base.CMD_GET_DEVICE_NAME ^ 0x80, 'Arduino DMF Controller\x00')])
+
+
+def test_persistent_memory():
+    board = SimulatedControlBoard(serial_number=42, realtime=False)
+    serial_number = ''.join(board.process_command(
+        Base.CMD_PERSISTENT_READ,
+        struct.pack('<H', Base.PERSISTENT_SERIAL_NUMBER_ADDRESS + i))[1]
+        for i in xrange(4))
+    assert(struct.unpack('<I', serial_number)[0] == 42)
+    assert(board.process_command(Base.CMD_PERSISTENT_WRITE,
+                                 struct.pack('<HB', 500, 7)) ==
+           (Base.RETURN_OK, ''))
+    assert(board.persistent_memory[500] == 7)
+
+
+def test_config_checksum():
+    board = SimulatedControlBoard(realtime=False)
+    return_code, data = board.process_command(Base.CMD_GET_CONFIG_CHECKSUM,
+                                              '')
+    assert(return_code == Base.RETURN_OK)
+    # Checksum changes when a series resistance is written.
+    board.process_command(Base.CMD_SET_SERIES_RESISTANCE,
+                          struct.pack('<Bf', 1, 1234.))
+    assert(board.process_command(Base.CMD_GET_CONFIG_CHECKSUM, '')[1] !=
+           data)
+
+
+def test_waveform_range():
+    board = SimulatedControlBoard(realtime=False)
+    return_code, data = board.process_command(Base.CMD_SET_WAVEFORM_VOLTAGE,
+                                              struct.pack('<f', 1e3))
+    assert(return_code == Base.RETURN_BAD_VALUE)
+    return_code, data = board.process_command(
+        Base.CMD_SET_WAVEFORM_FREQUENCY, struct.pack('<f', 10e3))
+    assert(return_code == Base.RETURN_OK)
+    assert(board.waveform_frequency == 10e3)
+
+
+def test_sweep_channels():
+    board = SimulatedControlBoard(number_of_channels=40, realtime=False,
+                                  noise=0)
+    board.waveform_voltage = 100.
+    channel_mask = np.zeros(40, dtype=np.uint8)
+    channel_mask[[3, 7]] = 1
+    payload = struct.pack('<fHfB', 5., 10, 0., 3) + channel_mask.tostring()
+    return_code, data = board.process_command(Base.CMD_SWEEP_CHANNELS,
+                                              payload)
+    assert(return_code == Base.RETURN_OK)
+    buffer = decode_impedance_reply(data)
+    assert(len(buffer) == 2 * 10 * 4 + 4)
+    # All channels are cleared after a sweep.
+    assert(not board.state_of_channels.any())
+
+
+def test_bad_packet_size():
+    board = SimulatedControlBoard(number_of_channels=40, realtime=False)
+    assert(board.process_command(Base.CMD_SET_STATE_OF_ALL_CHANNELS,
+                                 '\x00' * 39) ==
+           (Base.RETURN_BAD_PACKET_SIZE, ''))
+    assert(board.process_command(0xEE, '') ==
+           (Base.RETURN_UNKNOWN_COMMAND, ''))
+
+
+def test_connect():
+    with SimulatedControlBoard(number_of_channels=40, serial_number=3,
+                               realtime=False) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            assert(proxy.number_of_channels() == 40)
+            assert(proxy.serial_number == 3)
+            assert(proxy.config_checksum ==
+                   struct.unpack('<H', board.process_command(
+                       Base.CMD_GET_CONFIG_CHECKSUM, '')[1])[0])
+            proxy.set_waveform_voltage(50)
+            state = np.zeros(40, dtype=int)
+            state[0] = 1
+            result = proxy.measure_impedance(5., 10, 0, True, True, state)
+            # Capacitance of one channel and the stray capacitance.
+            assert(np.allclose(np.mean(result.capacitance()),
+                               board.load_capacitance(state), rtol=.1))
+        finally:
+            proxy.disconnect()
+
+
+def test_reply_timeout():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            board.unresponsive_commands.add(Base.CMD_BATCH)
+            state = np.zeros(40, dtype=int)
+            start = time.time()
+            try:
+                with proxy.batch() as batch:
+                    batch.measure_impedance(5., 10, 0, True, True, state)
+            except RuntimeError, exception:
+                assert('timeout' in str(exception))
+            else:
+                raise AssertionError('Expected reply to time out.')
+            # Gives up after the measurement duration and the timeout.
+            assert(time.time() - start < 1e-3 * (50 +
+                                                 proxy.TIMEOUT_MILLISECONDS) +
+                   1.)
+        finally:
+            proxy.disconnect()
@@ -0,0 +1,101 @@
+import numpy as np
+
+from dmf_control_board_firmware import DMFControlBoard, FeedbackResults
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+from dmf_control_board_firmware.stream import FrameRingBuffer
+
+
+def test_ring_buffer_fifo():
+    ring_buffer = FrameRingBuffer(4, 3)
+    for i in range(3):
+        ring_buffer.push(i, i * np.ones(3))
+    assert(len(ring_buffer) == 3)
+    for i in range(3):
+        sequence_number, frame = ring_buffer.pop()
+        assert(sequence_number == i)
+        assert((frame == i).all())
+    assert(ring_buffer.pop(timeout=0) is None)
+
+
+def test_ring_buffer_overflow():
+    ring_buffer = FrameRingBuffer(4, 3)
+    for i in range(6):
+        ring_buffer.push(i, i * np.ones(3))
+    # The two oldest frames are overwritten.
+    assert(ring_buffer.overflow_count == 2)
+    assert([ring_buffer.pop()[0] for i in range(4)] == [2, 3, 4, 5])
+
+
+def _connect(board):
+    proxy = DMFControlBoard()
+    proxy.connect(board.port)
+    proxy.set_waveform_voltage(100.)
+    return proxy
+
+
+def test_stream():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        proxy = _connect(board)
+        try:
+            state = np.zeros(40, dtype=int)
+            state[0] = 1
+            with proxy.measure_impedance_stream(5., 10, 0, True, True, state,
+                                                n_frames=5) as stream:
+                frames = list(stream)
+            assert([sequence_number for sequence_number, result in frames]
+                   == range(5))
+            for sequence_number, result in frames:
+                assert(isinstance(result, FeedbackResults))
+                assert(len(result.time) == 10)
+                assert(np.allclose(np.mean(result.capacitance()),
+                                   board.load_capacitance(state), rtol=.1))
+            assert(stream.dropped_frames == 0)
+            # The control board accepts commands after the stream has ended.
+            assert(proxy.waveform_voltage() == 100.)
+        finally:
+            proxy.disconnect()
+
+
+def test_stream_stop():
+    with SimulatedControlBoard(number_of_channels=40) as board:
+        proxy = _connect(board)
+        try:
+            state = np.zeros(40, dtype=int)
+            stream = proxy.measure_impedance_stream(5., 2, 0, True, True,
+                                                    state, decode=False)
+            for i in range(3):
+                sequence_number, frame = stream.next()
+                assert(sequence_number == i)
+                # Four values per sampling window, followed by the trailer.
+                assert(frame.shape == (4 * 2 + 4, ))
+            stream.stop()
+            assert(stream.finished)
+            # Frames received before the stream ended are in order.
+            assert([item[0] for item in stream] ==
+                   range(3, stream.frames_read))
+            assert(proxy.waveform_voltage() == 100.)
+        finally:
+            proxy.disconnect()
+
+
+def test_stream_overflow():
+    # Each frame takes 10 ms to measure.
+    with SimulatedControlBoard(number_of_channels=40) as board:
+        proxy = _connect(board)
+        try:
+            state = np.zeros(40, dtype=int)
+            stream = proxy.measure_impedance_stream(5., 2, 0, True, True,
+                                                    state, n_frames=10,
+                                                    capacity=4, decode=False)
+            assert(stream.next()[0] == 0)
+            # Fall behind until the stream has ended.
+            stream._thread.join()
+            assert(stream.frames_read == 10)
+            # Frames 1-5 were overwritten in the ring buffer.
+            assert(stream.ring_buffer.overflow_count == 5)
+            assert([item[0] for item in stream] ==
+                   range(6, 10))
+            assert(stream.dropped_frames == 5)
+        finally:
+            proxy.disconnect()
@@ -0,0 +1,108 @@
+import numpy as np
+
+from dmf_control_board_firmware import (DMFControlBoard, FeedbackCalibration,
+                                        FeedbackResults)
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+
+def _summary_results():
+    summary = {'n_windows': np.array([10, 4]),
+               'hv_saturated': np.array([0, 1]),
+               'fb_saturated': np.array([2, 0]),
+               'V_hv_min': np.array([.4, .5]),
+               'V_hv_max': np.array([.6, .7]),
+               'V_hv_last': np.array([.45, .55]),
+               'V_fb_min': np.array([.1, .2]),
+               'V_fb_max': np.array([.3, .4]),
+               'V_fb_last': np.array([.25, .35])}
+    return FeedbackResults(100., 1e3, 5., np.array([.5, .6]),
+                           np.array([1, 1]), np.array([.2, .3]),
+                           np.array([2, 3]), FeedbackCalibration(),
+                           summary=summary)
+
+
+def test_summary_frame():
+    results = _summary_results()
+    assert(results.is_summary)
+    df_summary = results.summary_frame()
+    # Indexed by the time of the first window of each group.
+    assert(np.allclose(df_summary.index, [0, 10 * 5e-3]))
+    assert(df_summary.n_windows.tolist() == [10, 4])
+    assert(df_summary.hv_saturated.tolist() == [0, 1])
+    assert(df_summary.fb_saturated.tolist() == [2, 0])
+    np.testing.assert_allclose(df_summary.V_actuation,
+                               results.V_actuation())
+    np.testing.assert_allclose(df_summary.capacitance, results.capacitance())
+
+    # The last columns are computed from the last window of each group.
+    last = FeedbackResults(100., 1e3, 5., np.array([.45, .55]),
+                           np.array([1, 1]), np.array([.25, .35]),
+                           np.array([2, 3]), FeedbackCalibration())
+    np.testing.assert_allclose(df_summary.V_actuation_last,
+                               last.V_actuation())
+    np.testing.assert_allclose(df_summary.capacitance_last,
+                               last.capacitance())
+    assert((df_summary.V_actuation_min < df_summary.V_actuation).all())
+    assert((df_summary.V_actuation < df_summary.V_actuation_max).all())
+    assert((df_summary.capacitance_min < df_summary.capacitance).all())
+    assert((df_summary.capacitance < df_summary.capacitance_max).all())
+
+
+def test_summary_frame_not_summary():
+    results = FeedbackResults(100., 1e3, 5., np.array([.5]), np.array([1]),
+                              np.array([.2]), np.array([2]),
+                              FeedbackCalibration())
+    assert(not results.is_summary)
+    try:
+        results.summary_frame()
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('Expected `ValueError`.')
+
+
+def test_measure_impedance_summary():
+    with SimulatedControlBoard(number_of_channels=40, realtime=False,
+                               noise=.05) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_waveform_voltage(100)
+            state = np.zeros(40, dtype=int)
+            state[[1, 2]] = 1
+            # Measure the same (noisy) sampling windows twice: once window by
+            # window, and once summarized in groups of (up to) 10 windows.
+            board.random_state = np.random.RandomState(0)
+            windows = proxy.measure_impedance(5., 60, 0, True, True, state)
+            board.random_state = np.random.RandomState(0)
+            summary = proxy.measure_impedance_summary(5., 60, 0, True, True,
+                                                      state, 10)
+            # Resolution of the (integer) mean computed by the control board.
+            scale = proxy.__aref__ / (64 * 1023.) / 2. / np.sqrt(2)
+        finally:
+            proxy.disconnect()
+
+    assert(summary.is_summary)
+    assert(summary.n_windows.sum() == 60)
+    assert((summary.n_windows <= 10).all())
+    start = 0
+    for i, n_windows in enumerate(summary.n_windows):
+        group = slice(start, start + n_windows)
+        start += n_windows
+        for name in ('hv', 'fb'):
+            V = getattr(windows, 'V_' + name)[group]
+            resistor = getattr(windows, name + '_resistor')[group]
+            valid = resistor >= 0
+            assert(getattr(summary, name + '_saturated')[i] ==
+                   (~valid).sum())
+            # Every unsaturated window of a group uses the same resistor.
+            assert(set(resistor[valid]) ==
+                   set([getattr(summary, name + '_resistor')[i]]))
+            # Mean, min, max, and last RMS voltage of the group.
+            assert(abs(getattr(summary, 'V_' + name)[i] -
+                       V[valid].mean()) <= scale)
+            np.testing.assert_allclose([getattr(summary, 'V_%s_%s' %
+                                                (name, suffix))[i]
+                                        for suffix in ('min', 'max', 'last')],
+                                       [V[valid].min(), V[valid].max(),
+                                        V[valid][-1]], rtol=1e-9)
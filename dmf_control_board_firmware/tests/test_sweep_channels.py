@@ -0,0 +1,77 @@
+import numpy as np
+
+from dmf_control_board_firmware import DMFControlBoard
+from dmf_control_board_firmware.dmf_control_board_base import \
+    DMFControlBoard as Base
+from dmf_control_board_firmware.simulator import SimulatedControlBoard
+
+COLUMNS = ['channel_i', 'V_actuation', 'capacitance', 'impedance']
+
+
+def _sweep(proxy, channels, n_sampling_windows):
+    channel_mask = np.zeros(proxy.number_of_channels(), dtype=int)
+    channel_mask[channels] = 1
+    return proxy.sweep_channels(5., n_sampling_windows, 0, True, True,
+                                channel_mask)
+
+
+def test_sweep_chunks():
+    with SimulatedControlBoard(number_of_channels=40, realtime=False,
+                               noise=0) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            proxy.set_waveform_voltage(50)
+            channels = [0, 3, 7, 12, 20, 33, 39]
+            # At most 3 channels of 100 sampling windows fit in a reply, so
+            # the last chunk only holds a single channel.
+            df_sweep = _sweep(proxy, channels, 100)
+            assert(board.command_counts[Base.CMD_SWEEP_CHANNELS] == 3)
+            # One row per sampling window of each channel, in order.
+            assert(df_sweep.shape[0] == len(channels) * 100)
+            assert((df_sweep.channel_i.values ==
+                    np.repeat(channels, 100)).all())
+            assert((np.diff(df_sweep.index.values) > 0).all())
+
+            # Same measurements as one measurement per channel.
+            channel_mask = np.zeros(40, dtype=int)
+            channel_mask[channels] = 1
+            df_slow = proxy.sweep_channels_slow(5., 100, 0, True, True,
+                                                channel_mask)
+            np.testing.assert_allclose(df_sweep[COLUMNS].values,
+                                       df_slow[COLUMNS].values, rtol=1e-9)
+        finally:
+            proxy.disconnect()
+
+
+def test_sweep_empty_mask():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            df_sweep = _sweep(proxy, [], 10)
+            assert(df_sweep.shape == (0, len(proxy.SWEEP_CHANNELS_COLUMNS)))
+            assert(board.command_counts[Base.CMD_SWEEP_CHANNELS] == 0)
+        finally:
+            proxy.disconnect()
+
+
+def test_sweep_timeout():
+    with SimulatedControlBoard(number_of_channels=40,
+                               realtime=False) as board:
+        proxy = DMFControlBoard()
+        proxy.connect(board.port)
+        try:
+            board.unresponsive_commands.add(Base.CMD_SWEEP_CHANNELS)
+            try:
+                _sweep(proxy, [0, 1], 10)
+            except RuntimeError, exception:
+                assert('timeout' in str(exception))
+            else:
+                raise AssertionError('Expected sweep to time out.')
+            # The control board accepts commands after the timeout.
+            board.unresponsive_commands.clear()
+            assert(_sweep(proxy, [0, 1], 10).shape[0] == 20)
+        finally:
+            proxy.disconnect()
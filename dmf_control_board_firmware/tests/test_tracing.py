@@ -0,0 +1,40 @@
+import json
+import os
+import tempfile
+
+from dmf_control_board_firmware import tracing
+
+
+@tracing.traced('test')
+def add(a, b):
+    return a + b
+
+
+def test_disabled():
+    assert(not tracing.is_tracing())
+    assert(tracing.span('noop') is tracing.NULL_SPAN)
+    assert(add(1, 2) == 3)
+
+
+def test_trace():
+    handle, filepath = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    try:
+        tracing.start_tracing(filepath)
+        with tracing.span('outer', 'test', step=1):
+            assert(add(1, 2) == 3)
+        tracer = tracing.stop_tracing()
+        assert(not tracing.is_tracing())
+        assert([event['name'] for event in tracer.events] == ['add',
+                                                                'outer'])
+        with open(filepath, 'r') as input_:
+            trace = json.load(input_)
+        add_event, outer_event = trace['traceEvents']
+        assert(outer_event['ph'] == 'X')
+        assert(outer_event['args'] == {'step': 1})
+        # The inner span is nested within the outer span.
+        assert(outer_event['ts'] <= add_event['ts'])
+        assert(add_event['ts'] + add_event['dur'] <=
+               outer_event['ts'] + outer_event['dur'])
+    finally:
+        os.remove(filepath)
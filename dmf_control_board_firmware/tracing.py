@@ -0,0 +1,240 @@
+'''
+Opt-in span tracing in the `Chrome trace-event format`_.
+
+Spans are recorded around control board commands, measurement buffer
+decoders, transfer function evaluation, feedback analysis (e.g.,
+interpolation and Savitzky-Golay filtering), and calibration fits.  The
+resulting JSON file can be loaded into ``chrome://tracing`` (or any other
+viewer supporting the trace-event format, e.g., Perfetto) to see where the
+time of a slow protocol step went.
+
+Tracing is disabled by default, in which case each instrumented call only
+costs a global lookup.  To enable tracing:
+
+.. code-block:: python
+
+    from dmf_control_board_firmware import tracing
+
+    tracing.start_tracing('trace.json')
+    ...
+    tracing.stop_tracing()  # Writes `trace.json`.
+
+or set the ``DMF_CONTROL_BOARD_TRACE`` environment variable to an output
+file path to trace the whole process (the file is written at exit).
+
+.. _`Chrome trace-event format`: https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+'''
+import atexit
+import functools
+import json
+import os
+import threading
+import timeit
+
+# Global tracer (`None` if tracing is disabled).
+_tracer = None
+
+# Environment variable to enable tracing at import time.
+TRACE_ENVIRONMENT_VARIABLE = 'DMF_CONTROL_BOARD_TRACE'
+
+
+class Tracer(object):
+    '''
+    Collect complete (``"ph": "X"``) trace events.
+
+    Parameters
+    ----------
+    filepath : str, optional
+        Default output path (see :meth:`save`).
+    '''
+    def __init__(self, filepath=None):
+        self.filepath = filepath
+        self.events = []
+        self.pid = os.getpid()
+        self.start_time = timeit.default_timer()
+
+    def add_event(self, name, category, start, duration, args=None):
+        '''
+        Parameters
+        ----------
+        name : str
+            Name of span.
+        category : str
+            Category of span (e.g., ``command``, ``decode``).
+        start : float
+            Start time (in seconds, as returned by
+            :func:`timeit.default_timer`).
+        duration : float
+            Duration of span (in seconds).
+        args : dict, optional
+            Extra values to show with the span in the trace viewer.
+        '''
+        event = {'name': name, 'cat': category, 'ph': 'X',
+                 'ts': 1e6 * (start - self.start_time), 'dur': 1e6 * duration,
+                 'pid': self.pid, 'tid': threading.current_thread().ident}
+        if args:
+            event['args'] = args
+        # `list.append` is atomic, so no lock is required to record events
+        # from multiple threads.
+        self.events.append(event)
+
+    def to_dict(self):
+        '''
+        Returns
+        -------
+        dict
+            Trace in the JSON object format of the trace-event format.
+        '''
+        return {'traceEvents': list(self.events), 'displayTimeUnit': 'ms'}
+
+    def save(self, filepath=None):
+        '''
+        Write trace to a JSON file.
+
+        Parameters
+        ----------
+        filepath : str, optional
+            Output path.  If not specified, the default output path of the
+            tracer is used.
+        '''
+        filepath = filepath or self.filepath
+        if filepath is None:
+            raise ValueError('No output path specified.')
+        with open(filepath, 'w') as output:
+            json.dump(self.to_dict(), output, default=str)
+
+
+class Span(object):
+    '''
+    Context manager to record a span.
+    '''
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start = timeit.default_timer()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.tracer.add_event(self.name, self.category, self.start,
+                              timeit.default_timer() - self.start, self.args)
+        return False
+
+
+class NullSpan(object):
+    '''
+    Context manager that does nothing (used when tracing is disabled).
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+def span(name, category='dmf', **args):
+    '''
+    Parameters
+    ----------
+    name : str
+        Name of span.
+    category : str, optional
+        Category of span.
+    **args
+        Extra values to show with the span in the trace viewer.
+
+    Returns
+    -------
+    Span or NullSpan
+        Context manager recording the time spent in its block (a shared
+        no-op context manager if tracing is disabled).
+    '''
+    tracer = _tracer
+    if tracer is None:
+        return NULL_SPAN
+    return Span(tracer, name, category, args)
+
+
+def traced(category='dmf', name=None):
+    '''
+    Decorator to record a span for each call to a function.
+
+    Parameters
+    ----------
+    category : str, optional
+        Category of span.
+    name : str, optional
+        Name of span (default: name of function).
+    '''
+    def decorate(function):
+        name_ = name or function.__name__
+
+        @functools.wraps(function)
+        def _traced(*args, **kwargs):
+            tracer = _tracer
+            if tracer is None:
+                return function(*args, **kwargs)
+            start = timeit.default_timer()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                tracer.add_event(name_, category, start,
+                                 timeit.default_timer() - start)
+        return _traced
+    return decorate
+
+
+def start_tracing(filepath=None):
+    '''
+    Start recording spans (discarding any spans recorded by a previous
+    tracer).
+
+    Parameters
+    ----------
+    filepath : str, optional
+        Output path to write the trace to when tracing is stopped.
+
+    Returns
+    -------
+    Tracer
+    '''
+    global _tracer
+
+    _tracer = Tracer(filepath)
+    return _tracer
+
+
+def stop_tracing():
+    '''
+    Stop recording spans and write the trace to the output path passed to
+    :func:`start_tracing` (if any).
+
+    Returns
+    -------
+    Tracer
+        Stopped tracer (``None`` if tracing was not enabled).
+    '''
+    global _tracer
+
+    tracer = _tracer
+    _tracer = None
+    if tracer is not None and tracer.filepath is not None:
+        tracer.save()
+    return tracer
+
+
+def is_tracing():
+    return _tracer is not None
+
+
+if os.environ.get(TRACE_ENVIRONMENT_VARIABLE):
+    start_tracing(os.environ[TRACE_ENVIRONMENT_VARIABLE])
+    atexit.register(stop_tracing)
@@ -23,7 +23,7 @@ setup(name='wheeler.dmf-control-board-firmware',
       packages=['dmf_control_board_firmware'],
       include_package_data=True,
       install_requires=['arduino_helpers>=0.3.post10', 'arduino-scons',
-                        'decorator', 'functools32', 'matplotlib',
+                        'decorator', 'functools32', 'futures', 'matplotlib',
                         'microdrop-utility', 'scipy', 'serial_device>=0.3',
                         'svg-model>=0.5.post20', 'sympy', 'tables',
                         'wheeler.base-node>=0.3.post2', 'pandas>=0.17',